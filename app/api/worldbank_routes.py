@@ -2,6 +2,10 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
 from typing import List, Dict, Any, Optional
 from ..worldbank.rag_processor import WorldBankRAGProcessor
+from ..vector_store.filters import FILTER_FIELDS
+from ..vector_store.encoder_loader import EncoderNotReadyError
+import base64
+import binascii
 import logging
 
 logger = logging.getLogger(__name__)
@@ -46,6 +50,21 @@ async def get_system_info(wb_processor: WorldBankRAGProcessor = Depends(get_wb_p
             detail=f"Erreur lors de la récupération des informations système: {e}"
         )
 
+@worldbank_router.get("/ready/")
+async def readiness(wb_processor: WorldBankRAGProcessor = Depends(get_wb_processor)):
+    """
+    Indiquer si le système peut répondre sans attendre le chargement du modèle d'embeddings
+    (503 avec l'état "warming" pendant le préchauffage)
+    """
+    encoder = wb_processor.vector_store.encoder_status()
+    if not encoder["ready"]:
+        raise HTTPException(
+            status_code=503,
+            detail={"status": "warming" if encoder["state"] != "failed" else "failed", "encoder": encoder},
+            headers={"Retry-After": "5"}
+        )
+    return {"status": "ready", "encoder": encoder}
+
 @worldbank_router.post("/update-knowledge/")
 async def update_knowledge(
     request: Request,
@@ -91,6 +110,141 @@ async def update_knowledge(
             detail=f"Erreur lors de la mise à jour de la base de connaissances: {e}"
         )
 
+@worldbank_router.post("/documents/batch/")
+async def add_documents_batch(
+    request: Request,
+    wb_processor: WorldBankRAGProcessor = Depends(get_wb_processor)
+):
+    """
+    Ajouter un lot de documents avec une seule mise à jour de l'index
+    """
+    try:
+        # Récupérer le corps de la requête
+        body = await request.json()
+        
+        # Extraire les documents: [{"filename": ..., "content": ...} ou {"filename": ..., "content_base64": ...}],
+        # avec des métadonnées optionnelles {"metadata": {"type": ..., "country": ...}} utilisables comme filtres
+        documents = body.get("documents", [])
+        if not documents:
+            raise HTTPException(
+                status_code=400,
+                detail="Aucun document fourni"
+            )
+        
+        batch = []
+        for document in documents:
+            if document.get("content_base64") is not None:
+                try:
+                    file_content = base64.b64decode(document["content_base64"], validate=True)
+                except (binascii.Error, ValueError, TypeError):
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Contenu base64 invalide pour le document {document.get('filename', 'document.txt')}"
+                    )
+            else:
+                file_content = str(document.get("content", "")).encode("utf-8")
+            batch.append({
+                "file_content": file_content,
+                "filename": document.get("filename", "document.txt"),
+                "metadata": document.get("metadata")
+            })
+        
+        logger.info(f"Ajout d'un lot de {len(batch)} documents")
+        
+        # Effectuer l'ajout ("replace": true remplace les documents de même nom de fichier)
+        return wb_processor.add_documents(batch, replace_existing=bool(body.get("replace", False)))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erreur lors de l'ajout du lot de documents: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de l'ajout du lot de documents: {e}"
+        )
+
+@worldbank_router.delete("/documents/{doc_id}")
+async def delete_document(
+    doc_id: str,
+    wb_processor: WorldBankRAGProcessor = Depends(get_wb_processor)
+):
+    """
+    Supprimer un document de la base de connaissances
+    """
+    result = wb_processor.delete_document(doc_id)
+    if not result["success"]:
+        raise HTTPException(
+            status_code=500,
+            detail=result["message"]
+        )
+    return result
+
+@worldbank_router.post("/search/batch/")
+async def search_batch(
+    request: Request,
+    wb_processor: WorldBankRAGProcessor = Depends(get_wb_processor)
+):
+    """
+    Rechercher les chunks pertinents pour plusieurs requêtes en un seul appel (sans génération)
+    """
+    try:
+        # Récupérer le corps de la requête
+        body = await request.json()
+        
+        # Extraire les paramètres
+        queries = body.get("queries", [])
+        top_k = body.get("top_k", 5)
+        
+        if not isinstance(queries, list) or not queries or not all(isinstance(q, str) and q for q in queries):
+            raise HTTPException(
+                status_code=400,
+                detail="La liste de requêtes ne peut pas être vide"
+            )
+        
+        # bool est une sous-classe de int: true ne doit pas valoir top_k=1
+        if not isinstance(top_k, int) or isinstance(top_k, bool) or top_k <= 0:
+            raise HTTPException(
+                status_code=400,
+                detail="top_k doit être un entier positif"
+            )
+        
+        logger.info(f"Recherche par lot: {len(queries)} requêtes")
+        
+        # Ne pas bloquer la requête pendant le préchauffage du modèle d'embeddings
+        if not wb_processor.vector_store.encoder_status()["ready"]:
+            raise HTTPException(
+                status_code=503,
+                detail="warming",
+                headers={"Retry-After": "5"}
+            )
+        
+        # Effectuer la recherche
+        results = wb_processor.vector_store.search_many(queries, top_k)
+        return {
+            "success": True,
+            "results": [
+                {"query": query, "chunks": chunks}
+                for query, chunks in zip(queries, results)
+            ]
+        }
+    except HTTPException:
+        raise
+    except EncoderNotReadyError:
+        raise HTTPException(
+            status_code=503,
+            detail="warming",
+            headers={"Retry-After": "5"}
+        )
+    except Exception as e:
+        logger.error(f"Erreur lors de la recherche par lot: {e}")
+        import traceback
+        logger.error(traceback.format_exc())
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de la recherche par lot: {e}"
+        )
+
 @worldbank_router.post("/query/")
 async def query(
     request: Request,
@@ -107,6 +261,7 @@ async def query(
         question = body.get("question", "")
         top_k = body.get("top_k", 3)
         max_tokens = body.get("max_tokens", 512)
+        filters = body.get("filters")
         
         if not question:
             raise HTTPException(
@@ -114,10 +269,24 @@ async def query(
                 detail="La question ne peut pas être vide"
             )
         
+        # Un champ de filtre non indexé est une erreur du client, pas une erreur interne
+        if filters is not None:
+            if not isinstance(filters, dict):
+                raise HTTPException(
+                    status_code=400,
+                    detail="Les filtres doivent être un objet champ -> valeur"
+                )
+            unknown = sorted(field for field in filters if field not in FILTER_FIELDS)
+            if unknown:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Champs de filtre non indexés: {', '.join(unknown)} (champs disponibles: {', '.join(FILTER_FIELDS)})"
+                )
+        
         logger.info(f"Requête au système RAG: '{question}'")
         
         # Effectuer la requête
-        result = wb_processor.query(question, top_k, max_tokens)
+        result = wb_processor.query(question, top_k, max_tokens, filters=filters)
         
         if not result["success"]:
             logger.error(f"Erreur lors de la requête: {result.get('message', 'Erreur inconnue')}")
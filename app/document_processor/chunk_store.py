@@ -0,0 +1,324 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+
+class ChunkStore:
+    """
+    Stockage consolidé des chunks dans un fichier SQLite unique.
+    Remplace la lecture d'un fichier JSON par document à chaque requête.
+    """
+
+    def __init__(self, db_path: str = "./data/chunks.db"):
+        """
+        Initialiser le stockage des chunks
+        Args:
+            db_path (str): Chemin du fichier SQLite
+        """
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+        # Une seule connexion partagée, protégée par un verrou
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                doc_id TEXT NOT NULL,
+                chunk_id INTEGER NOT NULL,
+                filename TEXT,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                PRIMARY KEY (doc_id, chunk_id)
+            );
+            CREATE INDEX IF NOT EXISTS chunks_filename ON chunks (filename);
+            CREATE TABLE IF NOT EXISTS chunk_signatures (
+                doc_id TEXT NOT NULL,
+                chunk_id INTEGER NOT NULL,
+                signature BLOB NOT NULL,
+                PRIMARY KEY (doc_id, chunk_id)
+            );
+            CREATE TABLE IF NOT EXISTS signature_bands (
+                band_key INTEGER NOT NULL,
+                doc_id TEXT NOT NULL,
+                chunk_id INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS signature_bands_key ON signature_bands (band_key);
+            CREATE INDEX IF NOT EXISTS signature_bands_doc ON signature_bands (doc_id);
+            CREATE TABLE IF NOT EXISTS store_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self._conn.commit()
+        logger.info(f"ChunkStore initialisé: {db_path}")
+
+    @staticmethod
+    def _row_to_chunk(row: Tuple[str, int, str, str, str]) -> Dict[str, Any]:
+        """
+        Convertir une ligne SQLite en chunk
+        """
+        return {"text": row[3], "metadata": json.loads(row[4])}
+
+    def add_chunks(self, chunks: List[Dict[str, Any]]) -> int:
+        """
+        Ajouter (ou remplacer) des chunks
+        Args:
+            chunks (List[Dict[str, Any]]): Chunks avec leurs métadonnées
+        Returns:
+            int: Nombre de chunks écrits
+        """
+        rows = []
+        for chunk in chunks:
+            metadata = chunk.get("metadata", {})
+            rows.append((
+                metadata["doc_id"],
+                metadata["chunk_id"],
+                metadata.get("filename"),
+                chunk.get("text", chunk.get("content", "")),
+                json.dumps(metadata, ensure_ascii=False)
+            ))
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (doc_id, chunk_id, filename, text, metadata) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def get_chunk(self, doc_id: str, chunk_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Récupérer un chunk par identifiant
+        Args:
+            doc_id (str): ID du document
+            chunk_id (int): Numéro du chunk
+        Returns:
+            Optional[Dict[str, Any]]: Chunk ou None si absent
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM chunks WHERE doc_id = ? AND chunk_id = ?", (doc_id, chunk_id)
+            ).fetchone()
+        return self._row_to_chunk(row) if row else None
+
+    def get_document_chunks(self, doc_id: str) -> List[Dict[str, Any]]:
+        """
+        Récupérer les chunks d'un document, dans l'ordre
+        Args:
+            doc_id (str): ID du document
+        Returns:
+            List[Dict[str, Any]]: Chunks du document
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM chunks WHERE doc_id = ? ORDER BY chunk_id", (doc_id,)
+            ).fetchall()
+        return [self._row_to_chunk(row) for row in rows]
+
+    def iter_chunks(self, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """
+        Parcourir tous les chunks par lots, sans tout charger en mémoire
+        Args:
+            batch_size (int): Nombre de lignes lues par lot
+        Yields:
+            Dict[str, Any]: Chunk
+        """
+        last_key = ("", -1)
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT * FROM chunks WHERE (doc_id, chunk_id) > (?, ?) ORDER BY doc_id, chunk_id LIMIT ?",
+                    (last_key[0], last_key[1], batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._row_to_chunk(row)
+            last_key = (rows[-1][0], rows[-1][1])
+
+    def get_all_chunks(self) -> List[Dict[str, Any]]:
+        """
+        Récupérer tous les chunks
+        Returns:
+            List[Dict[str, Any]]: Liste de tous les chunks
+        """
+        return list(self.iter_chunks())
+
+    def delete_document(self, doc_id: str) -> int:
+        """
+        Supprimer les chunks d'un document
+        Args:
+            doc_id (str): ID du document
+        Returns:
+            int: Nombre de chunks supprimés
+        """
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+            self._conn.execute("DELETE FROM chunk_signatures WHERE doc_id = ?", (doc_id,))
+            self._conn.execute("DELETE FROM signature_bands WHERE doc_id = ?", (doc_id,))
+            self._conn.commit()
+        return cursor.rowcount
+
+    def add_signatures(self, entries: List[Tuple[str, int, bytes, List[int]]]) -> None:
+        """
+        Enregistrer les signatures MinHash de chunks canoniques
+        Args:
+            entries (List[Tuple[str, int, bytes, List[int]]]): (doc_id, chunk_id, signature, clés des bandes LSH)
+        """
+        if not entries:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunk_signatures (doc_id, chunk_id, signature) VALUES (?, ?, ?)",
+                [(doc_id, chunk_id, signature) for doc_id, chunk_id, signature, _ in entries]
+            )
+            self._conn.executemany(
+                "INSERT INTO signature_bands (band_key, doc_id, chunk_id) VALUES (?, ?, ?)",
+                [(key, doc_id, chunk_id) for doc_id, chunk_id, _, keys in entries for key in keys]
+            )
+            self._conn.commit()
+
+    def clear_signatures(self) -> None:
+        """
+        Supprimer toutes les signatures MinHash (avant leur recalcul)
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM chunk_signatures")
+            self._conn.execute("DELETE FROM signature_bands")
+            self._conn.commit()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        """
+        Lire une valeur de store_meta
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        """
+        Écrire une valeur de store_meta
+        """
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO store_meta (key, value) VALUES (?, ?)", (key, value))
+            self._conn.commit()
+
+    def find_signature_candidates(self, band_keys: List[int]) -> List[Tuple[str, int, bytes]]:
+        """
+        Chunks canoniques partageant au moins une bande LSH
+        Args:
+            band_keys (List[int]): Clés des bandes d'une signature
+        Returns:
+            List[Tuple[str, int, bytes]]: (doc_id, chunk_id, signature) des candidats
+        """
+        placeholders = ",".join("?" * len(band_keys))
+        with self._lock:
+            return self._conn.execute(
+                f"""SELECT s.doc_id, s.chunk_id, s.signature FROM chunk_signatures s
+                    JOIN (SELECT DISTINCT doc_id, chunk_id FROM signature_bands WHERE band_key IN ({placeholders})) b
+                    ON s.doc_id = b.doc_id AND s.chunk_id = b.chunk_id""",
+                band_keys
+            ).fetchall()
+
+    def find_aliases(self, doc_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Chunks d'autres documents marqués comme doublons de chunks de ces documents
+        Args:
+            doc_ids (List[str]): IDs des documents
+        Returns:
+            List[Dict[str, Any]]: Chunks dont metadata["duplicate_of"] désigne un de ces documents
+        """
+        placeholders = ",".join("?" * len(doc_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT * FROM chunks WHERE json_extract(metadata, '$.duplicate_of[0]') IN ({placeholders})
+                    AND doc_id NOT IN ({placeholders}) ORDER BY doc_id, chunk_id""",
+                list(doc_ids) * 2
+            ).fetchall()
+        return [self._row_to_chunk(row) for row in rows]
+
+    def count_aliases(self) -> int:
+        """
+        Nombre de chunks enregistrés comme doublons
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM chunks WHERE json_extract(metadata, '$.duplicate_of') IS NOT NULL"
+            ).fetchone()[0]
+
+    def find_documents(self, filename: str) -> List[str]:
+        """
+        IDs des documents enregistrés sous un nom de fichier
+        Args:
+            filename (str): Nom du fichier d'origine
+        Returns:
+            List[str]: IDs des documents
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT doc_id FROM chunks WHERE filename = ?", (filename,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def count_chunks(self) -> int:
+        """
+        Nombre total de chunks
+        """
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def count_documents(self) -> int:
+        """
+        Nombre de documents distincts
+        """
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(DISTINCT doc_id) FROM chunks").fetchone()[0]
+
+    def migrate_json_dir(self, chunks_dir: str) -> int:
+        """
+        Migrer une seule fois les fichiers data/chunks/*.json existants vers le stockage
+        Args:
+            chunks_dir (str): Répertoire des fichiers JSON de chunks
+        Returns:
+            int: Nombre de chunks migrés
+        """
+        with self._lock:
+            done = self._conn.execute(
+                "SELECT value FROM store_meta WHERE key = 'json_migrated'"
+            ).fetchone()
+        if done or not os.path.isdir(chunks_dir):
+            return 0
+
+        migrated = 0
+        for filename in sorted(os.listdir(chunks_dir)):
+            if not filename.endswith('.json'):
+                continue
+            chunks_path = os.path.join(chunks_dir, filename)
+            try:
+                with open(chunks_path, 'r', encoding='utf-8') as f:
+                    migrated += self.add_chunks(json.load(f))
+            except Exception as e:
+                logger.error(f"Erreur lors de la migration de {chunks_path}: {e}")
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('json_migrated', '1')"
+            )
+            self._conn.commit()
+        logger.info(f"{migrated} chunks migrés depuis {chunks_dir}")
+        return migrated
+
+    def close(self) -> None:
+        """
+        Fermer la connexion SQLite
+        """
+        with self._lock:
+            self._conn.close()
@@ -1,5 +1,7 @@
 import logging
-from typing import List, Dict, Any
+from collections import deque
+from itertools import chain
+from typing import List, Dict, Any, Iterable, Iterator
 
 # Configurer le logging
 logger = logging.getLogger(__name__)
@@ -28,73 +30,84 @@ class DocumentChunker:
         Returns:
             List[Dict[str, Any]]: Liste des chunks avec leurs métadonnées
         """
-        chunks = []
-        
-        # Vérifier si le texte est plus petit que la taille d'un chunk
-        if len(text) <= self.chunk_size:
-            chunks.append({
-                "text": text,
-                "metadata": {
-                    "doc_id": doc_metadata["id"],
-                    "filename": doc_metadata["filename"],
-                    "chunk_id": 0
-                }
-            })
-            return chunks
-            
-        # Découper le texte en paragraphes d'abord
-        paragraphs = [p for p in text.split('\n') if p.strip()]
-        
-        # Regrouper les paragraphes en chunks
-        current_chunk = []
-        current_size = 0
+        return list(self.split_stream([text], doc_metadata))
+
+    def _make_chunk(self, text: str, doc_metadata: Dict[str, Any], chunk_id: int) -> Dict[str, Any]:
+        return {
+            "text": text,
+            "metadata": {
+                "doc_id": doc_metadata["id"],
+                "filename": doc_metadata["filename"],
+                "chunk_id": chunk_id
+            }
+        }
+
+    def split_stream(self, blocks: Iterable[str], doc_metadata: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Découper un flux de blocs de texte (pages, lignes...) en chunks, au fil de l'eau.
+        Le découpage est identique à celui du texte concaténé: les paragraphes sont les lignes
+        non vides, regroupées jusqu'à chunk_size, et chaque chunk reprend en tête ses derniers
+        paragraphes dans la limite de chunk_overlap. La fenêtre courante est une file dont les
+        paragraphes sortent une seule fois: seule une ligne en cours et un chunk sont en mémoire.
+        Args:
+            blocks (Iterable[str]): Blocs de texte, dans l'ordre du document
+            doc_metadata (Dict[str, Any]): Métadonnées du document
+        Yields:
+            Dict[str, Any]: Chunk avec ses métadonnées
+        """
+        blocks = iter(blocks)
+
+        # Un texte qui tient dans un seul chunk est gardé tel quel (lignes vides comprises)
+        head = []
+        head_size = 0
+        for block in blocks:
+            head.append(block)
+            head_size += len(block)
+            if head_size > self.chunk_size:
+                break
+        else:
+            yield self._make_chunk("".join(head), doc_metadata, 0)
+            return
+
+        window = deque()
+        window_size = 0  # Somme de len(p) + 1 sur la fenêtre
         chunk_id = 0
-        
-        for paragraph in paragraphs:
+
+        def lines() -> Iterator[str]:
+            # Lignes complètes du flux; une ligne coupée entre deux blocs est recollée
+            pending = ""
+            for block in chain(head, blocks):
+                parts = (pending + block).split("\n")
+                pending = parts.pop()
+                yield from parts
+            yield pending
+
+        for paragraph in lines():
+            if not paragraph.strip():
+                continue
             # Si ajouter ce paragraphe dépasse la taille du chunk et le chunk n'est pas vide
-            if current_size + len(paragraph) > self.chunk_size and current_chunk:
-                # Sauvegarder le chunk actuel
-                chunk_text = '\n'.join(current_chunk)
-                chunks.append({
-                    "text": chunk_text,
-                    "metadata": {
-                        "doc_id": doc_metadata["id"],
-                        "filename": doc_metadata["filename"],
-                        "chunk_id": chunk_id
-                    }
-                })
-                
-                # Calculer combien de paragraphes à conserver pour le chevauchement
+            if window_size + len(paragraph) > self.chunk_size and window:
+                yield self._make_chunk("\n".join(window), doc_metadata, chunk_id)
+
+                # Paragraphes de fin conservés pour le chevauchement
+                kept = 0
                 chars_to_keep = 0
-                paragraphs_to_keep = []
-                
-                for p in reversed(current_chunk):
-                    if chars_to_keep + len(p) <= self.chunk_overlap:
-                        chars_to_keep += len(p) + 1  # +1 pour le \n
-                        paragraphs_to_keep.insert(0, p)
-                    else:
+                for p in reversed(window):
+                    if chars_to_keep + len(p) > self.chunk_overlap:
                         break
-                        
-                # Commencer un nouveau chunk avec les paragraphes chevauchants
-                current_chunk = paragraphs_to_keep
-                current_size = sum(len(p) for p in current_chunk) + len(current_chunk)  # Taille + \n
+                    chars_to_keep += len(p) + 1  # +1 pour le \n
+                    kept += 1
+                for _ in range(len(window) - kept):
+                    window_size -= len(window.popleft()) + 1
                 chunk_id += 1
-            
+
             # Ajouter le paragraphe au chunk actuel
-            current_chunk.append(paragraph)
-            current_size += len(paragraph) + 1  # +1 pour le \n
-        
+            window.append(paragraph)
+            window_size += len(paragraph) + 1  # +1 pour le \n
+
         # Ajouter le dernier chunk s'il n'est pas vide
-        if current_chunk:
-            chunk_text = '\n'.join(current_chunk)
-            chunks.append({
-                "text": chunk_text,
-                "metadata": {
-                    "doc_id": doc_metadata["id"],
-                    "filename": doc_metadata["filename"],
-                    "chunk_id": chunk_id
-                }
-            })
-        
-        logger.info(f"Document découpé en {len(chunks)} chunks")
-        return chunks
\ No newline at end of file
+        if window:
+            yield self._make_chunk("\n".join(window), doc_metadata, chunk_id)
+            chunk_id += 1
+
+        logger.info(f"Document découpé en {chunk_id} chunks")
@@ -0,0 +1,206 @@
+import re
+import zlib
+import hashlib
+import logging
+from typing import List, Dict, Any, Iterable, Tuple
+import numpy as np
+
+from .chunk_store import ChunkStore
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+# Nombre premier de Mersenne des permutations MinHash (2^61 - 1)
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+
+# Borne des coefficients a et b: avec des empreintes CRC32 (< 2^32), a * h + b reste
+# inférieur à 2^64 et ne déborde pas en uint64
+COEFFICIENT_BOUND = 1 << 32
+
+# Version du calcul des signatures: les signatures stockées sont recalculées si elle change
+SIGNATURE_VERSION = 2
+
+SUPPORTED_DEDUP_MODES = ("off", "skip", "alias")
+
+
+class MinHashDeduplicator:
+    """
+    Détection des chunks quasi identiques à l'ingestion par MinHash LSH.
+    Chaque chunk est réduit à une signature MinHash de ses shingles (n-grammes de mots),
+    découpée en bandes: deux chunks partageant une bande sont candidats, puis comparés
+    sur leur signature complète (estimation de la similarité de Jaccard).
+    Les signatures des chunks canoniques sont conservées dans le ChunkStore.
+    """
+    def __init__(self, store: ChunkStore, threshold: float = 0.9, num_perm: int = 128, bands: int = 16,
+                 shingle_size: int = 5, seed: int = 1):
+        """
+        Initialiser le dédoublonneur
+        Args:
+            store (ChunkStore): Stockage des chunks et des signatures
+            threshold (float): Similarité de Jaccard estimée au-delà de laquelle un chunk est un doublon
+            num_perm (int): Nombre de permutations (taille de la signature)
+            bands (int): Nombre de bandes LSH (num_perm doit en être un multiple)
+            shingle_size (int): Nombre de mots par shingle
+            seed (int): Graine des permutations (doit rester fixe pour un stockage donné)
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm doit être un multiple de bands")
+        self.store = store
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, COEFFICIENT_BOUND, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, COEFFICIENT_BOUND, size=num_perm, dtype=np.uint64)
+        self.checked = 0
+        self.duplicates = 0
+        self._ensure_signatures(f"{SIGNATURE_VERSION}/{num_perm}/{bands}/{shingle_size}/{seed}")
+
+    def _ensure_signatures(self, scheme: str) -> None:
+        """
+        Recalculer les signatures stockées si elles ont été produites par d'autres permutations
+        (elles ne seraient plus comparables aux nouvelles)
+        Args:
+            scheme (str): Version et paramètres du calcul des signatures
+        """
+        stored = self.store.get_meta("minhash_scheme")
+        if stored == scheme:
+            return
+        if stored is not None or self.store.count_chunks():
+            self.store.clear_signatures()
+            batch, count = [], 0
+            for chunk in self.store.iter_chunks():
+                if "duplicate_of" in chunk["metadata"]:
+                    continue
+                batch.append(chunk)
+                if len(batch) >= 1000:
+                    self.register_chunks(batch)
+                    count, batch = count + len(batch), []
+            self.register_chunks(batch)
+            logger.info(f"Signatures MinHash recalculées pour {count + len(batch)} chunks")
+        self.store.set_meta("minhash_scheme", scheme)
+
+    def signature(self, text: str) -> np.ndarray:
+        """
+        Signature MinHash d'un texte
+        Args:
+            text (str): Texte du chunk
+        Returns:
+            np.ndarray: Signature (num_perm valeurs uint64)
+        """
+        words = WORD_PATTERN.findall(text.lower())
+        size = min(self.shingle_size, len(words)) or 1
+        shingles = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        # Toutes les permutations en une opération: (a * h + b) mod p, minimum par permutation
+        permuted = (hashes[:, None] * self._a[None, :] + self._b[None, :]) % MERSENNE_PRIME
+        return permuted.min(axis=0)
+
+    def band_keys(self, signature: np.ndarray) -> List[int]:
+        """
+        Clés des bandes LSH d'une signature (entiers signés 64 bits pour SQLite)
+        """
+        rows = self.num_perm // self.bands
+        keys = []
+        for band in range(self.bands):
+            digest = hashlib.blake2b(signature[band * rows:(band + 1) * rows].tobytes(),
+                                     digest_size=8, salt=band.to_bytes(2, "little")).digest()
+            keys.append(int.from_bytes(digest, "little", signed=True))
+        return keys
+
+    @staticmethod
+    def similarity(signature: np.ndarray, other: np.ndarray) -> float:
+        """
+        Similarité de Jaccard estimée entre deux signatures
+        """
+        return float(np.mean(signature == other))
+
+    def deduplicate(self, chunks: List[Dict[str, Any]], mode: str = "alias",
+                    exclude_docs: Iterable[str] = ()) -> Tuple[List[Dict[str, Any]], List[Tuple]]:
+        """
+        Repérer les doublons parmi de nouveaux chunks (par rapport aux chunks enregistrés
+        et aux chunks précédents du même lot)
+        Args:
+            chunks (List[Dict[str, Any]]): Nouveaux chunks
+            mode (str): "skip" (doublons retirés) ou "alias" (doublons gardés, marqués
+                metadata["duplicate_of"] = [doc_id, chunk_id] du chunk canonique)
+            exclude_docs (Iterable[str]): Documents ignorés comme canoniques (documents remplacés)
+        Returns:
+            Tuple[List[Dict[str, Any]], List[Tuple]]: Chunks à enregistrer et signatures des
+                chunks canoniques, à passer à register() une fois les chunks enregistrés
+        """
+        exclude_docs = set(exclude_docs)
+        kept = []
+        pending = []
+        duplicates = 0
+        # Bandes des chunks canoniques du lot, pas encore enregistrées
+        batch_bands: Dict[int, List[int]] = {}
+        for chunk in chunks:
+            metadata = chunk["metadata"]
+            signature = self.signature(chunk.get("text", ""))
+            keys = self.band_keys(signature)
+            self.checked += 1
+
+            best, best_similarity = None, self.threshold
+            candidates = [(doc_id, chunk_id, np.frombuffer(blob, dtype=np.uint64))
+                          for doc_id, chunk_id, blob in self.store.find_signature_candidates(keys)
+                          if doc_id not in exclude_docs]
+            candidates += [pending[i][:3] for i in {i for key in keys for i in batch_bands.get(key, [])}]
+            for doc_id, chunk_id, other in candidates:
+                similarity = self.similarity(signature, other)
+                if similarity >= best_similarity:
+                    best, best_similarity = (doc_id, chunk_id), similarity
+
+            if best is not None:
+                duplicates += 1
+                if mode == "alias":
+                    chunk["metadata"] = {**metadata, "duplicate_of": list(best)}
+                    kept.append(chunk)
+                continue
+
+            for key in keys:
+                batch_bands.setdefault(key, []).append(len(pending))
+            pending.append((metadata["doc_id"], metadata["chunk_id"], signature, keys))
+            kept.append(chunk)
+
+        self.duplicates += duplicates
+        if duplicates:
+            logger.info(f"{duplicates} doublons détectés sur {len(chunks)} chunks")
+        return kept, pending
+
+    def register(self, pending: List[Tuple]) -> None:
+        """
+        Enregistrer les signatures de chunks canoniques
+        Args:
+            pending (List[Tuple]): (doc_id, chunk_id, signature, clés des bandes)
+        """
+        self.store.add_signatures([(doc_id, chunk_id, signature.tobytes(), keys)
+                                   for doc_id, chunk_id, signature, keys in pending])
+
+    def register_chunks(self, chunks: List[Dict[str, Any]]) -> None:
+        """
+        Calculer et enregistrer les signatures de chunks devenus canoniques
+        """
+        pending = []
+        for chunk in chunks:
+            signature = self.signature(chunk.get("text", ""))
+            pending.append((chunk["metadata"]["doc_id"], chunk["metadata"]["chunk_id"], signature, self.band_keys(signature)))
+        self.register(pending)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Statistiques de dédoublonnage (depuis le démarrage et dans le stockage)
+        """
+        stored = self.store.count_chunks()
+        aliases = self.store.count_aliases()
+        return {
+            "checked": self.checked,
+            "duplicates": self.duplicates,
+            "ratio": self.duplicates / self.checked if self.checked else 0.0,
+            "stored_aliases": aliases,
+            "stored_ratio": aliases / stored if stored else 0.0
+        }
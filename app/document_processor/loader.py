@@ -1,21 +1,24 @@
 import os
-from typing import List, Dict, Any
-import PyPDF2
+from typing import Dict, Any, Iterator, Optional
 import uuid
 
+from .pdf_extractor import PdfExtractor, content_hash
+
 class DocumentLoader:
     """
     Classe pour charger des documents de différents formats (TXT, PDF)
     """
     
-    def __init__(self, storage_dir: str = "./data/documents"):
+    def __init__(self, storage_dir: str = "./data/documents", pdf_extractor: Optional[PdfExtractor] = None):
         """
         Initialiser le chargeur de documents
         
         Args:
             storage_dir (str): Répertoire de stockage des documents
+            pdf_extractor (PdfExtractor): Extraction du texte des PDF (parallèle, avec cache)
         """
         self.storage_dir = storage_dir
+        self.pdf_extractor = pdf_extractor or PdfExtractor()
         os.makedirs(storage_dir, exist_ok=True)
     
     def load_text(self, file_path: str) -> str:
@@ -31,31 +34,69 @@ class DocumentLoader:
         with open(file_path, 'r', encoding='utf-8') as file:
             return file.read()
     
-    def load_pdf(self, file_path: str) -> str:
+    def iter_text_lines(self, file_path: str) -> Iterator[str]:
+        """
+        Parcourir un fichier texte ligne par ligne, sans le charger entièrement
+        
+        Args:
+            file_path (str): Chemin vers le fichier texte
+            
+        Yields:
+            str: Ligne du fichier (avec son saut de ligne)
+        """
+        with open(file_path, 'r', encoding='utf-8') as file:
+            yield from file
+    
+    def iter_pdf_pages(self, file_path: str, key: Optional[str] = None) -> Iterator[str]:
+        """
+        Parcourir le texte d'un fichier PDF page par page
+        
+        Args:
+            file_path (str): Chemin vers le fichier PDF
+            key (str): Empreinte du contenu du fichier (clé du cache d'extraction)
+            
+        Yields:
+            str: Texte d'une page, suivi d'un saut de ligne
+        """
+        for page_text in self.pdf_extractor.iter_pages(file_path, key):
+            yield page_text + "\n"
+    
+    def load_pdf(self, file_path: str, key: Optional[str] = None) -> str:
         """
         Charger un fichier PDF
         
         Args:
             file_path (str): Chemin vers le fichier PDF
+            key (str): Empreinte du contenu du fichier (clé du cache d'extraction)
             
         Returns:
             str: Contenu du fichier
         """
-        text = ""
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text += page.extract_text() + "\n"
-        return text
+        return "".join(self.iter_pdf_pages(file_path, key))
     
-    def save_file(self, file_content: bytes, filename: str) -> Dict[str, Any]:
+    def iter_blocks(self, document: Dict[str, Any]) -> Iterator[str]:
+        """
+        Parcourir le texte d'un document sauvegardé par blocs (lignes ou pages), pour un découpage en flux
+        
+        Args:
+            document (Dict[str, Any]): Métadonnées renvoyées par save_file
+            
+        Yields:
+            str: Bloc de texte, dans l'ordre du document
+        """
+        if document["extension"] == '.pdf':
+            return self.iter_pdf_pages(document["path"], document.get("content_hash"))
+        return self.iter_text_lines(document["path"])
+    
+    def save_file(self, file_content: bytes, filename: str, load_content: bool = True) -> Dict[str, Any]:
         """
         Sauvegarder un fichier sur le disque
         
         Args:
             file_content (bytes): Contenu du fichier
             filename (str): Nom du fichier
+            load_content (bool): Extraire le texte complet dans "content" (sinon, le lire
+                ensuite en flux avec iter_blocks)
             
         Returns:
             Dict[str, Any]: Métadonnées du document
@@ -67,6 +108,10 @@ class DocumentLoader:
         _, ext = os.path.splitext(filename)
         ext = ext.lower()
         
+        # Vérifier le format avant d'écrire quoi que ce soit
+        if ext not in ('.txt', '.md', '.pdf'):
+            raise ValueError(f"Format de fichier non supporté: {ext}")
+        
         # Créer le chemin de stockage
         file_path = os.path.join(self.storage_dir, f"{doc_id}{ext}")
         
@@ -74,19 +119,20 @@ class DocumentLoader:
         with open(file_path, 'wb') as f:
             f.write(file_content)
         
-        # Extraire le texte selon le format
-        if ext == '.txt' or ext == '.md':
-            content = self.load_text(file_path)
-        elif ext == '.pdf':
-            content = self.load_pdf(file_path)
-        else:
-            raise ValueError(f"Format de fichier non supporté: {ext}")
-        
-        # Retourner les métadonnées
-        return {
+        document = {
             "id": doc_id,
             "filename": filename,
             "path": file_path,
-            "content": content,
-            "extension": ext
-        }
\ No newline at end of file
+            "extension": ext,
+            "content_hash": content_hash(file_content) if ext == '.pdf' else None
+        }
+        
+        # Extraire le texte selon le format
+        if load_content:
+            if ext == '.pdf':
+                document["content"] = self.load_pdf(file_path, document["content_hash"])
+            else:
+                document["content"] = self.load_text(file_path)
+        
+        # Retourner les métadonnées
+        return document
\ No newline at end of file
@@ -1,15 +1,22 @@
 import os
-import json
-from typing import List, Dict, Any
+import glob
+from itertools import islice
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 from .loader import DocumentLoader
+from .pdf_extractor import PdfExtractor
 from .chunker import DocumentChunker
+from .chunk_store import ChunkStore
+from .dedup import MinHashDeduplicator, SUPPORTED_DEDUP_MODES
 
 class DocumentManager:
     """
     Classe pour gérer les documents et leurs chunks
     """
+    # Nombre de chunks dédoublonnés et enregistrés ensemble à l'ingestion
+    ingest_batch_size = 256
     
-    def __init__(self, storage_dir: str = "./data", chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(self, storage_dir: str = "./data", chunk_size: int = 1000, chunk_overlap: int = 200,
+                 dedup: str = "alias", dedup_threshold: float = 0.9, pdf_workers: Optional[int] = None):
         """
         Initialiser le gestionnaire de documents
         
@@ -17,37 +24,75 @@ class DocumentManager:
             storage_dir (str): Répertoire de stockage
             chunk_size (int): Taille des chunks en caractères
             chunk_overlap (int): Chevauchement entre les chunks en caractères
+            dedup (str): Traitement des chunks quasi identiques à des chunks déjà enregistrés:
+                "alias" (enregistrés mais non indexés, avec un renvoi vers le chunk canonique),
+                "skip" (ignorés) ou "off"
+            dedup_threshold (float): Similarité de Jaccard estimée à partir de laquelle un chunk est un doublon
+            pdf_workers (int): Processus d'extraction des pages des gros PDF (par défaut: nombre de CPU, au plus 8)
         """
+        if dedup not in SUPPORTED_DEDUP_MODES:
+            raise ValueError(f"Mode de dédoublonnage non supporté: {dedup}")
         self.docs_dir = os.path.join(storage_dir, "documents")
         self.chunks_dir = os.path.join(storage_dir, "chunks")
-        self.loader = DocumentLoader(self.docs_dir)
+        self.loader = DocumentLoader(self.docs_dir, PdfExtractor(os.path.join(storage_dir, "pdf_cache"), pdf_workers))
         self.chunker = DocumentChunker(chunk_size, chunk_overlap)
         
         # Créer les répertoires nécessaires
         os.makedirs(self.docs_dir, exist_ok=True)
         os.makedirs(self.chunks_dir, exist_ok=True)
+        
+        # Stockage consolidé des chunks, avec migration unique des anciens fichiers JSON
+        self.chunk_store = ChunkStore(os.path.join(storage_dir, "chunks.db"))
+        self.chunk_store.migrate_json_dir(self.chunks_dir)
+        
+        # Détection des doublons à l'ingestion (signatures conservées dans le stockage des chunks)
+        self.dedup = dedup
+        self.deduplicator = MinHashDeduplicator(self.chunk_store, dedup_threshold) if dedup != "off" else None
     
-    def process_document(self, file_content: bytes, filename: str) -> str:
+    def process_document(self, file_content: bytes, filename: str, metadata: Optional[Dict[str, Any]] = None,
+                         exclude_docs: Iterable[str] = ()) -> str:
         """
-        Traiter un document: charger, découper et sauvegarder
+        Traiter un document: charger, découper, dédoublonner et sauvegarder
         
         Args:
             file_content (bytes): Contenu du fichier
             filename (str): Nom du fichier
+            metadata (Dict[str, Any]): Métadonnées structurées à propager sur chaque chunk
+                (ex: type, id, region, indicator, country pour les documents Banque Mondiale)
+            exclude_docs (Iterable[str]): Documents dont les chunks ne servent pas de référence
+                pour les doublons (documents sur le point d'être remplacés)
             
         Returns:
             str: ID du document
         """
-        # Charger et sauvegarder le document
-        doc_metadata = self.loader.save_file(file_content, filename)
+        # Sauvegarder le document (son texte est lu ensuite en flux)
+        doc_metadata = self.loader.save_file(file_content, filename, load_content=False)
         
-        # Découper le document
-        chunks = self.chunker.split_text(doc_metadata["content"], doc_metadata)
-        
-        # Sauvegarder les chunks
-        chunks_path = os.path.join(self.chunks_dir, f"{doc_metadata['id']}.json")
-        with open(chunks_path, 'w', encoding='utf-8') as f:
-            json.dump(chunks, f, ensure_ascii=False, indent=2)
+        try:
+            # Découper le document au fil de la lecture, et traiter les chunks par lots:
+            # le texte complet n'est jamais en mémoire
+            stream = self.chunker.split_stream(self.loader.iter_blocks(doc_metadata), doc_metadata)
+            for chunks in iter(lambda: list(islice(stream, self.ingest_batch_size)), []):
+                # Propager les métadonnées structurées sans écraser doc_id, filename et chunk_id
+                if metadata:
+                    for chunk in chunks:
+                        chunk["metadata"] = {**metadata, **chunk["metadata"]}
+                
+                # Repérer les chunks quasi identiques à des chunks déjà enregistrés
+                # (y compris ceux des lots précédents, dont les signatures sont enregistrées)
+                pending = []
+                if self.deduplicator is not None:
+                    chunks, pending = self.deduplicator.deduplicate(chunks, self.dedup, exclude_docs)
+                
+                # Sauvegarder les chunks, puis les signatures des nouveaux chunks canoniques
+                self.chunk_store.add_chunks(chunks)
+                if pending:
+                    self.deduplicator.register(pending)
+        except BaseException:
+            # Échec en cours de lecture (PDF illisible, interruption): ne laisser ni les lots de
+            # chunks déjà enregistrés, ni leurs signatures, ni le fichier sauvegardé
+            self.delete_document(doc_metadata["id"])
+            raise
         
         return doc_metadata["id"]
     
@@ -61,13 +106,20 @@ class DocumentManager:
         Returns:
             List[Dict[str, Any]]: Liste des chunks avec leurs métadonnées
         """
-        chunks_path = os.path.join(self.chunks_dir, f"{doc_id}.json")
-        
-        if not os.path.exists(chunks_path):
-            return []
+        return self.chunk_store.get_document_chunks(doc_id)
+    
+    def get_chunk(self, doc_id: str, chunk_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Récupérer un chunk précis
         
-        with open(chunks_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        Args:
+            doc_id (str): ID du document
+            chunk_id (int): Numéro du chunk
+            
+        Returns:
+            Optional[Dict[str, Any]]: Chunk ou None s'il n'existe pas
+        """
+        return self.chunk_store.get_chunk(doc_id, chunk_id)
     
     def get_all_chunks(self) -> List[Dict[str, Any]]:
         """
@@ -76,13 +128,96 @@ class DocumentManager:
         Returns:
             List[Dict[str, Any]]: Liste de tous les chunks avec leurs métadonnées
         """
-        all_chunks = []
+        return self.chunk_store.get_all_chunks()
+    
+    def iter_indexable_chunks(self) -> Iterator[Dict[str, Any]]:
+        """
+        Parcourir les chunks à indexer (tous sauf les doublons enregistrés comme alias)
+        
+        Yields:
+            Dict[str, Any]: Chunk
+        """
+        for chunk in self.chunk_store.iter_chunks():
+            if "duplicate_of" not in chunk["metadata"]:
+                yield chunk
+    
+    def release_aliases(self, doc_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Avant la suppression de documents, promouvoir les doublons d'autres documents qui
+        renvoient vers leurs chunks: pour chaque chunk supprimé, le premier alias devient
+        canonique et les suivants renvoient vers lui
+        
+        Args:
+            doc_ids (List[str]): IDs des documents supprimés
+            
+        Returns:
+            List[Dict[str, Any]]: Chunks devenus canoniques, à indexer
+        """
+        if self.deduplicator is None or not doc_ids:
+            return []
+        promoted = {}
+        updated = []
+        for chunk in self.chunk_store.find_aliases(doc_ids):
+            metadata = chunk["metadata"]
+            target = tuple(metadata.pop("duplicate_of"))
+            if target in promoted:
+                canonical = promoted[target]["metadata"]
+                metadata["duplicate_of"] = [canonical["doc_id"], canonical["chunk_id"]]
+            else:
+                promoted[target] = chunk
+            updated.append(chunk)
+        if updated:
+            self.chunk_store.add_chunks(updated)
+            self.deduplicator.register_chunks(list(promoted.values()))
+        return list(promoted.values())
+    
+    def dedup_stats(self) -> Optional[Dict[str, Any]]:
+        """
+        Statistiques de dédoublonnage (None si désactivé)
+        """
+        return self.deduplicator.stats() if self.deduplicator is not None else None
+    
+    def count_chunks(self) -> int:
+        """
+        Nombre total de chunks, sans les charger
         
-        for filename in os.listdir(self.chunks_dir):
-            if filename.endswith('.json'):
-                chunks_path = os.path.join(self.chunks_dir, filename)
-                with open(chunks_path, 'r', encoding='utf-8') as f:
-                    chunks = json.load(f)
-                    all_chunks.extend(chunks)
+        Returns:
+            int: Nombre de chunks
+        """
+        return self.chunk_store.count_chunks()
+    
+    def count_documents(self) -> int:
+        """
+        Nombre de documents ayant des chunks, sans les charger
+        
+        Returns:
+            int: Nombre de documents
+        """
+        return self.chunk_store.count_documents()
+    
+    def find_documents(self, filename: str) -> List[str]:
+        """
+        IDs des documents déjà enregistrés sous un nom de fichier
         
-        return all_chunks
\ No newline at end of file
+        Args:
+            filename (str): Nom du fichier d'origine
+            
+        Returns:
+            List[str]: IDs des documents
+        """
+        return self.chunk_store.find_documents(filename)
+    
+    def delete_document(self, doc_id: str) -> int:
+        """
+        Supprimer un document: ses chunks et le fichier enregistré
+        
+        Args:
+            doc_id (str): ID du document
+            
+        Returns:
+            int: Nombre de chunks supprimés
+        """
+        deleted = self.chunk_store.delete_document(doc_id)
+        for path in glob.glob(os.path.join(self.docs_dir, f"{glob.escape(doc_id)}.*")):
+            os.remove(path)
+        return deleted
@@ -0,0 +1,205 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterator, List, Optional
+import PyPDF2
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+
+def content_hash(file_content: bytes) -> str:
+    """
+    Empreinte du contenu d'un fichier (clé du cache d'extraction)
+    Args:
+        file_content (bytes): Contenu du fichier
+    Returns:
+        str: Empreinte BLAKE2b hexadécimale
+    """
+    return hashlib.blake2b(file_content, digest_size=20).hexdigest()
+
+
+def _extract_range(file_path: str, start: int, stop: int) -> List[str]:
+    """
+    Extraire le texte d'une plage de pages (exécuté dans un processus de travail,
+    qui ouvre lui-même le fichier)
+    """
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        return [pdf_reader.pages[page_num].extract_text() for page_num in range(start, stop)]
+
+
+class PdfExtractor:
+    """
+    Extraction du texte des PDF page par page, sous forme de flux.
+    Les gros documents sont découpés en plages de pages extraites en parallèle par un pool
+    de processus, créé au premier gros document et réutilisé ensuite; les pages sont rendues
+    dans l'ordre dès que leur plage est prête.
+    Le texte extrait est mis en cache par empreinte du contenu: un fichier déjà vu
+    (réingestion, remplacement à l'identique) n'est pas réextrait. Le cache est borné en
+    taille et en âge, les entrées les moins récemment utilisées étant supprimées d'abord.
+    """
+    def __init__(self, cache_dir: Optional[str] = "./data/pdf_cache", workers: Optional[int] = None,
+                 pages_per_task: int = 16, parallel_threshold: int = 32,
+                 cache_max_bytes: Optional[int] = 512 * 1024 * 1024, cache_max_age: Optional[float] = None):
+        """
+        Initialiser l'extracteur
+        Args:
+            cache_dir (str): Répertoire du cache des textes extraits (None pour désactiver)
+            workers (int): Nombre de processus d'extraction (par défaut: nombre de CPU, au plus 8)
+            pages_per_task (int): Nombre de pages par plage confiée à un processus
+            parallel_threshold (int): Nombre de pages à partir duquel l'extraction est parallèle
+            cache_max_bytes (int): Taille maximale du cache en octets (None pour ne pas la limiter)
+            cache_max_age (float): Âge maximal d'une entrée non utilisée, en secondes (None pour ne pas le limiter)
+        """
+        self.cache_dir = cache_dir
+        self.workers = workers if workers is not None else min(8, os.cpu_count() or 1)
+        self.pages_per_task = pages_per_task
+        self.parallel_threshold = parallel_threshold
+        self.cache_max_bytes = cache_max_bytes
+        self.cache_max_age = cache_max_age
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """
+        Pool de processus d'extraction, créé au premier besoin puis réutilisé
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def close(self) -> None:
+        """
+        Arrêter le pool de processus d'extraction
+        """
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _cache_path(self, key: str) -> Optional[str]:
+        return os.path.join(self.cache_dir, f"{key}.jsonl.gz") if self.cache_dir and key else None
+
+    def iter_pages(self, file_path: str, key: Optional[str] = None) -> Iterator[str]:
+        """
+        Parcourir le texte des pages d'un PDF, dans l'ordre
+        Args:
+            file_path (str): Chemin du fichier PDF
+            key (str): Empreinte du contenu (calculée depuis le fichier si absente)
+        Yields:
+            str: Texte d'une page
+        """
+        if self.cache_dir and key is None:
+            with open(file_path, 'rb') as file:
+                key = content_hash(file.read())
+        cache_path = self._cache_path(key)
+        if cache_path and os.path.exists(cache_path):
+            logger.info(f"Texte de {file_path} servi depuis le cache d'extraction")
+            try:
+                # La date de modification sert de date de dernière utilisation pour l'éviction
+                os.utime(cache_path)
+            except OSError:
+                pass
+            with gzip.open(cache_path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+            return
+
+        # Les pages extraites sont écrites au fil de l'eau dans un fichier temporaire,
+        # publié dans le cache une fois le document entièrement extrait
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp" if cache_path else None
+        cache_file = gzip.open(tmp_path, "wt", encoding="utf-8") if tmp_path else None
+        try:
+            for text in self._extract(file_path):
+                if cache_file is not None:
+                    cache_file.write(json.dumps(text, ensure_ascii=False) + "\n")
+                yield text
+            if cache_file is not None:
+                cache_file.close()
+                cache_file = None
+                os.replace(tmp_path, cache_path)
+                self._evict_cache()
+        finally:
+            if cache_file is not None:
+                cache_file.close()
+                os.remove(tmp_path)
+
+    def _evict_cache(self) -> None:
+        """
+        Supprimer les entrées du cache trop anciennes, puis les moins récemment utilisées
+        tant que la taille totale dépasse cache_max_bytes
+        """
+        if self.cache_max_bytes is None and self.cache_max_age is None:
+            return
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".jsonl.gz"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        now = time.time()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, path in entries:
+            expired = self.cache_max_age is not None and now - mtime > self.cache_max_age
+            oversized = self.cache_max_bytes is not None and total > self.cache_max_bytes
+            if not expired and not oversized:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        if removed:
+            logger.info(f"Cache d'extraction: {removed} entrées supprimées ({total} octets conservés)")
+
+    def _extract(self, file_path: str) -> Iterator[str]:
+        """
+        Extraire les pages, en parallèle par plages pour les gros documents
+        """
+        with open(file_path, 'rb') as file:
+            page_count = len(PyPDF2.PdfReader(file).pages)
+
+        if self.workers <= 1 or page_count < self.parallel_threshold:
+            with open(file_path, 'rb') as file:
+                pdf_reader = PyPDF2.PdfReader(file)
+                for page_num in range(page_count):
+                    yield pdf_reader.pages[page_num].extract_text()
+            return
+
+        ranges = [(start, min(start + self.pages_per_task, page_count))
+                  for start in range(0, page_count, self.pages_per_task)]
+        logger.info(f"Extraction parallèle de {page_count} pages ({len(ranges)} plages, {self.workers} processus)")
+        executor = self._get_executor()
+        futures = []
+        try:
+            futures = [executor.submit(_extract_range, file_path, start, stop) for start, stop in ranges]
+            for future in futures:
+                yield from future.result()
+        except BrokenProcessPool:
+            # Un processus de travail a disparu: le prochain document recréera le pool
+            with self._executor_lock:
+                if self._executor is executor:
+                    self._executor = None
+            raise
+        finally:
+            # Un consommateur qui s'arrête en cours de route annule les plages restantes
+            for future in futures:
+                future.cancel()
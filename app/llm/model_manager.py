@@ -86,7 +86,8 @@ class LLMManager:
             logger.error(f"Erreur lors du chargement du modèle: {e}")
             return False
 
-    def generate(self, prompt: str, max_tokens: int = 512, temperature: float = 0.7, top_p: float = 0.95) -> str:
+    def generate(self, prompt: str, max_tokens: int = 512, temperature: float = 0.7, top_p: float = 0.95,
+                 raise_errors: bool = False) -> str:
         """
         Générer une réponse à partir d'un prompt
         Args:
@@ -94,10 +95,14 @@ class LLMManager:
             max_tokens (int): Nombre maximum de tokens à générer
             temperature (float): Température pour le sampling (plus bas = plus déterministe)
             top_p (float): Paramètre pour le nucleus sampling
+            raise_errors (bool): Lever l'erreur au lieu de renvoyer un message d'erreur comme texte
+                (permet à l'appelant de distinguer une réponse d'un échec, par exemple pour ne pas la mettre en cache)
         Returns:
             str: Texte généré
         """
         if self.model is None:
+            if raise_errors:
+                raise RuntimeError("Modèle non chargé")
             return "Modèle non chargé. Veuillez charger un modèle d'abord."
 
         try:
@@ -119,6 +124,8 @@ class LLMManager:
             return response
         except Exception as e:
             logger.error(f"Erreur lors de la génération: {e}")
+            if raise_errors:
+                raise
             return f"Erreur lors de la génération: {e}"
 
     def _clean_response(self, text: str) -> str:
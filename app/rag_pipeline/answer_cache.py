@@ -0,0 +1,163 @@
+# app/rag_pipeline/answer_cache.py
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+
+from app.vector_store.query_cache import normalize_query
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+
+class AnswerCache:
+    """
+    Cache LRU des réponses générées, indexé par (question normalisée, chunks récupérés
+    dans l'ordre, version de l'index, max_tokens, température, modèle).
+    En mode sémantique, une question proche (similarité des embeddings de requête)
+    ayant récupéré exactement les mêmes chunks avec les mêmes paramètres réutilise la réponse.
+    """
+    def __init__(self, max_size: int = 256, semantic_threshold: Optional[float] = None):
+        """
+        Initialiser le cache des réponses
+        Args:
+            max_size (int): Nombre maximum de réponses gardées
+            semantic_threshold (float): Similarité cosinus minimale entre questions pour le
+                mode quasi-doublon (désactivé par défaut)
+        """
+        self.max_size = max_size
+        self.semantic_threshold = semantic_threshold
+        self.index_version = None
+        # clé complète -> (réponse, embedding de la question ou None)
+        self._entries: "OrderedDict[Tuple, Tuple[str, Optional[np.ndarray]]]" = OrderedDict()
+        # contexte (tout sauf la question) -> clés complètes, pour le mode sémantique
+        self._by_context: Dict[Tuple, List[Tuple]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _context(chunk_ids: List[str], index_version: int, max_tokens: int, temperature: float, model_name: str) -> Tuple:
+        """
+        Partie de la clé commune aux questions qui ont récupéré le même contexte
+        """
+        return (tuple(chunk_ids), index_version, max_tokens, round(float(temperature), 4), model_name)
+
+    def _check_version(self, index_version: int) -> None:
+        """
+        Vider le cache si l'index a changé (verrou déjà pris)
+        """
+        if index_version != self.index_version:
+            if self._entries:
+                logger.info(f"Index mis à jour (version {index_version}), cache des réponses invalidé")
+            self._entries.clear()
+            self._by_context.clear()
+            self.index_version = index_version
+
+    def get(self, question: str, chunk_ids: List[str], index_version: int, max_tokens: int,
+            temperature: float, model_name: str, query_vector: Optional[np.ndarray] = None) -> Optional[str]:
+        """
+        Récupérer une réponse en cache
+        Args:
+            question (str): Question de l'utilisateur
+            chunk_ids (List[str]): Identifiants des chunks récupérés, dans l'ordre
+            index_version (int): Version de l'index vectoriel
+            max_tokens (int): Nombre maximum de tokens générés
+            temperature (float): Température de génération
+            model_name (str): Nom du modèle de langage
+            query_vector (np.ndarray): Embedding de la question (mode sémantique)
+        Returns:
+            Optional[str]: Réponse en cache ou None
+        """
+        context = self._context(chunk_ids, index_version, max_tokens, temperature, model_name)
+        key = (normalize_query(question),) + context
+        with self._lock:
+            self._check_version(index_version)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            if self.semantic_threshold is not None and query_vector is not None:
+                query = self._unit(query_vector)
+                for candidate in self._by_context.get(context, []):
+                    answer, vector = self._entries[candidate]
+                    if vector is not None and float(vector @ query) >= self.semantic_threshold:
+                        self._entries.move_to_end(candidate)
+                        self.hits += 1
+                        self.semantic_hits += 1
+                        return answer
+
+            self.misses += 1
+            return None
+
+    def put(self, question: str, chunk_ids: List[str], index_version: int, max_tokens: int,
+            temperature: float, model_name: str, answer: str, query_vector: Optional[np.ndarray] = None) -> None:
+        """
+        Mettre une réponse en cache
+        Args:
+            question (str): Question de l'utilisateur
+            chunk_ids (List[str]): Identifiants des chunks récupérés, dans l'ordre
+            index_version (int): Version de l'index vectoriel
+            max_tokens (int): Nombre maximum de tokens générés
+            temperature (float): Température de génération
+            model_name (str): Nom du modèle de langage
+            answer (str): Réponse générée
+            query_vector (np.ndarray): Embedding de la question (mode sémantique)
+        """
+        context = self._context(chunk_ids, index_version, max_tokens, temperature, model_name)
+        key = (normalize_query(question),) + context
+        vector = self._unit(query_vector) if self.semantic_threshold is not None and query_vector is not None else None
+        with self._lock:
+            self._check_version(index_version)
+            if key not in self._entries:
+                self._by_context.setdefault(context, []).append(key)
+            self._entries[key] = (answer, vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                siblings = self._by_context.get(evicted[1:], [])
+                siblings.remove(evicted)
+                if not siblings:
+                    self._by_context.pop(evicted[1:], None)
+                self.evictions += 1
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        """
+        Embedding de question en vecteur dense normalisé
+        """
+        vector = vector.toarray() if hasattr(vector, "toarray") else np.asarray(vector)
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def clear(self) -> None:
+        """
+        Vider le cache
+        """
+        with self._lock:
+            self._entries.clear()
+            self._by_context.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Statistiques du cache
+        Returns:
+            Dict[str, Any]: hits (dont sémantiques), misses, evictions, taille et taux de succès
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -1,8 +1,16 @@
+import os
 import logging
-from typing import Dict, Any, List, Union
+from typing import Dict, Any, List, Union, Optional, Tuple
 from app.document_processor.manager import DocumentManager
 from app.vector_store.manager import VectorStoreManager
+from app.vector_store.catalog import ChunkCatalog, make_chunk_id
+from app.vector_store.encoder_loader import EncoderNotReadyError
+from app.vector_store.diversity import merge_adjacent
 from app.llm.model_manager import LLMManager
+from .answer_cache import AnswerCache
+from .reranker import Reranker
+
+WARMING_MESSAGE = "Le modèle d'embeddings est en cours de chargement, veuillez réessayer dans quelques instants."
 
 # Configurer le logging
 logger = logging.getLogger(__name__)
@@ -11,19 +19,44 @@ class RAGProcessor:
     """
     Classe pour le pipeline RAG complet
     """
-    def __init__(self, use_sentence_transformers: bool = True):
+    def __init__(self, use_sentence_transformers: bool = True, search_mode: str = "exact", retrieval_mode: str = "dense",
+                 answer_cache_size: int = 256, semantic_cache_threshold: Optional[float] = None,
+                 reranker: Optional[str] = None, rerank_candidates: int = 50, rerank_time_budget: Optional[float] = None,
+                 mmr_lambda: Optional[float] = None, storage_dir: str = "./data"):
         """
         Initialiser le pipeline RAG
         Args:
             use_sentence_transformers (bool): Utiliser SentenceTransformers au lieu de TF-IDF
+            search_mode (str): "exact" ou "approximate" (index IVF pour les embeddings denses)
+            retrieval_mode (str): "dense" ou "hybrid" (embeddings + BM25 fusionnés)
+            answer_cache_size (int): Nombre de réponses gardées en cache (0 pour désactiver)
+            semantic_cache_threshold (float): Similarité minimale entre questions pour réutiliser
+                une réponse obtenue avec les mêmes chunks (mode quasi-doublon, désactivé par défaut)
+            reranker (str): Scorer de reranking des candidats ("lexical" ou "cross_encoder"), désactivé par défaut
+            rerank_candidates (int): Nombre de candidats récupérés puis reclassés avant de garder top_k
+            rerank_time_budget (float): Durée maximale du reranking par requête, en secondes
+            mmr_lambda (float): Compromis pertinence/diversité de la sélection MMR des chunks
+                (1.0 = pertinence seule), désactivée par défaut
+            storage_dir (str): Répertoire des documents, des chunks et des indices
         """
         logger.info("Initialisation du RAGProcessor")
-        self.doc_manager = DocumentManager()
-        self.vector_store = VectorStoreManager(use_sentence_transformers=use_sentence_transformers)
+        self.doc_manager = DocumentManager(storage_dir=storage_dir)
+        self.vector_store = VectorStoreManager(
+            indices_dir=os.path.join(storage_dir, "indices"),
+            use_sentence_transformers=use_sentence_transformers,
+            search_mode=search_mode,
+            retrieval_mode=retrieval_mode,
+            mmr_lambda=mmr_lambda
+        )
         self.llm_manager = LLMManager()
+        self.answer_cache = AnswerCache(answer_cache_size, semantic_cache_threshold) if answer_cache_size > 0 else None
+        self.reranker = Reranker(reranker, max_candidates=rerank_candidates, time_budget=rerank_time_budget) if reranker else None
         
         # Charger l'index vectoriel
-        self.vector_store.load_index()
+        if self.vector_store.load_index():
+            # Aligner le catalogue des chunks pour les index sauvegardés sans catalogue
+            self.vector_store.ensure_catalog(self.doc_manager.get_all_chunks)
+            self.vector_store.ensure_keyword_index(self.doc_manager.iter_indexable_chunks)
         
         # Essayer de charger le modèle LLM
         if not self.llm_manager.load_model():
@@ -54,16 +87,16 @@ class RAGProcessor:
             # Traiter le document
             doc_id = self.doc_manager.process_document(file_content, filename)
             
-            # Récupérer tous les chunks
-            chunks = self.doc_manager.get_all_chunks()
-            
-            # Recréer l'index vectoriel
-            self.vector_store.create_index(chunks)
+            # Indexer uniquement les chunks du nouveau document (hors doublons)
+            chunks, duplicates = self._split_duplicates(self.doc_manager.get_chunks(doc_id))
+            if not self.vector_store.add_chunks(chunks):
+                raise ValueError("Échec de l'indexation des chunks du document")
             
             logger.info(f"Document ajouté avec succès: {filename}, ID: {doc_id}")
             return {
                 "success": True,
                 "doc_id": doc_id,
+                "duplicate_count": len(duplicates),
                 "message": f"Document '{filename}' ajouté avec succès"
             }
         except Exception as e:
@@ -73,6 +106,181 @@ class RAGProcessor:
                 "message": f"Erreur lors de l'ajout du document: {e}"
             }
 
+    def add_documents(self, documents: List[Dict[str, Any]], replace_existing: bool = False) -> Dict[str, Any]:
+        """
+        Ajouter un lot de documents à la base de connaissances.
+        Tous les documents et leurs chunks sont écrits d'abord, puis l'index
+        vectoriel est mis à jour une seule fois pour tout le lot.
+        Args:
+            documents (List[Dict[str, Any]]): Documents avec les clés 'file_content' (bytes) et 'filename',
+                et optionnellement 'metadata' (métadonnées structurées propagées sur les chunks)
+            replace_existing (bool): Remplacer les documents déjà enregistrés sous le même nom de fichier;
+                si le lot contient plusieurs copies d'un même fichier, seule la dernière est enregistrée
+        Returns:
+            Dict[str, Any]: Résultat global et résultat par document
+        """
+        logger.info(f"Ajout d'un lot de {len(documents)} documents")
+        results = []
+        batch_chunks = []
+        replaced = []
+        duplicate_count = 0
+        
+        # Une copie antérieure du même fichier dans le lot serait retrouvée par find_documents
+        # et supprimée par la copie suivante alors que ses chunks sont indexés: ne garder que la dernière
+        last_copy = {document.get("filename", "document"): position for position, document in enumerate(documents)}
+        
+        # 1. Écrire les documents et leurs chunks
+        for position, document in enumerate(documents):
+            filename = document.get("filename", "document")
+            if replace_existing and last_copy[filename] != position:
+                results.append({
+                    "success": False,
+                    "filename": filename,
+                    "message": "Document remplacé par une copie ultérieure du même lot"
+                })
+                continue
+            try:
+                previous = self.doc_manager.find_documents(filename) if replace_existing else []
+                # Les documents remplacés ne servent pas de référence pour les doublons
+                doc_id = self.doc_manager.process_document(document["file_content"], filename, document.get("metadata"),
+                                                           exclude_docs=replaced + previous)
+                chunks, duplicates = self._split_duplicates(self.doc_manager.get_chunks(doc_id))
+                batch_chunks.extend(chunks)
+                replaced.extend(previous)
+                duplicate_count += len(duplicates)
+                results.append({
+                    "success": True,
+                    "doc_id": doc_id,
+                    "filename": filename,
+                    "chunk_count": len(chunks),
+                    "duplicate_count": len(duplicates),
+                    "replaced": previous
+                })
+            except Exception as e:
+                logger.error(f"Erreur lors du traitement du document {filename}: {e}")
+                results.append({
+                    "success": False,
+                    "filename": filename,
+                    "message": f"Erreur lors du traitement du document: {e}"
+                })
+        
+        # 2. Mettre à jour l'index une seule fois pour tout le lot
+        # (les anciennes versions des documents remplacés sont supprimées dans la même version)
+        indexed = self.vector_store.add_chunks(batch_chunks, replace_documents=replaced)
+        if indexed:
+            self._release_aliases(replaced)
+            for doc_id in replaced:
+                self.doc_manager.delete_document(doc_id)
+        else:
+            # Annuler l'enregistrement du lot: un nouvel envoi le traitera comme un nouvel ajout
+            # au lieu de laisser des documents stockés mais absents de l'index
+            for result in results:
+                if result["success"]:
+                    self.doc_manager.delete_document(result["doc_id"])
+                    result["success"] = False
+                    result["message"] = "Erreur lors de l'indexation, document non enregistré"
+        
+        added = [result for result in results if result["success"]]
+        logger.info(f"Lot traité: {len(added)}/{len(documents)} documents ajoutés, {len(batch_chunks)} chunks")
+        return {
+            "success": indexed and len(added) > 0,
+            "message": f"{len(added)} documents sur {len(documents)} ajoutés avec succès",
+            "document_count": len(added),
+            "failed_count": len(results) - len(added),
+            "chunk_count": len(batch_chunks) if indexed else 0,
+            "replaced_count": len(replaced) if indexed else 0,
+            "duplicate_count": duplicate_count,
+            "results": results
+        }
+
+    @staticmethod
+    def _split_duplicates(chunks: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Séparer les chunks à indexer des doublons enregistrés comme alias
+        Returns:
+            Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]: Chunks à indexer et doublons
+        """
+        indexable = [chunk for chunk in chunks if "duplicate_of" not in chunk["metadata"]]
+        duplicates = [chunk for chunk in chunks if "duplicate_of" in chunk["metadata"]]
+        return indexable, duplicates
+
+    def _release_aliases(self, doc_ids: List[str]) -> None:
+        """
+        Avant de supprimer des documents, indexer les doublons qui renvoyaient vers leurs chunks
+        """
+        promoted = self.doc_manager.release_aliases(doc_ids)
+        if promoted and not self.vector_store.add_chunks(promoted):
+            logger.error(f"Échec de l'indexation de {len(promoted)} chunks promus après suppression")
+
+    def upsert_documents(self, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Ajouter ou remplacer un lot de documents, identifiés par leur nom de fichier
+        Args:
+            documents (List[Dict[str, Any]]): Documents (voir add_documents)
+        Returns:
+            Dict[str, Any]: Résultat global et résultat par document
+        """
+        return self.add_documents(documents, replace_existing=True)
+
+    def upsert_document(self, file_content: bytes, filename: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Ajouter un document ou remplacer celui enregistré sous le même nom de fichier
+        Args:
+            file_content (bytes): Contenu du fichier
+            filename (str): Nom du fichier
+            metadata (Dict[str, Any]): Métadonnées structurées propagées sur les chunks
+        Returns:
+            Dict[str, Any]: Résultat de l'opération
+        """
+        batch_result = self.upsert_documents([{"file_content": file_content, "filename": filename, "metadata": metadata}])
+        result = batch_result["results"][0]
+        return {
+            "success": batch_result["success"],
+            "doc_id": result.get("doc_id"),
+            "replaced": result.get("replaced", []),
+            "message": f"Document '{filename}' enregistré avec succès" if batch_result["success"] else result.get("message", "")
+        }
+
+    def delete_documents(self, doc_ids: List[str]) -> Dict[str, Any]:
+        """
+        Supprimer des documents de la base de connaissances.
+        Leurs lignes sont retirées de la recherche dès la mise à jour de l'index,
+        puis de l'index lui-même par la compaction en arrière-plan.
+        Args:
+            doc_ids (List[str]): IDs des documents
+        Returns:
+            Dict[str, Any]: Résultat de l'opération
+        """
+        try:
+            logger.info(f"Suppression de {len(doc_ids)} documents")
+            # Retirer d'abord les documents de l'index, puis du stockage
+            if self.vector_store.delete_documents(doc_ids) < 0:
+                raise ValueError("Échec de la suppression des documents de l'index")
+            self._release_aliases(doc_ids)
+            chunk_count = sum(self.doc_manager.delete_document(doc_id) for doc_id in doc_ids)
+            return {
+                "success": True,
+                "deleted_count": len(doc_ids),
+                "chunk_count": chunk_count,
+                "message": f"{len(doc_ids)} documents supprimés"
+            }
+        except Exception as e:
+            logger.error(f"Erreur lors de la suppression des documents: {e}")
+            return {
+                "success": False,
+                "message": f"Erreur lors de la suppression des documents: {e}"
+            }
+
+    def delete_document(self, doc_id: str) -> Dict[str, Any]:
+        """
+        Supprimer un document de la base de connaissances
+        Args:
+            doc_id (str): ID du document
+        Returns:
+            Dict[str, Any]: Résultat de l'opération
+        """
+        return self.delete_documents([doc_id])
+
     def query(self, question: str, top_k: int = 5, max_tokens: int = 512, temperature: float = 0.7) -> Dict[str, Any]:
         """
         Interroger le système RAG avec paramètres améliorés
@@ -92,13 +300,26 @@ class RAGProcessor:
                 "message": "Modèle LLM non chargé. Veuillez charger un modèle d'abord."
             }
         
+        # Modèle d'embeddings encore en chargement: signaler le préchauffage plutôt que d'attendre
+        encoder = self.vector_store.encoder_status()
+        if not encoder["ready"]:
+            logger.warning(f"Encodeur des requêtes non prêt: {encoder['state']}")
+            if encoder["state"] == "failed":
+                return {
+                    "success": False,
+                    "status": "failed",
+                    "message": f"Modèle d'embeddings non disponible: {encoder.get('error')}"
+                }
+            return {
+                "success": False,
+                "status": "warming",
+                "message": WARMING_MESSAGE
+            }
+        
         try:
             logger.info(f"Traitement de la requête: {question}")
-            # Récupérer tous les chunks
-            chunks = self.doc_manager.get_all_chunks()
-            
             # Si aucun document n'est disponible
-            if not chunks:
+            if not self.doc_manager.count_chunks():
                 logger.warning("Aucun document disponible")
                 return {
                     "success": False,
@@ -106,7 +327,12 @@ class RAGProcessor:
                 }
             
             # Rechercher les chunks pertinents
-            relevant_chunks = self.vector_store.search(question, top_k)
+            if self.reranker is not None:
+                # Récupérer un ensemble plus large de candidats puis garder les top_k mieux reclassés
+                candidates = self.vector_store.search(question, max(top_k, self.reranker.max_candidates))
+                relevant_chunks = self.reranker.rerank(question, candidates, top_k)
+            else:
+                relevant_chunks = self.vector_store.search(question, top_k)
             
             # Si aucun chunk pertinent n'est trouvé
             if not relevant_chunks:
@@ -117,16 +343,25 @@ class RAGProcessor:
                     "sources": []
                 }
             
-            # Créer le prompt avec contexte
-            prompt = self.llm_manager.create_prompt(question, relevant_chunks)
-            
-            # Générer une réponse avec paramètres améliorés
-            answer = self.llm_manager.generate(
-                prompt, 
-                max_tokens=max_tokens,
-                temperature=temperature,
-                top_p=0.95
-            )
+            # Réutiliser une réponse déjà générée pour la même question et les mêmes chunks
+            answer = self._get_cached_answer(question, relevant_chunks, max_tokens, temperature)
+            if answer is None:
+                # Créer le prompt avec contexte
+                prompt = self.llm_manager.create_prompt(question, self._prompt_chunks(relevant_chunks))
+                
+                # Générer une réponse avec paramètres améliorés
+                # (seules les générations réussies sont mises en cache)
+                try:
+                    answer = self.llm_manager.generate(
+                        prompt, 
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        top_p=0.95,
+                        raise_errors=True
+                    )
+                    self._cache_answer(question, relevant_chunks, max_tokens, temperature, answer)
+                except Exception as e:
+                    answer = f"Erreur lors de la génération: {e}"
             
             # Préparer les sources
             sources = [{
@@ -142,6 +377,14 @@ class RAGProcessor:
                 "answer": answer,
                 "sources": sources
             }
+        except EncoderNotReadyError as e:
+            # Le modèle n'a pas fini de charger dans le délai accordé à la requête
+            logger.warning(f"Encodeur des requêtes non prêt: {e}")
+            return {
+                "success": False,
+                "status": "warming",
+                "message": WARMING_MESSAGE
+            }
         except Exception as e:
             logger.error(f"Erreur lors de la requête: {e}")
             return {
@@ -149,6 +392,60 @@ class RAGProcessor:
                 "message": f"Erreur lors de la requête: {e}"
             }
 
+    def _answer_cache_args(self, question: str, relevant_chunks: List[Dict[str, Any]], max_tokens: int, temperature: float) -> Dict[str, Any]:
+        """
+        Arguments de clé du cache des réponses pour une requête
+        """
+        query_vector = None
+        if self.answer_cache.semantic_threshold is not None:
+            try:
+                # Embedding de la question (déjà en cache après la recherche)
+                query_vector = self.vector_store.embeddings.transform(question)
+            except Exception as e:
+                logger.warning(f"Embedding de la question indisponible pour le cache sémantique: {e}")
+        return {
+            "question": question,
+            "chunk_ids": [make_chunk_id(*ChunkCatalog.key(chunk)) for chunk in relevant_chunks],
+            "index_version": self.vector_store.index_version,
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+            "model_name": self.llm_manager.model_name,
+            "query_vector": query_vector
+        }
+
+    def _prompt_chunks(self, relevant_chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Préparer le contexte du prompt: chunks par score décroissant, les chunks consécutifs
+        d'un même document fusionnés en un seul bloc (sans répéter le chevauchement)
+        Args:
+            relevant_chunks (List[Dict[str, Any]]): Chunks retenus pour la réponse
+        Returns:
+            List[Dict[str, Any]]: Blocs de contexte passés à create_prompt
+        """
+        if all("score" in chunk for chunk in relevant_chunks):
+            relevant_chunks = sorted(relevant_chunks, key=lambda chunk: chunk.get("score", 0), reverse=True)
+        return merge_adjacent(relevant_chunks)
+
+    def _get_cached_answer(self, question: str, relevant_chunks: List[Dict[str, Any]], max_tokens: int, temperature: float) -> Optional[str]:
+        """
+        Chercher une réponse en cache
+        Returns:
+            Optional[str]: Réponse en cache ou None
+        """
+        if self.answer_cache is None:
+            return None
+        answer = self.answer_cache.get(**self._answer_cache_args(question, relevant_chunks, max_tokens, temperature))
+        if answer is not None:
+            logger.info("Réponse servie depuis le cache")
+        return answer
+
+    def _cache_answer(self, question: str, relevant_chunks: List[Dict[str, Any]], max_tokens: int, temperature: float, answer: str) -> None:
+        """
+        Mettre en cache une réponse générée
+        """
+        if self.answer_cache is not None:
+            self.answer_cache.put(answer=answer, **self._answer_cache_args(question, relevant_chunks, max_tokens, temperature))
+
     def get_system_info(self) -> Dict[str, Any]:
         """
         Obtenir des informations sur l'état du système
@@ -156,22 +453,26 @@ class RAGProcessor:
             Dict[str, Any]: Informations sur le système
         """
         try:
-            # Récupérer tous les chunks
-            chunks = self.doc_manager.get_all_chunks()
-            
-            # Compter le nombre de documents uniques
-            doc_ids = set()
-            for chunk in chunks:
-                doc_ids.add(chunk["metadata"]["doc_id"])
+            # Compter les documents et les chunks sans les charger
+            document_count = self.doc_manager.count_documents()
+            chunk_count = self.doc_manager.count_chunks()
             
-            logger.info(f"Info système: {len(doc_ids)} documents, {len(chunks)} chunks")
+            logger.info(f"Info système: {document_count} documents, {chunk_count} chunks")
+            query_cache = getattr(self.vector_store.embeddings, "query_cache", None)
+            embedding_cache = getattr(self.vector_store.embeddings, "embedding_cache", None)
             return {
                 "success": True,
-                "document_count": len(doc_ids),
-                "chunk_count": len(chunks),
+                "document_count": document_count,
+                "chunk_count": chunk_count,
                 "model_loaded": self.model_loaded,
                 "model_name": self.llm_manager.model_name if self.model_loaded else None,
-                "embeddings_type": self.vector_store.embeddings_type
+                "embeddings_type": self.vector_store.embeddings_type,
+                "encoder": self.vector_store.encoder_status(),
+                "query_cache": query_cache.stats() if query_cache is not None else None,
+                "embedding_cache": embedding_cache.stats() if embedding_cache is not None else None,
+                "answer_cache": self.answer_cache.stats() if self.answer_cache is not None else None,
+                "dedup": self.doc_manager.dedup_stats(),
+                "reranker": getattr(self.reranker.scorer, "name", None) if self.reranker is not None else None
             }
         except Exception as e:
             logger.error(f"Erreur lors de la récupération des informations système: {e}")
@@ -0,0 +1,215 @@
+# app/rag_pipeline/reranker.py
+import time
+import logging
+import importlib.util
+from collections import Counter
+from typing import List, Dict, Any, Optional, Union
+import numpy as np
+
+from app.vector_store.bm25 import tokenize
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+# Vérifier si sentence_transformers (CrossEncoder) est disponible
+CROSS_ENCODER_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+
+SUPPORTED_SCORERS = ("lexical", "cross_encoder")
+
+
+def chunk_text(chunk: Dict[str, Any]) -> str:
+    """
+    Texte d'un chunk (clé "text", ou "content" pour les documents en mémoire)
+    """
+    return chunk.get("text", chunk.get("content", ""))
+
+
+class LexicalOverlapScorer:
+    """
+    Scorer léger: part des termes de la requête présents dans le chunk, pondérés par
+    leur IDF calculé sur l'ensemble des candidats reclassés, avec un bonus pour les bigrammes de la requête.
+    """
+    name = "lexical"
+
+    def __init__(self, bigram_weight: float = 0.5):
+        """
+        Initialiser le scorer lexical
+        Args:
+            bigram_weight (float): Poids des bigrammes de la requête retrouvés dans le chunk
+        """
+        self.bigram_weight = bigram_weight
+
+    def idf(self, query: str, texts: List[str]) -> Dict[str, float]:
+        """
+        IDF des termes de la requête sur un ensemble de candidats
+        Args:
+            query (str): Requête
+            texts (List[str]): Textes des candidats
+        Returns:
+            Dict[str, float]: Terme de la requête -> IDF
+        """
+        query_terms = set(tokenize(query))
+        df = Counter(term for text in texts for term in set(tokenize(text)) & query_terms)
+        return {term: np.log(1.0 + (len(texts) + 1) / (df[term] + 1)) for term in query_terms}
+
+    def score(self, query: str, texts: List[str], idf: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """
+        Scorer des textes pour une requête
+        Args:
+            query (str): Requête
+            texts (List[str]): Textes des candidats
+            idf (Dict[str, float]): IDF calculé sur l'ensemble des candidats, lorsque les textes
+                n'en sont qu'un lot (par défaut: calculé sur les textes)
+        Returns:
+            np.ndarray: Scores (plus élevé = plus pertinent)
+        """
+        query_terms = tokenize(query)
+        if not query_terms or not texts:
+            return np.zeros(len(texts), dtype=np.float32)
+        query_bigrams = set(zip(query_terms, query_terms[1:]))
+        query_terms = set(query_terms)
+
+        if idf is None:
+            idf = self.idf(query, texts)
+        total = sum(idf.values())
+
+        scores = np.zeros(len(texts), dtype=np.float32)
+        for i, text in enumerate(texts):
+            terms = tokenize(text)
+            scores[i] = sum(idf[term] for term in query_terms & set(terms)) / total
+            if query_bigrams:
+                bigrams = set(zip(terms, terms[1:]))
+                scores[i] += self.bigram_weight * len(query_bigrams & bigrams) / len(query_bigrams)
+        return scores
+
+
+class CrossEncoderScorer:
+    """
+    Scorer par cross-encoder local (sentence_transformers): la requête et le chunk sont
+    encodés ensemble, plus précis mais plus coûteux que le scorer lexical.
+    """
+    name = "cross_encoder"
+
+    def __init__(self, model_name: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1", max_length: int = 512):
+        """
+        Initialiser le scorer (le modèle est chargé au premier appel)
+        Args:
+            model_name (str): Nom du modèle CrossEncoder
+            max_length (int): Longueur maximale (tokens) d'une paire requête/chunk
+        """
+        self.model_name = model_name
+        self.max_length = max_length
+        self.model = None
+
+    def load(self) -> bool:
+        """
+        Charger le modèle
+        Returns:
+            bool: True si le modèle est disponible
+        """
+        if self.model is not None:
+            return True
+        if not CROSS_ENCODER_AVAILABLE:
+            logger.warning("sentence_transformers non disponible, cross-encoder désactivé")
+            return False
+        try:
+            from sentence_transformers import CrossEncoder
+            logger.info(f"Chargement du cross-encoder {self.model_name}")
+            self.model = CrossEncoder(self.model_name, max_length=self.max_length)
+            return True
+        except Exception as e:
+            logger.error(f"Erreur lors du chargement du cross-encoder: {e}")
+            return False
+
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        """
+        Scorer des textes pour une requête
+        Args:
+            query (str): Requête
+            texts (List[str]): Textes des candidats
+        Returns:
+            np.ndarray: Scores (plus élevé = plus pertinent)
+        """
+        if not self.load():
+            raise ValueError("Cross-encoder non disponible")
+        return np.asarray(self.model.predict([(query, text) for text in texts], batch_size=len(texts),
+                                             show_progress_bar=False), dtype=np.float32)
+
+
+class Reranker:
+    """
+    Reranking en deuxième étape: les candidats du retriever (dans l'ordre de la recherche)
+    sont scorés par lots, dans la limite d'un nombre de candidats et d'un budget de temps
+    par requête. Les candidats non scorés faute de budget gardent l'ordre de la recherche,
+    après les candidats scorés.
+    """
+    def __init__(self, scorer: Union[str, Any] = "lexical", max_candidates: int = 50, batch_size: int = 16,
+                 time_budget: Optional[float] = None):
+        """
+        Initialiser le reranker
+        Args:
+            scorer: "lexical", "cross_encoder" ou objet exposant score(query, texts) -> np.ndarray
+            max_candidates (int): Nombre maximum de candidats scorés par requête
+            batch_size (int): Nombre de candidats scorés par appel au scorer
+            time_budget (float): Durée maximale du scoring par requête, en secondes (illimitée par défaut)
+        """
+        if isinstance(scorer, str):
+            if scorer not in SUPPORTED_SCORERS:
+                raise ValueError(f"Scorer de reranking non supporté: {scorer}")
+            if scorer == "cross_encoder":
+                cross_encoder = CrossEncoderScorer()
+                # Sans modèle local, se rabattre sur le scorer lexical
+                scorer = cross_encoder if cross_encoder.load() else LexicalOverlapScorer()
+            else:
+                scorer = LexicalOverlapScorer()
+        self.scorer = scorer
+        self.max_candidates = max_candidates
+        self.batch_size = batch_size
+        self.time_budget = time_budget
+
+    def rerank(self, query: str, candidates: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        """
+        Réordonner des candidats et garder les top_k
+        Args:
+            query (str): Requête
+            candidates (List[Dict[str, Any]]): Chunks retournés par la recherche, par pertinence décroissante
+            top_k (int): Nombre de chunks à retourner
+        Returns:
+            List[Dict[str, Any]]: Copies des chunks retenus; "score" est le score de reranking
+                et "retrieval_score" le score de la recherche
+        """
+        candidates = candidates[:self.max_candidates]
+        if not candidates:
+            return []
+
+        start = time.perf_counter()
+        texts = [chunk_text(chunk) for chunk in candidates]
+        options = {}
+        if hasattr(self.scorer, "idf"):
+            # IDF calculé une fois sur tous les candidats: les scores ne dépendent pas du découpage en lots
+            options["idf"] = self.scorer.idf(query, texts)
+        scores = []
+        for offset in range(0, len(candidates), self.batch_size):
+            if self.time_budget is not None and scores and time.perf_counter() - start >= self.time_budget:
+                logger.info(f"Budget de reranking atteint: {len(scores)}/{len(candidates)} candidats scorés")
+                break
+            try:
+                scores.extend(self.scorer.score(query, texts[offset:offset + self.batch_size], **options).tolist())
+            except Exception as e:
+                logger.error(f"Erreur lors du reranking: {e}")
+                break
+
+        # Tri stable: à score égal, l'ordre de la recherche est conservé
+        order = sorted(range(len(scores)), key=lambda i: -scores[i]) + list(range(len(scores), len(candidates)))
+        # Les candidats non scorés reçoivent le score minimal: un tri ultérieur par score
+        # (create_prompt) conserve l'ordre du reranking
+        floor = min(scores) if scores else None
+        reranked = []
+        for i in order[:top_k]:
+            chunk = dict(candidates[i])
+            chunk["retrieval_score"] = candidates[i].get("score")
+            if floor is not None:
+                chunk["score"] = float(scores[i]) if i < len(scores) else float(floor)
+            reranked.append(chunk)
+        logger.debug(f"Reranking de {len(candidates)} candidats en {(time.perf_counter() - start) * 1000:.1f} ms")
+        return reranked
@@ -0,0 +1,273 @@
+# app/vector_store/ann.py
+import os
+import uuid
+import logging
+from typing import List, Optional, Tuple
+import numpy as np
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    Normaliser les lignes d'une matrice (norme L2), les lignes nulles restant nulles
+    Args:
+        vectors (np.ndarray): Matrice (n, d)
+    Returns:
+        np.ndarray: Matrice normalisée en float32
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def save_npz_atomic(path: str, **arrays: np.ndarray) -> None:
+    """
+    Écrire un fichier .npz via un fichier temporaire propre à l'écrivain puis un renommage:
+    un autre processus ne lit jamais un fichier partiel
+    Args:
+        path (str): Chemin du fichier
+        arrays (np.ndarray): Tableaux nommés
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}-{uuid.uuid4().hex[:12]}"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class IVFFlatIndex:
+    """
+    Index approximatif IVF-flat en NumPy pur, pour des embeddings denses.
+    Les vecteurs sont répartis en listes autour de centroïdes (k-means sphérique);
+    une requête ne score que les vecteurs des `nprobe` listes les plus proches.
+    L'index ne garde que les centroïdes et les listes inversées (numéros de lignes): les
+    candidats sont scorés sur la matrice des embeddings, éventuellement ouverte en mmap.
+    Les listes sont rangées en parties, une par ajout; un index n'est jamais modifié après
+    sa construction: un ajout renvoie un nouvel index qui partage les parties existantes.
+    """
+    # Nombre de parties au-delà duquel les listes sont fusionnées en une seule
+    max_parts = 16
+    # Croissance du corpus au-delà de laquelle les centroïdes sont réentraînés
+    rebuild_ratio = 4.0
+
+    def __init__(self, n_lists: Optional[int] = None, nprobe: int = 8, n_iter: int = 10, seed: int = 42):
+        """
+        Initialiser l'index IVF
+        Args:
+            n_lists (int): Nombre de listes (par défaut ~4*sqrt(n))
+            nprobe (int): Nombre de listes explorées par requête (rappel vs latence)
+            n_iter (int): Nombre d'itérations du k-means
+            seed (int): Graine aléatoire
+        """
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.seed = seed
+        self.centroids = None
+        # Parties des listes inversées au format CSR: ids[offsets[i]:offsets[i+1]] pour la liste i
+        self.parts: Tuple[Tuple[np.ndarray, np.ndarray], ...] = ()
+        # Nombre de vecteurs sur lesquels les centroïdes ont été entraînés
+        self.trained_size = 0
+
+    @property
+    def size(self) -> int:
+        """
+        Nombre de vecteurs indexés
+        """
+        return sum(len(ids) for _, ids in self.parts)
+
+    def _assign(self, vectors: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+        """
+        Affecter chaque vecteur à son centroïde le plus proche, par blocs (le plus grand produit
+        scalaire ne dépend pas de la norme du vecteur: pas de copie normalisée de la matrice)
+        """
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), batch_size):
+            block = np.asarray(vectors[start:start + batch_size], dtype=np.float32)
+            assignments[start:start + batch_size] = np.argmax(block @ self.centroids.T, axis=1)
+        return assignments
+
+    def _part(self, assignments: np.ndarray, start: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Partie des listes inversées pour des lignes consécutives à partir de start
+        """
+        order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=len(self.centroids))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return offsets, order.astype(np.int64) + start
+
+    def _copy(self) -> "IVFFlatIndex":
+        index = IVFFlatIndex(n_lists=self.n_lists, nprobe=self.nprobe, n_iter=self.n_iter, seed=self.seed)
+        index.centroids = self.centroids
+        index.parts = self.parts
+        index.trained_size = self.trained_size
+        return index
+
+    def build(self, vectors: np.ndarray) -> None:
+        """
+        Construire l'index (k-means sphérique sur un échantillon, puis listes inversées)
+        Args:
+            vectors (np.ndarray): Vecteurs à indexer (n, d), éventuellement en mmap
+        """
+        n = len(vectors)
+        n_lists = self.n_lists or int(4 * np.sqrt(n))
+        n_lists = max(1, min(n_lists, n))
+        rng = np.random.default_rng(self.seed)
+
+        # Entraîner les centroïdes sur un échantillon (seul l'échantillon est normalisé en mémoire)
+        sample_size = min(n, max(n_lists * 64, 10000))
+        sample = normalize_rows(vectors[np.sort(rng.choice(n, size=sample_size, replace=False))])
+        self.centroids = sample[rng.choice(sample_size, size=n_lists, replace=False)].copy()
+
+        for _ in range(self.n_iter):
+            assignments = self._assign(sample)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignments, sample)
+            counts = np.bincount(assignments, minlength=n_lists)
+
+            # Réinitialiser les centroïdes vides sur des points aléatoires
+            empty = counts == 0
+            if np.any(empty):
+                sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+            self.centroids = normalize_rows(sums)
+
+        self.parts = (self._part(self._assign(vectors), 0),)
+        self.trained_size = n
+        logger.info(f"Index IVF construit: {n} vecteurs, {n_lists} listes")
+
+    def needs_rebuild(self, size: int) -> bool:
+        """
+        Les centroïdes ont été entraînés sur un corpus bien plus petit que size
+        """
+        return self.centroids is None or size > self.rebuild_ratio * max(self.trained_size, 1)
+
+    def extended(self, vectors: np.ndarray) -> "IVFFlatIndex":
+        """
+        Nouvel index prolongé de vecteurs ajoutés en fin de matrice, sans réentraîner les
+        centroïdes; seuls les nouveaux vecteurs sont affectés et triés (self n'est pas modifié)
+        Args:
+            vectors (np.ndarray): Nouveaux vecteurs (m, d)
+        Returns:
+            IVFFlatIndex: Index prolongé
+        """
+        if self.centroids is None:
+            raise ValueError("L'index IVF n'a pas été construit")
+        index = self._copy()
+        if len(vectors):
+            index.parts = self.parts + (self._part(self._assign(vectors), self.size),)
+        if len(index.parts) > self.max_parts:
+            index.parts = (index._merged(),)
+        return index
+
+    def _merged(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Parties réunies en une seule (concaténation liste par liste, sans tri)
+        """
+        offsets = np.sum([part_offsets for part_offsets, _ in self.parts], axis=0)
+        ids = np.concatenate([part_ids[part_offsets[i]:part_offsets[i + 1]]
+                              for i in range(len(self.centroids)) for part_offsets, part_ids in self.parts])
+        return offsets.astype(np.int64), ids.astype(np.int64, copy=False)
+
+    def search(self, query: np.ndarray, vectors: np.ndarray, top_k: int = 5,
+               nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rechercher les plus proches voisins d'une requête (similarité cosinus)
+        Args:
+            query (np.ndarray): Vecteur de requête (d,) ou (1, d)
+            vectors (np.ndarray): Matrice des embeddings indexés (seules les lignes candidates sont lues)
+            top_k (int): Nombre de résultats
+            nprobe (int): Nombre de listes explorées (par défaut celui de l'index)
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Indices des lignes et scores, par score décroissant
+        """
+        if self.centroids is None:
+            raise ValueError("L'index IVF n'a pas été construit")
+
+        query = normalize_rows(np.asarray(query).reshape(1, -1))[0]
+        nprobe = max(1, min(nprobe or self.nprobe, len(self.centroids)))
+
+        # Sélectionner les listes les plus proches
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        candidates = np.concatenate([
+            ids[offsets[i]:offsets[i + 1]] for i in probe for offsets, ids in self.parts
+        ])
+        if len(candidates) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # Scorer uniquement les candidats, lus dans l'ordre des lignes
+        candidates.sort()
+        scores = normalize_rows(vectors[candidates]) @ query
+        k = min(top_k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return candidates[top], scores[top]
+
+    @staticmethod
+    def files(directory: str, prefix: str = "ivf") -> List[str]:
+        """
+        Fichiers d'un index IVF dans un répertoire: centroïdes puis parties, dans l'ordre des lignes
+        """
+        if not os.path.isdir(directory):
+            return []
+        names = os.listdir(directory)
+        parts = sorted(name for name in names if name.startswith(f"{prefix}_lists_") and name.endswith(".npz"))
+        centroids = [name for name in names if name == f"{prefix}_centroids.npz"]
+        return centroids + parts
+
+    def save(self, directory: str, prefix: str = "ivf", first_part: int = 0) -> None:
+        """
+        Sauvegarder la structure de l'index (sans les vecteurs, stockés par les embeddings)
+        Args:
+            directory (str): Répertoire de l'index
+            prefix (str): Préfixe des fichiers
+            first_part (int): Première partie à écrire; si > 0, les centroïdes et les parties
+                précédentes sont déjà présents (repris d'une version précédente)
+        """
+        if first_part == 0:
+            save_npz_atomic(
+                os.path.join(directory, f"{prefix}_centroids.npz"),
+                centroids=self.centroids,
+                params=np.array([self.nprobe, self.n_iter, self.seed, self.trained_size], dtype=np.int64)
+            )
+        start = sum(len(ids) for _, ids in self.parts[:first_part])
+        for offsets, ids in self.parts[first_part:]:
+            save_npz_atomic(os.path.join(directory, f"{prefix}_lists_{start:09d}.npz"), offsets=offsets, ids=ids)
+            start += len(ids)
+        logger.info(f"Index IVF sauvegardé dans {directory}")
+
+    @classmethod
+    def load(cls, directory: str, size: int, prefix: str = "ivf") -> Optional["IVFFlatIndex"]:
+        """
+        Charger un index IVF
+        Args:
+            directory (str): Répertoire de l'index
+            size (int): Nombre de lignes attendu (celui des embeddings)
+            prefix (str): Préfixe des fichiers
+        Returns:
+            Optional[IVFFlatIndex]: Index ou None s'il est absent ou désaligné
+        """
+        files = cls.files(directory, prefix)
+        if not files or files[0] != f"{prefix}_centroids.npz":
+            return None
+        data = np.load(os.path.join(directory, files[0]))
+        nprobe, n_iter, seed, trained_size = (int(x) for x in data["params"])
+        index = cls(n_lists=len(data["centroids"]), nprobe=nprobe, n_iter=n_iter, seed=seed)
+        index.centroids = data["centroids"]
+        index.trained_size = trained_size
+        parts = []
+        for name in files[1:]:
+            part = np.load(os.path.join(directory, name))
+            parts.append((part["offsets"], part["ids"]))
+        index.parts = tuple(parts)
+        if index.size != size:
+            logger.warning(f"Index IVF désaligné ({index.size} vs {size} vecteurs)")
+            return None
+        return index
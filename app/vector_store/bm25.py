@@ -0,0 +1,444 @@
+# app/vector_store/bm25.py
+import os
+import re
+import json
+import logging
+import threading
+from array import array
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+import numpy as np
+
+from .ann import save_npz_atomic
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\b\w{3,}\b")
+LOG_PATTERN = re.compile(r"_(\d{9})\.log$")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Découper un texte en termes (minuscules, mots d'au moins 3 caractères)
+    Args:
+        text (str): Texte à découper
+    Returns:
+        List[str]: Termes du texte
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Index inversé BM25 pour la recherche par mots-clés.
+    Chaque terme pointe vers ses listes de postings (lignes, fréquences): une requête
+    ne parcourt que les postings de ses termes, quelle que soit la taille du corpus.
+    Les suppressions marquent les lignes comme mortes; compact() les retire des postings.
+    L'index est modifié sur place sous verrou (les recherches en cours copient les postings
+    de leurs termes). Sur disque, un fichier de base .npz est complété par un journal des mises
+    à jour (une ligne JSON par mise à jour, ajoutée en fin de fichier), réécrit dans la base
+    lorsqu'il dépasse sa taille.
+    """
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Initialiser l'index BM25
+        Args:
+            k1 (float): Saturation de la fréquence des termes
+            b (float): Normalisation par la longueur des chunks
+        """
+        self.k1 = k1
+        self.b = b
+        # terme -> (lignes, fréquences)
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._keys: List[Tuple[str, int]] = []
+        self._slots: Dict[Tuple[str, int], int] = {}
+        self._lengths = array("i")
+        self._live = bytearray()
+        self._live_count = 0
+        self._total_length = 0
+        self._lock = threading.Lock()
+        # Fichier de base lu ou écrit (génération, identité) et position dans son journal
+        self.generation = 0
+        self.base_stamp: Optional[Tuple[int, int]] = None
+        self.log_offset = 0
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    @property
+    def dead_count(self) -> int:
+        """
+        Nombre de lignes supprimées encore présentes dans les postings
+        """
+        return len(self._keys) - self._live_count
+
+    def _add_terms(self, key: Tuple[str, int], counts: Dict[str, int]) -> None:
+        """
+        Ajouter (ou remplacer) une ligne à partir des fréquences de ses termes (verrou pris)
+        """
+        if key in self._slots:
+            self._remove(key)
+
+        slot = len(self._keys)
+        length = 0
+        for term, tf in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("i"), array("i"))
+            postings[0].append(slot)
+            postings[1].append(tf)
+            length += tf
+
+        self._keys.append(key)
+        self._slots[key] = slot
+        self._lengths.append(length)
+        self._live.append(1)
+        self._live_count += 1
+        self._total_length += length
+
+    def _remove(self, key: Tuple[str, int]) -> bool:
+        """
+        Marquer une ligne comme supprimée (verrou pris)
+        """
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return False
+        self._live[slot] = 0
+        self._live_count -= 1
+        self._total_length -= self._lengths[slot]
+        return True
+
+    def _remove_document(self, doc_id: str) -> int:
+        """
+        Marquer les lignes d'un document comme supprimées (verrou pris)
+        """
+        keys = [key for key in self._slots if key[0] == doc_id]
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def add(self, doc_id: str, chunk_id: int, text: str) -> None:
+        """
+        Ajouter (ou remplacer) un chunk
+        Args:
+            doc_id (str): ID du document
+            chunk_id (int): Numéro du chunk
+            text (str): Texte du chunk
+        """
+        with self._lock:
+            self._add_terms((doc_id, chunk_id), Counter(tokenize(text)))
+
+    def add_chunks(self, chunks: Iterable[Dict[str, Any]]) -> int:
+        """
+        Ajouter des chunks
+        Args:
+            chunks (Iterable[Dict[str, Any]]): Chunks avec leurs métadonnées
+        Returns:
+            int: Nombre de chunks ajoutés
+        """
+        added = 0
+        for chunk in chunks:
+            metadata = chunk.get("metadata", {})
+            self.add(metadata["doc_id"], metadata["chunk_id"], chunk.get("text", chunk.get("content", "")))
+            added += 1
+        return added
+
+    def remove(self, doc_id: str, chunk_id: int) -> bool:
+        """
+        Supprimer un chunk
+        Args:
+            doc_id (str): ID du document
+            chunk_id (int): Numéro du chunk
+        Returns:
+            bool: True si le chunk était indexé
+        """
+        with self._lock:
+            return self._remove((doc_id, chunk_id))
+
+    def remove_document(self, doc_id: str) -> int:
+        """
+        Supprimer tous les chunks d'un document
+        Args:
+            doc_id (str): ID du document
+        Returns:
+            int: Nombre de chunks supprimés
+        """
+        with self._lock:
+            return self._remove_document(doc_id)
+
+    def compact(self) -> None:
+        """
+        Retirer les lignes supprimées des postings et renuméroter les lignes
+        """
+        with self._lock:
+            if not self.dead_count:
+                return
+            live = np.frombuffer(self._live, dtype=np.uint8).astype(bool)
+            remap = np.cumsum(live, dtype=np.int64) - 1
+
+            postings = {}
+            for term, (slots, tfs) in self._postings.items():
+                slots = np.frombuffer(slots, dtype=np.int32)
+                keep = live[slots]
+                if np.any(keep):
+                    postings[term] = (
+                        array("i", remap[slots[keep]].astype(np.int32).tobytes()),
+                        array("i", np.frombuffer(tfs, dtype=np.int32)[keep].tobytes())
+                    )
+            # Nouvelles structures: une recherche en cours garde les anciennes lignes
+            self._postings = postings
+            self._keys = [key for key, alive in zip(self._keys, live) if alive]
+            self._slots = {key: slot for slot, key in enumerate(self._keys)}
+            self._lengths = array("i", np.frombuffer(self._lengths, dtype=np.int32)[live].tobytes())
+            self._live = bytearray(b"\x01" * len(self._keys))
+        logger.info(f"Index BM25 compacté: {len(self._keys)} chunks")
+
+    def search(self, query: str, top_k: int = 5,
+               candidates: Optional[Iterable[Tuple[str, int]]] = None) -> List[Tuple[Tuple[str, int], float]]:
+        """
+        Rechercher les chunks les plus pertinents pour une requête
+        Args:
+            query (str): Requête
+            top_k (int): Nombre de résultats
+            candidates (Iterable[Tuple[str, int]]): Clés (doc_id, chunk_id) autorisées (toutes par défaut)
+        Returns:
+            List[Tuple[Tuple[str, int], float]]: Clés (doc_id, chunk_id) et scores BM25, par score décroissant
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        # Copier sous verrou les postings vivants des termes de la requête: seules ces lignes sont scorées
+        term_postings = []
+        with self._lock:
+            if not self._live_count:
+                return []
+            live_count = self._live_count
+            avg_length = self._total_length / live_count if self._total_length else 1.0
+            keys = self._keys
+            allowed = None
+            if candidates is not None:
+                # Restreindre aux lignes candidates (filtre de métadonnées)
+                allowed = np.array([self._slots[key] for key in candidates if key in self._slots], dtype=np.int32)
+                if not len(allowed):
+                    return []
+            live = np.frombuffer(self._live, dtype=np.uint8)
+            lengths = np.frombuffer(self._lengths, dtype=np.int32)
+            for term in terms:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                slots = np.frombuffer(postings[0], dtype=np.int32).copy()
+                alive = live[slots].astype(bool)
+                if alive.any():
+                    slots = slots[alive]
+                    tfs = np.frombuffer(postings[1], dtype=np.int32)[alive]
+                    term_postings.append((slots, tfs.astype(np.float32), lengths[slots]))
+            del live, lengths
+
+        touched, contributions = [], []
+        for slots, tfs, slot_lengths in term_postings:
+            df = len(slots)
+            idf = np.log(1.0 + (live_count - df + 0.5) / (df + 0.5))
+            if allowed is not None:
+                keep = np.isin(slots, allowed)
+                slots, tfs, slot_lengths = slots[keep], tfs[keep], slot_lengths[keep]
+            norm = self.k1 * (1.0 - self.b + self.b * slot_lengths / avg_length)
+            touched.append(slots)
+            contributions.append(idf * tfs * (self.k1 + 1.0) / (tfs + norm))
+        if not touched:
+            return []
+
+        # Cumuler les contributions par ligne touchée
+        slots, inverse = np.unique(np.concatenate(touched), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(contributions), minlength=len(slots)).astype(np.float32)
+        k = min(top_k, int(np.count_nonzero(scores > 0)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(keys[slots[i]], float(scores[i])) for i in top]
+
+    @staticmethod
+    def log_path(path: str, generation: int) -> str:
+        """
+        Chemin du journal des mises à jour d'une génération du fichier de base
+        Args:
+            path (str): Chemin du fichier de base .npz
+            generation (int): Génération du fichier de base
+        Returns:
+            str: Chemin du journal
+        """
+        return f"{os.path.splitext(path)[0]}_{generation:09d}.log"
+
+    @staticmethod
+    def _log_generations(path: str) -> List[int]:
+        """
+        Générations des journaux présents sur disque
+        """
+        directory = os.path.dirname(path) or "."
+        prefix = os.path.basename(os.path.splitext(path)[0])
+        generations = []
+        for name in os.listdir(directory):
+            match = LOG_PATTERN.search(name)
+            if match and name[:match.start()] == prefix:
+                generations.append(int(match.group(1)))
+        return generations
+
+    @staticmethod
+    def stamp(path: str) -> Optional[Tuple[int, int]]:
+        """
+        Identité du fichier de base (remplacé à chaque réécriture), None s'il est absent
+        Args:
+            path (str): Chemin du fichier de base .npz
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        """
+        Appliquer une mise à jour du journal (verrou pris)
+        """
+        for doc_id in record.get("remove", []):
+            self._remove_document(doc_id)
+        for doc_id, chunk_id, counts in record.get("add", []):
+            self._add_terms((doc_id, chunk_id), counts)
+
+    def replay(self, path: str) -> int:
+        """
+        Appliquer les mises à jour ajoutées au journal depuis la dernière lecture
+        Args:
+            path (str): Chemin du fichier de base .npz
+        Returns:
+            int: Nombre de mises à jour appliquées
+        """
+        # Sous verrou: deux recherches concurrentes n'appliquent pas deux fois la même mise à jour
+        with self._lock:
+            try:
+                with open(self.log_path(path, self.generation), "rb") as f:
+                    f.seek(self.log_offset)
+                    data = f.read()
+            except OSError:
+                return 0
+            # Ignorer une ligne incomplète (écriture en cours ou interrompue)
+            end = data.rfind(b"\n") + 1
+            records = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+            for record in records:
+                self._apply(record)
+            self.log_offset += end
+        return len(records)
+
+    def update(self, path: str, chunks: Iterable[Dict[str, Any]] = (),
+               removed_documents: Iterable[str] = ()) -> int:
+        """
+        Supprimer des documents et ajouter des chunks, en ajoutant la mise à jour au journal.
+        L'appelant sérialise les écrivains et a relu le journal (replay) au préalable.
+        Args:
+            path (str): Chemin du fichier de base .npz
+            chunks (Iterable[Dict[str, Any]]): Chunks ajoutés
+            removed_documents (Iterable[str]): IDs des documents supprimés (avant l'ajout)
+        Returns:
+            int: Taille du journal en octets
+        """
+        record = {
+            "remove": list(removed_documents),
+            "add": [[chunk["metadata"]["doc_id"], chunk["metadata"]["chunk_id"],
+                     Counter(tokenize(chunk.get("text", chunk.get("content", ""))))] for chunk in chunks]
+        }
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            with open(self.log_path(path, self.generation), "ab") as f:
+                # Retirer la fin d'une écriture interrompue avant d'ajouter la mise à jour
+                f.truncate(self.log_offset)
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self._apply(record)
+            self.log_offset += len(line)
+            return self.log_offset
+
+    def save(self, path: str) -> None:
+        """
+        Réécrire le fichier de base au format .npz compact (postings concaténés, sans pickle),
+        dans une nouvelle génération dont le journal est vide
+        Args:
+            path (str): Chemin du fichier .npz
+        """
+        self.compact()
+        with self._lock:
+            terms = list(self._postings)
+            counts = np.array([len(self._postings[term][0]) for term in terms], dtype=np.int64)
+            offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+            slots = np.frombuffer(b"".join(self._postings[term][0].tobytes() for term in terms), dtype=np.int32)
+            tfs = np.frombuffer(b"".join(self._postings[term][1].tobytes() for term in terms), dtype=np.int32)
+            lengths = np.frombuffer(self._lengths, dtype=np.int32).copy()
+            doc_ids = np.array([key[0] for key in self._keys], dtype=str)
+            chunk_ids = np.array([key[1] for key in self._keys], dtype=np.int64)
+
+        # Génération jamais utilisée: un lecteur ne rejoue pas un ancien journal sur la nouvelle base
+        old_generations = self._log_generations(path)
+        generation = max([self.generation, *old_generations]) + 1
+        save_npz_atomic(
+            path,
+            terms=np.array(terms, dtype=str),
+            offsets=offsets,
+            slots=slots,
+            tfs=tfs,
+            lengths=lengths,
+            doc_ids=doc_ids,
+            chunk_ids=chunk_ids,
+            params=np.array([self.k1, self.b], dtype=np.float64),
+            generation=np.array(generation, dtype=np.int64)
+        )
+        self.generation = generation
+        self.base_stamp = self.stamp(path)
+        self.log_offset = 0
+        for old in old_generations:
+            try:
+                os.remove(self.log_path(path, old))
+            except OSError:
+                pass
+        logger.info(f"Index BM25 sauvegardé: {path} ({len(doc_ids)} chunks, {len(terms)} termes)")
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BM25Index"]:
+        """
+        Charger un index BM25: fichier de base puis mises à jour de son journal
+        Args:
+            path (str): Chemin du fichier .npz
+        Returns:
+            Optional[BM25Index]: Index ou None s'il est absent
+        """
+        stamp = cls.stamp(path)
+        if stamp is None:
+            # Pas encore de fichier de base: seulement un journal
+            index = cls()
+            if not os.path.exists(cls.log_path(path, 0)):
+                return None
+            index.replay(path)
+            return index
+        with np.load(path) as data:
+            k1, b = (float(x) for x in data["params"])
+            index = cls(k1=k1, b=b)
+            index.generation = int(data["generation"]) if "generation" in data.files else 0
+            index.base_stamp = stamp
+
+            offsets = data["offsets"]
+            slots = data["slots"].astype(np.int32)
+            tfs = data["tfs"].astype(np.int32)
+            for i, term in enumerate(data["terms"].tolist()):
+                start, end = offsets[i], offsets[i + 1]
+                index._postings[term] = (array("i", slots[start:end].tobytes()), array("i", tfs[start:end].tobytes()))
+
+            index._keys = list(zip(data["doc_ids"].tolist(), data["chunk_ids"].tolist()))
+            index._slots = {key: slot for slot, key in enumerate(index._keys)}
+            index._lengths = array("i", data["lengths"].astype(np.int32).tobytes())
+            index._live = bytearray(b"\x01" * len(index._keys))
+            index._live_count = len(index._keys)
+            index._total_length = int(data["lengths"].sum())
+        index.replay(path)
+        return index
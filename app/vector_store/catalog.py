@@ -0,0 +1,259 @@
+# app/vector_store/catalog.py
+import os
+import json
+import logging
+from itertools import islice
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+import numpy as np
+
+from .filters import MetadataIndex
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+
+def make_chunk_id(doc_id: str, chunk_id: int) -> str:
+    """
+    Construire l'identifiant de ligne d'un chunk dans l'index vectoriel
+    Args:
+        doc_id (str): ID du document
+        chunk_id (int): Numéro du chunk dans le document
+    Returns:
+        str: Identifiant au format "<doc_id>_<chunk_id>"
+    """
+    return f"{doc_id}_{chunk_id}"
+
+
+def parse_chunk_id(row_id: str) -> Tuple[str, int]:
+    """
+    Décomposer un identifiant de ligne en (doc_id, chunk_id)
+    Args:
+        row_id (str): Identifiant au format "<doc_id>_<chunk_id>"
+    Returns:
+        Tuple[str, int]: Couple (doc_id, chunk_id)
+    """
+    doc_id, chunk_idx_str = row_id.rsplit('_', 1)
+    return doc_id, int(chunk_idx_str)
+
+
+class ChunkCatalog:
+    """
+    Catalogue des chunks aligné ligne à ligne sur l'index vectoriel.
+    Permet de retrouver un chunk en O(1) par position ou par (doc_id, chunk_id),
+    et de résoudre un filtre de métadonnées en positions via l'index de métadonnées.
+    Les structures ne font que grandir et peuvent être partagées entre les catalogues de
+    versions successives de l'index (voir extended): chaque catalogue ne voit que ses
+    len() premières lignes.
+    """
+    def __init__(self, chunks: Optional[Iterable[Dict[str, Any]]] = None):
+        """
+        Initialiser le catalogue
+        Args:
+            chunks (Iterable[Dict[str, Any]]): Chunks dans l'ordre des lignes de l'index
+        """
+        self._rows: List[Dict[str, Any]] = []
+        self._positions: Dict[Tuple[str, int], int] = {}
+        self.metadata_index = MetadataIndex()
+        self._size = 0
+        if chunks is not None:
+            self.extend(chunks)
+
+    def extended(self, chunks: Iterable[Dict[str, Any]]) -> "ChunkCatalog":
+        """
+        Nouveau catalogue prolongé de chunks, sans recopier les lignes existantes:
+        les structures sont partagées avec ce catalogue, qui reste inchangé (il ne voit
+        pas les lignes ajoutées) et peut continuer à servir des recherches en cours
+        Args:
+            chunks (Iterable[Dict[str, Any]]): Chunks ajoutés en fin de catalogue
+        Returns:
+            ChunkCatalog: Catalogue prolongé
+        """
+        catalog = ChunkCatalog.__new__(ChunkCatalog)
+        catalog._rows = self._rows
+        catalog._positions = self._positions
+        catalog.metadata_index = self.metadata_index
+        catalog._size = self._size
+        catalog.extend(chunks)
+        return catalog
+
+    def _detach(self) -> None:
+        """
+        Recopier les structures partagées lorsque d'autres lignes ont déjà été ajoutées
+        derrière ce catalogue (prolongement abandonné), avant de le prolonger lui-même
+        """
+        rows = self._rows[:self._size]
+        self._rows = []
+        self._positions = {}
+        self.metadata_index = MetadataIndex(self.metadata_index.fields)
+        self._size = 0
+        self.extend(rows)
+
+    @staticmethod
+    def key(chunk: Dict[str, Any]) -> Tuple[str, int]:
+        """
+        Clé (doc_id, chunk_id) d'un chunk
+        Args:
+            chunk (Dict[str, Any]): Chunk avec ses métadonnées
+        Returns:
+            Tuple[str, int]: Clé du chunk
+        """
+        metadata = chunk.get("metadata", {})
+        return metadata.get("doc_id"), metadata.get("chunk_id")
+
+    def append(self, chunk: Dict[str, Any]) -> int:
+        """
+        Ajouter un chunk en fin de catalogue
+        Args:
+            chunk (Dict[str, Any]): Chunk à ajouter
+        Returns:
+            int: Position du chunk dans le catalogue
+        """
+        # Normaliser une seule fois le champ 'text' plutôt qu'à chaque requête
+        if 'text' not in chunk and 'content' in chunk:
+            chunk = dict(chunk)
+            chunk['text'] = chunk['content']
+
+        if self._size != len(self._rows):
+            self._detach()
+        position = self._size
+        self._rows.append(chunk)
+        self._positions[self.key(chunk)] = position
+        self.metadata_index.add(position, chunk.get("metadata", {}))
+        self._size += 1
+        return position
+
+    def extend(self, chunks: Iterable[Dict[str, Any]]) -> None:
+        """
+        Ajouter plusieurs chunks en fin de catalogue
+        Args:
+            chunks (Iterable[Dict[str, Any]]): Chunks à ajouter
+        """
+        for chunk in chunks:
+            self.append(chunk)
+
+    def get(self, position: int) -> Optional[Dict[str, Any]]:
+        """
+        Récupérer un chunk par sa position dans l'index
+        Args:
+            position (int): Position de la ligne
+        Returns:
+            Optional[Dict[str, Any]]: Chunk ou None si hors limites
+        """
+        if 0 <= position < self._size:
+            return self._rows[position]
+        return None
+
+    def position(self, doc_id: str, chunk_id: int) -> Optional[int]:
+        """
+        Position d'un chunk dans l'index
+        Args:
+            doc_id (str): ID du document
+            chunk_id (int): Numéro du chunk
+        Returns:
+            Optional[int]: Position ou None si absent
+        """
+        position = self._positions.get((doc_id, chunk_id))
+        return position if position is not None and position < self._size else None
+
+    def lookup(self, doc_id: str, chunk_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Récupérer un chunk par (doc_id, chunk_id)
+        Args:
+            doc_id (str): ID du document
+            chunk_id (int): Numéro du chunk
+        Returns:
+            Optional[Dict[str, Any]]: Chunk ou None si absent
+        """
+        position = self.position(doc_id, chunk_id)
+        return self._rows[position] if position is not None else None
+
+    def filter_rows(self, filters: Dict[str, Any]) -> np.ndarray:
+        """
+        Positions des chunks correspondant à un filtre de métadonnées
+        Args:
+            filters (Dict[str, Any]): Champ -> valeur ou liste de valeurs acceptées
+        Returns:
+            np.ndarray: Positions triées
+        """
+        rows = self.metadata_index.rows(filters)
+        if len(rows) and rows[-1] >= self._size:
+            # Lignes ajoutées par une version plus récente du catalogue
+            rows = rows[:np.searchsorted(rows, self._size)]
+        return rows
+
+    def row_ids(self) -> List[str]:
+        """
+        Identifiants de lignes dans l'ordre du catalogue
+        Returns:
+            List[str]: Liste des identifiants "<doc_id>_<chunk_id>"
+        """
+        return [make_chunk_id(*self.key(chunk)) for chunk in self]
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self):
+        return islice(self._rows, self._size)
+
+    @classmethod
+    def from_chunk_ids(cls, chunk_ids: List[str], chunks: Iterable[Dict[str, Any]]) -> "ChunkCatalog":
+        """
+        Reconstruire un catalogue aligné sur une liste d'identifiants existante
+        (utilisé pour migrer un index sauvegardé sans catalogue)
+        Args:
+            chunk_ids (List[str]): Identifiants des lignes de l'index
+            chunks (Iterable[Dict[str, Any]]): Chunks disponibles, dans n'importe quel ordre
+        Returns:
+            ChunkCatalog: Catalogue aligné sur chunk_ids
+        """
+        by_key = {cls.key(chunk): chunk for chunk in chunks}
+        catalog = cls()
+        for row_id in chunk_ids:
+            try:
+                chunk = by_key.get(parse_chunk_id(row_id))
+            except ValueError:
+                chunk = None
+            if chunk is None:
+                # Conserver l'alignement avec une ligne vide
+                logger.warning(f"Chunk introuvable pour la ligne {row_id}")
+                chunk = {"text": "", "metadata": {"doc_id": None, "chunk_id": None}}
+            catalog.append(chunk)
+        return catalog
+
+    def encode_rows(self, start: int = 0) -> bytes:
+        """
+        Lignes du catalogue au format JSON Lines (une ligne par chunk)
+        Args:
+            start (int): Première ligne encodée
+        Returns:
+            bytes: Lignes encodées en UTF-8
+        """
+        return "".join(json.dumps(chunk, ensure_ascii=False) + '\n'
+                       for chunk in islice(self._rows, start, self._size)).encode('utf-8')
+
+    def save(self, path: str, start: int = 0) -> None:
+        """
+        Sauvegarder le catalogue au format JSON Lines (une ligne par chunk)
+        Args:
+            path (str): Chemin du fichier
+            start (int): Première ligne à écrire; si > 0, les lignes sont ajoutées
+                en fin de fichier au lieu de le réécrire
+        """
+        mode = 'ab' if start > 0 else 'wb'
+        with open(path, mode) as f:
+            f.write(self.encode_rows(start))
+
+    @classmethod
+    def load(cls, path: str, limit: Optional[int] = None) -> Optional["ChunkCatalog"]:
+        """
+        Charger un catalogue depuis un fichier JSON Lines
+        Args:
+            path (str): Chemin du fichier
+            limit (int): Nombre de lignes à lire (fichier partagé avec des versions plus récentes)
+        Returns:
+            Optional[ChunkCatalog]: Catalogue ou None si le fichier n'existe pas
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.loads(line) for line in islice(f, limit) if line.strip())
@@ -0,0 +1,120 @@
+# app/vector_store/diversity.py
+import logging
+from typing import List, Dict, Any, Optional
+import numpy as np
+import scipy.sparse as sp
+
+from .ann import normalize_rows
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+
+def mmr_select(query_vector, candidate_vectors, top_k: int, lambda_: float = 0.7,
+               relevance: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Sélection par pertinence marginale maximale (MMR): chaque pas retient le candidat
+    qui maximise lambda * pertinence - (1 - lambda) * similarité au plus proche déjà retenu.
+    Les similarités entre candidats sont calculées en un seul produit matriciel, puis la
+    similarité maximale aux retenus est mise à jour par un np.maximum à chaque pas.
+    Args:
+        query_vector: Vecteur de la requête (dense ou creux, 1 x d)
+        candidate_vectors: Vecteurs des candidats (dense ou creux, n x d)
+        top_k (int): Nombre de candidats à retenir
+        lambda_ (float): Compromis pertinence (1.0) / diversité (0.0)
+        relevance (np.ndarray): Pertinence des candidats (cosinus avec la requête par défaut)
+    Returns:
+        np.ndarray: Positions des candidats retenus, dans l'ordre de sélection
+    """
+    if sp.issparse(candidate_vectors):
+        candidate_vectors = candidate_vectors.toarray()
+    if sp.issparse(query_vector):
+        query_vector = query_vector.toarray()
+    candidates = normalize_rows(np.asarray(candidate_vectors, dtype=np.float32))
+    n = candidates.shape[0]
+    top_k = min(top_k, n)
+    if top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    if relevance is None:
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32).reshape(1, -1))[0]
+        relevance = candidates @ query
+    relevance = np.asarray(relevance, dtype=np.float32)
+    similarity = candidates @ candidates.T
+
+    selected = np.empty(top_k, dtype=np.int64)
+    available = np.ones(n, dtype=bool)
+    max_similarity = np.full(n, -np.inf, dtype=np.float32)
+    for step in range(top_k):
+        penalty = np.where(np.isfinite(max_similarity), max_similarity, 0.0)
+        scores = np.where(available, lambda_ * relevance - (1.0 - lambda_) * penalty, -np.inf)
+        best = int(np.argmax(scores))
+        selected[step] = best
+        available[best] = False
+        np.maximum(max_similarity, similarity[best], out=max_similarity)
+    return selected
+
+
+def _overlap_lines(previous: List[str], following: List[str]) -> int:
+    """
+    Nombre de lignes en fin de previous répétées en début de following (chevauchement du chunker)
+    """
+    for size in range(min(len(previous), len(following)), 0, -1):
+        if previous[-size:] == following[:size]:
+            return size
+    return 0
+
+
+def merge_adjacent(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Fusionner les chunks consécutifs d'un même document (chunk_id qui se suivent) en un
+    seul bloc de contexte, sans répéter les paragraphes de chevauchement.
+    Un bloc prend la place de son chunk le mieux classé et garde le meilleur score.
+    Args:
+        chunks (List[Dict[str, Any]]): Chunks par pertinence décroissante
+    Returns:
+        List[Dict[str, Any]]: Blocs fusionnés (copies); "chunk_ids" liste les chunks de chaque bloc
+    """
+    positions = {}
+    for position, chunk in enumerate(chunks):
+        metadata = chunk.get("metadata", {})
+        positions.setdefault(metadata.get("doc_id"), []).append((metadata.get("chunk_id"), position))
+
+    # Regrouper les chunk_ids consécutifs de chaque document
+    groups = []
+    for doc_id, entries in positions.items():
+        if doc_id is None:
+            groups.extend([[position] for _, position in entries])
+            continue
+        entries.sort(key=lambda entry: (entry[0] is None, entry[0] if isinstance(entry[0], int) else 0))
+        group = []
+        for chunk_id, position in entries:
+            previous = chunks[group[-1]]["metadata"].get("chunk_id") if group else None
+            if group and (not isinstance(chunk_id, int) or not isinstance(previous, int) or chunk_id > previous + 1):
+                groups.append(group)
+                group = []
+            if not group or chunk_id != previous:
+                group.append(position)
+        groups.append(group)
+
+    merged = []
+    for group in groups:
+        first = chunks[group[0]]
+        block = dict(first)
+        block["metadata"] = dict(first.get("metadata", {}))
+        block["chunk_ids"] = [chunks[position]["metadata"].get("chunk_id") for position in group]
+        if len(group) > 1:
+            lines = first.get("text", "").split("\n")
+            for position in group[1:]:
+                following = chunks[position].get("text", "").split("\n")
+                lines.extend(following[_overlap_lines(lines, following):])
+            block["text"] = "\n".join(lines)
+            scores = [chunks[position]["score"] for position in group if "score" in chunks[position]]
+            if scores:
+                block["score"] = max(scores)
+        merged.append((min(group), block))
+
+    merged.sort(key=lambda item: item[0])
+    if len(merged) < len(chunks):
+        logger.info(f"{len(chunks)} chunks fusionnés en {len(merged)} blocs de contexte")
+    return [block for _, block in merged]
@@ -0,0 +1,159 @@
+# app/vector_store/embedding_cache.py
+import os
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, Any, List
+import numpy as np
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> bytes:
+    """
+    Empreinte du contenu exact d'un chunk
+    Args:
+        text (str): Texte du chunk
+    Returns:
+        bytes: Empreinte BLAKE2b (16 octets)
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class ChunkEmbeddingCache:
+    """
+    Cache persistant (SQLite) des embeddings de chunks, indexé par (modèle, empreinte du texte).
+    Une reconstruction de l'index ou une réingestion n'encode que les textes absents du cache:
+    les chunks inchangés ne repassent jamais par le modèle.
+    """
+    # Nombre maximal d'empreintes par requête SQLite (limite des paramètres liés)
+    lookup_batch = 500
+
+    def __init__(self, path: str):
+        """
+        Initialiser le cache
+        Args:
+            path (str): Fichier SQLite du cache
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_embeddings (
+                model TEXT NOT NULL,
+                hash BLOB NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, hash)
+            )
+        """)
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, model: str, hashes: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """
+        Récupérer les embeddings en cache
+        Args:
+            model (str): Identifiant du modèle
+            hashes (List[bytes]): Empreintes des textes
+        Returns:
+            Dict[bytes, np.ndarray]: Empreinte -> vecteur (float32), pour les textes en cache
+        """
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), self.lookup_batch):
+                batch = hashes[start:start + self.lookup_batch]
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM chunk_embeddings WHERE model = ? AND hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch]
+                ).fetchall()
+                for key, vector in rows:
+                    found[bytes(key)] = np.frombuffer(vector, dtype=np.float32)
+        return found
+
+    def put_many(self, model: str, hashes: List[bytes], vectors: np.ndarray) -> None:
+        """
+        Mettre en cache des embeddings
+        Args:
+            model (str): Identifiant du modèle
+            hashes (List[bytes]): Empreintes des textes
+            vectors (np.ndarray): Vecteurs alignés sur hashes
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunk_embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                [(model, key, vector.tobytes()) for key, vector in zip(hashes, vectors)]
+            )
+            self._conn.commit()
+
+    def encode(self, model: str, texts: List[str], encode: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Embeddings de textes, en n'encodant que ceux absents du cache (une seule fois par texte distinct)
+        Args:
+            model (str): Identifiant du modèle
+            texts (List[str]): Textes des chunks
+            encode (Callable[[List[str]], np.ndarray]): Encodage des textes manquants
+        Returns:
+            np.ndarray: Embeddings (float32), un par texte
+        """
+        hashes = [text_hash(text) for text in texts]
+        cached = self.get_many(model, list(dict.fromkeys(hashes)))
+
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            logger.info(f"Encodage de {len(missing)} textes absents du cache ({len(texts) - len(missing)} en cache)")
+            vectors = np.asarray(encode(list(missing.values())), dtype=np.float32)
+            self.put_many(model, list(missing), vectors)
+            cached.update(zip(missing, vectors))
+        else:
+            logger.info(f"{len(texts)} embeddings servis depuis le cache")
+
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([cached[key] for key in hashes])
+
+    def clear(self, model: str = None) -> None:
+        """
+        Vider le cache (pour un modèle, ou entièrement)
+        """
+        with self._lock:
+            if model is None:
+                self._conn.execute("DELETE FROM chunk_embeddings")
+            else:
+                self._conn.execute("DELETE FROM chunk_embeddings WHERE model = ?", (model,))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Statistiques du cache
+        Returns:
+            Dict[str, Any]: hits, misses, taux de succès et nombre d'embeddings stockés
+        """
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM chunk_embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": size
+        }
+
+    def close(self) -> None:
+        """
+        Fermer la connexion SQLite
+        """
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,200 @@
+# app/vector_store/embedding_jobs.py
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+from numpy.lib import format as npy_format
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+# Encodeur du processus de travail, chargé une fois par réplique
+_worker_encoder = None
+
+
+def load_sentence_transformer(model_name: str):
+    """
+    Charger un modèle SentenceTransformer (fabrique picklable pour les processus de travail)
+    """
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_name)
+
+
+def _init_worker(encoder_factory: Callable[[], Any], threads: int) -> None:
+    """
+    Initialiser un processus de travail: limiter les threads torch et charger sa réplique de l'encodeur
+    """
+    global _worker_encoder
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    _worker_encoder = encoder_factory()
+
+
+def _encode_batch(index: int, texts: List[str], batch_size: int):
+    """
+    Encoder un lot dans un processus de travail
+    """
+    return index, np.asarray(_worker_encoder.encode(texts, batch_size=batch_size, convert_to_numpy=True), dtype=np.float32)
+
+
+class EmbeddingJobRunner:
+    """
+    Encodage de gros volumes de textes: les textes sont triés par longueur et regroupés en
+    lots homogènes (moins de padding), encodés par un pool de processus portant chacun
+    une réplique de l'encodeur, et écrits au fil de l'eau dans un fichier .npy ouvert en mmap.
+    Un fichier de progression, mis à jour régulièrement, permet de reprendre un travail
+    interrompu sans réencoder les lots déjà écrits.
+    """
+    def __init__(self, encoder_factory: Optional[Callable[[], Any]] = None, encoder: Any = None, batch_size: int = 64,
+                 workers: int = 0, checkpoint_interval: float = 5.0,
+                 progress_callback: Optional[Callable[[int, int], None]] = None):
+        """
+        Initialiser le runner
+        Args:
+            encoder_factory (Callable): Fabrique picklable d'un encodeur (exposant encode), appelée dans chaque processus
+            encoder: Encodeur déjà chargé, utilisé dans le processus courant si workers == 0
+            batch_size (int): Nombre de textes par lot
+            workers (int): Nombre de processus de travail (0 pour encoder dans le processus courant)
+            checkpoint_interval (float): Intervalle minimal entre deux sauvegardes de la progression, en secondes
+            progress_callback (Callable[[int, int], None]): Appelée avec (textes encodés, total) après chaque lot
+        """
+        if workers > 0 and encoder_factory is None:
+            raise ValueError("Une fabrique d'encodeur est nécessaire pour encoder dans plusieurs processus")
+        if workers == 0 and encoder is None and encoder_factory is None:
+            raise ValueError("Aucun encodeur fourni")
+        self.encoder_factory = encoder_factory
+        self.encoder = encoder
+        self.batch_size = batch_size
+        self.workers = workers
+        self.checkpoint_interval = checkpoint_interval
+        self.progress_callback = progress_callback
+
+    @staticmethod
+    def fingerprint(texts: List[str], model: str = "") -> str:
+        """
+        Empreinte d'un travail (modèle et textes, dans l'ordre), pour reconnaître un travail à reprendre
+        """
+        digest = hashlib.blake2b(model.encode("utf-8"), digest_size=16)
+        for text in texts:
+            digest.update(hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest())
+        return digest.hexdigest()
+
+    def _batches(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Lots de positions de textes de longueurs voisines
+        """
+        order = np.argsort(np.fromiter((len(text) for text in texts), dtype=np.int64, count=len(texts)), kind="stable")
+        return [order[start:start + self.batch_size] for start in range(0, len(order), self.batch_size)]
+
+    @staticmethod
+    def _progress_path(output_path: str) -> str:
+        return output_path + ".progress.json"
+
+    def _load_progress(self, output_path: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """
+        Progression d'un travail interrompu sur les mêmes textes (None sinon)
+        """
+        try:
+            with open(self._progress_path(output_path), "r", encoding="utf-8") as f:
+                progress = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (progress.get("fingerprint") != fingerprint or progress.get("batch_size") != self.batch_size
+                or not os.path.exists(output_path)):
+            return None
+        return progress
+
+    def _save_progress(self, output_path: str, vectors: np.memmap, progress: Dict[str, Any]) -> None:
+        """
+        Écrire les vecteurs sur disque puis la liste des lots terminés (remplacement atomique)
+        """
+        vectors.flush()
+        # Fichier temporaire propre à l'écrivain: deux processus n'écrivent pas dans le même
+        tmp_path = f"{self._progress_path(output_path)}.tmp-{os.getpid()}-{uuid.uuid4().hex[:12]}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(progress, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self._progress_path(output_path))
+
+    def run(self, texts: List[str], output_path: str, model: str = "") -> np.memmap:
+        """
+        Encoder des textes dans un fichier .npy (une ligne par texte, dans l'ordre des textes)
+        Args:
+            texts (List[str]): Textes à encoder
+            output_path (str): Fichier .npy de sortie
+            model (str): Identifiant du modèle (inclus dans l'empreinte du travail)
+        Returns:
+            np.memmap: Vecteurs en lecture seule
+        """
+        batches = self._batches(texts)
+        fingerprint = self.fingerprint(texts, model)
+        progress = self._load_progress(output_path, fingerprint)
+        vectors = None
+        if progress is not None:
+            vectors = np.load(output_path, mmap_mode="r+")
+            logger.info(f"Reprise du travail d'encodage: {len(progress['done'])}/{len(batches)} lots déjà encodés")
+        else:
+            progress = {"fingerprint": fingerprint, "batch_size": self.batch_size, "done": []}
+        done = set(progress["done"])
+        pending = [index for index in range(len(batches)) if index not in done]
+        encoded = sum(len(batches[index]) for index in done)
+        last_checkpoint = time.monotonic()
+
+        def write(index: int, batch_vectors: np.ndarray) -> None:
+            nonlocal vectors, encoded, last_checkpoint
+            if vectors is None:
+                os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+                vectors = npy_format.open_memmap(output_path, mode="w+", dtype=np.float32,
+                                                 shape=(len(texts), batch_vectors.shape[1]))
+            vectors[batches[index]] = batch_vectors
+            progress["done"].append(index)
+            encoded += len(batches[index])
+            if self.progress_callback is not None:
+                self.progress_callback(encoded, len(texts))
+            if time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+                self._save_progress(output_path, vectors, progress)
+                last_checkpoint = time.monotonic()
+                logger.info(f"Encodage: {encoded}/{len(texts)} textes")
+
+        start = time.perf_counter()
+        try:
+            if self.workers > 0 and len(pending) > 1:
+                threads = max(1, (os.cpu_count() or 1) // self.workers)
+                with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                         initargs=(self.encoder_factory, threads)) as executor:
+                    futures = [executor.submit(_encode_batch, index, [texts[i] for i in batches[index]], self.batch_size)
+                               for index in pending]
+                    for future in as_completed(futures):
+                        write(*future.result())
+            else:
+                encoder = self.encoder if self.encoder is not None else self.encoder_factory()
+                for index in pending:
+                    batch_texts = [texts[i] for i in batches[index]]
+                    write(index, np.asarray(encoder.encode(batch_texts, batch_size=self.batch_size, convert_to_numpy=True),
+                                            dtype=np.float32))
+        except BaseException:
+            # Conserver les lots terminés pour une reprise
+            if vectors is not None:
+                self._save_progress(output_path, vectors, progress)
+            raise
+
+        if vectors is None:
+            # Aucun lot à encoder (liste vide)
+            return np.empty((0, 0), dtype=np.float32)
+        vectors.flush()
+        try:
+            os.remove(self._progress_path(output_path))
+        except OSError:
+            pass
+        logger.info(f"{len(texts)} textes encodés en {time.perf_counter() - start:.1f} s "
+                    f"({len(batches)} lots, {self.workers or 1} processus)")
+        return np.load(output_path, mmap_mode="r")
@@ -1,15 +1,333 @@
 # app/vector_store/embeddings.py
 import os
+import json
+import time
 import pickle
-from typing import List, Dict, Any
+import shutil
+import threading
+from contextlib import contextmanager
+from functools import partial
+from typing import List, Dict, Any, Optional, Iterable
 import numpy as np
+import scipy.sparse as sp
+from sklearn.base import clone
 from sklearn.feature_extraction.text import TfidfVectorizer
 import logging
 
+from .catalog import ChunkCatalog, parse_chunk_id
+from .quantization import QuantizedVectors, save_npy_atomic, write_rows, append_rows, open_rows, SUPPORTED_DTYPES
+from .query_cache import QueryEmbeddingCache
+from .embedding_cache import ChunkEmbeddingCache
+from .embedding_jobs import EmbeddingJobRunner, load_sentence_transformer
+from .encoder_loader import EncoderLoader, EncoderNotReadyError, ENCODER_FAILED, ENCODER_IDLE
+from .snapshot import IndexSnapshot, SnapshotStore
+from .hashing import HashingTfidf
+from .ann import IVFFlatIndex
+from .index_format import ChunkIdSegments, save_chunk_ids, load_chunk_ids, save_tfidf_vectorizer, load_tfidf_vectorizer
+
 # Configurer le logging
 logger = logging.getLogger(__name__)
 
-class TFIDFEmbeddings:
+# Fichier du masque des lignes supprimées dans un snapshot
+TOMBSTONES_FILE = "deleted.npy"
+# Vecteurs float32 bruts et description de la version d'un snapshot SentenceTransformer
+ST_VECTORS_FILE = "st_vectors.f32"
+ST_META_FILE = "st_meta.json"
+
+
+class SnapshotEmbeddings:
+    """
+    Base des gestionnaires d'embeddings: l'état de l'index (vecteurs, identifiants,
+    catalogue) est un IndexSnapshot immuable, remplacé par référence à chaque mise à jour.
+    Les recherches lisent un snapshot sans verrou; les écritures sont sérialisées (entre
+    processus par un verrou de fichier), construites sur la dernière version publiée et
+    publiées dans un répertoire versionné, que les autres processus rechargent via refresh().
+    """
+    # Intervalle minimal entre deux lectures du pointeur de version (secondes)
+    refresh_interval = 1.0
+
+    def _init_snapshots(self, indices_dir: str, name: str) -> None:
+        """
+        Initialiser l'état versionné
+        Args:
+            indices_dir (str): Répertoire de stockage des indices
+            name (str): Préfixe des fichiers de l'index ("tfidf" ou "st")
+        """
+        self.snapshots = SnapshotStore(indices_dir, name)
+        self._snapshot = IndexSnapshot()
+        self._write_lock = threading.RLock()
+        self._checked_at = 0.0
+
+    @property
+    def snapshot(self) -> IndexSnapshot:
+        """
+        Snapshot courant; à lire une seule fois par recherche pour un état cohérent
+        """
+        return self._snapshot
+
+    @property
+    def doc_vectors(self):
+        return self.snapshot.doc_vectors
+
+    @property
+    def chunk_ids(self) -> List[str]:
+        return self.snapshot.chunk_ids
+
+    @property
+    def quantized(self) -> Optional[QuantizedVectors]:
+        return self.snapshot.quantized
+
+    @property
+    def catalog(self) -> ChunkCatalog:
+        return self.snapshot.catalog
+
+    @catalog.setter
+    def catalog(self, catalog: ChunkCatalog) -> None:
+        # Catalogue reconstruit en mémoire: nouveau snapshot, même version
+        with self._write_lock:
+            self._swap(self.snapshot.replace(catalog=catalog))
+
+    def _swap(self, snapshot: IndexSnapshot) -> None:
+        """
+        Rendre un snapshot visible aux recherches (affectation atomique d'une référence)
+        """
+        self._snapshot = snapshot
+
+    @contextmanager
+    def _writing(self, refresh: bool = True):
+        """
+        Section d'écriture: verrou du processus puis verrou inter-processus des snapshots.
+        La mise à jour est construite sur la dernière version publiée, éventuellement par
+        un autre processus, pour ne pas perdre ses lignes à la publication suivante.
+        Args:
+            refresh (bool): Recharger la dernière version publiée (inutile pour un entraînement complet)
+        """
+        with self._write_lock, self.snapshots.locked():
+            if refresh:
+                self.refresh(force=True)
+            yield
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Charger la dernière version publiée si elle est plus récente que le snapshot courant
+        (mise à jour faite par un autre processus)
+        Args:
+            force (bool): Ignorer l'intervalle minimal entre deux vérifications
+        Returns:
+            bool: True si un nouveau snapshot a été chargé
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.refresh_interval:
+            return False
+        self._checked_at = now
+
+        version = self.snapshots.current_version()
+        if version == 0 or version == self._snapshot.version:
+            return False
+        with self._write_lock:
+            if version == self._snapshot.version:
+                return False
+            snapshot = self._read_snapshot(self.snapshots.path(version), version)
+            if snapshot is None:
+                return False
+            self._swap(snapshot)
+        logger.info(f"Index rechargé: version {version}, {len(snapshot.chunk_ids)} chunks")
+        return True
+
+    def _publish(self, snapshot: IndexSnapshot) -> IndexSnapshot:
+        """
+        Écrire un snapshot complet dans un répertoire temporaire puis le publier
+        Args:
+            snapshot (IndexSnapshot): Snapshot à écrire
+        Returns:
+            IndexSnapshot: Snapshot avec sa version et son répertoire
+        """
+        tmp_dir = self.snapshots.begin()
+        try:
+            self._write_files(tmp_dir, snapshot)
+            return self._commit(tmp_dir, snapshot)
+        except Exception:
+            self.snapshots.abort(tmp_dir)
+            raise
+
+    def _commit(self, tmp_dir: str, snapshot: IndexSnapshot) -> IndexSnapshot:
+        """
+        Publier un répertoire temporaire écrit pour un snapshot
+        """
+        version = self.snapshots.commit(tmp_dir)
+        return snapshot.replace(version=version, path=self.snapshots.path(version))
+
+    def document_rows(self, doc_ids: Iterable[str], snapshot: Optional[IndexSnapshot] = None) -> List[int]:
+        """
+        Lignes vivantes des chunks de documents
+        Args:
+            doc_ids (Iterable[str]): IDs des documents
+            snapshot (IndexSnapshot): Snapshot consulté (courant par défaut)
+        Returns:
+            List[int]: Positions des lignes
+        """
+        snapshot = snapshot or self.snapshot
+        doc_ids = set(doc_ids)
+        deleted = snapshot.deleted
+        if hasattr(snapshot.chunk_ids, "document_rows"):
+            # Identifiants binaires (PackedChunkIds, ChunkIdSegments): comparaison vectorisée
+            rows = snapshot.chunk_ids.document_rows(doc_ids)
+            if deleted is not None:
+                rows = rows[~deleted[rows]]
+            return rows.tolist()
+        rows = []
+        for row, row_id in enumerate(snapshot.chunk_ids):
+            if deleted is not None and deleted[row]:
+                continue
+            try:
+                if parse_chunk_id(row_id)[0] in doc_ids:
+                    rows.append(row)
+            except ValueError:
+                continue
+        return rows
+
+    def delete_documents(self, doc_ids: Iterable[str]) -> int:
+        """
+        Supprimer les chunks de documents: les lignes sont marquées comme supprimées
+        (ignorées au scoring) jusqu'à la prochaine compaction
+        Args:
+            doc_ids (Iterable[str]): IDs des documents
+        Returns:
+            int: Nombre de lignes supprimées
+        """
+        with self._writing():
+            current = self.snapshot
+            rows = self.document_rows(doc_ids, current)
+            if not rows:
+                return 0
+            snapshot = current.replace(deleted=current.tombstone(rows))
+            if current.version == 0:
+                # Index non versionné: premier snapshot complet
+                self._swap(self._publish(snapshot))
+            else:
+                # Seul le masque change: les autres fichiers de la version courante sont repris tels quels
+                tmp_dir = self.snapshots.begin()
+                try:
+                    self.snapshots.link_files(current.path, tmp_dir, exclude=[TOMBSTONES_FILE])
+                    self._write_tombstones(tmp_dir, snapshot)
+                    self._swap(self._commit(tmp_dir, snapshot))
+                except Exception:
+                    self.snapshots.abort(tmp_dir)
+                    raise
+            logger.info(f"{len(rows)} lignes supprimées de l'index ({self.snapshot.dead_count} en attente de compaction)")
+            return len(rows)
+
+    def compact(self) -> bool:
+        """
+        Réécrire l'index sans les lignes supprimées (nouvelle version complète)
+        Returns:
+            bool: True si l'index a été compacté, False s'il n'y avait rien à retirer
+        """
+        with self._writing():
+            current = self.snapshot
+            if not current.dead_count:
+                return False
+            live = np.flatnonzero(~current.deleted)
+            self._swap(self._publish(self._compacted(current, live)))
+            logger.info(f"Index compacté: {current.dead_count} lignes retirées, {len(live)} conservées")
+            return True
+
+    def _compacted(self, current: IndexSnapshot, live: np.ndarray) -> IndexSnapshot:
+        """
+        Snapshot réduit aux lignes vivantes
+        Args:
+            current (IndexSnapshot): Snapshot courant
+            live (np.ndarray): Positions des lignes conservées
+        Returns:
+            IndexSnapshot: Snapshot sans lignes supprimées
+        """
+        catalog = ChunkCatalog()
+        if len(current.catalog) == len(current.chunk_ids):
+            catalog = ChunkCatalog(current.catalog.get(int(row)) for row in live)
+        quantized = current.quantized
+        if quantized is not None:
+            quantized = QuantizedVectors(np.asarray(quantized.codes[live]), quantized.dtype, quantized.scale, quantized.offset)
+        return current.replace(
+            doc_vectors=current.doc_vectors[live],
+            chunk_ids=[current.chunk_ids[row] for row in live],
+            catalog=catalog,
+            quantized=quantized,
+            deleted=None,
+            ann=None
+        )
+
+    @staticmethod
+    def _write_tombstones(directory: str, snapshot: IndexSnapshot) -> None:
+        """
+        Écrire le masque des lignes supprimées d'un snapshot (absent si aucune)
+        """
+        if snapshot.deleted is not None:
+            np.save(os.path.join(directory, TOMBSTONES_FILE), snapshot.deleted)
+
+    @staticmethod
+    def _read_tombstones(directory: str, size: int) -> Optional[np.ndarray]:
+        """
+        Lire le masque des lignes supprimées d'un snapshot
+        """
+        path = os.path.join(directory, TOMBSTONES_FILE)
+        if not os.path.exists(path):
+            return None
+        deleted = np.load(path).astype(bool)
+        if len(deleted) != size:
+            logger.warning("Masque des lignes supprimées non aligné sur l'index, ignoré")
+            return None
+        return deleted
+
+    @staticmethod
+    def _write_chunk_ids(directory: str, name: str, snapshot: IndexSnapshot) -> None:
+        """
+        Écrire les identifiants des lignes d'un snapshot (format binaire, sans pickle)
+        """
+        save_chunk_ids(os.path.join(directory, f"{name}_chunk_ids.idx"), snapshot.chunk_ids)
+
+    @staticmethod
+    def _read_chunk_ids(directory: str, name: str) -> Optional[List[str]]:
+        """
+        Lire les identifiants des lignes d'un snapshot (None s'ils sont absents).
+        Les index écrits avant le format binaire (liste picklée) restent lisibles;
+        ils sont convertis à la publication suivante.
+        """
+        path = os.path.join(directory, f"{name}_chunk_ids.idx")
+        if os.path.exists(path):
+            return load_chunk_ids(path)
+        legacy_path = os.path.join(directory, f"{name}_chunk_ids.pkl")
+        if not os.path.exists(legacy_path):
+            return None
+        logger.info(f"Lecture des identifiants au format pickle: {legacy_path}")
+        with open(legacy_path, "rb") as f:
+            return pickle.load(f)
+
+    def _load_embeddings(self) -> bool:
+        """
+        Charger la dernière version publiée, ou à défaut les fichiers d'un index non versionné
+        Returns:
+            bool: True si le chargement a réussi, False sinon
+        """
+        version = self.snapshots.current_version()
+        snapshot = None
+        if version:
+            snapshot = self._read_snapshot(self.snapshots.path(version), version)
+        if snapshot is None:
+            # Index antérieur aux snapshots: mêmes fichiers directement dans indices_dir
+            snapshot = self._read_snapshot(self.indices_dir, 0)
+        if snapshot is None:
+            return False
+        self._swap(snapshot)
+        return True
+
+    def _read_snapshot(self, directory: str, version: int) -> Optional[IndexSnapshot]:
+        raise NotImplementedError
+
+    def _write_files(self, directory: str, snapshot: IndexSnapshot) -> None:
+        raise NotImplementedError
+
+
+class TFIDFEmbeddings(SnapshotEmbeddings):
     """
     Classe pour créer et gérer des embeddings TF-IDF
     """
@@ -20,273 +338,1091 @@ class TFIDFEmbeddings:
             indices_dir (str): Répertoire de stockage des indices
         """
         self.indices_dir = indices_dir
-        self.vectorizer = TfidfVectorizer(
+        # Paramètres du vectoriseur; chaque entraînement en clone une copie pour son snapshot
+        self._vectorizer_template = TfidfVectorizer(
             lowercase=True,
             max_df=0.85,
             min_df=2,
             max_features=10000,
             ngram_range=(1, 2)
         )
-        self.doc_vectors = None
-        self.chunk_ids = []
         
         # Créer le répertoire d'indices s'il n'existe pas
         os.makedirs(indices_dir, exist_ok=True)
+        self._init_snapshots(indices_dir, "tfidf")
         
         # Essayer de charger les embeddings s'ils existent
         self._load_embeddings()
         
         logger.info(f"TFIDFEmbeddings initialisé, {len(self.chunk_ids)} embeddings chargés")
     
-    def fit(self, chunk_texts: List[str], chunk_ids: List[str]) -> None:
+    @property
+    def vectorizer(self) -> Optional[TfidfVectorizer]:
+        return self.snapshot.vectorizer
+    
+    def fit(self, chunk_texts: List[str], chunk_ids: List[str], chunks: Optional[List[Dict[str, Any]]] = None) -> None:
         """
         Entraîner le vectoriseur TF-IDF sur une liste de textes
         Args:
             chunk_texts (List[str]): Liste des textes
             chunk_ids (List[str]): Liste des identifiants de chunks
+            chunks (List[Dict[str, Any]]): Chunks alignés sur chunk_ids, pour le catalogue
         """
         try:
-            logger.info(f"Entraînement des embeddings TF-IDF sur {len(chunk_texts)} textes")
-            self.doc_vectors = self.vectorizer.fit_transform(chunk_texts)
-            self.chunk_ids = chunk_ids
-            logger.info(f"Forme des doc_vectors: {self.doc_vectors.shape}")
-            
-            # Sauvegarder les embeddings
-            self._save_embeddings()
+            with self._writing(refresh=False):
+                logger.info(f"Entraînement des embeddings TF-IDF sur {len(chunk_texts)} textes")
+                vectorizer = clone(self._vectorizer_template)
+                snapshot = IndexSnapshot(
+                    doc_vectors=vectorizer.fit_transform(chunk_texts),
+                    chunk_ids=list(chunk_ids),
+                    catalog=ChunkCatalog(chunks) if chunks is not None else ChunkCatalog(),
+                    vectorizer=vectorizer
+                )
+                logger.info(f"Forme des doc_vectors: {snapshot.doc_vectors.shape}")
+                
+                # Publier le snapshot sur disque, puis le rendre visible aux recherches
+                self._swap(self._publish(snapshot))
         except Exception as e:
             logger.error(f"Erreur lors de l'entraînement des embeddings TF-IDF: {e}")
             raise
     
-    def transform(self, text: str) -> np.ndarray:
+    def add_chunks(self, chunk_texts: List[str], chunk_ids: List[str], chunks: Optional[List[Dict[str, Any]]] = None,
+                   replace_documents: Optional[Iterable[str]] = None) -> None:
+        """
+        Ajouter des chunks à l'index.
+        Le vocabulaire et l'IDF dépendent de tout le corpus: le vectoriseur est réentraîné,
+        mais sur les textes du catalogue, sans relire les chunks depuis le disque.
+        Les lignes supprimées ne sont pas reprises (compaction au passage).
+        Args:
+            chunk_texts (List[str]): Textes des nouveaux chunks
+            chunk_ids (List[str]): Identifiants des nouveaux chunks
+            chunks (List[Dict[str, Any]]): Nouveaux chunks, pour le catalogue
+            replace_documents (Iterable[str]): IDs des documents remplacés par les nouveaux chunks
+        """
+        with self._writing():
+            current = self.snapshot
+            if current.doc_vectors is None or len(current.catalog) != len(current.chunk_ids):
+                # Pas d'index existant (ou catalogue incomplet): entraînement complet
+                if current.doc_vectors is not None:
+                    logger.warning("Catalogue non aligné sur l'index, réentraînement sur les nouveaux chunks uniquement")
+                self.fit(chunk_texts, chunk_ids, chunks)
+                return
+            
+            dead = set(self.document_rows(replace_documents, current)) if replace_documents else set()
+            if current.deleted is not None:
+                dead.update(np.flatnonzero(current.deleted).tolist())
+            kept = [row for row in range(len(current.chunk_ids)) if row not in dead]
+            kept_chunks = [current.catalog.get(row) for row in kept]
+            all_chunks = kept_chunks + list(chunks if chunks is not None else [])
+            all_texts = [chunk.get("text", "") for chunk in kept_chunks] + list(chunk_texts)
+            all_ids = [current.chunk_ids[row] for row in kept] + list(chunk_ids)
+            self.fit(all_texts, all_ids, all_chunks if chunks is not None else None)
+    
+    def transform(self, text: str, snapshot: Optional[IndexSnapshot] = None) -> np.ndarray:
         """
         Transformer un texte en vecteur TF-IDF
         Args:
             text (str): Texte à transformer
+            snapshot (IndexSnapshot): Snapshot dont le vocabulaire est utilisé (courant par défaut)
         Returns:
             np.ndarray: Vecteur TF-IDF du texte
         """
-        if self.vectorizer is None:
+        vectorizer = (snapshot or self.snapshot).vectorizer
+        if vectorizer is None:
             raise ValueError("Le vectoriseur TF-IDF n'a pas été entraîné")
         
-        return self.vectorizer.transform([text])
+        return vectorizer.transform([text])
     
-    def _save_embeddings(self) -> None:
+    def transform_many(self, texts: List[str], snapshot: Optional[IndexSnapshot] = None):
         """
-        Sauvegarder les embeddings
+        Transformer plusieurs textes en une seule passe
+        Args:
+            texts (List[str]): Textes à transformer
+            snapshot (IndexSnapshot): Snapshot dont le vocabulaire est utilisé (courant par défaut)
+        Returns:
+            Matrice TF-IDF creuse (une ligne par texte)
         """
-        try:
-            # Chemin du fichier d'embeddings
-            embeddings_path = os.path.join(self.indices_dir, "tfidf_embeddings.pkl")
-            
-            # Sauvegarder le vectoriseur
-            vectorizer_path = os.path.join(self.indices_dir, "tfidf_vectorizer.pkl")
-            
-            # Sauvegarder les vecteurs de documents
-            doc_vectors_path = os.path.join(self.indices_dir, "tfidf_doc_vectors.npz")
-            
-            # Sauvegarder les IDs des chunks
-            chunk_ids_path = os.path.join(self.indices_dir, "tfidf_chunk_ids.pkl")
-            
-            # Sauvegarder le vectoriseur
-            with open(vectorizer_path, "wb") as f:
-                pickle.dump(self.vectorizer, f)
-            
-            # Sauvegarder les vecteurs de documents
-            if isinstance(self.doc_vectors, np.ndarray):
-                np.savez_compressed(doc_vectors_path, vectors=self.doc_vectors)
-            else:
-                # Pour les matrices sparses de scipy
-                import scipy.sparse as sp
-                sp.save_npz(doc_vectors_path, self.doc_vectors)
-            
-            # Sauvegarder les IDs des chunks
-            with open(chunk_ids_path, "wb") as f:
-                pickle.dump(self.chunk_ids, f)
-            
-            logger.info(f"Embeddings TF-IDF sauvegardés dans {self.indices_dir}")
-        except Exception as e:
-            logger.error(f"Erreur lors de la sauvegarde des embeddings TF-IDF: {e}")
+        vectorizer = (snapshot or self.snapshot).vectorizer
+        if vectorizer is None:
+            raise ValueError("Le vectoriseur TF-IDF n'a pas été entraîné")
+        
+        return vectorizer.transform(texts)
     
-    def _load_embeddings(self) -> bool:
+    def _write_files(self, directory: str, snapshot: IndexSnapshot) -> None:
         """
-        Charger les embeddings
+        Écrire les fichiers d'un snapshot
+        Args:
+            directory (str): Répertoire du snapshot
+            snapshot (IndexSnapshot): Snapshot à écrire
+        """
+        doc_vectors_path = os.path.join(directory, "tfidf_doc_vectors.npz")
+        
+        # Sauvegarder le vectoriseur (vocabulaire trié et IDF)
+        save_tfidf_vectorizer(os.path.join(directory, "tfidf_vectorizer.idx"), snapshot.vectorizer)
+        
+        # Sauvegarder les vecteurs de documents
+        if isinstance(snapshot.doc_vectors, np.ndarray):
+            np.savez_compressed(doc_vectors_path, vectors=snapshot.doc_vectors)
+        else:
+            # Pour les matrices sparses de scipy
+            sp.save_npz(doc_vectors_path, snapshot.doc_vectors)
+        
+        # Sauvegarder les IDs des chunks
+        self._write_chunk_ids(directory, "tfidf", snapshot)
+        
+        # Sauvegarder le catalogue des chunks, aligné sur chunk_ids
+        snapshot.catalog.save(os.path.join(directory, "tfidf_catalog.jsonl"))
+        self._write_tombstones(directory, snapshot)
+        
+        logger.info(f"Embeddings TF-IDF sauvegardés dans {directory}")
+    
+    def _read_snapshot(self, directory: str, version: int) -> Optional[IndexSnapshot]:
+        """
+        Charger les embeddings d'un répertoire
+        Args:
+            directory (str): Répertoire du snapshot (ou indices_dir pour un index non versionné)
+            version (int): Version du snapshot
         Returns:
-            bool: True si le chargement a réussi, False sinon
+            Optional[IndexSnapshot]: Snapshot chargé, None en cas d'échec
         """
         try:
-            # Chemin du fichier d'embeddings
-            vectorizer_path = os.path.join(self.indices_dir, "tfidf_vectorizer.pkl")
-            doc_vectors_path = os.path.join(self.indices_dir, "tfidf_doc_vectors.npz")
-            chunk_ids_path = os.path.join(self.indices_dir, "tfidf_chunk_ids.pkl")
+            vectorizer_path = os.path.join(directory, "tfidf_vectorizer.idx")
+            legacy_vectorizer_path = os.path.join(directory, "tfidf_vectorizer.pkl")
+            doc_vectors_path = os.path.join(directory, "tfidf_doc_vectors.npz")
+            
+            # Charger les IDs des chunks
+            chunk_ids = self._read_chunk_ids(directory, "tfidf")
             
             # Vérifier si les fichiers existent
-            if not os.path.exists(vectorizer_path) or not os.path.exists(chunk_ids_path):
+            if chunk_ids is None or not (os.path.exists(vectorizer_path) or os.path.exists(legacy_vectorizer_path)):
                 logger.info("Fichiers d'embeddings TF-IDF non trouvés")
-                return False
+                return None
             
-            # Charger le vectoriseur
-            with open(vectorizer_path, "rb") as f:
-                self.vectorizer = pickle.load(f)
+            # Charger le vectoriseur (index antérieurs au format binaire: vectoriseur picklé)
+            if os.path.exists(vectorizer_path):
+                vectorizer = load_tfidf_vectorizer(vectorizer_path)
+            else:
+                logger.info(f"Lecture du vectoriseur au format pickle: {legacy_vectorizer_path}")
+                with open(legacy_vectorizer_path, "rb") as f:
+                    vectorizer = pickle.load(f)
             
             # Charger les vecteurs de documents
             try:
                 # D'abord essayer de charger comme une matrice sparse
-                import scipy.sparse as sp
-                self.doc_vectors = sp.load_npz(doc_vectors_path)
+                doc_vectors = sp.load_npz(doc_vectors_path)
             except:
                 # Ensuite essayer de charger comme un tableau numpy
                 try:
                     data = np.load(doc_vectors_path)
-                    self.doc_vectors = data["vectors"]
+                    doc_vectors = data["vectors"]
                 except:
                     logger.warning("Impossible de charger les vecteurs de documents")
-                    return False
+                    return None
             
-            # Charger les IDs des chunks
-            with open(chunk_ids_path, "rb") as f:
-                self.chunk_ids = pickle.load(f)
+            # Charger le catalogue des chunks (absent pour les anciens index)
+            catalog = ChunkCatalog.load(os.path.join(directory, "tfidf_catalog.jsonl")) or ChunkCatalog()
             
-            logger.info(f"Embeddings TF-IDF chargés: {len(self.chunk_ids)} chunks")
-            return True
+            logger.info(f"Embeddings TF-IDF chargés: {len(chunk_ids)} chunks (version {version})")
+            return IndexSnapshot(version, doc_vectors, chunk_ids, catalog, vectorizer=vectorizer, path=directory,
+                                 deleted=self._read_tombstones(directory, len(chunk_ids)))
         except Exception as e:
             logger.error(f"Erreur lors du chargement des embeddings TF-IDF: {e}")
-            return False
+            return None
 
 
-class SentenceTransformerEmbeddings:
+class HashingTFIDFEmbeddings(SnapshotEmbeddings):
+    """
+    Embeddings TF-IDF incrémentaux: les termes sont hachés (pas de vocabulaire à réentraîner)
+    et les fréquences documentaires cumulées. Un ajout ne transforme que les nouveaux chunks;
+    l'IDF n'est recalculé (repondération des lignes existantes, sans relire les textes) que
+    lorsque le corpus a grandi de reweight_ratio depuis le dernier calcul.
+    Sur disque, les vecteurs sont stockés en segments: un ajout écrit un nouveau segment et
+    reprend les précédents par liens physiques.
+    """
+    # Nombre de segments au-delà duquel les vecteurs sont réécrits en un seul fichier
+    max_segments = 32
+
+    def __init__(self, indices_dir: str = "./data/indices", n_features: int = 2 ** 18, reweight_ratio: float = 0.2):
+        """
+        Initialiser le gestionnaire d'embeddings TF-IDF incrémentaux
+        Args:
+            indices_dir (str): Répertoire de stockage des indices
+            n_features (int): Nombre de colonnes de hachage
+            reweight_ratio (float): Croissance relative du corpus au-delà de laquelle l'IDF est recalculé
+        """
+        self.indices_dir = indices_dir
+        self.n_features = n_features
+        self.reweight_ratio = reweight_ratio
+        
+        os.makedirs(indices_dir, exist_ok=True)
+        self._init_snapshots(indices_dir, "hashing")
+        self._load_embeddings()
+        
+        logger.info(f"HashingTFIDFEmbeddings initialisé, {len(self.chunk_ids)} embeddings chargés")
+    
+    @property
+    def vectorizer(self) -> Optional[HashingTfidf]:
+        return self.snapshot.vectorizer
+    
+    def fit(self, chunk_texts: List[str], chunk_ids: List[str], chunks: Optional[List[Dict[str, Any]]] = None) -> None:
+        """
+        Construire l'index sur une liste de textes
+        Args:
+            chunk_texts (List[str]): Liste des textes
+            chunk_ids (List[str]): Liste des identifiants de chunks
+            chunks (List[Dict[str, Any]]): Chunks alignés sur chunk_ids, pour le catalogue
+        """
+        try:
+            with self._writing(refresh=False):
+                logger.info(f"Construction de l'index TF-IDF haché sur {len(chunk_texts)} textes")
+                vectorizer = HashingTfidf(self.n_features, reweight_ratio=self.reweight_ratio)
+                # IDF initial à 1: la repondération donne directement les vecteurs TF-IDF
+                doc_vectors = vectorizer.reweight(vectorizer.partial_fit(chunk_texts))
+                snapshot = IndexSnapshot(
+                    doc_vectors=doc_vectors,
+                    chunk_ids=list(chunk_ids),
+                    catalog=ChunkCatalog(chunks) if chunks is not None else ChunkCatalog(),
+                    vectorizer=vectorizer
+                )
+                self._swap(self._publish(snapshot))
+        except Exception as e:
+            logger.error(f"Erreur lors de la construction de l'index TF-IDF haché: {e}")
+            raise
+    
+    def add_chunks(self, chunk_texts: List[str], chunk_ids: List[str], chunks: Optional[List[Dict[str, Any]]] = None,
+                   replace_documents: Optional[Iterable[str]] = None) -> None:
+        """
+        Ajouter des chunks à l'index sans toucher aux lignes existantes (sauf recalcul de l'IDF)
+        Args:
+            chunk_texts (List[str]): Textes des nouveaux chunks
+            chunk_ids (List[str]): Identifiants des nouveaux chunks
+            chunks (List[Dict[str, Any]]): Nouveaux chunks, pour le catalogue
+            replace_documents (Iterable[str]): IDs des documents remplacés: leurs lignes sont
+                marquées comme supprimées dans la même version que l'ajout
+        """
+        with self._writing():
+            current = self.snapshot
+            if current.doc_vectors is None or not current.chunk_ids:
+                self.fit(chunk_texts, chunk_ids, chunks)
+                return
+            
+            try:
+                # Le vectoriseur du snapshot courant peut servir à des recherches en cours: le copier
+                vectorizer = current.vectorizer.copy()
+                new_vectors = vectorizer.weigh(vectorizer.partial_fit(chunk_texts))
+                doc_vectors = sp.vstack([current.doc_vectors, new_vectors], format="csr")
+                reweighted = vectorizer.needs_reweight
+                if reweighted:
+                    doc_vectors = vectorizer.reweight(doc_vectors)
+                
+                # Le catalogue courant peut être lu par des recherches en cours: il est prolongé sans être modifié
+                append_catalog = chunks is not None and len(current.catalog) == len(current.chunk_ids)
+                catalog = current.catalog.extended(chunks) if append_catalog else current.catalog
+                replaced = self.document_rows(replace_documents, current) if replace_documents else []
+                snapshot = current.replace(
+                    doc_vectors=doc_vectors,
+                    chunk_ids=list(current.chunk_ids) + list(chunk_ids),
+                    catalog=catalog,
+                    vectorizer=vectorizer,
+                    deleted=current.tombstone(replaced, len(chunk_ids)) if replaced or current.deleted is not None else None
+                )
+                
+                segments = self._segments(current.path) if current.path else []
+                if reweighted or not segments or len(segments) >= self.max_segments:
+                    self._swap(self._publish(snapshot))
+                else:
+                    tmp_dir = self.snapshots.begin()
+                    try:
+                        self._append_segment(tmp_dir, current, snapshot, new_vectors, append_catalog)
+                        self._swap(self._commit(tmp_dir, snapshot))
+                    except Exception:
+                        self.snapshots.abort(tmp_dir)
+                        raise
+                logger.info(f"Index TF-IDF haché mis à jour, forme: {snapshot.doc_vectors.shape}")
+            except Exception as e:
+                logger.error(f"Erreur lors de l'ajout incrémental des embeddings TF-IDF hachés: {e}")
+                raise
+    
+    def transform(self, text: str, snapshot: Optional[IndexSnapshot] = None):
+        """
+        Transformer un texte en vecteur TF-IDF avec l'IDF du snapshot
+        Args:
+            text (str): Texte à transformer
+            snapshot (IndexSnapshot): Snapshot dont l'IDF est utilisé (courant par défaut)
+        Returns:
+            Vecteur TF-IDF creux du texte
+        """
+        return self.transform_many([text], snapshot=snapshot)
+    
+    def transform_many(self, texts: List[str], snapshot: Optional[IndexSnapshot] = None):
+        """
+        Transformer plusieurs textes en une seule passe
+        Args:
+            texts (List[str]): Textes à transformer
+            snapshot (IndexSnapshot): Snapshot dont l'IDF est utilisé (courant par défaut)
+        Returns:
+            Matrice TF-IDF creuse (une ligne par texte)
+        """
+        vectorizer = (snapshot or self.snapshot).vectorizer
+        if vectorizer is None:
+            raise ValueError("L'index TF-IDF haché n'a pas été construit")
+        
+        return vectorizer.transform(texts)
+    
+    def _compacted(self, current: IndexSnapshot, live: np.ndarray) -> IndexSnapshot:
+        """
+        Snapshot réduit aux lignes vivantes, fréquences documentaires et IDF recalculés
+        """
+        snapshot = super()._compacted(current, live)
+        vectorizer = current.vectorizer.copy()
+        vectorizer.rebuild_df(snapshot.doc_vectors)
+        return snapshot.replace(doc_vectors=vectorizer.reweight(snapshot.doc_vectors), vectorizer=vectorizer)
+    
+    @staticmethod
+    def _segments(directory: str) -> List[str]:
+        """
+        Fichiers des segments de vecteurs d'un snapshot, dans l'ordre des lignes
+        """
+        if not directory or not os.path.isdir(directory):
+            return []
+        return sorted(name for name in os.listdir(directory)
+                      if name.startswith("hashing_vectors_") and name.endswith(".npz"))
+    
+    def _write_metadata(self, directory: str, snapshot: IndexSnapshot) -> None:
+        """
+        Écrire le vectoriseur, les IDs des chunks et les tombstones d'un snapshot
+        """
+        snapshot.vectorizer.save(os.path.join(directory, "hashing_vectorizer.npz"))
+        self._write_chunk_ids(directory, "hashing", snapshot)
+        self._write_tombstones(directory, snapshot)
+    
+    def _write_files(self, directory: str, snapshot: IndexSnapshot) -> None:
+        """
+        Écrire les fichiers d'un snapshot (un seul segment de vecteurs)
+        Args:
+            directory (str): Répertoire du snapshot
+            snapshot (IndexSnapshot): Snapshot à écrire
+        """
+        sp.save_npz(os.path.join(directory, f"hashing_vectors_{0:09d}.npz"), snapshot.doc_vectors)
+        snapshot.catalog.save(os.path.join(directory, "hashing_catalog.jsonl"))
+        self._write_metadata(directory, snapshot)
+        logger.info(f"Embeddings TF-IDF hachés sauvegardés dans {directory}")
+    
+    def _append_segment(self, directory: str, current: IndexSnapshot, snapshot: IndexSnapshot,
+                        new_vectors, append_catalog: bool) -> None:
+        """
+        Écrire le snapshot d'un ajout sans recalcul de l'IDF: les segments publiés sont
+        repris par liens physiques et les nouvelles lignes forment un nouveau segment
+        Args:
+            directory (str): Répertoire du nouveau snapshot
+            current (IndexSnapshot): Snapshot courant
+            snapshot (IndexSnapshot): Nouveau snapshot
+            new_vectors: Vecteurs ajoutés
+            append_catalog (bool): Ajouter les nouvelles lignes du catalogue
+        """
+        self.snapshots.link_files(current.path, directory, exclude=[
+            "hashing_vectorizer.npz", "hashing_chunk_ids.idx", "hashing_chunk_ids.pkl", "hashing_catalog.jsonl", TOMBSTONES_FILE
+        ])
+        sp.save_npz(os.path.join(directory, f"hashing_vectors_{len(current.chunk_ids):09d}.npz"), new_vectors)
+        
+        catalog_path = os.path.join(directory, "hashing_catalog.jsonl")
+        if append_catalog and os.path.exists(os.path.join(current.path, "hashing_catalog.jsonl")):
+            shutil.copyfile(os.path.join(current.path, "hashing_catalog.jsonl"), catalog_path)
+            snapshot.catalog.save(catalog_path, start=len(current.chunk_ids))
+        else:
+            snapshot.catalog.save(catalog_path)
+        self._write_metadata(directory, snapshot)
+        logger.info(f"{new_vectors.shape[0]} embeddings TF-IDF hachés ajoutés dans {directory}")
+    
+    def _read_snapshot(self, directory: str, version: int) -> Optional[IndexSnapshot]:
+        """
+        Charger les embeddings d'un répertoire
+        Args:
+            directory (str): Répertoire du snapshot
+            version (int): Version du snapshot
+        Returns:
+            Optional[IndexSnapshot]: Snapshot chargé, None en cas d'échec
+        """
+        try:
+            vectorizer = HashingTfidf.load(os.path.join(directory, "hashing_vectorizer.npz"))
+            chunk_ids = self._read_chunk_ids(directory, "hashing")
+            segments = self._segments(directory)
+            if vectorizer is None or not segments or chunk_ids is None:
+                logger.info("Fichiers d'embeddings TF-IDF hachés non trouvés")
+                return None
+            
+            doc_vectors = sp.vstack([sp.load_npz(os.path.join(directory, name)) for name in segments], format="csr")
+            if doc_vectors.shape[0] != len(chunk_ids):
+                logger.warning("Segments de vecteurs non alignés sur les IDs des chunks")
+                return None
+            catalog = ChunkCatalog.load(os.path.join(directory, "hashing_catalog.jsonl")) or ChunkCatalog()
+            
+            logger.info(f"Embeddings TF-IDF hachés chargés: {len(chunk_ids)} chunks (version {version})")
+            return IndexSnapshot(version, doc_vectors, chunk_ids, catalog, vectorizer=vectorizer, path=directory,
+                                 deleted=self._read_tombstones(directory, len(chunk_ids)))
+        except Exception as e:
+            logger.error(f"Erreur lors du chargement des embeddings TF-IDF hachés: {e}")
+            return None
+
+
+class SentenceTransformerEmbeddings(SnapshotEmbeddings):
     """
     Classe pour créer et gérer des embeddings avec SentenceTransformers
     """
-    def __init__(self, model_name: str = "paraphrase-multilingual-MiniLM-L12-v2", indices_dir: str = "./data/indices"):
+    # Nombre de segments d'identifiants au-delà duquel ils sont réunis en un seul fichier
+    max_id_segments = 32
+    
+    def __init__(self, model_name: str = "paraphrase-multilingual-MiniLM-L12-v2", indices_dir: str = "./data/indices",
+                 vector_dtype: str = "float32", mmap: bool = True, rescore: bool = True,
+                 query_cache_size: int = 1024, query_cache_ttl: Optional[float] = None,
+                 query_cache_path: Optional[str] = None, embedding_cache: bool = True,
+                 encode_batch_size: int = 64, encode_workers: int = 0, encode_job_threshold: int = 4096,
+                 preload: bool = True, ann_index: bool = False, ann_lists: Optional[int] = None,
+                 query_wait_timeout: float = 10.0):
         """
         Initialiser le gestionnaire d'embeddings SentenceTransformers
         Args:
             model_name (str): Nom du modèle SentenceTransformer à utiliser
             indices_dir (str): Répertoire de stockage des indices
+            vector_dtype (str): Stockage de scoring: "float32", "float16" ou "int8" (quantification par dimension)
+            mmap (bool): Ouvrir les fichiers de vecteurs en mmap (partagés entre processus via le cache de pages)
+            rescore (bool): Rescorer en float32 les meilleurs candidats issus des vecteurs quantifiés
+            query_cache_size (int): Nombre d'embeddings de requêtes gardés en cache LRU (0 pour désactiver)
+            query_cache_ttl (float): Durée de vie des embeddings de requêtes en cache, en secondes
+            query_cache_path (str): Fichier SQLite d'un cache disque partagé entre processus (optionnel)
+            embedding_cache (bool): Conserver les embeddings des chunks par (modèle, empreinte du texte)
+                dans indices_dir/chunk_embeddings.db: seuls les textes nouveaux ou modifiés sont encodés
+            encode_batch_size (int): Nombre de textes par lot d'encodage
+            encode_workers (int): Processus d'encodage (une réplique du modèle chacun) pour les gros volumes
+                (0 pour encoder dans le processus courant)
+            encode_job_threshold (int): Nombre de textes à partir duquel l'encodage passe par un travail
+                par lots triés par longueur, écrit sur disque et reprenable après interruption
+            preload (bool): Charger et préchauffer le modèle en arrière-plan dès le démarrage
+                lorsqu'un index sauvegardé est chargé (sinon au premier besoin ou à la première
+                consultation de encoder_status); sans index, le chargement démarre toujours
+            ann_index (bool): Maintenir un index IVF (recherche approximative) avec chaque version publiée
+            ann_lists (int): Nombre de listes IVF (par défaut ~4*sqrt(n))
+            query_wait_timeout (float): Attente maximale du modèle pour encoder une requête, en secondes;
+                au-delà, EncoderNotReadyError signale que le service chauffe
         """
+        if vector_dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Type de vecteurs non supporté: {vector_dtype}")
         self.indices_dir = indices_dir
         self.model_name = model_name
-        self.model = None
-        self.doc_vectors = None
-        self.chunk_ids = []
+        self.vector_dtype = vector_dtype
+        self.mmap = mmap
+        self.rescore = rescore
+        self.query_cache = QueryEmbeddingCache(query_cache_size, query_cache_ttl, query_cache_path) if query_cache_size > 0 else None
+        if self.query_cache is not None:
+            # Ne pas servir les embeddings de requêtes produits par un autre modèle
+            self.query_cache.set_model(model_name)
+        self.embedding_cache = ChunkEmbeddingCache(os.path.join(indices_dir, "chunk_embeddings.db")) if embedding_cache else None
+        self.encode_batch_size = encode_batch_size
+        self.encode_workers = encode_workers
+        self.encode_job_threshold = encode_job_threshold
+        self.ann_index = ann_index
+        self.ann_lists = ann_lists
+        self.query_wait_timeout = query_wait_timeout
+        self.model_loader = EncoderLoader(partial(load_sentence_transformer, model_name))
+        self._fallback_lock = threading.Lock()
+        self._fallback_allowed = False
         
         # Créer le répertoire d'indices s'il n'existe pas
         os.makedirs(indices_dir, exist_ok=True)
+        self._init_snapshots(indices_dir, "st")
         
         # Essayer de charger les embeddings s'ils existent
         loaded = self._load_embeddings()
+        # Sans index sauvegardé, un échec du chargement du modèle bascule vers un index TF-IDF
+        # de secours, créé lorsque l'échec est constaté
+        self._fallback_allowed = not loaded
         
-        # Charger le modèle si nécessaire
         if not loaded:
-            try:
-                from sentence_transformers import SentenceTransformer
-                self.model = SentenceTransformer(model_name)
-                logger.info(f"Modèle SentenceTransformer {model_name} chargé")
-            except Exception as e:
-                logger.error(f"Erreur lors du chargement du modèle SentenceTransformer: {e}")
-                logger.warning("Fallback vers TF-IDF pour les embeddings")
-                # Créer un vectoriseur TF-IDF de secours
-                self.fallback_tfidf = TFIDFEmbeddings(indices_dir)
+            # Le démarrage n'attend pas le modèle: l'entraînement et les ajouts l'attendront
+            self.model_loader.start()
         else:
             logger.info(f"Embeddings SentenceTransformer chargés: {len(self.chunk_ids)} chunks")
+            if preload:
+                # Les recherches n'attendront pas le chargement du modèle au premier appel
+                self.model_loader.start()
     
-    def fit(self, chunk_texts: List[str], chunk_ids: List[str]) -> None:
+    @property
+    def model(self):
+        """
+        Modèle SentenceTransformer, None tant qu'il n'est pas chargé
+        """
+        return self.model_loader.model
+    
+    @model.setter
+    def model(self, model) -> None:
+        self.model_loader.set_model(model)
+    
+    @property
+    def ready(self) -> bool:
+        """
+        Les requêtes peuvent être encodées sans attendre (modèle prêt ou index de secours TF-IDF)
+        """
+        return self.model is not None or self._uses_fallback()
+    
+    def encoder_status(self) -> Dict[str, Any]:
+        """
+        État du chargement du modèle, pour signaler un service en cours de préchauffage
+        """
+        if self.model_loader.state == ENCODER_IDLE:
+            # Chargement différé (preload=False): la vérification de l'état le lance, sinon le
+            # service resterait signalé comme non prêt sans qu'aucune requête ne le déclenche
+            self.model_loader.start()
+        status = self.model_loader.status()
+        status["fallback"] = self._uses_fallback()
+        status["ready"] = self.ready
+        return status
+    
+    def _uses_fallback(self) -> bool:
+        """
+        Index de secours TF-IDF actif (modèle indisponible)
+        """
+        if self.model is not None:
+            return False
+        if not hasattr(self, "fallback_tfidf"):
+            if not self._fallback_allowed or self.model_loader.state != ENCODER_FAILED:
+                return False
+            with self._fallback_lock:
+                if not hasattr(self, "fallback_tfidf"):
+                    logger.warning("Fallback vers TF-IDF pour les embeddings")
+                    # Créer un vectoriseur TF-IDF de secours
+                    self.fallback_tfidf = TFIDFEmbeddings(self.indices_dir)
+        return True
+    
+    @property
+    def snapshot(self) -> IndexSnapshot:
+        if self._uses_fallback():
+            return self.fallback_tfidf.snapshot
+        return self._snapshot
+    
+    def _swap(self, snapshot: IndexSnapshot) -> None:
+        if self._uses_fallback():
+            self.fallback_tfidf._swap(snapshot)
+        else:
+            self._snapshot = snapshot
+    
+    def refresh(self, force: bool = False) -> bool:
+        if self._uses_fallback():
+            return self.fallback_tfidf.refresh(force)
+        return super().refresh(force)
+    
+    def delete_documents(self, doc_ids: Iterable[str]) -> int:
+        if self._uses_fallback():
+            return self.fallback_tfidf.delete_documents(doc_ids)
+        return super().delete_documents(doc_ids)
+    
+    def compact(self) -> bool:
+        if self._uses_fallback():
+            return self.fallback_tfidf.compact()
+        return super().compact()
+    
+    def _publish(self, snapshot: IndexSnapshot) -> IndexSnapshot:
+        snapshot = super()._publish(self._with_ann(self._with_quantized(snapshot)))
+        if self.mmap:
+            # Libérer la matrice en mémoire au profit des fichiers partagés
+            snapshot = self._open_vectors(snapshot)
+        return snapshot
+    
+    def _with_quantized(self, snapshot: IndexSnapshot) -> IndexSnapshot:
+        """
+        Snapshot à écrire avec un stockage quantifié conforme à vector_dtype: la quantification
+        n'est faite qu'à l'écriture d'une version, jamais à la lecture d'une version publiée
+        Args:
+            snapshot (IndexSnapshot): Snapshot à écrire
+        Returns:
+            IndexSnapshot: Snapshot avec ses vecteurs quantifiés (ou sans, en float32)
+        """
+        quantized = snapshot.quantized
+        if self.vector_dtype == "float32":
+            return snapshot.replace(quantized=None) if quantized is not None else snapshot
+        if quantized is None or quantized.dtype != self.vector_dtype or len(quantized) != len(snapshot.doc_vectors):
+            logger.info(f"Quantification des embeddings en {self.vector_dtype}")
+            snapshot = snapshot.replace(quantized=QuantizedVectors.quantize(snapshot.doc_vectors, self.vector_dtype))
+        return snapshot
+    
+    def _with_ann(self, snapshot: IndexSnapshot) -> IndexSnapshot:
+        """
+        Snapshot à écrire avec son index IVF (mode approximatif): l'index de la version précédente
+        est prolongé des lignes ajoutées, ou reconstruit s'il est absent, désaligné ou entraîné sur
+        un corpus bien plus petit. L'index n'est jamais construit ni modifié par une recherche.
+        Args:
+            snapshot (IndexSnapshot): Snapshot à écrire
+        Returns:
+            IndexSnapshot: Snapshot avec son index IVF (ou sans, hors mode approximatif)
+        """
+        if not self.ann_index:
+            return snapshot.replace(ann=None) if snapshot.ann is not None else snapshot
+        ann, size = snapshot.ann, len(snapshot.doc_vectors)
+        if ann is not None and ann.size == size:
+            return snapshot
+        if ann is not None and ann.size < size and not ann.needs_rebuild(size):
+            ann = ann.extended(snapshot.doc_vectors[ann.size:])
+        else:
+            ann = IVFFlatIndex(n_lists=self.ann_lists)
+            ann.build(snapshot.doc_vectors)
+        return snapshot.replace(ann=ann)
+    
+    def _load_model(self, timeout: Optional[float] = None) -> bool:
+        """
+        Charger le modèle SentenceTransformer (ou attendre le chargement en arrière-plan)
+        Args:
+            timeout (float): Attente maximale en secondes (None pour attendre la fin du chargement)
+        Returns:
+            bool: True si le modèle est chargé, False sinon
+        """
+        return self.model_loader.wait(timeout) is not None
+    
+    def fit(self, chunk_texts: List[str], chunk_ids: List[str], chunks: Optional[List[Dict[str, Any]]] = None) -> None:
         """
         Générer les embeddings pour une liste de textes
         Args:
             chunk_texts (List[str]): Liste des textes
             chunk_ids (List[str]): Liste des identifiants de chunks
+            chunks (List[Dict[str, Any]]): Chunks alignés sur chunk_ids, pour le catalogue
         """
         try:
-            if self.model is None:
+            # Attendre le modèle s'il est encore en chargement
+            if not self._load_model():
                 logger.warning("Modèle SentenceTransformer non disponible, utilisation de TF-IDF")
                 # Utiliser TF-IDF comme fallback
-                if hasattr(self, "fallback_tfidf"):
-                    self.fallback_tfidf.fit(chunk_texts, chunk_ids)
-                    self.doc_vectors = self.fallback_tfidf.doc_vectors
-                    self.chunk_ids = self.fallback_tfidf.chunk_ids
+                if self._uses_fallback():
+                    self.fallback_tfidf.fit(chunk_texts, chunk_ids, chunks)
                 else:
                     raise ValueError("Modèle SentenceTransformer non disponible et fallback TF-IDF non initialisé")
                 return
             
-            logger.info(f"Génération des embeddings pour {len(chunk_texts)} textes")
-            
-            # Générer les embeddings
-            self.doc_vectors = self.model.encode(chunk_texts, show_progress_bar=True, convert_to_numpy=True)
-            self.chunk_ids = chunk_ids
-            
-            logger.info(f"Embeddings générés, forme: {self.doc_vectors.shape}")
-            
-            # Sauvegarder les embeddings
-            self._save_embeddings()
+            with self._writing(refresh=False):
+                logger.info(f"Génération des embeddings pour {len(chunk_texts)} textes")
+                
+                # Générer les embeddings (seuls les textes absents du cache sont encodés)
+                doc_vectors = self._encode_chunks(chunk_texts, show_progress_bar=True)
+                snapshot = IndexSnapshot(
+                    doc_vectors=doc_vectors,
+                    chunk_ids=list(chunk_ids),
+                    catalog=ChunkCatalog(chunks) if chunks is not None else ChunkCatalog(),
+                    quantized=QuantizedVectors.quantize(doc_vectors, self.vector_dtype) if self.vector_dtype != "float32" else None
+                )
+                
+                logger.info(f"Embeddings générés, forme: {doc_vectors.shape}")
+                
+                # Publier le snapshot sur disque, puis le rendre visible aux recherches
+                self._swap(self._publish(snapshot))
         except Exception as e:
             logger.error(f"Erreur lors de la génération des embeddings: {e}")
             raise
     
-    def transform(self, text: str) -> np.ndarray:
+    def add_chunks(self, chunk_texts: List[str], chunk_ids: List[str], chunks: Optional[List[Dict[str, Any]]] = None,
+                   replace_documents: Optional[Iterable[str]] = None) -> None:
+        """
+        Ajouter des chunks à l'index en n'encodant que les nouveaux textes.
+        Le nouveau snapshot reprend les fichiers de la version courante et y ajoute les
+        nouvelles lignes en fin de fichier, sans réencoder le corpus.
+        Args:
+            chunk_texts (List[str]): Textes des nouveaux chunks
+            chunk_ids (List[str]): Identifiants des nouveaux chunks
+            chunks (List[Dict[str, Any]]): Nouveaux chunks, pour le catalogue
+            replace_documents (Iterable[str]): IDs des documents remplacés: leurs lignes sont
+                marquées comme supprimées dans la même version que l'ajout
+        """
+        # Attendre le modèle s'il est encore en chargement (démarrage sans index)
+        if not self._load_model() and self._uses_fallback():
+            # Index de secours TF-IDF: déléguer l'ajout
+            self.fallback_tfidf.add_chunks(chunk_texts, chunk_ids, chunks, replace_documents)
+            return
+        
+        with self._writing():
+            current = self.snapshot
+            if current.doc_vectors is None or not current.chunk_ids:
+                self.fit(chunk_texts, chunk_ids, chunks)
+                return
+            
+            # Le modèle n'est pas chargé lorsque l'index a été restauré depuis le disque
+            if not self._load_model():
+                raise ValueError("Modèle SentenceTransformer non disponible pour encoder les nouveaux chunks")
+            
+            try:
+                logger.info(f"Ajout incrémental de {len(chunk_texts)} chunks à l'index ({len(current.chunk_ids)} existants)")
+                new_vectors = self._encode_chunks(chunk_texts)
+                new_codes = current.quantized.encode(new_vectors) if current.quantized is not None else None
+                # Version sans stockage quantifié (type de vecteurs changé): écriture complète, qui quantifie
+                requantize = self.vector_dtype != "float32" and current.quantized is None
+                
+                # Le catalogue et les identifiants courants peuvent être lus par des recherches en
+                # cours: ils sont prolongés sans être modifiés ni recopiés
+                append_catalog = chunks is not None and len(current.catalog) == len(current.chunk_ids)
+                catalog = current.catalog.extended(chunks) if append_catalog else current.catalog
+                replaced = self.document_rows(replace_documents, current) if replace_documents else []
+                snapshot = current.replace(
+                    chunk_ids=ChunkIdSegments.of(current.chunk_ids).appended(chunk_ids),
+                    catalog=catalog,
+                    deleted=current.tombstone(replaced, len(chunk_ids)) if replaced or current.deleted is not None else None
+                )
+                
+                tmp_dir = self.snapshots.begin()
+                try:
+                    written = None if requantize else self._append_embeddings(tmp_dir, current, snapshot, new_vectors,
+                                                                                new_codes, append_catalog)
+                    appended = written is not None
+                    if appended:
+                        snapshot = written
+                    else:
+                        # Repartir d'un répertoire vide: les fichiers liés sont partagés avec les versions publiées
+                        self.snapshots.abort(tmp_dir)
+                        tmp_dir = self.snapshots.begin()
+                    if not (appended and self.mmap):
+                        snapshot = snapshot.replace(
+                            doc_vectors=np.vstack([current.doc_vectors, new_vectors.astype(current.doc_vectors.dtype, copy=False)]),
+                            quantized=QuantizedVectors(np.vstack([current.quantized.codes, new_codes]), current.quantized.dtype,
+                                                       current.quantized.scale, current.quantized.offset)
+                            if current.quantized is not None else None
+                        )
+                    if not appended:
+                        snapshot = self._with_ann(self._with_quantized(snapshot))
+                        self._write_files(tmp_dir, snapshot)
+                    snapshot = self._commit(tmp_dir, snapshot)
+                except Exception:
+                    self.snapshots.abort(tmp_dir)
+                    raise
+                
+                if appended and self.mmap:
+                    # Ouvrir les fichiers agrandis en mmap plutôt que de copier la matrice en mémoire
+                    snapshot = self._open_vectors(snapshot)
+                self._swap(snapshot)
+                logger.info(f"Index mis à jour, forme: {snapshot.doc_vectors.shape}")
+            except Exception as e:
+                logger.error(f"Erreur lors de l'ajout incrémental des embeddings: {e}")
+                raise
+    
+    def _encode_chunks(self, chunk_texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+        """
+        Encoder des textes de chunks en passant par le cache des embeddings
+        Args:
+            chunk_texts (List[str]): Textes des chunks
+            show_progress_bar (bool): Afficher la progression de l'encodage
+        Returns:
+            np.ndarray: Embeddings, un par texte
+        """
+        def encode(texts: List[str]) -> np.ndarray:
+            if len(texts) >= self.encode_job_threshold:
+                return self._run_encoding_job(texts)
+            return self.model.encode(texts, batch_size=self.encode_batch_size, show_progress_bar=show_progress_bar,
+                                     convert_to_numpy=True)
+        
+        if self.embedding_cache is None:
+            return encode(chunk_texts)
+        return self.embedding_cache.encode(self.model_name, chunk_texts, encode)
+    
+    def _run_encoding_job(self, texts: List[str]) -> np.ndarray:
+        """
+        Encoder un gros volume de textes par un travail reprenable: relancé sur les mêmes
+        textes après une interruption, il repart des lots déjà écrits dans indices_dir/embedding_jobs
+        Args:
+            texts (List[str]): Textes à encoder
+        Returns:
+            np.ndarray: Embeddings, un par texte
+        """
+        runner = EmbeddingJobRunner(
+            encoder_factory=partial(load_sentence_transformer, self.model_name),
+            encoder=self.model,
+            batch_size=self.encode_batch_size,
+            workers=self.encode_workers
+        )
+        job_path = os.path.join(self.indices_dir, "embedding_jobs",
+                                f"{EmbeddingJobRunner.fingerprint(texts, self.model_name)}.npy")
+        vectors = np.array(runner.run(texts, job_path, self.model_name))
+        os.remove(job_path)
+        return vectors
+    
+    def _query_model(self):
+        """
+        Modèle d'encodage des requêtes; si l'index a été chargé depuis le disque, le modèle
+        est peut-être encore en chargement en arrière-plan: l'attendre au plus query_wait_timeout
+        """
+        model = self.model_loader.wait(self.query_wait_timeout)
+        if model is None:
+            if self.model_loader.state == ENCODER_FAILED:
+                raise ValueError("Modèle SentenceTransformer non disponible et fallback TF-IDF non initialisé")
+            raise EncoderNotReadyError(f"Modèle SentenceTransformer non prêt: {self.model_loader.state}")
+        return model
+    
+    def transform(self, text: str, snapshot: Optional[IndexSnapshot] = None) -> np.ndarray:
         """
         Transformer un texte en vecteur d'embedding
         Args:
             text (str): Texte à transformer
+            snapshot (IndexSnapshot): Snapshot interrogé (utile pour le vocabulaire du fallback TF-IDF)
         Returns:
             np.ndarray: Vecteur d'embedding du texte
         """
-        if self.model is None:
+        if self._uses_fallback():
             # Utiliser TF-IDF comme fallback
-            if hasattr(self, "fallback_tfidf"):
-                return self.fallback_tfidf.transform(text)
-            else:
-                raise ValueError("Modèle SentenceTransformer non disponible et fallback TF-IDF non initialisé")
+            return self.fallback_tfidf.transform(text, snapshot)
         
-        # Générer l'embedding
-        embedding = self.model.encode([text], convert_to_numpy=True)
+        if self.query_cache is None:
+            return self._query_model().encode([text], convert_to_numpy=True)
+        
+        # Les requêtes répétées évitent une passe complète du modèle (et son chargement)
+        embedding = self.query_cache.get(text)
+        if embedding is None:
+            embedding = self.query_cache.put(text, self._query_model().encode([text], convert_to_numpy=True))
         return embedding
     
-    def _save_embeddings(self) -> None:
+    def transform_many(self, texts: List[str], batch_size: int = 64, snapshot: Optional[IndexSnapshot] = None) -> np.ndarray:
         """
-        Sauvegarder les embeddings
+        Encoder plusieurs textes en un seul appel au modèle
+        Args:
+            texts (List[str]): Textes à encoder
+            batch_size (int): Taille des lots du modèle
+            snapshot (IndexSnapshot): Snapshot interrogé (utile pour le vocabulaire du fallback TF-IDF)
+        Returns:
+            np.ndarray: Embeddings (une ligne par texte)
+        """
+        if self._uses_fallback():
+            # Utiliser TF-IDF comme fallback
+            return self.fallback_tfidf.transform_many(texts, snapshot)
+        
+        if self.query_cache is None:
+            return self._query_model().encode(texts, batch_size=batch_size, convert_to_numpy=True)
+        
+        # N'encoder que les requêtes absentes du cache, en un seul appel
+        embeddings = [self.query_cache.get(text) for text in texts]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            encoded = self._query_model().encode([texts[i] for i in missing], batch_size=batch_size, convert_to_numpy=True)
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = self.query_cache.put(texts[i], embedding)
+        return np.vstack(embeddings)
+    
+    def _write_files(self, directory: str, snapshot: IndexSnapshot) -> None:
+        """
+        Écrire les fichiers d'un snapshot: matrices brutes (prolongées en place par les ajouts
+        suivants), un segment d'identifiants, le catalogue et la description de la version
+        Args:
+            directory (str): Répertoire du snapshot
+            snapshot (IndexSnapshot): Snapshot à écrire
+        """
+        doc_vectors = np.asarray(snapshot.doc_vectors, dtype=np.float32)
+        meta = {
+            "rows": len(doc_vectors),
+            "dim": int(doc_vectors.shape[1]) if doc_vectors.ndim == 2 else 0,
+            "vectors_bytes": write_rows(os.path.join(directory, ST_VECTORS_FILE), doc_vectors)
+        }
+        quantized = snapshot.quantized
+        if quantized is not None:
+            meta["codes_dtype"] = quantized.dtype
+            meta["codes_bytes"] = write_rows(self._codes_path(directory, quantized.dtype), quantized.codes)
+            if quantized.dtype == "int8":
+                save_npy_atomic(self._codes_params_path(directory), np.stack([quantized.scale, quantized.offset]))
+        
+        # Sauvegarder les IDs des chunks (un seul segment)
+        save_chunk_ids(os.path.join(directory, self._id_segment_name(0)), snapshot.chunk_ids)
+        
+        # Sauvegarder le catalogue des chunks, aligné sur chunk_ids
+        catalog_path = os.path.join(directory, "st_catalog.jsonl")
+        snapshot.catalog.save(catalog_path)
+        meta["catalog_rows"] = len(snapshot.catalog)
+        meta["catalog_bytes"] = os.path.getsize(catalog_path)
+        if snapshot.ann is not None:
+            snapshot.ann.save(directory, "st_ivf")
+        self._write_tombstones(directory, snapshot)
+        self._write_meta(directory, meta)
+        
+        logger.info(f"Embeddings SentenceTransformer sauvegardés dans {directory}")
+    
+    @staticmethod
+    def _codes_path(directory: str, dtype: str) -> str:
+        """
+        Chemin du fichier des vecteurs quantifiés
+        """
+        return os.path.join(directory, f"st_vectors.{dtype}")
+    
+    @staticmethod
+    def _codes_params_path(directory: str) -> str:
+        """
+        Chemin des paramètres de quantification int8 (fixés à l'écriture complète)
+        """
+        return os.path.join(directory, "st_vectors_int8_params.npy")
+    
+    @staticmethod
+    def _id_segment_name(start: int) -> str:
+        """
+        Nom du segment d'identifiants commençant à la ligne start
+        """
+        return f"st_chunk_ids_{start:09d}.idx"
+    
+    @staticmethod
+    def _id_segments(directory: str) -> List[str]:
+        """
+        Segments d'identifiants d'un snapshot, dans l'ordre des lignes
+        """
+        return sorted(name for name in os.listdir(directory)
+                      if name.startswith("st_chunk_ids_") and name.endswith(".idx"))
+    
+    @staticmethod
+    def _write_meta(directory: str, meta: Dict[str, Any]) -> None:
+        """
+        Écrire la description d'une version (nombre de lignes et tailles publiées des fichiers partagés)
+        """
+        with open(os.path.join(directory, ST_META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+    
+    @staticmethod
+    def _read_meta(directory: str) -> Optional[Dict[str, Any]]:
+        """
+        Lire la description d'une version (None pour un index au format .npy antérieur)
+        """
+        path = os.path.join(directory, ST_META_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    
+    def _append_embeddings(self, directory: str, current: IndexSnapshot, snapshot: IndexSnapshot, new_vectors: np.ndarray,
+                           new_codes: Optional[np.ndarray], append_catalog: bool) -> Optional[IndexSnapshot]:
+        """
+        Écrire le snapshot d'un ajout incrémental. Les fichiers de la version courante sont repris
+        par liens physiques; les nouvelles lignes sont ajoutées en fin des matrices et du catalogue,
+        au-delà des tailles publiées (les versions existantes n'en lisent que leur début), et les
+        identifiants ajoutés forment un nouveau segment.
+        Args:
+            directory (str): Répertoire du nouveau snapshot
+            current (IndexSnapshot): Snapshot courant
+            snapshot (IndexSnapshot): Nouveau snapshot (identifiants et catalogue)
+            new_vectors (np.ndarray): Vecteurs ajoutés
+            new_codes (np.ndarray): Codes quantifiés des vecteurs ajoutés (None en float32)
+            append_catalog (bool): Ajouter les nouvelles lignes du catalogue
+        Returns:
+            Optional[IndexSnapshot]: Snapshot écrit, None si une écriture complète est nécessaire
         """
         try:
-            # Chemin des fichiers
-            doc_vectors_path = os.path.join(self.indices_dir, "st_doc_vectors.npy")
-            chunk_ids_path = os.path.join(self.indices_dir, "st_chunk_ids.pkl")
+            meta = self._read_meta(current.path) if current.path else None
+            # Index au format antérieur, ou version dépassée: ses fichiers ne peuvent pas être prolongés
+            if meta is None or current.version != self.snapshots.current_version():
+                return None
+            if meta.get("codes_dtype") != (self.vector_dtype if new_codes is not None else None):
+                return None
+            ann = current.ann
+            if self.ann_index:
+                # Index IVF absent ou à réentraîner: écriture complète, qui le reconstruit
+                if ann is None or ann.size != len(current.chunk_ids) or ann.needs_rebuild(len(snapshot.chunk_ids)):
+                    return None
+                ann = ann.extended(new_vectors)
+            else:
+                ann = None
+            rewrite_ann = ann is None or len(ann.parts) <= len(current.ann.parts)
+            
+            segments = self._id_segments(current.path)
+            merge_ids = len(segments) >= self.max_id_segments
+            self.snapshots.link_files(current.path, directory, exclude=[ST_META_FILE, TOMBSTONES_FILE] +
+                                      (segments if merge_ids else []) +
+                                      (IVFFlatIndex.files(current.path, "st_ivf") if rewrite_ann else []))
+            
+            meta = dict(meta, rows=len(snapshot.chunk_ids))
+            meta["vectors_bytes"] = append_rows(os.path.join(directory, ST_VECTORS_FILE),
+                                                new_vectors.astype(np.float32, copy=False), meta["vectors_bytes"])
+            if new_codes is not None:
+                meta["codes_bytes"] = append_rows(self._codes_path(directory, self.vector_dtype), new_codes,
+                                                  meta["codes_bytes"])
             
-            # Sauvegarder les vecteurs de documents
-            np.save(doc_vectors_path, self.doc_vectors)
+            if merge_ids:
+                # Trop de segments: les identifiants sont réunis en un seul fichier
+                snapshot = snapshot.replace(chunk_ids=ChunkIdSegments((snapshot.chunk_ids.merged(),)))
+                save_chunk_ids(os.path.join(directory, self._id_segment_name(0)), snapshot.chunk_ids)
+            else:
+                save_chunk_ids(os.path.join(directory, self._id_segment_name(len(current.chunk_ids))),
+                               snapshot.chunk_ids.segments[-1])
+            
+            if ann is not None:
+                # Seule la partie des nouvelles lignes est écrite (toutes si les parties ont été fusionnées)
+                ann.save(directory, "st_ivf", first_part=0 if rewrite_ann else len(ann.parts) - 1)
+                snapshot = snapshot.replace(ann=ann)
             
-            # Sauvegarder les IDs des chunks
-            with open(chunk_ids_path, "wb") as f:
-                pickle.dump(self.chunk_ids, f)
+            if append_catalog:
+                data = np.frombuffer(snapshot.catalog.encode_rows(meta["catalog_rows"]), dtype=np.uint8)
+                meta["catalog_bytes"] = append_rows(os.path.join(directory, "st_catalog.jsonl"), data, meta["catalog_bytes"])
+                meta["catalog_rows"] = len(snapshot.catalog)
+            self._write_tombstones(directory, snapshot)
+            self._write_meta(directory, meta)
             
-            logger.info(f"Embeddings SentenceTransformer sauvegardés dans {self.indices_dir}")
+            logger.info(f"{len(new_vectors)} embeddings ajoutés dans {directory}")
+            return snapshot
         except Exception as e:
-            logger.error(f"Erreur lors de la sauvegarde des embeddings: {e}")
+            logger.error(f"Erreur lors de l'ajout des embeddings: {e}")
+            return None
     
-    def _load_embeddings(self) -> bool:
+    def _open_vectors(self, snapshot: IndexSnapshot) -> IndexSnapshot:
         """
-        Charger les embeddings
+        Ouvrir les fichiers de vecteurs (float32 et quantifiés) d'un snapshot, en mmap si configuré
+        Args:
+            snapshot (IndexSnapshot): Snapshot écrit sur disque
         Returns:
-            bool: True si le chargement a réussi, False sinon
+            IndexSnapshot: Snapshot dont les vecteurs pointent sur les fichiers
+        """
+        meta = self._read_meta(snapshot.path)
+        quantized = None
+        if meta is None:
+            # Format antérieur: fichiers .npy
+            doc_vectors = np.load(os.path.join(snapshot.path, "st_doc_vectors.npy"), mmap_mode="r" if self.mmap else None)
+            if self.vector_dtype != "float32":
+                quantized = QuantizedVectors.load(os.path.join(snapshot.path, f"st_doc_vectors_{self.vector_dtype}.npy"),
+                                                  self.vector_dtype, self.mmap)
+        else:
+            shape = (meta["rows"], meta["dim"])
+            doc_vectors = open_rows(os.path.join(snapshot.path, ST_VECTORS_FILE), "float32", shape, self.mmap)
+            if self.vector_dtype != "float32" and meta.get("codes_dtype") == self.vector_dtype:
+                codes = open_rows(self._codes_path(snapshot.path, self.vector_dtype), self.vector_dtype, shape, self.mmap)
+                scale = offset = None
+                if self.vector_dtype == "int8":
+                    scale, offset = np.load(self._codes_params_path(snapshot.path))
+                quantized = QuantizedVectors(codes, self.vector_dtype, scale, offset)
+        
+        if self.vector_dtype != "float32" and (quantized is None or len(quantized) != len(doc_vectors)):
+            # Une version publiée n'est jamais modifiée: recherche en float32 jusqu'à la
+            # prochaine écriture, qui produira le stockage quantifié
+            logger.warning(f"Vecteurs {self.vector_dtype} absents ou non alignés dans {snapshot.path}, recherche en float32")
+            quantized = None
+        return snapshot.replace(doc_vectors=doc_vectors, quantized=quantized)
+    
+    def _read_snapshot(self, directory: str, version: int) -> Optional[IndexSnapshot]:
+        """
+        Charger les embeddings d'un répertoire
+        Args:
+            directory (str): Répertoire du snapshot (ou indices_dir pour un index non versionné)
+            version (int): Version du snapshot
+        Returns:
+            Optional[IndexSnapshot]: Snapshot chargé, None en cas d'échec
         """
         try:
-            # Chemin des fichiers
-            doc_vectors_path = os.path.join(self.indices_dir, "st_doc_vectors.npy")
-            chunk_ids_path = os.path.join(self.indices_dir, "st_chunk_ids.pkl")
-            
-            # Vérifier si les fichiers existent
-            if not os.path.exists(doc_vectors_path) or not os.path.exists(chunk_ids_path):
-                logger.info("Fichiers d'embeddings SentenceTransformer non trouvés")
-                return False
-            
-            # Charger les vecteurs de documents
-            self.doc_vectors = np.load(doc_vectors_path)
+            meta = self._read_meta(directory)
+            catalog_path = os.path.join(directory, "st_catalog.jsonl")
+            if meta is not None:
+                segments = self._id_segments(directory)
+                chunk_ids = ChunkIdSegments(tuple(load_chunk_ids(os.path.join(directory, name)) for name in segments))
+                if len(chunk_ids) != meta["rows"]:
+                    logger.warning("Segments d'identifiants non alignés sur les vecteurs")
+                    return None
+                # Le catalogue peut être partagé avec des versions plus récentes: n'en lire que les lignes de cette version
+                catalog = ChunkCatalog.load(catalog_path, limit=meta["catalog_rows"]) or ChunkCatalog()
+            else:
+                # Format antérieur (.npy, identifiants en un seul fichier)
+                chunk_ids = self._read_chunk_ids(directory, "st")
+                if not os.path.exists(os.path.join(directory, "st_doc_vectors.npy")) or chunk_ids is None:
+                    logger.info("Fichiers d'embeddings SentenceTransformer non trouvés")
+                    return None
+                # Charger le catalogue des chunks (absent pour les anciens index)
+                catalog = ChunkCatalog.load(catalog_path) or ChunkCatalog()
             
-            # Charger les IDs des chunks
-            with open(chunk_ids_path, "rb") as f:
-                self.chunk_ids = pickle.load(f)
+            # Ouvrir les vecteurs de documents (et leur version quantifiée), et l'index IVF de la version
+            ann = IVFFlatIndex.load(directory, len(chunk_ids), "st_ivf") if self.ann_index else None
+            snapshot = self._open_vectors(IndexSnapshot(version, chunk_ids=chunk_ids, catalog=catalog, path=directory,
+                                                        deleted=self._read_tombstones(directory, len(chunk_ids)), ann=ann))
             
-            logger.info(f"Embeddings SentenceTransformer chargés: {len(self.chunk_ids)} chunks")
-            return True
+            logger.info(f"Embeddings SentenceTransformer chargés: {len(chunk_ids)} chunks (version {version})")
+            return snapshot
         except Exception as e:
             logger.error(f"Erreur lors du chargement des embeddings: {e}")
-            return False
\ No newline at end of file
+            return None
@@ -0,0 +1,131 @@
+# app/vector_store/encoder_loader.py
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+# États du chargement de l'encodeur
+ENCODER_IDLE = "idle"
+ENCODER_LOADING = "loading"
+ENCODER_WARMING = "warming"
+ENCODER_READY = "ready"
+ENCODER_FAILED = "failed"
+
+
+class EncoderNotReadyError(RuntimeError):
+    """
+    L'encodeur des requêtes est encore en chargement ou en préchauffage
+    """
+
+
+class EncoderLoader:
+    """
+    Chargement d'un encodeur de requêtes dans un thread d'arrière-plan, suivi d'un encodage
+    de préchauffage (allocation des buffers, compilation des noyaux): le démarrage n'est pas
+    bloqué et la première requête ne paie pas le coût du chargement.
+    L'état ("loading", "warming", "ready", "failed") permet de signaler que le service chauffe.
+    """
+    def __init__(self, factory: Callable[[], Any], warmup_texts: Iterable[str] = ("warm-up",)):
+        """
+        Initialiser le chargeur
+        Args:
+            factory (Callable[[], Any]): Construction de l'encodeur (exposant encode)
+            warmup_texts (Iterable[str]): Textes encodés une fois après le chargement
+        """
+        self.factory = factory
+        self.warmup_texts = list(warmup_texts)
+        self.model = None
+        self.state = ENCODER_IDLE
+        self.error = None
+        self.load_seconds = None
+        self.warmup_seconds = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return self.model is not None
+
+    def start(self) -> None:
+        """
+        Lancer le chargement en arrière-plan (sans effet s'il est déjà lancé ou terminé)
+        """
+        with self._lock:
+            if self._thread is not None or self._done.is_set():
+                return
+            self.state = ENCODER_LOADING
+            self._thread = threading.Thread(target=self._run, name="encoder-loader", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        """
+        Charger puis préchauffer l'encodeur
+        """
+        try:
+            start = time.perf_counter()
+            model = self.factory()
+            self.load_seconds = time.perf_counter() - start
+            self.state = ENCODER_WARMING
+            start = time.perf_counter()
+            if self.warmup_texts:
+                model.encode(self.warmup_texts, convert_to_numpy=True)
+            self.warmup_seconds = time.perf_counter() - start
+            with self._lock:
+                # Un encodeur fourni entre-temps (set_model) est conservé
+                if self.model is None:
+                    self.model = model
+                self.state = ENCODER_READY
+            logger.info(f"Encodeur prêt (chargement {self.load_seconds:.1f} s, préchauffage {self.warmup_seconds:.2f} s)")
+        except Exception as e:
+            with self._lock:
+                self.error = str(e)
+                self.state = ENCODER_READY if self.model is not None else ENCODER_FAILED
+            logger.error(f"Erreur lors du chargement de l'encodeur: {e}")
+        finally:
+            self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """
+        Attendre la fin du chargement (lancé si nécessaire)
+        Args:
+            timeout (float): Attente maximale en secondes (None pour attendre la fin)
+        Returns:
+            L'encodeur, ou None s'il n'est pas prêt (chargement en cours ou échoué)
+        """
+        if self.model is not None:
+            return self.model
+        self.start()
+        self._done.wait(timeout)
+        return self.model
+
+    def set_model(self, model: Any) -> None:
+        """
+        Fournir directement un encodeur déjà chargé
+        """
+        with self._lock:
+            self.model = model
+            if model is not None:
+                self.state = ENCODER_READY
+                self.error = None
+            elif self._done.is_set() or self._thread is None:
+                self.state = ENCODER_IDLE
+                self._done.clear()
+                self._thread = None
+
+    def status(self) -> Dict[str, Any]:
+        """
+        État du chargement
+        Returns:
+            Dict[str, Any]: state, ready, erreur éventuelle et durées de chargement et de préchauffage
+        """
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "error": self.error,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds
+        }
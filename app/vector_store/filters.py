@@ -0,0 +1,89 @@
+# app/vector_store/filters.py
+import logging
+import threading
+from array import array
+from typing import Dict, Any, Optional, Tuple
+import numpy as np
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+# Champs de métadonnées indexés pour le filtrage (documents Banque Mondiale et chunks)
+FILTER_FIELDS = ("type", "id", "region", "indicator", "country", "doc_id", "filename")
+
+
+class MetadataIndex:
+    """
+    Listes de postings par champ de métadonnées: valeur -> lignes de l'index vectoriel.
+    Les lignes sont ajoutées dans l'ordre, donc chaque liste est triée; un filtre
+    se résout en unions (valeurs d'un même champ) et intersections (champs différents).
+    """
+    def __init__(self, fields: Tuple[str, ...] = FILTER_FIELDS):
+        """
+        Initialiser l'index de métadonnées
+        Args:
+            fields (Tuple[str, ...]): Champs indexés
+        """
+        self.fields = fields
+        self._postings: Dict[str, Dict[str, array]] = {field: {} for field in fields}
+        # Un index partagé entre versions du catalogue grandit pendant les recherches:
+        # les postings sont copiés sous verrou (un array exporté ne peut pas être agrandi)
+        self._lock = threading.Lock()
+
+    def add(self, position: int, metadata: Dict[str, Any]) -> None:
+        """
+        Indexer les métadonnées d'une ligne
+        Args:
+            position (int): Position de la ligne dans l'index vectoriel
+            metadata (Dict[str, Any]): Métadonnées du chunk
+        """
+        with self._lock:
+            for field in self.fields:
+                value = metadata.get(field)
+                if value is None:
+                    continue
+                postings = self._postings[field].get(str(value))
+                if postings is None:
+                    postings = self._postings[field][str(value)] = array("q")
+                postings.append(position)
+
+    def values(self, field: str) -> Dict[str, int]:
+        """
+        Valeurs connues d'un champ et nombre de lignes associées
+        Args:
+            field (str): Champ de métadonnées
+        Returns:
+            Dict[str, int]: Valeur -> nombre de lignes
+        """
+        return {value: len(postings) for value, postings in self._postings.get(field, {}).items()}
+
+    def rows(self, filters: Dict[str, Any]) -> np.ndarray:
+        """
+        Lignes correspondant à un filtre
+        Args:
+            filters (Dict[str, Any]): Champ -> valeur ou liste de valeurs acceptées
+                (ex: {"type": "country", "id": ["MAR", "TUN"]})
+        Returns:
+            np.ndarray: Positions triées des lignes correspondantes
+        """
+        result: Optional[np.ndarray] = None
+        for field, accepted in filters.items():
+            if field not in self._postings:
+                raise ValueError(f"Champ de filtre non indexé: {field}")
+            if isinstance(accepted, (list, tuple, set)):
+                values = accepted
+            else:
+                values = [accepted]
+
+            field_postings = self._postings[field]
+            with self._lock:
+                matches = [np.frombuffer(field_postings[str(value)], dtype=np.int64).copy()
+                           for value in values if str(value) in field_postings]
+            if not matches:
+                return np.empty(0, dtype=np.int64)
+            field_rows = matches[0] if len(matches) == 1 else np.unique(np.concatenate(matches))
+
+            result = field_rows if result is None else np.intersect1d(result, field_rows, assume_unique=True)
+            if len(result) == 0:
+                break
+        return result if result is not None else np.empty(0, dtype=np.int64)
@@ -0,0 +1,156 @@
+# app/vector_store/hashing.py
+import os
+import logging
+from typing import List, Optional
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+
+class HashingTfidf:
+    """
+    Vectoriseur TF-IDF incrémental. Les termes sont hachés vers un nombre fixe de colonnes
+    (aucun vocabulaire à entraîner) et les fréquences documentaires sont cumulées au fil
+    des ajouts. L'IDF utilisé pour pondérer est figé jusqu'au prochain recalcul, déclenché
+    lorsque le corpus a suffisamment grandi: un nouveau texte se transforme sans toucher
+    aux lignes existantes.
+    """
+    def __init__(self, n_features: int = 2 ** 18, ngram_range=(1, 2), reweight_ratio: float = 0.2):
+        """
+        Initialiser le vectoriseur
+        Args:
+            n_features (int): Nombre de colonnes de hachage
+            ngram_range (tuple): Taille des n-grammes
+            reweight_ratio (float): Croissance relative du corpus au-delà de laquelle l'IDF est recalculé
+        """
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self.reweight_ratio = reweight_ratio
+        self.hasher = HashingVectorizer(
+            n_features=n_features,
+            ngram_range=self.ngram_range,
+            lowercase=True,
+            alternate_sign=False,
+            norm=None,
+            dtype=np.float32
+        )
+        self.df = np.zeros(n_features, dtype=np.int64)
+        self.n_docs = 0
+        self.idf = np.ones(n_features, dtype=np.float32)
+        self.weighted_docs = 0
+
+    def copy(self) -> "HashingTfidf":
+        """
+        Copier l'état (statistiques et IDF), le hachage étant sans état
+        """
+        clone = HashingTfidf.__new__(HashingTfidf)
+        clone.__dict__.update(self.__dict__)
+        clone.df = self.df.copy()
+        clone.idf = self.idf.copy()
+        return clone
+
+    def counts(self, texts: List[str]) -> sp.csr_matrix:
+        """
+        Fréquences brutes des termes hachés
+        """
+        return self.hasher.transform(texts).tocsr()
+
+    def partial_fit(self, texts: List[str]) -> sp.csr_matrix:
+        """
+        Cumuler les fréquences documentaires de nouveaux textes
+        Args:
+            texts (List[str]): Nouveaux textes
+        Returns:
+            sp.csr_matrix: Fréquences brutes des textes
+        """
+        counts = self.counts(texts)
+        self.df += np.bincount(counts.indices, minlength=self.n_features)
+        self.n_docs += counts.shape[0]
+        return counts
+
+    @property
+    def needs_reweight(self) -> bool:
+        """
+        Le corpus a assez grandi depuis le dernier calcul de l'IDF
+        """
+        return self.n_docs > (1.0 + self.reweight_ratio) * self.weighted_docs
+
+    def compute_idf(self) -> np.ndarray:
+        """
+        IDF lissé sur les statistiques courantes (même formule que TfidfVectorizer)
+        """
+        return (np.log((1.0 + self.n_docs) / (1.0 + self.df)) + 1.0).astype(np.float32)
+
+    def weigh(self, counts: sp.csr_matrix) -> sp.csr_matrix:
+        """
+        Pondérer des fréquences brutes par l'IDF courant et normaliser les lignes
+        """
+        return normalize(sp.csr_matrix(counts.multiply(self.idf[None, :]), dtype=np.float32))
+
+    def transform(self, texts: List[str]) -> sp.csr_matrix:
+        """
+        Vecteurs TF-IDF de textes, sans modifier les statistiques
+        """
+        return self.weigh(self.counts(texts))
+
+    def reweight(self, doc_vectors: sp.csr_matrix) -> sp.csr_matrix:
+        """
+        Recalculer l'IDF et repondérer des vecteurs pondérés avec l'ancien IDF.
+        Les lignes étant normalisées, le rapport des IDF suffit: les textes ne sont pas relus.
+        Args:
+            doc_vectors (sp.csr_matrix): Vecteurs pondérés avec l'IDF courant
+        Returns:
+            sp.csr_matrix: Vecteurs pondérés avec le nouvel IDF
+        """
+        idf = self.compute_idf()
+        ratio = idf / self.idf
+        self.idf = idf
+        self.weighted_docs = self.n_docs
+        logger.info(f"IDF recalculé sur {self.n_docs} documents")
+        return normalize(sp.csr_matrix(doc_vectors.multiply(ratio[None, :]), dtype=np.float32))
+
+    def rebuild_df(self, doc_vectors: sp.csr_matrix) -> None:
+        """
+        Recalculer les fréquences documentaires à partir des vecteurs (après compaction)
+        """
+        self.df = np.bincount(doc_vectors.indices, minlength=self.n_features).astype(np.int64)
+        self.n_docs = doc_vectors.shape[0]
+
+    def save(self, path: str) -> None:
+        """
+        Sauvegarder les statistiques et l'IDF au format .npz
+        Args:
+            path (str): Chemin du fichier
+        """
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                df=self.df,
+                idf=self.idf,
+                params=np.array([self.n_features, self.ngram_range[0], self.ngram_range[1], self.n_docs, self.weighted_docs], dtype=np.int64),
+                reweight_ratio=np.array(self.reweight_ratio, dtype=np.float64)
+            )
+
+    @classmethod
+    def load(cls, path: str) -> Optional["HashingTfidf"]:
+        """
+        Charger un vectoriseur sauvegardé
+        Args:
+            path (str): Chemin du fichier
+        Returns:
+            Optional[HashingTfidf]: Vectoriseur ou None s'il est absent
+        """
+        if not os.path.exists(path):
+            return None
+        data = np.load(path)
+        n_features, ngram_min, ngram_max, n_docs, weighted_docs = (int(x) for x in data["params"])
+        vectorizer = cls(n_features, (ngram_min, ngram_max), float(data["reweight_ratio"]))
+        vectorizer.df = data["df"].astype(np.int64)
+        vectorizer.idf = data["idf"].astype(np.float32)
+        vectorizer.n_docs = n_docs
+        vectorizer.weighted_docs = weighted_docs
+        return vectorizer
@@ -0,0 +1,156 @@
+# app/vector_store/hybrid.py
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+from .catalog import ChunkCatalog
+from .encoder_loader import EncoderNotReadyError
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+SUPPORTED_FUSIONS = ("rrf", "weighted")
+
+
+class HybridRetriever:
+    """
+    Recherche hybride: la branche dense (embeddings) et la branche creuse (BM25)
+    sont exécutées puis fusionnées par rang réciproque (RRF) ou par somme pondérée
+    des scores normalisés. Les deux branches s'exécutent en parallèle: la branche creuse
+    est soumise à un pool de threads pendant que la branche dense s'exécute dans le thread
+    de la requête, si bien qu'une requête n'occupe qu'un seul thread du pool.
+    """
+    def __init__(self, dense_search: Callable[..., List[Dict[str, Any]]],
+                 sparse_search: Callable[..., List[Dict[str, Any]]],
+                 fusion: str = "rrf", rrf_k: int = 60, dense_weight: float = 0.5,
+                 candidate_factor: int = 4, sparse_workers: int = 8):
+        """
+        Initialiser la recherche hybride
+        Args:
+            dense_search (Callable): Recherche dense (query, top_k=..., threshold=..., filters=...) -> chunks avec score
+            sparse_search (Callable): Recherche par mots-clés (query, top_k=..., filters=...) -> chunks avec score
+            fusion (str): "rrf" (rang réciproque) ou "weighted" (scores normalisés pondérés)
+            rrf_k (int): Constante de lissage du RRF
+            dense_weight (float): Poids de la branche dense en fusion pondérée
+            candidate_factor (int): Nombre de candidats demandés à chaque branche, en multiple de top_k
+            sparse_workers (int): Taille du pool de la branche creuse, soit le nombre de requêtes
+                dont les branches s'exécutent en parallèle
+        """
+        if fusion not in SUPPORTED_FUSIONS:
+            raise ValueError(f"Méthode de fusion non supportée: {fusion}")
+        self.dense_search = dense_search
+        self.sparse_search = sparse_search
+        self.fusion = fusion
+        self.rrf_k = rrf_k
+        self.dense_weight = dense_weight
+        self.candidate_factor = candidate_factor
+        self.sparse_workers = sparse_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """
+        Créer à la demande le pool de la branche creuse
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.sparse_workers,
+                                                    thread_name_prefix="hybrid-sparse")
+            return self._executor
+
+    @property
+    def last_timings(self) -> Dict[str, float]:
+        """
+        Décomposition de la latence (ms) de la dernière recherche du thread courant
+        """
+        return getattr(self._local, "timings", {})
+
+    @staticmethod
+    def _timed(search: Callable[..., List[Dict[str, Any]]], *args, **kwargs) -> Tuple[List[Dict[str, Any]], float]:
+        """
+        Exécuter une branche et mesurer sa durée
+        """
+        start = time.perf_counter()
+        try:
+            results = search(*args, **kwargs)
+        except EncoderNotReadyError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur dans une branche de la recherche hybride: {e}")
+            results = []
+        return results, (time.perf_counter() - start) * 1000
+
+    def search(self, query: str, top_k: int = 5, threshold: float = -0.1,
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Rechercher les chunks les plus pertinents en combinant les deux branches
+        Args:
+            query (str): Requête
+            top_k (int): Nombre de résultats
+            threshold (float): Seuil de similarité de la branche dense
+            filters (Dict[str, Any]): Filtre de métadonnées appliqué aux deux branches
+        Returns:
+            List[Dict[str, Any]]: Chunks avec leur score fusionné, même format que Retriever.search
+        """
+        start = time.perf_counter()
+        candidates = top_k * self.candidate_factor
+        sparse_future = self._get_executor().submit(self._timed, self.sparse_search, query,
+                                                    top_k=candidates, filters=filters)
+        dense_results, dense_ms = self._timed(self.dense_search, query,
+                                              top_k=candidates, threshold=threshold, filters=filters)
+        sparse_results, sparse_ms = sparse_future.result()
+
+        fusion_start = time.perf_counter()
+        results = self.fuse([dense_results, sparse_results], top_k)
+        end = time.perf_counter()
+
+        self._local.timings = {
+            "dense_ms": dense_ms,
+            "sparse_ms": sparse_ms,
+            "fusion_ms": (end - fusion_start) * 1000,
+            "total_ms": (end - start) * 1000
+        }
+        timings = self._local.timings
+        logger.info(f"Recherche hybride: dense {dense_ms:.1f} ms, creuse {sparse_ms:.1f} ms, "
+                    f"fusion {timings['fusion_ms']:.1f} ms, total {timings['total_ms']:.1f} ms")
+        return results
+
+    def fuse(self, branches: List[List[Dict[str, Any]]], top_k: int) -> List[Dict[str, Any]]:
+        """
+        Fusionner des listes de résultats classés
+        Args:
+            branches (List[List[Dict[str, Any]]]): Résultats de chaque branche (dense puis creuse)
+            top_k (int): Nombre de résultats
+        Returns:
+            List[Dict[str, Any]]: Chunks fusionnés par score décroissant
+        """
+        weights = [self.dense_weight, 1.0 - self.dense_weight]
+        fused: Dict[Tuple[str, int], float] = {}
+        chunks: Dict[Tuple[str, int], Dict[str, Any]] = {}
+
+        for branch, weight in zip(branches, weights):
+            if not branch:
+                continue
+            if self.fusion == "weighted":
+                # Normalisation min-max: les échelles cosinus et BM25 ne sont pas comparables
+                scores = [chunk.get("score", 0.0) for chunk in branch]
+                low, high = min(scores), max(scores)
+            for rank, chunk in enumerate(branch):
+                key = ChunkCatalog.key(chunk)
+                if self.fusion == "rrf":
+                    contribution = 1.0 / (self.rrf_k + rank + 1)
+                else:
+                    contribution = weight * ((chunk.get("score", 0.0) - low) / (high - low) if high > low else 1.0)
+                fused[key] = fused.get(key, 0.0) + contribution
+                chunks.setdefault(key, chunk)
+
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        results = []
+        for key, score in ranked:
+            chunk_with_score = chunks[key].copy()
+            chunk_with_score["score"] = float(score)
+            results.append(chunk_with_score)
+        return results
@@ -0,0 +1,389 @@
+# app/vector_store/index_format.py
+import os
+import json
+import uuid
+import zlib
+import struct
+import logging
+from collections.abc import Sequence
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from .catalog import make_chunk_id, parse_chunk_id
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+# Signature et version du format des fichiers d'index
+MAGIC = b"RAGIDX\x00\x00"
+FORMAT_VERSION = 1
+# Alignement des sections (permet de les ouvrir en mmap avec n'importe quel dtype)
+ALIGNMENT = 64
+# Signature, version et taille de l'en-tête JSON
+PREAMBLE = struct.Struct("<8sII")
+
+# Paramètres du TfidfVectorizer conservés dans l'en-tête (les autres gardent leur valeur par défaut)
+VECTORIZER_PARAMS = ("lowercase", "max_df", "min_df", "max_features", "ngram_range", "norm",
+                     "use_idf", "smooth_idf", "sublinear_tf", "analyzer", "token_pattern", "strip_accents")
+
+
+class IndexFormatError(ValueError):
+    """
+    Fichier d'index illisible: signature, version ou somme de contrôle invalide
+    """
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_index_file(path: str, sections: Dict[str, np.ndarray], meta: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Écrire un fichier d'index: en-tête (signature, version, description JSON des sections
+    avec leur somme de contrôle CRC32) puis sections binaires alignées.
+    L'écriture passe par un fichier temporaire renommé, pour ne jamais exposer un fichier partiel.
+    Args:
+        path (str): Chemin du fichier
+        sections (Dict[str, np.ndarray]): Tableaux à écrire (ordre C)
+        meta (Dict[str, Any]): Métadonnées sérialisables en JSON
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in sections.items()}
+    entries = {}
+    offset = 0
+    for name, array in arrays.items():
+        entries[name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+            "nbytes": array.nbytes,
+            "crc32": zlib.crc32(memoryview(array).cast("B")) if array.nbytes else 0
+        }
+        offset = _aligned(offset + array.nbytes)
+    header = json.dumps({"sections": entries, "meta": meta or {}}, ensure_ascii=False).encode("utf-8")
+    data_start = _aligned(PREAMBLE.size + len(header))
+
+    # Nom temporaire propre à chaque écrivain (processus et appel)
+    tmp_path = f"{path}.tmp-{os.getpid()}-{uuid.uuid4().hex[:12]}"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+            f.write(header)
+            for name, array in arrays.items():
+                f.seek(data_start + entries[name]["offset"])
+                f.write(memoryview(array).cast("B"))
+            f.truncate(data_start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_index_file(path: str, verify: bool = False) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    """
+    Ouvrir un fichier d'index: chaque section est un np.memmap en lecture seule
+    (partagé entre processus par le cache de pages), sans désérialisation.
+    Seuls l'en-tête et la taille du fichier sont contrôlés au chargement; les sommes de
+    contrôle obligent à lire toutes les sections et ne sont vérifiées qu'à la demande.
+    Args:
+        path (str): Chemin du fichier
+        verify (bool): Vérifier les sommes de contrôle des sections (maintenance, diagnostic)
+    Returns:
+        Tuple[Dict[str, np.ndarray], Dict[str, Any]]: Sections et métadonnées
+    """
+    with open(path, "rb") as f:
+        preamble = f.read(PREAMBLE.size)
+        if len(preamble) != PREAMBLE.size:
+            raise IndexFormatError(f"Fichier d'index tronqué: {path}")
+        magic, version, header_size = PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise IndexFormatError(f"Signature invalide: {path}")
+        if version != FORMAT_VERSION:
+            raise IndexFormatError(f"Version de format non supportée ({version}): {path}")
+        try:
+            header = json.loads(f.read(header_size).decode("utf-8"))
+        except ValueError as e:
+            raise IndexFormatError(f"En-tête illisible: {path}") from e
+    data_start = _aligned(PREAMBLE.size + header_size)
+    size = os.path.getsize(path)
+
+    sections = {}
+    for name, entry in header["sections"].items():
+        dtype = np.dtype(entry["dtype"])
+        shape = tuple(entry["shape"])
+        start = data_start + entry["offset"]
+        if start + entry["nbytes"] > size:
+            raise IndexFormatError(f"Section {name} tronquée: {path}")
+        if entry["nbytes"] == 0:
+            array = np.empty(shape, dtype=dtype)
+        else:
+            array = np.memmap(path, dtype=dtype, mode="r", offset=start, shape=shape)
+        if verify and entry["nbytes"] and zlib.crc32(memoryview(np.ascontiguousarray(array)).cast("B")) != entry["crc32"]:
+            raise IndexFormatError(f"Somme de contrôle invalide pour la section {name}: {path}")
+        sections[name] = array
+    return sections, header["meta"]
+
+
+def verify_index_file(path: str) -> None:
+    """
+    Vérifier l'intégrité d'un fichier d'index (lecture complète des sections)
+    Args:
+        path (str): Chemin du fichier
+    Raises:
+        IndexFormatError: Fichier illisible ou somme de contrôle invalide
+    """
+    read_index_file(path, verify=True)
+
+
+def pack_strings(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Table de chaînes: texte UTF-8 concaténé et tableau des positions (n + 1 valeurs)
+    """
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(data) for data in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def unpack_strings(offsets: np.ndarray, data: np.ndarray) -> List[str]:
+    """
+    Relire une table de chaînes
+    """
+    raw = data.tobytes()
+    bounds = offsets.tolist()
+    return [raw[start:end].decode("utf-8") for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _as_uuid(doc_id: str) -> Optional[bytes]:
+    """
+    Forme binaire (16 octets) d'un doc_id UUID canonique, None sinon
+    """
+    try:
+        value = uuid.UUID(doc_id)
+    except (ValueError, AttributeError, TypeError):
+        return None
+    return value.bytes if str(value) == doc_id else None
+
+
+class PackedChunkIds(Sequence):
+    """
+    Identifiants de lignes "<doc_id>_<chunk_id>" stockés en colonnes: doc_id en UUID binaire
+    (16 octets, ou table de chaînes s'ils ne sont pas tous des UUID) et numéro en int32.
+    Les identifiants sont reconstruits à la demande, sans liste Python en mémoire.
+    """
+    def __init__(self, chunk_numbers: np.ndarray, doc_uuids: Optional[np.ndarray] = None,
+                 doc_offsets: Optional[np.ndarray] = None, doc_data: Optional[np.ndarray] = None):
+        self.chunk_numbers = chunk_numbers
+        self.doc_uuids = doc_uuids
+        self.doc_offsets = doc_offsets
+        self.doc_data = doc_data
+
+    @classmethod
+    def pack(cls, chunk_ids: List[str]) -> "PackedChunkIds":
+        """
+        Empaqueter une liste d'identifiants
+        """
+        parsed = [parse_chunk_id(row_id) for row_id in chunk_ids]
+        chunk_numbers = np.array([chunk_id for _, chunk_id in parsed], dtype=np.int32)
+        uuids = [_as_uuid(doc_id) for doc_id, _ in parsed]
+        if all(value is not None for value in uuids):
+            doc_uuids = np.frombuffer(b"".join(uuids), dtype=np.uint8).reshape(len(uuids), 16)
+            return cls(chunk_numbers, doc_uuids=doc_uuids)
+        doc_offsets, doc_data = pack_strings([doc_id for doc_id, _ in parsed])
+        return cls(chunk_numbers, doc_offsets=doc_offsets, doc_data=doc_data)
+
+    def __len__(self) -> int:
+        return len(self.chunk_numbers)
+
+    def doc_id(self, row: int) -> str:
+        """
+        doc_id d'une ligne
+        """
+        if self.doc_uuids is not None:
+            return str(uuid.UUID(bytes=self.doc_uuids[row].tobytes()))
+        return self.doc_data[self.doc_offsets[row]:self.doc_offsets[row + 1]].tobytes().decode("utf-8")
+
+    def document_rows(self, doc_ids) -> np.ndarray:
+        """
+        Positions des lignes de documents (comparaison vectorisée des UUID binaires)
+        Args:
+            doc_ids (Iterable[str]): IDs des documents
+        Returns:
+            np.ndarray: Positions croissantes des lignes
+        """
+        doc_ids = set(doc_ids)
+        if self.doc_uuids is None:
+            return np.array([row for row in range(len(self)) if self.doc_id(row) in doc_ids], dtype=np.int64)
+        keys = np.ascontiguousarray(self.doc_uuids).view(np.dtype((np.void, 16))).ravel()
+        mask = np.zeros(len(self), dtype=bool)
+        for doc_id in doc_ids:
+            value = _as_uuid(doc_id)
+            if value is not None:
+                mask |= keys == np.void(value)
+        return np.flatnonzero(mask)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[row] for row in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Indice de ligne hors limites")
+        return make_chunk_id(self.doc_id(index), int(self.chunk_numbers[index]))
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def sections(self) -> Dict[str, np.ndarray]:
+        """
+        Sections du fichier d'index
+        """
+        if self.doc_uuids is not None:
+            return {"chunk_numbers": self.chunk_numbers, "doc_uuids": self.doc_uuids}
+        return {"chunk_numbers": self.chunk_numbers, "doc_offsets": self.doc_offsets, "doc_data": self.doc_data}
+
+
+class ChunkIdSegments(Sequence):
+    """
+    Identifiants de lignes répartis en segments (un par ajout), dans l'ordre des lignes.
+    Un ajout crée un nouveau segment sans recopier les précédents, qui restent partagés
+    avec le snapshot d'origine.
+    """
+    def __init__(self, segments: Tuple[PackedChunkIds, ...] = ()):
+        self.segments = tuple(segments)
+        self.starts = np.zeros(len(self.segments) + 1, dtype=np.int64)
+        np.cumsum([len(segment) for segment in self.segments], out=self.starts[1:])
+
+    @classmethod
+    def of(cls, chunk_ids: List[str]) -> "ChunkIdSegments":
+        """
+        Identifiants segmentés d'une liste quelconque (un seul segment si elle n'est pas déjà segmentée)
+        """
+        if isinstance(chunk_ids, ChunkIdSegments):
+            return chunk_ids
+        packed = chunk_ids if isinstance(chunk_ids, PackedChunkIds) else PackedChunkIds.pack(list(chunk_ids))
+        return cls((packed,))
+
+    def appended(self, chunk_ids: List[str]) -> "ChunkIdSegments":
+        """
+        Nouveaux identifiants prolongés d'un segment (self n'est pas modifié)
+        Args:
+            chunk_ids (List[str]): Identifiants des lignes ajoutées
+        Returns:
+            ChunkIdSegments: Identifiants prolongés
+        """
+        return ChunkIdSegments(self.segments + (PackedChunkIds.pack(list(chunk_ids)),))
+
+    def merged(self) -> PackedChunkIds:
+        """
+        Identifiants réunis en un seul segment (concaténation des colonnes)
+        """
+        if len(self.segments) == 1:
+            return self.segments[0]
+        chunk_numbers = np.concatenate([segment.chunk_numbers for segment in self.segments]) \
+            if self.segments else np.empty(0, dtype=np.int32)
+        if all(segment.doc_uuids is not None for segment in self.segments):
+            doc_uuids = np.vstack([segment.doc_uuids for segment in self.segments]) \
+                if self.segments else np.empty((0, 16), dtype=np.uint8)
+            return PackedChunkIds(chunk_numbers, doc_uuids=doc_uuids)
+        return PackedChunkIds.pack(list(self))
+
+    def __len__(self) -> int:
+        return int(self.starts[-1])
+
+    def document_rows(self, doc_ids) -> np.ndarray:
+        """
+        Positions des lignes de documents, segment par segment
+        """
+        doc_ids = set(doc_ids)
+        rows = [segment.document_rows(doc_ids) + start for segment, start in zip(self.segments, self.starts)]
+        return np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[row] for row in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Indice de ligne hors limites")
+        segment = int(np.searchsorted(self.starts, index, side="right")) - 1
+        return self.segments[segment][index - int(self.starts[segment])]
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+
+def save_chunk_ids(path: str, chunk_ids: List[str]) -> None:
+    """
+    Écrire les identifiants des lignes d'un index
+    Args:
+        path (str): Chemin du fichier
+        chunk_ids (List[str]): Identifiants "<doc_id>_<chunk_id>"
+    """
+    if isinstance(chunk_ids, ChunkIdSegments):
+        chunk_ids = chunk_ids.merged()
+    packed = chunk_ids if isinstance(chunk_ids, PackedChunkIds) else PackedChunkIds.pack(chunk_ids)
+    write_index_file(path, packed.sections(), {"kind": "chunk_ids", "count": len(packed)})
+
+
+def load_chunk_ids(path: str, verify: bool = False) -> PackedChunkIds:
+    """
+    Ouvrir les identifiants des lignes d'un index
+    Args:
+        path (str): Chemin du fichier
+        verify (bool): Vérifier les sommes de contrôle des sections
+    Returns:
+        PackedChunkIds: Identifiants (colonnes en mmap)
+    """
+    sections, meta = read_index_file(path, verify)
+    if meta.get("kind") != "chunk_ids":
+        raise IndexFormatError(f"Fichier d'identifiants attendu: {path}")
+    return PackedChunkIds(sections["chunk_numbers"], doc_uuids=sections.get("doc_uuids"),
+                          doc_offsets=sections.get("doc_offsets"), doc_data=sections.get("doc_data"))
+
+
+def save_tfidf_vectorizer(path: str, vectorizer: TfidfVectorizer) -> None:
+    """
+    Écrire un TfidfVectorizer entraîné: vocabulaire trié (table de chaînes), IDF en float32
+    et paramètres dans l'en-tête; stop_words_ (inutile à la transformation) n'est pas conservé
+    Args:
+        path (str): Chemin du fichier
+        vectorizer (TfidfVectorizer): Vectoriseur entraîné
+    """
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    offsets, data = pack_strings(terms)
+    params = vectorizer.get_params()
+    write_index_file(
+        path,
+        {"term_offsets": offsets, "term_data": data, "idf": np.asarray(vectorizer.idf_, dtype=np.float32)},
+        {"kind": "tfidf_vectorizer", "params": {name: params[name] for name in VECTORIZER_PARAMS}}
+    )
+
+
+def load_tfidf_vectorizer(path: str, verify: bool = False) -> TfidfVectorizer:
+    """
+    Reconstruire un TfidfVectorizer entraîné depuis son fichier d'index
+    Args:
+        path (str): Chemin du fichier
+        verify (bool): Vérifier les sommes de contrôle des sections
+    Returns:
+        TfidfVectorizer: Vectoriseur prêt pour transform()
+    """
+    sections, meta = read_index_file(path, verify)
+    if meta.get("kind") != "tfidf_vectorizer":
+        raise IndexFormatError(f"Fichier de vectoriseur attendu: {path}")
+    params = dict(meta["params"])
+    params["ngram_range"] = tuple(params["ngram_range"])
+    vectorizer = TfidfVectorizer(**params)
+    terms = unpack_strings(sections["term_offsets"], sections["term_data"])
+    vectorizer.vocabulary_ = dict(zip(terms, range(len(terms))))
+    vectorizer.fixed_vocabulary_ = False
+    vectorizer.idf_ = np.asarray(sections["idf"], dtype=np.float32)
+    return vectorizer
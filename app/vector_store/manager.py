@@ -1,9 +1,17 @@
-from typing import List, Dict, Any
-from .embeddings import TFIDFEmbeddings
+import os
+import threading
+from typing import List, Dict, Any, Callable, Iterable, Optional
+from .embeddings import TFIDFEmbeddings, HashingTFIDFEmbeddings
+from .hashing import HashingTfidf
 from .retriever import Retriever
+from .catalog import make_chunk_id
+from .bm25 import BM25Index
+from .snapshot import file_lock
+from .hybrid import HybridRetriever
+from .encoder_loader import EncoderNotReadyError
 import logging
 import importlib.util
-from sklearn.feature_extraction.text import TfidfVectorizer
+import scipy.sparse as sp
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 
@@ -17,23 +25,42 @@ SENTENCE_TRANSFORMERS_AVAILABLE = importlib.util.find_spec("sentence_transformer
 from .embeddings import TFIDFEmbeddings
 if SENTENCE_TRANSFORMERS_AVAILABLE:
     try:
-        from .sentence_embeddings import SentenceTransformerEmbeddings
+        from .embeddings import SentenceTransformerEmbeddings
     except ImportError:
-        logger.warning("Module sentence_embeddings non trouvé. Utilisation de TF-IDF.")
+        logger.warning("SentenceTransformerEmbeddings non disponible. Utilisation de TF-IDF.")
         SENTENCE_TRANSFORMERS_AVAILABLE = False
 
 class VectorStoreManager:
     """
     Classe pour gérer l'index vectoriel
     """
-    def __init__(self, indices_dir: str = "./data/indices", use_sentence_transformers: bool = True):
+    def __init__(self, indices_dir: str = "./data/indices", use_sentence_transformers: bool = True,
+                 search_mode: str = "exact", ann_nprobe: int = 8, vector_dtype: str = "float32",
+                 retrieval_mode: str = "dense", fusion: str = "rrf", compaction_threshold: float = 0.2,
+                 sparse_embeddings: str = "tfidf", mmr_lambda: Optional[float] = None):
         """
         Initialiser le gestionnaire d'index vectoriel
         Args:
             indices_dir (str): Répertoire de stockage des indices
             use_sentence_transformers (bool): Utiliser SentenceTransformers si disponible
+            search_mode (str): "exact" ou "approximate" (index IVF pour les embeddings denses)
+            ann_nprobe (int): Nombre de listes IVF explorées par requête en mode approximatif
+            vector_dtype (str): Stockage des embeddings denses: "float32", "float16" ou "int8"
+            retrieval_mode (str): "dense" (embeddings seuls) ou "hybrid" (embeddings + BM25 fusionnés)
+            fusion (str): Fusion de la recherche hybride: "rrf" ou "weighted"
+            compaction_threshold (float): Proportion de lignes supprimées au-delà de laquelle
+                l'index est compacté en arrière-plan
+            sparse_embeddings (str): Embeddings TF-IDF (sans SentenceTransformers): "tfidf"
+                (vectoriseur réentraîné à chaque ajout) ou "hashing" (ajout incrémental)
+            mmr_lambda (float): Compromis pertinence/diversité de la sélection MMR des résultats
+                denses (désactivée par défaut)
         """
+        if retrieval_mode not in ("dense", "hybrid"):
+            raise ValueError(f"Mode de recherche non supporté: {retrieval_mode}")
+        if sparse_embeddings not in ("tfidf", "hashing"):
+            raise ValueError(f"Embeddings TF-IDF non supportés: {sparse_embeddings}")
         self.indices_dir = indices_dir
+        self.sparse_embeddings = sparse_embeddings
         
         # Déterminer le type d'embeddings à utiliser
         self.use_transformers = use_sentence_transformers and SENTENCE_TRANSFORMERS_AVAILABLE
@@ -41,26 +68,112 @@ class VectorStoreManager:
         if self.use_transformers:
             try:
                 logger.info("Utilisation de SentenceTransformerEmbeddings")
-                self.embeddings = SentenceTransformerEmbeddings(indices_dir)
+                # En mode approximatif, l'index IVF est maintenu avec chaque version publiée
+                self.embeddings = SentenceTransformerEmbeddings(indices_dir=indices_dir, vector_dtype=vector_dtype,
+                                                                ann_index=search_mode == "approximate")
                 self.embeddings_type = "sentence_transformers"
             except Exception as e:
                 logger.error(f"Erreur lors de l'initialisation de SentenceTransformerEmbeddings: {e}")
-                logger.info("Fallback vers TFIDFEmbeddings")
-                self.embeddings = TFIDFEmbeddings(indices_dir)
-                self.embeddings_type = "tfidf"
+                logger.info("Fallback vers les embeddings TF-IDF")
+                self.embeddings = self._sparse_embeddings(indices_dir)
+                self.embeddings_type = sparse_embeddings
         else:
-            logger.info("Utilisation de TFIDFEmbeddings")
-            self.embeddings = TFIDFEmbeddings(indices_dir)
-            self.embeddings_type = "tfidf"
+            logger.info("Utilisation des embeddings TF-IDF")
+            self.embeddings = self._sparse_embeddings(indices_dir)
+            self.embeddings_type = sparse_embeddings
         
         # Initialiser le retriever
         from .retriever import Retriever
-        self.retriever = Retriever(self.embeddings)
+        self.retriever = Retriever(self.embeddings, search_mode=search_mode, nprobe=ann_nprobe, mmr_lambda=mmr_lambda)
+
+        # Index inversé BM25 pour la recherche par mots-clés
+        # (fichier de base et journal des mises à jour, écrivains sérialisés par un verrou)
+        self.keyword_index_path = os.path.join(indices_dir, "bm25_index.npz")
+        self.keyword_lock_path = os.path.join(indices_dir, "bm25_index.lock")
+        self._keyword_lock = threading.Lock()
+        self.keyword_index = BM25Index.load(self.keyword_index_path) or BM25Index()
+
+        # Compaction des lignes supprimées, en arrière-plan
+        self.compaction_threshold = compaction_threshold
+        self._compaction_thread = None
+
+        # Recherche hybride: branches dense et BM25 fusionnées
+        self.retrieval_mode = retrieval_mode
+        self.hybrid = HybridRetriever(self.retriever.search, self.keyword_search, fusion=fusion)
 
-        self.vectorizer = TfidfVectorizer()
+        # Documents ajoutés en mémoire (add_document): TF-IDF haché, sans réentraînement
+        self.vectorizer = HashingTfidf()
         self.documents = []
         self.vectors = None
 
+    def _sparse_embeddings(self, indices_dir: str):
+        """
+        Créer le gestionnaire d'embeddings TF-IDF configuré
+        """
+        if self.sparse_embeddings == "hashing":
+            return HashingTFIDFEmbeddings(indices_dir)
+        return TFIDFEmbeddings(indices_dir)
+
+    def encoder_status(self) -> Dict[str, Any]:
+        """
+        État de l'encodeur des requêtes: "ready", ou "loading"/"warming" pendant le chargement
+        du modèle en arrière-plan (les requêtes attendraient), "failed" en cas d'échec
+        """
+        status = getattr(self.embeddings, "encoder_status", None)
+        if status is None:
+            # Embeddings TF-IDF: aucun modèle à charger
+            return {"state": "ready", "ready": True}
+        return status()
+
+    @property
+    def index_version(self) -> int:
+        """
+        Version publiée de l'index, changée à chaque mise à jour, y compris par un autre
+        processus (invalidation des caches en aval)
+        """
+        return self.embeddings.snapshot.version
+
+    def _publish_keyword_index(self, index: BM25Index) -> None:
+        """
+        Sauvegarder un nouvel index BM25 complet puis le substituer à l'index courant
+        (les recherches en cours gardent l'ancien)
+        """
+        with self._keyword_lock, file_lock(self.keyword_lock_path):
+            index.save(self.keyword_index_path)
+            self.keyword_index = index
+
+    def _update_keyword_index(self, chunks: List[Dict[str, Any]], removed_documents: List[str]) -> None:
+        """
+        Mettre à jour l'index BM25 sur place et ajouter la mise à jour à son journal; le fichier
+        de base n'est réécrit que lorsque le journal dépasse sa taille (coût amorti)
+        """
+        with self._keyword_lock, file_lock(self.keyword_lock_path):
+            # Rejouer d'abord les mises à jour des autres processus: le journal garde l'ordre des écritures
+            self._refresh_keyword_index()
+            index = self.keyword_index
+            log_size = index.update(self.keyword_index_path, chunks, removed_documents)
+            try:
+                base_size = os.path.getsize(self.keyword_index_path)
+            except OSError:
+                base_size = 0
+            if log_size > base_size:
+                index.save(self.keyword_index_path)
+
+    def _refresh_keyword_index(self) -> None:
+        """
+        Appliquer les mises à jour du journal écrites par un autre processus, ou recharger
+        l'index BM25 si son fichier de base a été réécrit
+        """
+        index = self.keyword_index
+        stamp = BM25Index.stamp(self.keyword_index_path)
+        if stamp == index.base_stamp:
+            index.replay(self.keyword_index_path)
+            return
+        index = BM25Index.load(self.keyword_index_path)
+        if index is not None:
+            self.keyword_index = index
+            logger.info(f"Index BM25 rechargé: {len(index)} chunks")
+
     def create_index(self, chunks: List[Dict[str, Any]]) -> bool:
         """
         Créer un index à partir des chunks
@@ -71,17 +184,99 @@ class VectorStoreManager:
         """
         try:
             logger.info(f"Création d'un index avec {len(chunks)} chunks")
-            # Entraîner le vectoriseur sur les chunks
-            self.embeddings.fit(chunks)
+            chunk_texts = [chunk.get("text", chunk.get("content", "")) for chunk in chunks]
+            chunk_ids = [make_chunk_id(chunk["metadata"]["doc_id"], chunk["metadata"]["chunk_id"]) for chunk in chunks]
             
-            # Sauvegarder l'index
-            index_path = self.embeddings.save()
-            logger.info(f"Index créé et sauvegardé: {index_path}")
+            # Entraîner le vectoriseur sur les chunks (le catalogue est construit et sauvegardé avec l'index)
+            self.embeddings.fit(chunk_texts, chunk_ids, chunks)
+            keyword_index = BM25Index()
+            keyword_index.add_chunks(chunks)
+            self._publish_keyword_index(keyword_index)
+            logger.info(f"Index créé et sauvegardé dans {self.indices_dir}")
             return True
         except Exception as e:
             logger.error(f"Erreur lors de la création de l'index: {e}")
             return False
 
+    def add_chunks(self, chunks: List[Dict[str, Any]], replace_documents: Optional[List[str]] = None) -> bool:
+        """
+        Ajouter des chunks à l'index existant sans réencoder tout le corpus
+        Args:
+            chunks (List[Dict[str, Any]]): Nouveaux chunks
+            replace_documents (List[str]): IDs des documents remplacés par ces chunks (mise à jour):
+                leurs lignes sont supprimées dans la même version de l'index
+        Returns:
+            bool: True si ajoutés avec succès, False sinon
+        """
+        try:
+            if not chunks and not replace_documents:
+                return True
+            if not chunks:
+                return self.delete_documents(replace_documents) >= 0
+            logger.info(f"Ajout de {len(chunks)} chunks à l'index")
+            chunk_texts = [chunk.get("text", chunk.get("content", "")) for chunk in chunks]
+            chunk_ids = [make_chunk_id(chunk["metadata"]["doc_id"], chunk["metadata"]["chunk_id"]) for chunk in chunks]
+            self.embeddings.add_chunks(chunk_texts, chunk_ids, chunks, replace_documents)
+            self._update_keyword_index(chunks, replace_documents or [])
+            if replace_documents:
+                self.maybe_compact()
+            return True
+        except Exception as e:
+            logger.error(f"Erreur lors de l'ajout des chunks à l'index: {e}")
+            return False
+
+    def delete_documents(self, doc_ids: List[str]) -> int:
+        """
+        Supprimer les chunks de documents de l'index: les lignes sont ignorées
+        dès la version publiée, puis retirées par la compaction
+        Args:
+            doc_ids (List[str]): IDs des documents
+        Returns:
+            int: Nombre de lignes supprimées, -1 en cas d'erreur
+        """
+        try:
+            deleted = self.embeddings.delete_documents(doc_ids)
+            self._update_keyword_index([], doc_ids)
+            logger.info(f"{len(doc_ids)} documents supprimés de l'index ({deleted} lignes)")
+            self.maybe_compact()
+            return deleted
+        except Exception as e:
+            logger.error(f"Erreur lors de la suppression des documents de l'index: {e}")
+            return -1
+
+    def compact(self) -> bool:
+        """
+        Réécrire l'index sans les lignes supprimées
+        Returns:
+            bool: True si l'index a été compacté
+        """
+        try:
+            return self.embeddings.compact()
+        except Exception as e:
+            logger.error(f"Erreur lors de la compaction de l'index: {e}")
+            return False
+
+    def maybe_compact(self, background: bool = True) -> bool:
+        """
+        Lancer la compaction si la proportion de lignes supprimées dépasse le seuil.
+        Les recherches continuent sur le snapshot courant pendant la réécriture.
+        Args:
+            background (bool): Compacter dans un thread d'arrière-plan
+        Returns:
+            bool: True si une compaction a été lancée
+        """
+        snapshot = self.embeddings.snapshot
+        if not snapshot.chunk_ids or snapshot.dead_count <= self.compaction_threshold * len(snapshot.chunk_ids):
+            return False
+        if not background:
+            return self.compact()
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return False
+        logger.info(f"Compaction de l'index en arrière-plan ({snapshot.dead_count} lignes supprimées)")
+        self._compaction_thread = threading.Thread(target=self.compact, name="index-compaction", daemon=True)
+        self._compaction_thread.start()
+        return True
+
     def load_index(self) -> bool:
         """
         Charger l'index
@@ -89,14 +284,8 @@ class VectorStoreManager:
             bool: True si chargé avec succès, False sinon
         """
         try:
-            # Essayer de charger l'index approprié selon le type d'embeddings
-            if self.use_transformers:
-                success = self.embeddings.load("sentence_transformer_index")
-                if not success:
-                    logger.warning("Index SentenceTransformers non trouvé, tentative avec TF-IDF")
-                    success = self.embeddings.load()
-            else:
-                success = self.embeddings.load()
+            # Les embeddings chargent l'index sauvegardé à leur initialisation
+            success = getattr(self.embeddings, "doc_vectors", None) is not None and bool(self.embeddings.chunk_ids)
             
             if success:
                 logger.info("Index chargé avec succès")
@@ -108,20 +297,110 @@ class VectorStoreManager:
             logger.error(f"Erreur lors du chargement de l'index: {e}")
             return False
 
-    def search(self, query: str, top_k: int = 3) -> List[Dict]:
+    def ensure_catalog(self, load_chunks: Callable[[], List[Dict[str, Any]]]) -> bool:
+        """
+        S'assurer que le catalogue des chunks est aligné sur l'index chargé
+        Args:
+            load_chunks (Callable[[], List[Dict[str, Any]]]): Fonction chargeant tous les chunks,
+                appelée uniquement si le catalogue doit être reconstruit
+        Returns:
+            bool: True si le catalogue est aligné, False sinon
+        """
+        try:
+            snapshot = self.embeddings.snapshot
+            if len(snapshot.catalog) == len(snapshot.chunk_ids):
+                return True
+            return self.retriever._get_catalog(snapshot, load_chunks()) is not None
+        except Exception as e:
+            logger.error(f"Erreur lors de l'alignement du catalogue des chunks: {e}")
+            return False
+
+    def ensure_keyword_index(self, iter_chunks: Callable[[], Iterable[Dict[str, Any]]]) -> bool:
+        """
+        S'assurer que l'index BM25 couvre l'index chargé (reconstruction pour les anciens index)
+        Args:
+            iter_chunks (Callable[[], Iterable[Dict[str, Any]]]): Fonction parcourant tous les chunks,
+                appelée uniquement si l'index BM25 doit être reconstruit
+        Returns:
+            bool: True si l'index BM25 est aligné, False sinon
+        """
+        try:
+            snapshot = self.embeddings.snapshot
+            if len(self.keyword_index) == len(snapshot.chunk_ids) - snapshot.dead_count:
+                return True
+            logger.info("Reconstruction de l'index BM25")
+            keyword_index = BM25Index()
+            keyword_index.add_chunks(iter_chunks())
+            self._publish_keyword_index(keyword_index)
+            return True
+        except Exception as e:
+            logger.error(f"Erreur lors de la reconstruction de l'index BM25: {e}")
+            return False
+
+    def keyword_search(self, query: str, top_k: int = 3,
+                       get_chunk: Optional[Callable[[str, int], Optional[Dict[str, Any]]]] = None,
+                       filters: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """
+        Recherche par mots-clés (BM25) dans l'index inversé
+        
+        Args:
+            query: Requête de recherche
+            top_k: Nombre de résultats à retourner
+            get_chunk: Fonction (doc_id, chunk_id) -> chunk, utilisée si le chunk est absent du catalogue
+            filters: Filtre de métadonnées, champ -> valeur ou liste de valeurs
+            
+        Returns:
+            List[Dict]: Chunks avec leur score BM25
+        """
+        try:
+            self._refresh_keyword_index()
+            keyword_index = self.keyword_index
+            catalog = getattr(self.embeddings, "catalog", None)
+            candidates = None
+            if filters:
+                if catalog is None:
+                    logger.warning("Catalogue des chunks indisponible, filtre de métadonnées impossible")
+                    return []
+                candidates = [catalog.key(catalog.get(int(row))) for row in catalog.filter_rows(filters)]
+            
+            results = []
+            for (doc_id, chunk_id), score in keyword_index.search(query, top_k=top_k, candidates=candidates):
+                chunk = catalog.lookup(doc_id, chunk_id) if catalog is not None else None
+                if chunk is None and get_chunk is not None:
+                    chunk = get_chunk(doc_id, chunk_id)
+                if chunk is None:
+                    logger.warning(f"Chunk introuvable pour le résultat BM25 {make_chunk_id(doc_id, chunk_id)}")
+                    continue
+                chunk_with_score = chunk.copy()
+                chunk_with_score["score"] = score
+                results.append(chunk_with_score)
+            return results
+        except Exception as e:
+            logger.error(f"Erreur lors de la recherche par mots-clés: {e}")
+            return []
+
+    def search(self, query: str, top_k: int = 3, threshold: float = -0.1,
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict]:
         """
         Recherche les documents les plus pertinents
         
         Args:
             query: Requête de recherche
             top_k: Nombre de résultats à retourner
+            threshold: Seuil de similarité de la recherche dense
+            filters: Filtre de métadonnées (ex: {"type": "country", "id": "MAR"}),
+                appliqué avant le scoring
             
         Returns:
             List[Dict]: Liste des documents pertinents
         """
         try:
+            # Documents ajoutés en mémoire via add_document (RAGPipeline)
             if not self.documents:
-                return []
+                # Sinon, rechercher dans l'index persistant via le catalogue des chunks
+                if self.retrieval_mode == "hybrid":
+                    return self.hybrid.search(query, top_k=top_k, threshold=threshold, filters=filters)
+                return self.retriever.search(query, top_k=top_k, threshold=threshold, filters=filters)
             
             # Vectoriser la requête
             query_vector = self.vectorizer.transform([query])
@@ -138,10 +417,31 @@ class VectorStoreManager:
                 results.append(self.documents[idx])
             
             return results
+        except EncoderNotReadyError:
+            raise
         except Exception as e:
             logger.error(f"Erreur lors de la recherche: {e}")
             return []
 
+    def search_many(self, queries: List[str], top_k: int = 3) -> List[List[Dict]]:
+        """
+        Recherche par lot dans l'index persistant
+        
+        Args:
+            queries: Requêtes de recherche
+            top_k: Nombre de résultats par requête
+            
+        Returns:
+            List[List[Dict]]: Résultats de chaque requête
+        """
+        try:
+            return self.retriever.search_many(queries, top_k=top_k)
+        except EncoderNotReadyError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur lors de la recherche par lot: {e}")
+            return [[] for _ in queries]
+
     def add_document(self, content: str, metadata: Dict) -> None:
         """
         Ajoute un document au vector store
@@ -158,21 +458,23 @@ class VectorStoreManager:
             })
             
             # Mettre à jour les vecteurs
-            self._update_vectors()
+            self._update_vectors(content)
             
             logger.info(f"Document ajouté avec succès: {metadata.get('filename', 'Unknown')}")
         except Exception as e:
             logger.error(f"Erreur lors de l'ajout du document: {e}")
             raise
 
-    def _update_vectors(self) -> None:
-        """Met à jour les vecteurs TF-IDF"""
+    def _update_vectors(self, content: str) -> None:
+        """Ajoute le vecteur TF-IDF d'un nouveau document, sans revectoriser les précédents"""
         try:
-            # Extraire les contenus
-            contents = [doc['content'] for doc in self.documents]
+            # Vectoriser le nouveau document avec l'IDF courant
+            vector = self.vectorizer.weigh(self.vectorizer.partial_fit([content]))
+            self.vectors = vector if self.vectors is None else sp.vstack([self.vectors, vector], format="csr")
             
-            # Vectoriser les documents
-            self.vectors = self.vectorizer.fit_transform(contents)
+            # Recalculer l'IDF lorsque le corpus a suffisamment grandi
+            if self.vectorizer.needs_reweight:
+                self.vectors = self.vectorizer.reweight(self.vectors)
         except Exception as e:
             logger.error(f"Erreur lors de la mise à jour des vecteurs: {e}")
             raise
\ No newline at end of file
@@ -0,0 +1,240 @@
+# app/vector_store/quantization.py
+import os
+import uuid
+import logging
+from typing import Optional
+import numpy as np
+
+from .ann import normalize_rows
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+SUPPORTED_DTYPES = ("float32", "float16", "int8")
+
+
+class QuantizedVectors:
+    """
+    Vecteurs denses normalisés stockés en float16 ou en int8 (quantification scalaire
+    par dimension), scorés directement sur la représentation compacte.
+    Les fichiers .npy peuvent être ouverts en mmap et partagés entre processus.
+    """
+    def __init__(self, codes: np.ndarray, dtype: str, scale: Optional[np.ndarray] = None, offset: Optional[np.ndarray] = None):
+        """
+        Initialiser les vecteurs quantifiés
+        Args:
+            codes (np.ndarray): Représentation compacte (n, d)
+            dtype (str): "float32", "float16" ou "int8"
+            scale (np.ndarray): Pas de quantification par dimension (int8)
+            offset (np.ndarray): Décalage par dimension (int8)
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Type de vecteurs non supporté: {dtype}")
+        self.codes = codes
+        self.dtype = dtype
+        self.scale = scale
+        self.offset = offset
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @classmethod
+    def quantize(cls, vectors: np.ndarray, dtype: str) -> "QuantizedVectors":
+        """
+        Normaliser puis quantifier des vecteurs
+        Args:
+            vectors (np.ndarray): Vecteurs float (n, d)
+            dtype (str): Type cible
+        Returns:
+            QuantizedVectors: Vecteurs quantifiés
+        """
+        normalized = normalize_rows(vectors)
+        if dtype != "int8":
+            return cls(normalized.astype(dtype), dtype)
+
+        # Quantification par dimension sur [min, max] -> [-128, 127]
+        offset = normalized.min(axis=0)
+        scale = (normalized.max(axis=0) - offset) / 255.0
+        scale[scale == 0] = 1.0
+        quantized = cls(np.empty(normalized.shape, dtype=np.int8), dtype, scale.astype(np.float32), offset.astype(np.float32))
+        quantized.codes = quantized.encode(normalized)
+        return quantized
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Encoder de nouveaux vecteurs avec les paramètres existants (pour les ajouts incrémentaux)
+        Args:
+            vectors (np.ndarray): Vecteurs float (m, d)
+        Returns:
+            np.ndarray: Codes (m, d)
+        """
+        normalized = normalize_rows(vectors)
+        if self.dtype != "int8":
+            return normalized.astype(self.dtype)
+        codes = np.rint((normalized - self.offset) / self.scale) - 128
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def append(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Ajouter des vecteurs en mémoire
+        Args:
+            vectors (np.ndarray): Vecteurs float (m, d)
+        Returns:
+            np.ndarray: Codes ajoutés
+        """
+        codes = self.encode(vectors)
+        self.codes = np.vstack([self.codes, codes])
+        return codes
+
+    def scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None, block_size: int = 65536) -> np.ndarray:
+        """
+        Similarité cosinus approchée entre une requête et les vecteurs stockés,
+        calculée par blocs sur la représentation compacte
+        Args:
+            query (np.ndarray): Vecteur de requête (d,) ou (1, d)
+            rows (np.ndarray): Sous-ensemble de lignes à scorer (toutes par défaut)
+            block_size (int): Nombre de lignes converties en float32 à la fois
+        Returns:
+            np.ndarray: Scores (n,) ou (len(rows),)
+        """
+        query = normalize_rows(np.asarray(query).reshape(1, -1))[0]
+        codes = self.codes if rows is None else self.codes[rows]
+
+        if self.dtype == "int8":
+            # q·v = q·offset + Σ (q*scale)_d * (code_d + 128)
+            weights = query * self.scale
+            bias = float(query @ self.offset) + 128.0 * float(weights.sum())
+        else:
+            weights = query
+            bias = 0.0
+
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), block_size):
+            block = np.asarray(codes[start:start + block_size], dtype=np.float32)
+            scores[start:start + block_size] = block @ weights + bias
+        return scores
+
+    def save(self, path: str) -> None:
+        """
+        Sauvegarder les codes (et les paramètres int8) via un fichier temporaire
+        puis un renommage, pour ne pas tronquer un fichier ouvert en mmap
+        Args:
+            path (str): Chemin du fichier .npy des codes
+        """
+        save_npy_atomic(path, self.codes)
+        if self.dtype == "int8":
+            save_npy_atomic(self.params_path(path), np.stack([self.scale, self.offset]))
+
+    @staticmethod
+    def params_path(path: str) -> str:
+        """
+        Chemin du fichier des paramètres int8 associé à un fichier de codes
+        """
+        return path[:-len(".npy")] + "_params.npy"
+
+    @classmethod
+    def load(cls, path: str, dtype: str, mmap: bool = True) -> Optional["QuantizedVectors"]:
+        """
+        Charger des vecteurs quantifiés
+        Args:
+            path (str): Chemin du fichier .npy des codes
+            dtype (str): Type attendu
+            mmap (bool): Ouvrir les codes en mmap (lecture seule, partagés entre processus)
+        Returns:
+            Optional[QuantizedVectors]: Vecteurs quantifiés ou None si absents
+        """
+        if not os.path.exists(path):
+            return None
+        codes = np.load(path, mmap_mode="r" if mmap else None)
+        if codes.dtype != np.dtype(dtype):
+            logger.warning(f"Type des vecteurs quantifiés inattendu: {codes.dtype} au lieu de {dtype}")
+            return None
+        if dtype == "int8":
+            params_path = cls.params_path(path)
+            if not os.path.exists(params_path):
+                return None
+            scale, offset = np.load(params_path)
+            return cls(codes, dtype, scale, offset)
+        return cls(codes, dtype)
+
+
+def save_npy_atomic(path: str, array: np.ndarray) -> None:
+    """
+    Écrire un fichier .npy via un fichier temporaire puis un renommage atomique.
+    Les lecteurs qui ont ouvert l'ancien fichier en mmap continuent de le lire.
+    Args:
+        path (str): Chemin du fichier
+        array (np.ndarray): Tableau à sauvegarder
+    """
+    tmp_path = f"{path}.tmp-{os.getpid()}-{uuid.uuid4().hex[:12]}"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_rows(path: str, rows: np.ndarray) -> int:
+    """
+    Écrire une matrice brute (ordre C, sans en-tête) via un fichier temporaire puis un renommage.
+    La forme et le type sont conservés à part: le fichier peut ensuite être prolongé par append_rows.
+    Args:
+        path (str): Chemin du fichier
+        rows (np.ndarray): Matrice à écrire
+    Returns:
+        int: Taille du fichier en octets
+    """
+    data = np.ascontiguousarray(rows)
+    tmp_path = f"{path}.tmp-{os.getpid()}-{uuid.uuid4().hex[:12]}"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(memoryview(data).cast("B"))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return data.nbytes
+
+
+def append_rows(path: str, rows: np.ndarray, size: int) -> int:
+    """
+    Prolonger une matrice brute. Le fichier peut être partagé (lien physique) avec des
+    versions publiées: leurs octets ne sont pas modifiés, seules des lignes sont ajoutées
+    au-delà, que ces versions ne lisent pas. Les restes d'un ajout abandonné sont d'abord tronqués.
+    Args:
+        path (str): Chemin du fichier
+        rows (np.ndarray): Lignes à ajouter (même type et même largeur que le fichier)
+        size (int): Taille publiée du fichier, en octets
+    Returns:
+        int: Nouvelle taille du fichier en octets
+    """
+    data = np.ascontiguousarray(rows)
+    with open(path, "r+b") as f:
+        f.truncate(size)
+        f.seek(size)
+        f.write(memoryview(data).cast("B"))
+        f.flush()
+        os.fsync(f.fileno())
+    return size + data.nbytes
+
+
+def open_rows(path: str, dtype: str, shape: tuple, mmap: bool = True) -> np.ndarray:
+    """
+    Ouvrir les premières lignes d'une matrice brute
+    Args:
+        path (str): Chemin du fichier
+        dtype (str): Type des valeurs
+        shape (tuple): Forme (lignes, colonnes) de la version lue
+        mmap (bool): Ouvrir en mmap (lecture seule, partagé entre processus)
+    Returns:
+        np.ndarray: Matrice
+    """
+    if shape[0] == 0:
+        return np.empty(shape, dtype=dtype)
+    if mmap:
+        return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+    return np.fromfile(path, dtype=dtype, count=shape[0] * shape[1]).reshape(shape)
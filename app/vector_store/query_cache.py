@@ -0,0 +1,187 @@
+# app/vector_store/query_cache.py
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+import numpy as np
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    """
+    Normaliser le texte d'une requête pour le cache (Unicode NFC, espaces réduits).
+    La casse est conservée: les modèles SentenceTransformer multilingues y sont sensibles.
+    Args:
+        text (str): Texte de la requête
+    Returns:
+        str: Texte normalisé
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class QueryEmbeddingCache:
+    """
+    Cache LRU (avec TTL optionnel) des embeddings de requêtes: texte normalisé -> vecteur.
+    Un second niveau optionnel sur disque (SQLite) peut être partagé entre processus.
+    Les entrées sont associées au modèle qui les a produites et invalidées s'il change.
+    """
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None, disk_path: Optional[str] = None):
+        """
+        Initialiser le cache
+        Args:
+            max_size (int): Nombre maximum d'entrées en mémoire
+            ttl (float): Durée de vie des entrées en secondes (illimitée par défaut)
+            disk_path (str): Fichier SQLite du niveau disque partagé (désactivé par défaut)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.disk_path = disk_path
+        self.model_key = ""
+        self._entries: "OrderedDict[str, Tuple[np.ndarray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+
+        self._conn = None
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._conn = sqlite3.connect(disk_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS query_embeddings (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    dtype TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created REAL NOT NULL
+                )
+            """)
+            self._conn.commit()
+
+    def _key(self, text: str) -> str:
+        """
+        Clé d'une requête pour le modèle courant
+        """
+        return hashlib.sha1(f"{self.model_key}\0{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+    def set_model(self, model_key: str) -> None:
+        """
+        Associer le cache à un modèle; les entrées d'un autre modèle ne sont plus servies
+        (la clé inclut le modèle), mais restent sur disque pour les processus qui l'utilisent encore
+        Args:
+            model_key (str): Identifiant du modèle (ex: nom du modèle SentenceTransformer)
+        """
+        with self._lock:
+            if model_key == self.model_key:
+                return
+            self.model_key = model_key
+            self._entries.clear()
+        logger.info(f"Cache des embeddings de requêtes associé au modèle {model_key}")
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """
+        Récupérer l'embedding d'une requête
+        Args:
+            text (str): Texte de la requête
+        Returns:
+            Optional[np.ndarray]: Vecteur (lecture seule) ou None si absent
+        """
+        key = self._key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[1]):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+                self.evictions += 1
+
+            row = None
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT dtype, vector, created FROM query_embeddings WHERE key = ? AND model = ?",
+                    (key, self.model_key)
+                ).fetchone()
+            if row is None or self._expired(row[2]):
+                self.misses += 1
+                return None
+
+            vector = np.frombuffer(row[1], dtype=row[0]).reshape(1, -1)
+            self._insert(key, vector, row[2])
+            self.hits += 1
+            self.disk_hits += 1
+            return vector
+
+    def put(self, text: str, vector: np.ndarray) -> np.ndarray:
+        """
+        Mettre en cache l'embedding d'une requête
+        Args:
+            text (str): Texte de la requête
+            vector (np.ndarray): Embedding (d,) ou (1, d)
+        Returns:
+            np.ndarray: Vecteur mis en cache (1, d), en lecture seule
+        """
+        key = self._key(text)
+        vector = np.array(vector, dtype=np.float32).reshape(1, -1)
+        vector.setflags(write=False)
+        created = time.time()
+        with self._lock:
+            self._insert(key, vector, created)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO query_embeddings (key, model, dtype, vector, created) VALUES (?, ?, ?, ?, ?)",
+                    (key, self.model_key, vector.dtype.str, vector.tobytes(), created)
+                )
+                self._conn.commit()
+        return vector
+
+    def _insert(self, key: str, vector: np.ndarray, created: float) -> None:
+        """
+        Insérer une entrée en mémoire et évincer les moins récemment utilisées (verrou déjà pris)
+        """
+        self._entries[key] = (vector, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Vider le cache (mémoire et disque)
+        """
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM query_embeddings")
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Statistiques du cache
+        Returns:
+            Dict[str, Any]: hits, misses, evictions, taille et taux de succès
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_hits": self.disk_hits,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
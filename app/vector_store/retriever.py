@@ -1,8 +1,14 @@
 # app/vector_store/retriever.py
 import logging
 import numpy as np
-from typing import List, Dict, Any, Union, Tuple
-from sklearn.metrics.pairwise import cosine_similarity
+from typing import List, Dict, Any, Optional, Union, Tuple
+
+from .catalog import ChunkCatalog
+from .ann import IVFFlatIndex, normalize_rows
+from .scoring import ScoringEngine, FALLBACK_THRESHOLD
+from .snapshot import IndexSnapshot
+from .diversity import mmr_select
+from .encoder_loader import EncoderNotReadyError
 
 # Configurer le logging
 logger = logging.getLogger(__name__)
@@ -11,150 +17,406 @@ class Retriever:
     """
     Classe pour rechercher des documents par similarité
     """
-    def __init__(self, embeddings):
+    def __init__(self, embeddings, search_mode: str = "exact", nprobe: int = 8,
+                 mmr_lambda: Optional[float] = None, mmr_candidates: int = 4):
         """
         Initialiser le retriever
         Args:
             embeddings: Gestionnaire d'embeddings (TFIDFEmbeddings ou SentenceTransformerEmbeddings)
+            search_mode (str): "exact" (force brute) ou "approximate" (index IVF publié avec chaque
+                version des embeddings denses, voir SentenceTransformerEmbeddings(ann_index=True))
+            nprobe (int): Nombre de listes IVF explorées par requête en mode approximatif
+            mmr_lambda (float): Compromis pertinence/diversité de la sélection MMR des résultats
+                (désactivée par défaut; 1.0 = pertinence seule)
+            mmr_candidates (int): Nombre de candidats soumis à la MMR, en multiple de top_k
         """
+        if search_mode not in ("exact", "approximate"):
+            raise ValueError(f"Mode de recherche inconnu: {search_mode}")
         self.embeddings = embeddings
-        logger.info(f"Retriever initialisé avec {type(embeddings).__name__}")
+        self.search_mode = search_mode
+        self.nprobe = nprobe
+        self.mmr_lambda = mmr_lambda
+        self.mmr_candidates = mmr_candidates
+        self._engine = None
+        self._engine_source = None
+        logger.info(f"Retriever initialisé avec {type(embeddings).__name__}, mode {search_mode}")
 
-    def search(self, query: str, chunks: List[Dict[str, Any]], top_k: int = 5, threshold: float = -0.1) -> List[Dict[str, Any]]:
+    def search(self, query: str, chunks: Optional[List[Dict[str, Any]]] = None, top_k: int = 5, threshold: float = -0.1,
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
         Rechercher les chunks les plus pertinents pour une requête
         Args:
             query (str): Requête de recherche
-            chunks (List[Dict[str, Any]]): Liste des chunks
+            chunks (List[Dict[str, Any]]): Liste des chunks (optionnelle, uniquement utilisée pour
+                reconstruire le catalogue d'un index sauvegardé sans catalogue)
             top_k (int): Nombre de résultats à retourner
             threshold (float): Seuil de similarité minimum (peut être négatif pour être plus inclusif)
+            filters (Dict[str, Any]): Filtre de métadonnées, champ -> valeur ou liste de valeurs
+                (ex: {"type": "country", "id": "MAR"}); seuls les chunks correspondants sont scorés
         Returns:
             List[Dict[str, Any]]: Liste des chunks les plus pertinents avec leurs scores
         """
-        # Vérifier que les chunks ont le bon format
-        formatted_chunks = []
-        for chunk in chunks:
-            # S'assurer que chaque chunk a un champ 'text'
-            if 'text' not in chunk and 'content' in chunk:
-                chunk_copy = chunk.copy()
-                chunk_copy['text'] = chunk_copy['content']
-                formatted_chunks.append(chunk_copy)
-            else:
-                formatted_chunks.append(chunk)
-        
-        chunks = formatted_chunks
+        # Un seul snapshot pour toute la recherche: une mise à jour concurrente de l'index
+        # ne peut pas mélanger vecteurs, identifiants et catalogue de deux versions
+        snapshot = self._snapshot()
         
         # Vérifier si l'index est vide
-        if not hasattr(self.embeddings, "doc_vectors") or self.embeddings.doc_vectors is None:
+        if snapshot.doc_vectors is None:
             logger.warning("doc_vectors non disponible, impossible de rechercher")
             return []
         
         # Vérifier si chunk_ids est disponible
-        if not hasattr(self.embeddings, "chunk_ids") or not self.embeddings.chunk_ids:
+        if not snapshot.chunk_ids:
             logger.warning("chunk_ids non disponible, impossible de rechercher")
             return []
             
+        # Résoudre le filtre en lignes candidates avant tout scoring
+        rows = None
+        if filters:
+            catalog = self._get_catalog(snapshot, chunks)
+            if catalog is None:
+                return []
+            rows = catalog.filter_rows(filters)
+            if snapshot.deleted is not None:
+                # Les lignes supprimées restent dans l'index de métadonnées jusqu'à la compaction
+                rows = rows[~snapshot.deleted[rows]]
+            logger.info(f"Filtre {filters}: {len(rows)} chunks candidats")
+            if len(rows) == 0:
+                return []
+        
         # Transformer la requête en vecteur
         try:
-            query_vector = self.embeddings.transform(query)
+            query_vector = self.embeddings.transform(query, snapshot=snapshot)
+        except EncoderNotReadyError:
+            # Service en préchauffage: l'appelant le signale plutôt que de renvoyer zéro résultat
+            raise
         except Exception as e:
             logger.error(f"Erreur lors de la transformation de la requête: {e}")
             logger.error(f"Type d'erreur: {type(e)}")
             return []
         
-        # Calculer la similarité cosinus entre la requête et tous les documents
-        try:
-            similarities = cosine_similarity(query_vector, self.embeddings.doc_vectors).flatten()
-            logger.info(f"Similarités calculées, forme: {similarities.shape}")
-            logger.info(f"Min/Max similarité: {np.min(similarities):.4f}/{np.max(similarities):.4f}")
-        except Exception as e:
-            logger.error(f"Erreur lors du calcul des similarités: {e}")
-            logger.error(f"Type d'erreur: {type(e)}")
-            return []
+        # Avec la MMR, classer plus de candidats que top_k puis diversifier
+        fetch_k = top_k * self.mmr_candidates if self.mmr_lambda is not None else top_k
         
-        # Filtrer par seuil de similarité
-        above_threshold = similarities >= threshold
-        if not np.any(above_threshold):
-            logger.warning(f"Aucun résultat au-dessus du seuil de similarité {threshold}, essai avec un seuil plus bas")
-            threshold = -0.5  # Seuil encore plus bas
-            above_threshold = similarities >= threshold
-            
-            # Si toujours rien, prendre les meilleurs quand même
-            if not np.any(above_threshold):
-                logger.warning("Utilisation des meilleurs résultats malgré le seuil")
-                # Prendre les top_k meilleurs
-                top_indices = np.argsort(similarities)[-top_k:][::-1]
-                above_threshold = np.zeros_like(similarities, dtype=bool)
-                above_threshold[top_indices] = True
-        
-        # Trier les indices par similarité décroissante
-        filtered_indices = np.where(above_threshold)[0]
-        filtered_similarities = similarities[above_threshold]
-        top_indices_filtered = filtered_indices[np.argsort(filtered_similarities)[-top_k:][::-1]]
+        # Recherche approximative via l'index IVF si configurée
+        # (un sous-ensemble filtré est scoré directement, sans passer par l'index IVF)
+        ranked = None
+        if self.search_mode == "approximate" and rows is None:
+            ranked = self._approximate_rank(snapshot, query_vector, fetch_k, threshold)
+        
+        elif snapshot.quantized is not None:
+            ranked = self._quantized_rank(snapshot, query_vector, fetch_k, threshold, rows=rows)
+        
+        if ranked is None:
+            ranked = self._exact_rank(snapshot, query_vector, fetch_k, threshold, rows=rows)
+            if ranked is None:
+                return []
+        top_indices_filtered, top_scores = self._diversify(snapshot, query_vector, *ranked, top_k)
         
         logger.info(f"Nombre d'indices sélectionnés: {len(top_indices_filtered)}")
         
-        # Récupérer les chunks correspondants
-        results = []
-        for idx in top_indices_filtered:
-            try:
-                # Vérifier que l'indice est valide
-                if idx >= len(self.embeddings.chunk_ids):
-                    logger.warning(f"Indice {idx} hors limites pour chunk_ids (longueur: {len(self.embeddings.chunk_ids)})")
-                    continue
-                
-                # Récupérer l'ID du chunk
-                chunk_id = self.embeddings.chunk_ids[idx]
-                
-                # Extraire doc_id et chunk_id
-                try:
-                    parts = chunk_id.split('_')
-                    if len(parts) == 2:
-                        doc_id, chunk_idx_str = parts
-                        chunk_idx = int(chunk_idx_str)
-                    else:
-                        logger.warning(f"Format d'ID de chunk invalide (pas deux parties): {chunk_id}")
-                        continue
-                except Exception as e:
-                    logger.warning(f"Format d'ID de chunk invalide: {chunk_id}, erreur: {e}")
-                    continue
-                
-                # Chercher le chunk correspondant
-                found = False
-                for chunk in chunks:
-                    # Vérifier les métadonnées
-                    if "metadata" not in chunk:
-                        continue
-                        
-                    metadata = chunk.get("metadata", {})
-                    if not isinstance(metadata, dict):
-                        continue
-                    
-                    if metadata.get("doc_id") == doc_id and metadata.get("chunk_id") == chunk_idx:
-                        # Ajouter le score de similarité
-                        chunk_with_score = chunk.copy()
-                        chunk_with_score["score"] = float(similarities[idx])
-                        results.append(chunk_with_score)
-                        found = True
-                        break
-                
-                if not found:
-                    logger.warning(f"Chunk non trouvé pour doc_id={doc_id}, chunk_id={chunk_idx}")
-                    # Approche de secours: prendre le premier chunk avec le bon doc_id
-                    for chunk in chunks:
-                        if "metadata" in chunk and chunk["metadata"].get("doc_id") == doc_id:
-                            chunk_with_score = chunk.copy()
-                            chunk_with_score["score"] = float(similarities[idx])
-                            results.append(chunk_with_score)
-                            logger.info(f"Utilisé chunk de secours pour doc_id={doc_id}")
-                            break
-            except Exception as e:
-                logger.error(f"Erreur lors de la récupération du chunk à l'indice {idx}: {e}")
-                continue
+        # Récupérer les chunks correspondants via le catalogue (O(1) par résultat)
+        catalog = self._get_catalog(snapshot, chunks)
+        if catalog is None:
+            return []
+        
+        results = self._to_results(catalog, top_indices_filtered, top_scores)
         
         logger.info(f"Requête '{query[:50]}...' a retourné {len(results)} résultats")
         for i, result in enumerate(results):
             if i < 3:  # limiter à 3 logs pour éviter de polluer
                 logger.info(f"Résultat {i+1}: score={result['score']:.4f}, doc={result['metadata'].get('filename', 'inconnu')}")
         
-        return results
\ No newline at end of file
+        return results
+    
+    def search_many(self, queries: List[str], top_k: int = 5, threshold: float = -0.1, block_size: int = 256) -> List[List[Dict[str, Any]]]:
+        """
+        Rechercher les chunks pertinents pour plusieurs requêtes à la fois:
+        un seul encodage par lot, un produit matrice-matrice et un top-k par ligne
+        Args:
+            queries (List[str]): Requêtes de recherche
+            top_k (int): Nombre de résultats par requête
+            threshold (float): Seuil de similarité minimum
+            block_size (int): Nombre de requêtes scorées ensemble (borne la mémoire à block_size x n)
+        Returns:
+            List[List[Dict[str, Any]]]: Résultats de chaque requête, dans l'ordre des requêtes
+        """
+        if not queries:
+            return []
+        snapshot = self._snapshot()
+        if snapshot.doc_vectors is None or not snapshot.chunk_ids:
+            logger.warning("Index non disponible, impossible de rechercher")
+            return [[] for _ in queries]
+        
+        catalog = self._get_catalog(snapshot)
+        if catalog is None:
+            return [[] for _ in queries]
+        
+        # Encoder toutes les requêtes en un seul appel
+        try:
+            query_vectors = self.embeddings.transform_many(queries, snapshot=snapshot)
+        except EncoderNotReadyError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur lors de la transformation des requêtes: {e}")
+            return [[] for _ in queries]
+        
+        all_results = []
+        for start in range(0, len(queries), block_size):
+            block = query_vectors[start:start + block_size]
+            
+            fetch_k = top_k * self.mmr_candidates if self.mmr_lambda is not None else top_k
+            if self.search_mode == "approximate" and self._ann_index(snapshot) is not None:
+                # L'index IVF explore des listes différentes pour chaque requête
+                ranked_rows = [self._approximate_rank(snapshot, block[i], fetch_k, threshold) for i in range(block.shape[0])]
+            else:
+                try:
+                    ranked_rows = self._get_engine(snapshot).rank_many(block, fetch_k, threshold, exclude=snapshot.deleted)
+                except Exception as e:
+                    logger.error(f"Erreur lors du calcul des similarités: {e}")
+                    return [[] for _ in queries]
+            
+            for i, ranked in enumerate(ranked_rows):
+                if ranked is None:
+                    all_results.append([])
+                    continue
+                all_results.append(self._to_results(catalog, *self._diversify(snapshot, block[i], *ranked, top_k)))
+        
+        logger.info(f"{len(queries)} requêtes traitées par lot")
+        return all_results
+    
+    def _snapshot(self) -> IndexSnapshot:
+        """
+        Snapshot courant des embeddings, après prise en compte d'une version publiée
+        par un autre processus
+        Returns:
+            IndexSnapshot: Snapshot à utiliser pour toute la recherche
+        """
+        try:
+            self.embeddings.refresh()
+        except Exception as e:
+            logger.error(f"Erreur lors du rechargement de l'index: {e}")
+        return self.embeddings.snapshot
+    
+    def _diversify(self, snapshot: IndexSnapshot, query_vector, indices: np.ndarray, scores: np.ndarray,
+                   top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sélection MMR parmi les lignes classées (sans effet si la MMR est désactivée):
+        écarte les chunks quasi identiques, typiquement les voisins chevauchants d'un même document
+        Args:
+            snapshot (IndexSnapshot): Snapshot de la recherche
+            query_vector: Vecteur de la requête
+            indices (np.ndarray): Lignes classées par score décroissant
+            scores (np.ndarray): Scores associés
+            top_k (int): Nombre de lignes à retenir
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Lignes retenues et leurs scores
+        """
+        indices = np.asarray(indices)
+        scores = np.asarray(scores)
+        if self.mmr_lambda is None or len(indices) <= 1:
+            return indices[:top_k], scores[:top_k]
+        try:
+            selected = mmr_select(query_vector, snapshot.doc_vectors[indices], top_k, self.mmr_lambda, relevance=scores)
+        except Exception as e:
+            logger.error(f"Erreur lors de la sélection MMR: {e}")
+            return indices[:top_k], scores[:top_k]
+        return indices[selected], scores[selected]
+    
+    def _to_results(self, catalog: ChunkCatalog, indices: np.ndarray, scores: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Convertir des lignes classées en chunks avec leurs scores
+        Args:
+            catalog (ChunkCatalog): Catalogue aligné sur l'index
+            indices (np.ndarray): Indices des lignes
+            scores (np.ndarray): Scores associés
+        Returns:
+            List[Dict[str, Any]]: Chunks avec leur score
+        """
+        results = []
+        for idx, score in zip(indices, scores):
+            chunk = catalog.get(int(idx))
+            if chunk is None:
+                logger.warning(f"Indice {idx} hors limites pour le catalogue (longueur: {len(catalog)})")
+                continue
+            
+            chunk_with_score = chunk.copy()
+            chunk_with_score["score"] = float(score)
+            results.append(chunk_with_score)
+        return results
+    
+    def _exact_rank(self, snapshot: IndexSnapshot, query_vector, top_k: int, threshold: float,
+                    rows: Optional[np.ndarray] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Classer tous les chunks par similarité cosinus (force brute, normes précalculées)
+        Args:
+            snapshot (IndexSnapshot): Snapshot interrogé
+            query_vector: Vecteur de la requête
+            top_k (int): Nombre de résultats
+            threshold (float): Seuil de similarité minimum
+            rows (np.ndarray): Lignes candidates (toutes par défaut)
+        Returns:
+            Optional[Tuple[np.ndarray, np.ndarray]]: Indices et scores par score décroissant, None en cas d'erreur
+        """
+        try:
+            # Un sous-ensemble filtré ne contient déjà plus de lignes supprimées
+            exclude = snapshot.deleted if rows is None else None
+            ranked = self._get_engine(snapshot).rank(query_vector, top_k, threshold, rows=rows, exclude=exclude)
+        except Exception as e:
+            logger.error(f"Erreur lors du calcul des similarités: {e}")
+            logger.error(f"Type d'erreur: {type(e)}")
+            return None
+        
+        if len(ranked[1]):
+            logger.info(f"Meilleure similarité: {ranked[1][0]:.4f}")
+        return ranked
+    
+    def _get_engine(self, snapshot: IndexSnapshot) -> ScoringEngine:
+        """
+        Obtenir le moteur de scoring des vecteurs d'un snapshot (normes précalculées une seule fois par index)
+        Args:
+            snapshot (IndexSnapshot): Snapshot interrogé
+        Returns:
+            ScoringEngine: Moteur de scoring
+        """
+        engine = self._engine
+        if engine is None or self._engine_source is not snapshot.doc_vectors:
+            engine = ScoringEngine(snapshot.doc_vectors)
+            self._engine, self._engine_source = engine, snapshot.doc_vectors
+        return engine
+    
+    def _approximate_rank(self, snapshot: IndexSnapshot, query_vector, top_k: int, threshold: float) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Classer les chunks via l'index IVF
+        Args:
+            snapshot (IndexSnapshot): Snapshot interrogé
+            query_vector: Vecteur de la requête
+            top_k (int): Nombre de résultats
+            threshold (float): Seuil de similarité minimum
+        Returns:
+            Optional[Tuple[np.ndarray, np.ndarray]]: Indices et scores par score décroissant,
+                None si l'index approximatif n'est pas utilisable (recherche exacte)
+        """
+        try:
+            ann_index = self._ann_index(snapshot)
+            if ann_index is None:
+                return None
+            # Demander assez de candidats pour compenser les lignes supprimées
+            dead_count = snapshot.dead_count
+            indices, scores = ann_index.search(np.asarray(query_vector), snapshot.doc_vectors, top_k + dead_count, self.nprobe)
+            if dead_count:
+                keep = ~snapshot.deleted[indices]
+                indices, scores = indices[keep][:top_k], scores[keep][:top_k]
+        except Exception as e:
+            logger.error(f"Erreur lors de la recherche approximative: {e}")
+            return None
+        
+        return self._apply_threshold(indices, scores, threshold)
+    
+    def _quantized_rank(self, snapshot: IndexSnapshot, query_vector, top_k: int, threshold: float, rescore_factor: int = 4,
+                        rows: Optional[np.ndarray] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Classer les chunks sur les vecteurs quantifiés (float16/int8), puis rescorer
+        optionnellement les meilleurs candidats avec les vecteurs float32
+        Args:
+            snapshot (IndexSnapshot): Snapshot interrogé
+            query_vector: Vecteur de la requête
+            top_k (int): Nombre de résultats
+            threshold (float): Seuil de similarité minimum
+            rescore_factor (int): Nombre de candidats rescorés, en multiple de top_k
+            rows (np.ndarray): Lignes candidates (toutes par défaut)
+        Returns:
+            Optional[Tuple[np.ndarray, np.ndarray]]: Indices et scores par score décroissant,
+                None si les vecteurs quantifiés ne sont pas utilisables (recherche exacte)
+        """
+        quantized = snapshot.quantized
+        if len(quantized) != len(snapshot.chunk_ids):
+            logger.warning("Vecteurs quantifiés non alignés sur l'index, recherche exacte")
+            return None
+        
+        try:
+            query = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+            scores = quantized.scores(query, rows)
+            if rows is None and snapshot.deleted is not None:
+                scores[snapshot.deleted] = -np.inf
+            
+            rescore = getattr(self.embeddings, "rescore", False)
+            n_candidates = min(len(scores), top_k * rescore_factor if rescore else top_k)
+            candidates = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+            candidates = candidates[np.isfinite(scores[candidates])]
+            if rows is not None:
+                scores = scores[candidates]
+                candidates = rows[candidates]
+                positions = np.arange(len(candidates))
+            else:
+                positions = candidates
+            
+            if rescore:
+                # Lecture des seules lignes candidates dans le fichier float32 (mmap)
+                candidates = np.sort(candidates)
+                candidate_scores = normalize_rows(snapshot.doc_vectors[candidates]) @ normalize_rows(query[None])[0]
+            else:
+                candidate_scores = scores[positions]
+            
+            order = np.argsort(-candidate_scores)[:top_k]
+            indices, scores = candidates[order], candidate_scores[order]
+        except Exception as e:
+            logger.error(f"Erreur lors du calcul des similarités quantifiées: {e}")
+            return None
+        
+        return self._apply_threshold(indices, scores, threshold)
+    
+    def _apply_threshold(self, indices: np.ndarray, scores: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Filtrer des résultats triés par seuil, en gardant les meilleurs si aucun ne passe le seuil
+        Args:
+            indices (np.ndarray): Indices des lignes
+            scores (np.ndarray): Scores associés
+            threshold (float): Seuil de similarité minimum
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Indices et scores filtrés
+        """
+        for minimum in (threshold, min(threshold, FALLBACK_THRESHOLD)):
+            keep = scores >= minimum
+            if np.any(keep):
+                return indices[keep], scores[keep]
+        logger.warning("Utilisation des meilleurs résultats malgré le seuil")
+        return indices, scores
+    
+    def _ann_index(self, snapshot: IndexSnapshot) -> Optional[IVFFlatIndex]:
+        """
+        Index IVF publié avec un snapshot. L'index est construit ou prolongé à l'écriture de
+        chaque version et n'est jamais modifié par une recherche.
+        Args:
+            snapshot (IndexSnapshot): Snapshot interrogé
+        Returns:
+            Optional[IVFFlatIndex]: Index IVF, ou None s'il est absent ou désaligné (recherche exacte)
+        """
+        ann_index = snapshot.ann
+        if ann_index is None or ann_index.size != len(snapshot.chunk_ids):
+            return None
+        return ann_index
+    
+    def _get_catalog(self, snapshot: IndexSnapshot, chunks: Optional[List[Dict[str, Any]]] = None) -> Optional[ChunkCatalog]:
+        """
+        Obtenir le catalogue aligné sur un snapshot, en le reconstruisant si nécessaire
+        Args:
+            snapshot (IndexSnapshot): Snapshot interrogé
+            chunks (List[Dict[str, Any]]): Chunks disponibles pour reconstruire le catalogue
+        Returns:
+            Optional[ChunkCatalog]: Catalogue aligné sur chunk_ids, ou None
+        """
+        catalog = snapshot.catalog
+        if catalog is not None and len(catalog) == len(snapshot.chunk_ids):
+            return catalog
+        
+        if not chunks:
+            logger.warning("Catalogue des chunks non aligné sur l'index et aucun chunk fourni")
+            return None
+        
+        # Index sauvegardé sans catalogue: reconstruire une fois à partir des chunks
+        logger.info("Reconstruction du catalogue des chunks à partir des chunks fournis")
+        catalog = ChunkCatalog.from_chunk_ids(snapshot.chunk_ids, chunks)
+        if self.embeddings.snapshot is snapshot:
+            self.embeddings.catalog = catalog
+        return catalog
@@ -0,0 +1,158 @@
+# app/vector_store/scoring.py
+import logging
+from typing import List, Optional, Tuple
+import numpy as np
+import scipy.sparse as sp
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+# Seuil de repli lorsqu'aucun résultat ne dépasse le seuil demandé
+FALLBACK_THRESHOLD = -0.5
+
+
+class ScoringEngine:
+    """
+    Moteur de scoring cosinus pour l'index vectoriel.
+    Les normes des lignes sont calculées une seule fois à la construction:
+    une requête coûte un produit scalaire brut (dense) ou un produit creux (CSR TF-IDF),
+    suivi d'une sélection top-k par argpartition.
+    """
+    def __init__(self, doc_vectors):
+        """
+        Initialiser le moteur de scoring
+        Args:
+            doc_vectors: Matrice dense (np.ndarray, éventuellement en mmap) ou creuse (scipy.sparse)
+        """
+        self.is_sparse = sp.issparse(doc_vectors)
+        if self.is_sparse:
+            self.doc_vectors = sp.csr_matrix(doc_vectors, dtype=np.float32)
+            norms = np.sqrt(np.asarray(self.doc_vectors.multiply(self.doc_vectors).sum(axis=1)).ravel())
+        else:
+            self.doc_vectors = doc_vectors
+            norms = self._dense_norms(doc_vectors)
+
+        # Les lignes déjà normalisées (TF-IDF l2, embeddings normalisés) n'ont pas besoin d'être rééchelonnées
+        norms = norms.astype(np.float32)
+        nonzero = norms > 0
+        self.inv_norms = np.zeros_like(norms)
+        self.inv_norms[nonzero] = 1.0 / norms[nonzero]
+        if np.allclose(norms[nonzero], 1.0, atol=1e-4):
+            self.inv_norms = None
+        logger.info(f"ScoringEngine initialisé: {self.doc_vectors.shape[0]} lignes, {'creux' if self.is_sparse else 'dense'}")
+
+    @staticmethod
+    def _dense_norms(doc_vectors: np.ndarray, block_size: int = 65536) -> np.ndarray:
+        """
+        Normes L2 des lignes, calculées par blocs (compatible mmap)
+        """
+        norms = np.empty(doc_vectors.shape[0], dtype=np.float32)
+        for start in range(0, doc_vectors.shape[0], block_size):
+            block = np.asarray(doc_vectors[start:start + block_size], dtype=np.float32)
+            norms[start:start + block_size] = np.sqrt(np.einsum("ij,ij->i", block, block))
+        return norms
+
+    def __len__(self) -> int:
+        return self.doc_vectors.shape[0]
+
+    def scores(self, query_vectors, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Similarités cosinus entre des requêtes et toutes les lignes (ou un sous-ensemble)
+        Args:
+            query_vectors: Requêtes (m, d), denses ou creuses
+            rows (np.ndarray): Lignes à scorer (toutes par défaut)
+        Returns:
+            np.ndarray: Matrice de scores (m, n) ou (m, len(rows))
+        """
+        doc_vectors = self.doc_vectors if rows is None else self.doc_vectors[rows]
+        inv_norms = self.inv_norms if rows is None or self.inv_norms is None else self.inv_norms[rows]
+        if sp.issparse(query_vectors):
+            queries = sp.csr_matrix(query_vectors, dtype=np.float32)
+            query_norms = np.sqrt(np.asarray(queries.multiply(queries).sum(axis=1)).ravel())
+        else:
+            queries = np.atleast_2d(np.asarray(query_vectors, dtype=np.float32))
+            query_norms = np.linalg.norm(queries, axis=1)
+        query_norms[query_norms == 0] = 1.0
+
+        if self.is_sparse:
+            # Produit CSR x dense (m colonnes): évite la conversion CSC de doc_vectors.T
+            dense_queries = queries.toarray() if sp.issparse(queries) else queries
+            scores = np.asarray(doc_vectors @ dense_queries.T).T
+        else:
+            if sp.issparse(queries):
+                queries = queries.toarray()
+            scores = queries @ np.asarray(doc_vectors, dtype=np.float32).T
+
+        scores = np.asarray(scores, dtype=np.float32)
+        scores /= query_norms[:, None]
+        if inv_norms is not None:
+            scores *= inv_norms[None, :]
+        return scores
+
+    @staticmethod
+    def select_top_k(scores: np.ndarray, top_k: int, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Sélectionner les top_k meilleurs scores d'une ligne et appliquer le seuil en une passe
+        Args:
+            scores (np.ndarray): Scores (n,)
+            top_k (int): Nombre de résultats
+            threshold (float): Seuil de similarité minimum
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Indices et scores par score décroissant
+        """
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        top_scores = scores[top]
+        # Lignes exclues (score -inf): jamais retournées, même sous le seuil de repli
+        if top_scores[-1] == -np.inf:
+            valid = top_scores > -np.inf
+            top, top_scores = top[valid], top_scores[valid]
+
+        # Les top_k filtrés par seuil sont exactement les top_k de l'ensemble filtré
+        for minimum in (threshold, min(threshold, FALLBACK_THRESHOLD)):
+            keep = top_scores >= minimum
+            if np.any(keep):
+                return top[keep], top_scores[keep]
+        return top, top_scores
+
+    def rank(self, query_vector, top_k: int, threshold: float, rows: Optional[np.ndarray] = None,
+             exclude: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Classer toutes les lignes (ou un sous-ensemble filtré) pour une requête
+        Args:
+            query_vector: Vecteur de requête (1, d)
+            top_k (int): Nombre de résultats
+            threshold (float): Seuil de similarité minimum
+            rows (np.ndarray): Lignes candidates, seules scorées (toutes par défaut)
+            exclude (np.ndarray): Masque booléen des lignes à ignorer (lignes supprimées), sans rows
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Indices et scores par score décroissant
+        """
+        scores = self.scores(query_vector, rows)[0]
+        if exclude is not None:
+            scores[exclude] = -np.inf
+        indices, scores = self.select_top_k(scores, top_k, threshold)
+        if rows is not None:
+            indices = rows[indices]
+        return indices, scores
+
+    def rank_many(self, query_vectors, top_k: int, threshold: float,
+                  exclude: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Classer toutes les lignes pour plusieurs requêtes (un seul produit matrice-matrice)
+        Args:
+            query_vectors: Requêtes (m, d)
+            top_k (int): Nombre de résultats par requête
+            threshold (float): Seuil de similarité minimum
+            exclude (np.ndarray): Masque booléen des lignes à ignorer (lignes supprimées)
+        Returns:
+            List[Tuple[np.ndarray, np.ndarray]]: Indices et scores de chaque requête
+        """
+        scores = self.scores(query_vectors)
+        if exclude is not None:
+            scores[:, exclude] = -np.inf
+        return [self.select_top_k(row, top_k, threshold) for row in scores]
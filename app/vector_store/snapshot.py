@@ -0,0 +1,260 @@
+# app/vector_store/snapshot.py
+import os
+import re
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterable, List, Optional
+import numpy as np
+
+from .catalog import ChunkCatalog
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: pas de verrou inter-processus, les écritures ne sont sérialisées que dans le processus
+    fcntl = None
+
+# Configurer le logging
+logger = logging.getLogger(__name__)
+
+VERSION_PATTERN = re.compile(r"^v(\d{6,})$")
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Verrou exclusif partagé entre processus, pris sur un fichier dédié. Chaque appel ouvre
+    son propre descripteur: deux threads d'un même processus s'excluent aussi.
+    Args:
+        path (str): Chemin du fichier de verrou
+    """
+    with open(path, "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+class IndexSnapshot:
+    """
+    État complet d'un index à une version donnée: vecteurs, identifiants, catalogue
+    (et vectoriseur TF-IDF, ou vecteurs quantifiés et index IVF), plus le masque des lignes supprimées
+    (tombstones) en attente de compaction. Un snapshot n'est jamais modifié
+    après sa publication: une mise à jour en construit un nouveau, échangé par référence,
+    de sorte qu'une recherche en cours lit toujours un état cohérent.
+    """
+    def __init__(self, version: int = 0, doc_vectors: Any = None, chunk_ids: Optional[List[str]] = None,
+                 catalog: Optional[ChunkCatalog] = None, quantized: Any = None, vectorizer: Any = None,
+                 path: Optional[str] = None, deleted: Optional[np.ndarray] = None, ann: Any = None):
+        """
+        Initialiser un snapshot
+        Args:
+            version (int): Version de l'index (0 pour un index non versionné)
+            doc_vectors: Vecteurs des chunks (dense, mmap ou creux)
+            chunk_ids (List[str]): Identifiants des lignes
+            catalog (ChunkCatalog): Catalogue aligné sur les lignes
+            quantized: Vecteurs quantifiés (SentenceTransformer)
+            vectorizer: Vectoriseur entraîné (TF-IDF)
+            path (str): Répertoire du snapshot sur disque
+            deleted (np.ndarray): Masque booléen des lignes supprimées (None si aucune)
+            ann: Index approximatif IVF des vecteurs (SentenceTransformer, mode approximatif)
+        """
+        self.version = version
+        self.doc_vectors = doc_vectors
+        self.chunk_ids = chunk_ids if chunk_ids is not None else []
+        self.catalog = catalog if catalog is not None else ChunkCatalog()
+        self.quantized = quantized
+        self.vectorizer = vectorizer
+        self.path = path
+        self.deleted = deleted
+        self.ann = ann
+        if deleted is not None:
+            deleted.setflags(write=False)
+
+    @property
+    def dead_count(self) -> int:
+        """
+        Nombre de lignes supprimées encore présentes dans l'index
+        """
+        return int(np.count_nonzero(self.deleted)) if self.deleted is not None else 0
+
+    def tombstone(self, rows: Iterable[int], extra_rows: int = 0) -> Optional[np.ndarray]:
+        """
+        Masque des lignes supprimées après suppression de nouvelles lignes
+        Args:
+            rows (Iterable[int]): Lignes à supprimer
+            extra_rows (int): Lignes vivantes ajoutées en fin d'index
+        Returns:
+            Optional[np.ndarray]: Nouveau masque (None si aucune ligne supprimée)
+        """
+        deleted = np.zeros(len(self.chunk_ids) + extra_rows, dtype=bool)
+        if self.deleted is not None:
+            deleted[:len(self.deleted)] = self.deleted
+        deleted[np.fromiter(rows, dtype=np.int64)] = True
+        return deleted if deleted.any() else None
+
+    def replace(self, **changes) -> "IndexSnapshot":
+        """
+        Copier le snapshot en remplaçant certains champs
+        Returns:
+            IndexSnapshot: Nouveau snapshot
+        """
+        fields = dict(self.__dict__)
+        fields.update(changes)
+        return IndexSnapshot(**fields)
+
+
+class SnapshotStore:
+    """
+    Répertoire de snapshots versionnés: <indices_dir>/<name>_snapshots/v000001/, ...
+    Un snapshot est écrit dans un répertoire temporaire puis renommé; le fichier
+    CURRENT, remplacé atomiquement, désigne la version publiée. Les autres processus
+    détectent une nouvelle version en relisant CURRENT.
+    Les écrivains de tous les processus sont sérialisés par un verrou fcntl
+    (<indices_dir>/<name>_snapshots.lock), pris autour de rechargement, construction et publication.
+    """
+    def __init__(self, indices_dir: str, name: str, keep: int = 3):
+        """
+        Initialiser le stockage des snapshots
+        Args:
+            indices_dir (str): Répertoire des indices
+            name (str): Préfixe de l'index ("tfidf" ou "st")
+            keep (int): Nombre de versions conservées sur disque
+        """
+        self.root = os.path.join(indices_dir, f"{name}_snapshots")
+        self.current_path = os.path.join(self.root, "CURRENT")
+        self.lock_path = f"{self.root}.lock"
+        self.keep = keep
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_file = None
+        os.makedirs(self.root, exist_ok=True)
+
+    @contextmanager
+    def locked(self):
+        """
+        Verrou exclusif des écritures, partagé entre processus. Réentrant dans un même
+        processus: une écriture peut en appeler une autre (ajout qui devient un entraînement complet).
+        """
+        with self._lock:
+            if self._lock_depth == 0:
+                self._lock_file = open(self.lock_path, "a")
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    if fcntl is not None:
+                        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def path(self, version: int) -> str:
+        """
+        Répertoire d'une version
+        """
+        return os.path.join(self.root, f"v{version:06d}")
+
+    def current_version(self) -> int:
+        """
+        Version publiée (0 si aucune)
+        """
+        try:
+            with open(self.current_path, "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _versions(self) -> List[int]:
+        """
+        Versions présentes sur disque, par ordre croissant
+        """
+        versions = []
+        for entry in os.listdir(self.root):
+            match = VERSION_PATTERN.match(entry)
+            if match:
+                versions.append(int(match.group(1)))
+        return sorted(versions)
+
+    def begin(self) -> str:
+        """
+        Créer le répertoire temporaire d'un nouveau snapshot
+        Returns:
+            str: Répertoire temporaire, à passer à commit() ou abort()
+        """
+        tmp_dir = os.path.join(self.root, f"tmp-{os.getpid()}-{id(self)}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        return tmp_dir
+
+    def commit(self, tmp_dir: str) -> int:
+        """
+        Publier un snapshot: renommage du répertoire puis remplacement atomique de CURRENT
+        (à appeler sous locked(), pour que deux processus ne prennent pas le même numéro de version)
+        Args:
+            tmp_dir (str): Répertoire temporaire complet
+        Returns:
+            int: Version publiée
+        """
+        existing = self._versions()
+        version = max(existing[-1] if existing else 0, self.current_version()) + 1
+        final_dir = self.path(version)
+        os.rename(tmp_dir, final_dir)
+
+        tmp_current = f"{self.current_path}.tmp-{os.getpid()}"
+        with open(tmp_current, "w", encoding="utf-8") as f:
+            f.write(str(version))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_current, self.current_path)
+        logger.info(f"Snapshot v{version:06d} publié dans {self.root}")
+
+        self._prune(version)
+        return version
+
+    def link_files(self, source_dir: str, tmp_dir: str, exclude: Iterable[str] = ()) -> None:
+        """
+        Reprendre les fichiers d'une version publiée dans un nouveau snapshot, par liens
+        physiques (copie si le système de fichiers ne les supporte pas).
+        Les liens partagent les données avec la version publiée: un fichier lié n'est modifié
+        qu'en ajout au-delà de la taille publiée, sous le verrou d'écriture (st_vectors.f32,
+        fichiers de codes et st_catalog.jsonl, tronqués à cette taille puis complétés par
+        quantization.append_rows et _append_embeddings). Les lecteurs de la version publiée ne
+        lisent que ses premières lignes; tout autre fichier doit être exclu puis réécrit.
+        Args:
+            source_dir (str): Répertoire de la version publiée
+            tmp_dir (str): Répertoire temporaire du nouveau snapshot
+            exclude (Iterable[str]): Noms de fichiers à ne pas reprendre
+        """
+        exclude = set(exclude)
+        for name in os.listdir(source_dir):
+            source = os.path.join(source_dir, name)
+            if name in exclude or not os.path.isfile(source):
+                continue
+            try:
+                os.link(source, os.path.join(tmp_dir, name))
+            except OSError:
+                shutil.copyfile(source, os.path.join(tmp_dir, name))
+
+    def abort(self, tmp_dir: str) -> None:
+        """
+        Abandonner un snapshot en cours d'écriture
+        """
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def _prune(self, current: int) -> None:
+        """
+        Supprimer les anciennes versions. Les processus qui ont encore ouvert
+        les anciens fichiers en mmap continuent de les lire (inodes conservés).
+        """
+        for version in self._versions():
+            if version <= current - self.keep:
+                shutil.rmtree(self.path(version), ignore_errors=True)
@@ -15,17 +15,18 @@ logger = logging.getLogger(__name__)
 class WorldBankRAGProcessor(RAGProcessor):
     """Extension du processeur RAG pour les données de la Banque Mondiale"""
     
-    def __init__(self, use_openai=False, openai_api_key=None, language="fr"):
+    def __init__(self, use_openai=False, openai_api_key=None, language="fr", mmr_lambda=None):
         """
         Initialise le processeur RAG spécialisé pour la Banque Mondiale
         Args:
             use_openai (bool): Utiliser l'API OpenAI au lieu du modèle local
             openai_api_key (str): Clé API OpenAI (si None et use_openai=True, cherche dans les variables d'environnement)
             language (str): Langue des données ('fr' pour français, 'en' pour anglais)
+            mmr_lambda (float): Compromis pertinence/diversité de la sélection MMR des chunks (désactivée par défaut)
         """
         # Appel au constructeur parent
         try:
-            super().__init__()
+            super().__init__(mmr_lambda=mmr_lambda)
             logger.info("Initialisation du processeur RAG réussie")
         except Exception as e:
             logger.error(f"Erreur lors de l'initialisation du processeur RAG: {e}")
@@ -68,20 +69,14 @@ class WorldBankRAGProcessor(RAGProcessor):
             # Vérifier le nombre de documents
             doc_count = 0
             try:
-                chunks = self.doc_manager.get_all_chunks()
-                doc_ids = set()
-                for chunk in chunks:
-                    if chunk.get("metadata") and chunk["metadata"].get("doc_id"):
-                        doc_ids.add(chunk["metadata"]["doc_id"])
-                doc_count = len(doc_ids)
+                doc_count = self.doc_manager.count_documents()
             except Exception as e:
                 logger.error(f"Erreur lors du comptage des documents: {e}")
             
             # Vérifier le nombre de chunks
             chunk_count = 0
             try:
-                chunks = self.doc_manager.get_all_chunks()
-                chunk_count = len(chunks)
+                chunk_count = self.doc_manager.count_chunks()
             except Exception as e:
                 logger.error(f"Erreur lors du comptage des chunks: {e}")
             
@@ -89,6 +84,9 @@ class WorldBankRAGProcessor(RAGProcessor):
             model_loaded = hasattr(self, "llm_manager") and hasattr(self.llm_manager, "model") and self.llm_manager.model is not None
             model_name = self.llm_manager.model_name if hasattr(self, "llm_manager") and hasattr(self.llm_manager, "model_name") else None
             
+            # Statistiques du cache des embeddings de requêtes
+            query_cache = getattr(self.vector_store.embeddings, "query_cache", None)
+            
             return {
                 "success": True,
                 "api_status": api_status,
@@ -98,7 +96,10 @@ class WorldBankRAGProcessor(RAGProcessor):
                 "document_count": doc_count,
                 "chunk_count": chunk_count,
                 "model_loaded": model_loaded,
-                "model_name": model_name
+                "model_name": model_name,
+                "encoder": self.vector_store.encoder_status(),
+                "query_cache": query_cache.stats() if query_cache is not None else None,
+                "answer_cache": self.answer_cache.stats() if self.answer_cache is not None else None
             }
         except Exception as e:
             logger.error(f"Erreur lors de la récupération des informations système: {e}")
@@ -221,8 +222,8 @@ class WorldBankRAGProcessor(RAGProcessor):
                     "document_ids": []
                 }
             
-            # Ajouter les documents à la base de connaissances
-            doc_ids = []
+            # Préparer le lot de documents pour la base de connaissances
+            batch = []
             for doc in documents:
                 try:
                     # Vérifier que le document est bien formé
@@ -234,12 +235,6 @@ class WorldBankRAGProcessor(RAGProcessor):
                     content = doc["content"]
                     metadata = doc["metadata"]
                     
-                    # S'assurer que le document est au bon format
-                    doc_formatted = {
-                        "text": content,
-                        "metadata": metadata
-                    }
-                    
                     # Vérifier que les métadonnées contiennent un ID
                     if 'id' not in metadata:
                         # Générer un ID pour le document s'il n'en a pas
@@ -251,23 +246,31 @@ class WorldBankRAGProcessor(RAGProcessor):
                     safe_type = re.sub(r'[^\w\.-]', '_', str(metadata.get('type', 'document')))
                     filename = f"{safe_type}_{safe_id}.md"
                     
-                    # Ajouter le document via la méthode standard du RAG
-                    doc_id = self.add_document(content.encode('utf-8'), filename)
-                    
-                    if doc_id:
-                        doc_ids.append(doc_id)
-                    else:
-                        logger.warning(f"Échec de l'ajout du document {filename}")
+                    batch.append({
+                        "file_content": content.encode('utf-8'),
+                        "filename": filename,
+                        "metadata": metadata
+                    })
                 except Exception as e:
-                    logger.error(f"Erreur lors du traitement du document {metadata.get('id', 'inconnu')}: {e}")
+                    logger.error(f"Erreur lors de la préparation du document {doc.get('metadata', {}).get('id', 'inconnu')}: {e}")
                     logger.error(traceback.format_exc())
                     continue
             
+            # Ajouter ou remplacer (même nom de fichier) tous les documents, puis mettre à jour l'index une seule fois
+            batch_result = self.upsert_documents(batch)
+            doc_ids = [result["doc_id"] for result in batch_result["results"] if result["success"]]
+            for result in batch_result["results"]:
+                if not result["success"]:
+                    logger.warning(f"Échec de l'ajout du document {result['filename']}: {result.get('message')}")
+            
             return {
-                "success": True,
+                "success": batch_result["success"],
                 "message": f"{len(doc_ids)} documents ajoutés à la base de connaissances",
                 "document_count": len(doc_ids),
-                "document_ids": doc_ids
+                "document_ids": doc_ids,
+                "replaced_count": batch_result["replaced_count"],
+                "duplicate_count": batch_result["duplicate_count"],
+                "failed_count": batch_result["failed_count"]
             }
         except Exception as e:
             logger.error(f"Erreur globale lors de la mise à jour de la base de connaissances: {e}")
@@ -280,13 +283,14 @@ class WorldBankRAGProcessor(RAGProcessor):
                 "document_ids": []
             }
     
-    def query(self, question: str, top_k: int = 5, max_tokens: int = 512) -> Dict[str, Any]:
+    def query(self, question: str, top_k: int = 5, max_tokens: int = 512, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Interroge le système RAG avec une question
         Args:
             question (str): Question de l'utilisateur
             top_k (int): Nombre de chunks à récupérer
             max_tokens (int): Nombre maximum de tokens à générer
+            filters (Dict[str, Any]): Filtre de métadonnées (ex: {"type": "country", "id": "MAR"})
         Returns:
             Dict[str, Any]: Résultat de la requête
         """
@@ -302,11 +306,11 @@ class WorldBankRAGProcessor(RAGProcessor):
                     "sources": []
                 }
             
-            # Récupérer tous les chunks
-            chunks = self.doc_manager.get_all_chunks()
-            logger.info(f"Nombre de chunks récupérés: {len(chunks)}")
+            # Compter les chunks disponibles sans les charger
+            chunk_count = self.doc_manager.count_chunks()
+            logger.info(f"Nombre de chunks disponibles: {chunk_count}")
             
-            if not chunks:
+            if not chunk_count:
                 logger.warning("Aucun document disponible dans la base de connaissances")
                 return {
                     "success": True,
@@ -314,15 +318,6 @@ class WorldBankRAGProcessor(RAGProcessor):
                     "sources": []
                 }
             
-            # Vérifier que les chunks ont le bon format
-            for i, chunk in enumerate(chunks[:3]):
-                if 'text' not in chunk:
-                    # Si le chunk a 'content' mais pas 'text', créer 'text'
-                    if 'content' in chunk:
-                        chunk['text'] = chunk['content']
-                    else:
-                        logger.warning(f"Chunk sans texte détecté: {chunk}")
-            
             # Rechercher les chunks pertinents avec un seuil de similarité plus bas
             try:
                 # Vérifier l'état des embeddings
@@ -334,10 +329,15 @@ class WorldBankRAGProcessor(RAGProcessor):
                 else:
                     logger.warning("doc_vectors non disponible dans les embeddings")
                     
-                # Recherche vectorielle
-                threshold = -0.2  # Seuil plus bas pour être plus inclusif
-                relevant_chunks = self.vector_store.retriever.search(question, chunks, top_k, threshold)
-                logger.info(f"Nombre de chunks pertinents trouvés: {len(relevant_chunks)}")
+                # Modèle d'embeddings en préchauffage: ne pas attendre, passer par la recherche par mots-clés
+                if not self.vector_store.encoder_status()["ready"]:
+                    logger.warning("Encodeur des requêtes en cours de chargement, recherche vectorielle ignorée")
+                    relevant_chunks = []
+                else:
+                    # Recherche vectorielle
+                    threshold = -0.2  # Seuil plus bas pour être plus inclusif
+                    relevant_chunks = self.vector_store.search(question, top_k=top_k, threshold=threshold, filters=filters)
+                    logger.info(f"Nombre de chunks pertinents trouvés: {len(relevant_chunks)}")
             except Exception as e:
                 logger.error(f"Erreur lors de la recherche de chunks pertinents: {e}")
                 logger.error(traceback.format_exc())
@@ -345,31 +345,12 @@ class WorldBankRAGProcessor(RAGProcessor):
             
             # Si aucun chunk pertinent n'est trouvé, essayer une recherche plus simple
             if not relevant_chunks:
-                # Créer une recherche par mots-clés simples comme fallback
+                # Recherche par mots-clés via l'index inversé BM25 comme fallback
                 logger.info("Aucun chunk pertinent trouvé via la recherche vectorielle, utilisation d'une recherche par mots-clés")
-                
-                # Extraire les mots clés de la question
-                import re
-                keywords = re.findall(r'\b\w{3,}\b', question.lower())
-                logger.info(f"Mots clés extraits: {keywords}")
-                
-                # Recherche simple par mots-clés
-                if keywords:
-                    for chunk in chunks:
-                        if 'text' in chunk:
-                            text = chunk['text'].lower()
-                            # Calculer un score simple basé sur le nombre de mots clés trouvés
-                            score = sum(1 for keyword in keywords if keyword in text) / len(keywords)
-                            if score > 0.2:  # Au moins 20% des mots clés présents
-                                chunk_copy = chunk.copy()
-                                chunk_copy['score'] = float(score)
-                                relevant_chunks.append(chunk_copy)
-                    
-                    # Trier par score
-                    relevant_chunks = sorted(relevant_chunks, key=lambda x: x.get('score', 0), reverse=True)
-                    # Limiter aux top_k résultats
-                    relevant_chunks = relevant_chunks[:top_k]
-                    logger.info(f"Recherche par mots-clés: {len(relevant_chunks)} chunks trouvés")
+                relevant_chunks = self.vector_store.keyword_search(
+                    question, top_k=top_k, get_chunk=self.doc_manager.get_chunk, filters=filters
+                )
+                logger.info(f"Recherche par mots-clés: {len(relevant_chunks)} chunks trouvés")
             
             # Si toujours aucun chunk pertinent, répondre par un message générique
             if not relevant_chunks:
@@ -386,9 +367,20 @@ class WorldBankRAGProcessor(RAGProcessor):
                 if 'text' in chunk:
                     logger.info(f"Contenu: {chunk['text'][:100]}...")
             
+            # Réutiliser une réponse déjà générée pour la même question et les mêmes chunks
+            # (WorldBank génère avec la température par défaut du modèle)
+            temperature = 0.7
+            answer = self._get_cached_answer(question, relevant_chunks, max_tokens, temperature)
+            if answer is not None:
+                return {
+                    "success": True,
+                    "answer": answer,
+                    "sources": self._format_sources(relevant_chunks)
+                }
+            
             # Créer le prompt avec contexte
             try:
-                prompt = self.llm_manager.create_prompt(question, relevant_chunks)
+                prompt = self.llm_manager.create_prompt(question, self._prompt_chunks(relevant_chunks))
                 logger.debug(f"Prompt: {prompt[:500]}...")
             except Exception as e:
                 logger.error(f"Erreur lors de la création du prompt: {e}")
@@ -409,8 +401,9 @@ Réponse:"""
             # Générer une réponse
             try:
                 logger.info("Génération de la réponse avec le modèle de langage")
-                answer = self.llm_manager.generate(prompt, max_tokens=max_tokens)
+                answer = self.llm_manager.generate(prompt, max_tokens=max_tokens, temperature=temperature, raise_errors=True)
                 logger.info(f"Réponse générée: {answer[:100]}...")
+                self._cache_answer(question, relevant_chunks, max_tokens, temperature, answer)
             except Exception as e:
                 logger.error(f"Erreur lors de la génération de la réponse: {e}")
                 logger.error(traceback.format_exc())
@@ -423,21 +416,10 @@ Réponse:"""
                         answer += f"- Source {i+1}: {chunk.get('metadata', {}).get('filename', 'Document')}\n"
                         answer += f"{chunk['text'][:200]}...\n\n"
             
-            # Préparer les sources
-            sources = []
-            for chunk in relevant_chunks:
-                metadata = chunk.get('metadata', {})
-                sources.append({
-                    "filename": metadata.get('filename', 'Document inconnu'),
-                    "doc_id": metadata.get('doc_id', 'unknown'),
-                    "chunk_id": metadata.get('chunk_id', 0),
-                    "score": float(chunk.get('score', 0.0))
-                })
-            
             return {
                 "success": True,
                 "answer": answer,
-                "sources": sources
+                "sources": self._format_sources(relevant_chunks)
             }
         except Exception as e:
             logger.error(f"Erreur lors de la requête: {e}")
@@ -446,4 +428,23 @@ Réponse:"""
                 "success": True,  # Pour éviter une erreur dans l'interface
                 "answer": f"Désolé, une erreur est survenue lors du traitement de votre question: {str(e)}",
                 "sources": []
-            }
\ No newline at end of file
+            }
+    
+    def _format_sources(self, relevant_chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Préparer les sources d'une réponse
+        Args:
+            relevant_chunks (List[Dict[str, Any]]): Chunks utilisés pour la réponse
+        Returns:
+            List[Dict[str, Any]]: Sources (fichier, document, chunk, score)
+        """
+        sources = []
+        for chunk in relevant_chunks:
+            metadata = chunk.get('metadata', {})
+            sources.append({
+                "filename": metadata.get('filename', 'Document inconnu'),
+                "doc_id": metadata.get('doc_id', 'unknown'),
+                "chunk_id": metadata.get('chunk_id', 0),
+                "score": float(chunk.get('score', 0.0))
+            })
+        return sources
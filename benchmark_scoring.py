@@ -0,0 +1,57 @@
+import time
+import numpy as np
+import scipy.sparse as sp
+from sklearn.metrics.pairwise import cosine_similarity
+from app.vector_store.scoring import ScoringEngine
+
+def legacy_rank(query, doc_vectors, top_k, threshold=-0.1):
+    """Ancien chemin du Retriever: cosine_similarity puis argsort complet"""
+    similarities = cosine_similarity(query, doc_vectors).flatten()
+    above_threshold = similarities >= threshold
+    filtered_indices = np.where(above_threshold)[0]
+    return filtered_indices[np.argsort(similarities[above_threshold])[-top_k:][::-1]]
+
+def random_csr(rng, n_rows, n_cols, nnz_per_row):
+    """Matrice creuse aléatoire de type TF-IDF, construite directement en CSR"""
+    indices = rng.integers(0, n_cols, size=n_rows * nnz_per_row)
+    data = rng.random(n_rows * nnz_per_row, dtype=np.float32)
+    indptr = np.arange(0, n_rows * nnz_per_row + 1, nnz_per_row)
+    matrix = sp.csr_matrix((data, indices, indptr), shape=(n_rows, n_cols))
+    matrix.sum_duplicates()
+    return matrix
+
+def bench(name, fn, repeat=20):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = (time.perf_counter() - start) / repeat * 1000
+    print(f"  {name:<30} {elapsed:8.2f} ms/requête")
+    return elapsed
+
+def benchmark_scoring(n_rows=100000, dim=384, vocab=10000, top_k=5):
+    rng = np.random.default_rng(0)
+    
+    print(f"=== Dense: {n_rows} x {dim} ===")
+    dense = rng.normal(size=(n_rows, dim)).astype(np.float32)
+    query = rng.normal(size=(1, dim)).astype(np.float32)
+    engine = ScoringEngine(dense)
+    bench("cosine_similarity + argsort", lambda: legacy_rank(query, dense, top_k))
+    bench("ScoringEngine.rank", lambda: engine.rank(query, top_k, -0.1))
+    assert list(legacy_rank(query, dense, top_k)) == list(engine.rank(query, top_k, -0.1)[0])
+    
+    print(f"=== TF-IDF creux: {n_rows} x {vocab} ===")
+    sparse = random_csr(rng, n_rows, vocab, nnz_per_row=50)
+    sparse_query = random_csr(rng, 1, vocab, nnz_per_row=8)
+    engine = ScoringEngine(sparse)
+    bench("cosine_similarity + argsort", lambda: legacy_rank(sparse_query, sparse, top_k))
+    bench("ScoringEngine.rank", lambda: engine.rank(sparse_query, top_k, -0.1))
+    
+    print("=== Lot de 64 requêtes denses ===")
+    queries = rng.normal(size=(64, dim)).astype(np.float32)
+    engine = ScoringEngine(dense)
+    bench("64 x ScoringEngine.rank", lambda: [engine.rank(q[None], top_k, -0.1) for q in queries], repeat=3)
+    bench("ScoringEngine.rank_many", lambda: engine.rank_many(queries, top_k, -0.1), repeat=3)
+
+if __name__ == "__main__":
+    benchmark_scoring()
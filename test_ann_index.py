@@ -0,0 +1,85 @@
+import os
+import tempfile
+import numpy as np
+from app.vector_store.ann import IVFFlatIndex, normalize_rows
+from app.vector_store.embeddings import SentenceTransformerEmbeddings
+from app.vector_store.retriever import Retriever
+
+class HashEncoder:
+    """Encodeur déterministe remplaçant le modèle SentenceTransformer pour le test"""
+    def encode(self, texts, **kwargs):
+        return np.stack([np.random.default_rng(sum(map(ord, t))).normal(size=16) for t in texts]).astype(np.float32)
+
+def test_ivf_recall():
+    rng = np.random.default_rng(0)
+    # Données groupées, comme des embeddings de documents sur quelques thèmes
+    centers = rng.normal(size=(20, 64))
+    vectors = (centers[rng.integers(0, 20, size=5000)] + 0.3 * rng.normal(size=(5000, 64))).astype(np.float32)
+    queries = vectors[rng.choice(5000, size=50, replace=False)] + 0.1 * rng.normal(size=(50, 64))
+    
+    index = IVFFlatIndex(nprobe=16)
+    index.build(vectors)
+    
+    normalized = normalize_rows(vectors)
+    hits = 0
+    for query in queries:
+        exact = np.argsort(-(normalized @ normalize_rows(query[None])[0]))[:10]
+        approx, _ = index.search(query, vectors, top_k=10)
+        hits += len(set(exact) & set(approx))
+    recall = hits / (10 * len(queries))
+    print(f"Rappel@10 (nprobe=16): {recall:.3f}")
+    assert recall > 0.9
+    
+    # Ajout incrémental: nouvel index, l'index d'origine n'est pas modifié
+    grown = np.vstack([vectors, vectors[:10]])
+    extended = index.extended(vectors[:10])
+    assert index.size == 5000 and extended.size == 5010 and len(extended.parts) == 2
+    indices, _ = extended.search(vectors[0], grown, top_k=2, nprobe=4)
+    assert set(indices) == {0, 5000}
+    
+    # Fusion des parties: mêmes listes, dans l'ordre des lignes
+    merged = extended
+    for start in range(IVFFlatIndex.max_parts - 1):
+        merged = merged.extended(vectors[start:start + 1])
+    assert len(merged.parts) == 1 and merged.size == 5010 + IVFFlatIndex.max_parts - 1
+    offsets, ids = merged.parts[0]
+    assert sorted(ids.tolist()) == list(range(merged.size))
+    
+    # Sauvegarde / chargement
+    with tempfile.TemporaryDirectory() as indices_dir:
+        extended.save(indices_dir)
+        assert IVFFlatIndex.files(indices_dir) == ["ivf_centroids.npz", "ivf_lists_000000000.npz", "ivf_lists_000005000.npz"]
+        assert IVFFlatIndex.load(indices_dir, 5000) is None
+        reloaded = IVFFlatIndex.load(indices_dir, 5010)
+        assert reloaded.trained_size == 5000
+        assert np.array_equal(reloaded.search(vectors[0], grown, top_k=2, nprobe=4)[0], indices)
+
+def test_ivf_published_with_snapshots():
+    texts = [f"chunk {i} sur le thème {i % 13}" for i in range(300)]
+    chunks = [{"text": t, "metadata": {"doc_id": f"doc{i}", "chunk_id": 0}} for i, t in enumerate(texts)]
+    with tempfile.TemporaryDirectory() as indices_dir:
+        writer = SentenceTransformerEmbeddings(indices_dir=indices_dir, ann_index=True)
+        writer.model = HashEncoder()
+        writer.fit(texts, [f"doc{i}_0" for i in range(300)], chunks)
+        held = writer.snapshot
+        assert held.ann is not None and held.ann.size == 300
+        retriever = Retriever(writer, search_mode="approximate", nprobe=64)
+        assert retriever.search(texts[7], top_k=1)[0]["metadata"]["doc_id"] == "doc7"
+        
+        # Un ajout prolonge l'index dans une nouvelle version; celui de l'ancienne n'est pas modifié
+        writer.add_chunks(["chunk ajouté"], ["new_0"], [{"text": "chunk ajouté", "metadata": {"doc_id": "new", "chunk_id": 0}}])
+        snapshot = writer.snapshot
+        assert held.ann.size == 300 and snapshot.ann is not held.ann and snapshot.ann.size == 301
+        assert os.path.samefile(os.path.join(held.path, "st_ivf_centroids.npz"), os.path.join(snapshot.path, "st_ivf_centroids.npz"))
+        assert retriever.search("chunk ajouté", top_k=1)[0]["metadata"]["doc_id"] == "new"
+        
+        # Les recherches ne construisent ni n'écrivent d'index; un autre processus lit celui de la version
+        assert not [name for name in os.listdir(indices_dir) if name.startswith("ivf")]
+        reader = SentenceTransformerEmbeddings(indices_dir=indices_dir, ann_index=True)
+        reader.model = HashEncoder()
+        assert reader.snapshot.ann.size == 301 and len(reader.snapshot.ann.parts) == 2
+        assert Retriever(reader, search_mode="approximate", nprobe=64).search("chunk ajouté", top_k=1)[0]["metadata"]["doc_id"] == "new"
+
+if __name__ == "__main__":
+    test_ivf_recall()
+    test_ivf_published_with_snapshots()
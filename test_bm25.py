@@ -0,0 +1,133 @@
+import os
+import math
+import tempfile
+from collections import Counter
+from app.vector_store.bm25 import BM25Index, tokenize
+from app.vector_store.manager import VectorStoreManager
+
+def reference_bm25(texts, query, k1=1.5, b=0.75):
+    """Score BM25 calculé naïvement sur tout le corpus"""
+    docs = [Counter(tokenize(text)) for text in texts]
+    avg_length = sum(sum(doc.values()) for doc in docs) / len(docs)
+    scores = []
+    for doc in docs:
+        length = sum(doc.values())
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(1 for d in docs if term in d)
+            if term in doc:
+                idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+                score += idf * doc[term] * (k1 + 1) / (doc[term] + k1 * (1 - b + b * length / avg_length))
+        scores.append(score)
+    return scores
+
+def test_bm25_index():
+    texts = [
+        "Le PIB du Sénégal a augmenté en 2020",
+        "La population du Mali dépasse vingt millions",
+        "Le PIB par habitant du Mali reste faible, le PIB global progresse",
+        "Inflation et chômage au Niger",
+    ]
+    index = BM25Index()
+    for i, text in enumerate(texts):
+        index.add("doc", i, text)
+    
+    results = index.search("PIB du Mali", top_k=3)
+    expected = reference_bm25(texts, "PIB du Mali")
+    assert results[0][0] == ("doc", 2)
+    for (doc_id, chunk_id), score in results:
+        assert abs(score - expected[chunk_id]) < 1e-4
+    assert index.search("inexistant", top_k=3) == []
+    
+    # Suppression puis compaction
+    assert index.remove("doc", 2)
+    assert ("doc", 2) not in [key for key, _ in index.search("PIB Mali", top_k=5)]
+    index.compact()
+    assert index.dead_count == 0 and len(index) == 3
+    remaining = [texts[0], texts[1], texts[3]]
+    assert abs(index.search("PIB", top_k=1)[0][1] - reference_bm25(remaining, "PIB")[0]) < 1e-4
+    
+    # Sauvegarde / chargement puis ajout incrémental
+    with tempfile.TemporaryDirectory() as indices_dir:
+        path = os.path.join(indices_dir, "bm25_index.npz")
+        index.add("doc", 1, "Chômage au Mali")
+        index.save(path)
+        loaded = BM25Index.load(path)
+        assert len(loaded) == 3
+        assert loaded.search("chômage mali", top_k=2) == index.search("chômage mali", top_k=2)
+        loaded.add("doc2", 0, "Exportations de coton")
+        assert loaded.search("coton", top_k=1)[0][0] == ("doc2", 0)
+
+def test_bm25_journal():
+    texts = [f"Rapport {i} sur le commerce du pays {i % 7}" for i in range(50)]
+    with tempfile.TemporaryDirectory() as indices_dir:
+        path = os.path.join(indices_dir, "bm25_index.npz")
+        writer = BM25Index()
+        writer.add_chunks({"text": t, "metadata": {"doc_id": f"doc{i}", "chunk_id": 0}} for i, t in enumerate(texts))
+        writer.save(path)
+        base = os.path.getsize(path)
+        reader = BM25Index.load(path)
+        
+        # Une mise à jour est ajoutée au journal, le fichier de base n'est pas réécrit
+        chunk = {"text": "Exportations de coton du pays", "metadata": {"doc_id": "new", "chunk_id": 0}}
+        log_size = writer.update(path, [chunk], ["doc3"])
+        assert 0 < log_size < base and os.path.getsize(path) == base
+        assert reader.search("coton", top_k=1) == []
+        assert reader.replay(path) == 1 and reader.replay(path) == 0
+        assert reader.search("coton", top_k=1)[0][0] == ("new", 0)
+        assert len(reader) == len(writer) == 50
+        assert reader.search("commerce pays", top_k=50) == writer.search("commerce pays", top_k=50)
+        
+        # Une écriture interrompue n'est pas appliquée, puis est écrasée par la suivante
+        with open(BM25Index.log_path(path, writer.generation), "ab") as f:
+            f.write(b'{"remove": ["doc1"')
+        assert reader.replay(path) == 0
+        writer.update(path, [], ["doc2"])
+        assert reader.replay(path) == 1 and len(reader) == 49
+        
+        # Les scores ne portent que sur les lignes touchées, candidats compris
+        remaining = [t for i, t in enumerate(texts) if i not in (2, 3)] + [chunk["text"]]
+        keys = [("doc%d" % i, 0) for i in range(50) if i not in (2, 3)] + [("new", 0)]
+        expected = dict(zip(keys, reference_bm25(remaining, "commerce pays 4")))
+        for key, score in reader.search("commerce pays 4", top_k=5, candidates=[("doc4", 0), ("doc11", 0), ("doc2", 0)]):
+            assert key in (("doc4", 0), ("doc11", 0)) and abs(score - expected[key]) < 1e-4
+        
+        # Réécriture de la base: nouvelle génération, ancien journal supprimé, rechargement complet
+        old_log = BM25Index.log_path(path, writer.generation)
+        writer.save(path)
+        assert not os.path.exists(old_log) and writer.log_offset == 0
+        assert BM25Index.stamp(path) != reader.base_stamp
+        reloaded = BM25Index.load(path)
+        assert reloaded.generation == writer.generation and len(reloaded) == 49
+
+def test_keyword_index_updates_in_place():
+    chunks = [{"text": f"Rapport {i} sur le commerce du pays {i % 7}", "metadata": {"doc_id": f"doc{i}", "chunk_id": 0}}
+              for i in range(40)]
+    with tempfile.TemporaryDirectory() as indices_dir:
+        writer = VectorStoreManager(indices_dir=indices_dir, use_sentence_transformers=False)
+        assert writer.create_index(chunks)
+        reader = VectorStoreManager(indices_dir=indices_dir, use_sentence_transformers=False)
+        index = writer.keyword_index
+        base = os.stat(writer.keyword_index_path)
+        
+        # Ajout et suppression: même index en mémoire, fichier de base inchangé, journal relu par l'autre processus
+        added = {"text": "Exportations de coton", "metadata": {"doc_id": "new", "chunk_id": 0}}
+        assert writer.add_chunks([added], replace_documents=["doc5"])
+        assert writer.delete_documents(["doc6"]) >= 0
+        assert writer.keyword_index is index and len(index) == 39
+        assert os.stat(writer.keyword_index_path).st_ino == base.st_ino
+        reader._refresh_keyword_index()
+        assert len(reader.keyword_index) == 39
+        assert reader.keyword_index.search("coton", top_k=1)[0][0] == ("new", 0)
+        
+        # Journal plus gros que la base: réécriture dans une nouvelle génération, rechargée par l'autre processus
+        big = [{"text": f"Ajout {i} sur l'agriculture", "metadata": {"doc_id": "big", "chunk_id": i}} for i in range(200)]
+        assert writer.add_chunks(big)
+        assert os.stat(writer.keyword_index_path).st_ino != base.st_ino and index.log_offset == 0
+        reader._refresh_keyword_index()
+        assert len(reader.keyword_index) == 239 and reader.keyword_index.generation == index.generation
+
+if __name__ == "__main__":
+    test_bm25_index()
+    test_bm25_journal()
+    test_keyword_index_updates_in_place()
@@ -0,0 +1,44 @@
+import tempfile
+from app.vector_store.catalog import ChunkCatalog, make_chunk_id
+from app.vector_store.embeddings import TFIDFEmbeddings
+from app.vector_store.retriever import Retriever
+
+def make_chunks():
+    themes = ["intelligence artificielle", "machine learning", "modèles de langage"]
+    chunks = []
+    for doc_idx, theme in enumerate(themes):
+        for chunk_idx in range(3):
+            chunks.append({
+                "text": f"Document sur {theme}, partie {chunk_idx}. Le sujet {theme} est important.",
+                "metadata": {"doc_id": f"doc-{doc_idx}", "filename": f"{doc_idx}.txt", "chunk_id": chunk_idx,
+                             "type": "topic" if doc_idx == 0 else "country", "id": ["MAR", "TUN", "SEN"][doc_idx]}
+            })
+    return chunks
+
+def test_chunk_catalog():
+    chunks = make_chunks()
+    catalog = ChunkCatalog(chunks)
+    assert len(catalog) == len(chunks)
+    assert catalog.position("doc-1", 2) == 5
+    assert catalog.lookup("doc-2", 0)["metadata"]["doc_id"] == "doc-2"
+    assert catalog.row_ids()[0] == make_chunk_id("doc-0", 0)
+
+def test_retriever_uses_catalog():
+    chunks = make_chunks()
+    with tempfile.TemporaryDirectory() as indices_dir:
+        embeddings = TFIDFEmbeddings(indices_dir)
+        chunk_ids = [make_chunk_id(c["metadata"]["doc_id"], c["metadata"]["chunk_id"]) for c in chunks]
+        embeddings.fit([c["text"] for c in chunks], chunk_ids, chunks)
+        
+        # Recharger l'index depuis le disque: le catalogue doit être persisté avec lui
+        reloaded = TFIDFEmbeddings(indices_dir)
+        assert len(reloaded.catalog) == len(reloaded.chunk_ids)
+        
+        results = Retriever(reloaded).search("machine learning", top_k=2)
+        print(f"Résultats: {[(r['metadata']['doc_id'], r['score']) for r in results]}")
+        assert results
+        assert results[0]["metadata"]["doc_id"] == "doc-1"
+
+if __name__ == "__main__":
+    test_chunk_catalog()
+    test_retriever_uses_catalog()
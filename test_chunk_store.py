@@ -0,0 +1,40 @@
+import os
+import json
+import tempfile
+from app.document_processor.chunk_store import ChunkStore
+
+def test_chunk_store():
+    with tempfile.TemporaryDirectory() as storage_dir:
+        # Ancien format: un fichier JSON par document
+        chunks_dir = os.path.join(storage_dir, "chunks")
+        os.makedirs(chunks_dir)
+        legacy_chunks = [
+            {"text": f"Texte {i}", "metadata": {"doc_id": "doc-legacy", "filename": "a.txt", "chunk_id": i}}
+            for i in range(3)
+        ]
+        with open(os.path.join(chunks_dir, "doc-legacy.json"), "w", encoding="utf-8") as f:
+            json.dump(legacy_chunks, f)
+        
+        store = ChunkStore(os.path.join(storage_dir, "chunks.db"))
+        assert store.migrate_json_dir(chunks_dir) == 3
+        # La migration n'est effectuée qu'une seule fois
+        assert store.migrate_json_dir(chunks_dir) == 0
+        
+        store.add_chunks([
+            {"text": "Nouveau", "metadata": {"doc_id": "doc-new", "filename": "b.txt", "chunk_id": 0}}
+        ])
+        
+        assert store.count_chunks() == 4
+        assert store.count_documents() == 2
+        assert store.get_chunk("doc-legacy", 1)["text"] == "Texte 1"
+        assert [c["metadata"]["chunk_id"] for c in store.get_document_chunks("doc-legacy")] == [0, 1, 2]
+        assert len(list(store.iter_chunks(batch_size=2))) == 4
+        
+        # Suppression d'un document retrouvé par son nom de fichier
+        assert store.find_documents("a.txt") == ["doc-legacy"]
+        assert store.delete_document("doc-legacy") == 3
+        assert store.count_chunks() == 1 and store.find_documents("a.txt") == []
+        store.close()
+
+if __name__ == "__main__":
+    test_chunk_store()
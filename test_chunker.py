@@ -0,0 +1,83 @@
+import random
+import tempfile
+from app.document_processor.chunker import DocumentChunker
+from app.document_processor.manager import DocumentManager
+
+def reference_split(text, chunk_size, chunk_overlap):
+    """Découpage de référence (algorithme historique de split_text, textes seuls)"""
+    if len(text) <= chunk_size:
+        return [text]
+    paragraphs = [p for p in text.split('\n') if p.strip()]
+    chunks, current_chunk, current_size = [], [], 0
+    for paragraph in paragraphs:
+        if current_size + len(paragraph) > chunk_size and current_chunk:
+            chunks.append('\n'.join(current_chunk))
+            chars_to_keep, paragraphs_to_keep = 0, []
+            for p in reversed(current_chunk):
+                if chars_to_keep + len(p) <= chunk_overlap:
+                    chars_to_keep += len(p) + 1
+                    paragraphs_to_keep.insert(0, p)
+                else:
+                    break
+            current_chunk = paragraphs_to_keep
+            current_size = sum(len(p) for p in current_chunk) + len(current_chunk)
+        current_chunk.append(paragraph)
+        current_size += len(paragraph) + 1
+    if current_chunk:
+        chunks.append('\n'.join(current_chunk))
+    return chunks
+
+def random_text(rng):
+    lines = []
+    for _ in range(rng.randint(0, 120)):
+        kind = rng.random()
+        if kind < 0.15:
+            lines.append("")
+        elif kind < 0.2:
+            lines.append("   ")
+        else:
+            lines.append(" ".join(rng.choice(["PIB", "croissance", "inflation", "dette", "emploi"])
+                                  for _ in range(rng.randint(1, 60))))
+    return "\n".join(lines) + rng.choice(["", "\n", "\n\n"])
+
+def random_blocks(rng, text):
+    cuts = sorted(rng.sample(range(len(text) + 1), min(len(text) + 1, rng.randint(0, 12))))
+    return [text[start:stop] for start, stop in zip([0] + cuts, cuts + [len(text)])]
+
+def test_stream_matches_split_text():
+    rng = random.Random(7)
+    doc = {"id": "doc", "filename": "doc.txt"}
+    for _ in range(300):
+        chunk_size = rng.choice([50, 200, 1000])
+        chunker = DocumentChunker(chunk_size, rng.choice([0, 20, chunk_size // 5, chunk_size]))
+        text = random_text(rng)
+        expected = reference_split(text, chunker.chunk_size, chunker.chunk_overlap)
+        streamed = list(chunker.split_stream(random_blocks(rng, text), doc))
+        assert [chunk["text"] for chunk in streamed] == expected
+        assert [chunk["metadata"]["chunk_id"] for chunk in streamed] == list(range(len(expected)))
+        assert chunker.split_text(text, doc) == streamed
+
+def test_stream_is_lazy():
+    consumed = []
+    def pages():
+        for i in range(1000):
+            consumed.append(i)
+            yield f"Page {i}: " + "croissance économique " * 20 + "\n"
+    chunks = DocumentChunker(1000, 200).split_stream(pages(), {"id": "doc", "filename": "rapport.pdf"})
+    next(chunks)
+    assert len(consumed) < 10
+
+def test_streaming_ingestion():
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = DocumentManager(data_dir, chunk_size=200, chunk_overlap=50, dedup="off")
+        manager.ingest_batch_size = 3
+        text = random_text(random.Random(3))
+        doc_id = manager.process_document(text.encode("utf-8"), "rapport.txt", metadata={"type": "country"})
+        chunks = manager.get_chunks(doc_id)
+        assert [chunk["text"] for chunk in chunks] == reference_split(text, 200, 50)
+        assert all(chunk["metadata"]["type"] == "country" for chunk in chunks)
+
+if __name__ == "__main__":
+    test_stream_matches_split_text()
+    test_stream_is_lazy()
+    test_streaming_ingestion()
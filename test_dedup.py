@@ -0,0 +1,69 @@
+import re
+import zlib
+import tempfile
+from app.document_processor.manager import DocumentManager
+from app.document_processor.dedup import MERSENNE_PRIME
+
+PARAGRAPHS = [f"Le paragraphe {i} décrit la croissance économique, l'inflation et la dette publique du pays numéro {i}." for i in range(40)]
+
+def test_dedup_alias_and_release():
+    with tempfile.TemporaryDirectory() as storage_dir:
+        manager = DocumentManager(storage_dir, chunk_size=400, chunk_overlap=0)
+        text = "\n".join(PARAGRAPHS)
+        first = manager.process_document(text.encode("utf-8"), "rapport.txt")
+        # Même rapport republié avec une conclusion réécrite
+        revised = text.replace(PARAGRAPHS[39], "Une conclusion entièrement nouvelle sur les perspectives commerciales régionales.")
+        second = manager.process_document(revised.encode("utf-8"), "rapport-v2.txt")
+
+        first_chunks = manager.get_chunks(first)
+        second_chunks = manager.get_chunks(second)
+        aliases = [chunk for chunk in second_chunks if "duplicate_of" in chunk["metadata"]]
+        assert len(second_chunks) == len(first_chunks) and len(aliases) == len(first_chunks) - 1
+        assert all(chunk["metadata"]["duplicate_of"][0] == first for chunk in aliases)
+        assert len(list(manager.iter_indexable_chunks())) == len(first_chunks) + 1
+        stats = manager.dedup_stats()
+        assert stats["duplicates"] == len(aliases) and 0.4 < stats["ratio"] < 0.5
+
+        # Un document remplacé ne sert pas de référence
+        third = manager.process_document(text.encode("utf-8"), "rapport.txt", exclude_docs=[first, second])
+        assert not any("duplicate_of" in chunk["metadata"] for chunk in manager.get_chunks(third))
+
+        # Suppression du document canonique: ses alias deviennent canoniques
+        promoted = manager.release_aliases([first])
+        assert len(promoted) == len(aliases)
+        manager.delete_document(first)
+        assert not any("duplicate_of" in chunk["metadata"] for chunk in manager.get_chunks(second))
+        fourth = manager.process_document(PARAGRAPHS[0].encode("utf-8") + b"\n" + "\n".join(PARAGRAPHS[1:]).encode("utf-8"), "copie.txt")
+        assert all(chunk["metadata"]["duplicate_of"][0] in (second, third) for chunk in manager.get_chunks(fourth)[:-1])
+
+def test_dedup_skip():
+    with tempfile.TemporaryDirectory() as storage_dir:
+        manager = DocumentManager(storage_dir, dedup="skip")
+        manager.process_document("\n".join(PARAGRAPHS[:5]).encode("utf-8"), "a.txt")
+        doc_id = manager.process_document("\n".join(PARAGRAPHS[:5]).encode("utf-8"), "b.txt")
+        assert manager.get_chunks(doc_id) == [] and manager.count_chunks() == 1
+
+def test_signature_without_overflow():
+    with tempfile.TemporaryDirectory() as storage_dir:
+        manager = DocumentManager(storage_dir)
+        deduplicator = manager.deduplicator
+        text = " ".join(PARAGRAPHS[:3])
+        # Référence en entiers Python (sans débordement)
+        words = re.findall(r"\w+", text.lower())
+        hashes = {zlib.crc32(" ".join(words[i:i + 5]).encode("utf-8")) for i in range(len(words) - 4)}
+        expected = [min((int(a) * h + int(b)) % int(MERSENNE_PRIME) for h in hashes)
+                    for a, b in zip(deduplicator._a, deduplicator._b)]
+        assert deduplicator.signature(text).tolist() == expected
+
+        # Signatures produites par d'autres permutations: recalculées à l'ouverture du stockage
+        first = manager.process_document("\n".join(PARAGRAPHS).encode("utf-8"), "rapport.txt")
+        manager.chunk_store.set_meta("minhash_scheme", "1/128/16/5/1")
+        manager.chunk_store.clear_signatures()
+        reopened = DocumentManager(storage_dir)
+        copy = reopened.process_document("\n".join(PARAGRAPHS).encode("utf-8"), "copie.txt")
+        assert all(chunk["metadata"]["duplicate_of"][0] == first for chunk in reopened.get_chunks(copy))
+
+if __name__ == "__main__":
+    test_dedup_alias_and_release()
+    test_dedup_skip()
+    test_signature_without_overflow()
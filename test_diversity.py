@@ -0,0 +1,31 @@
+import numpy as np
+from app.vector_store.diversity import mmr_select, merge_adjacent
+
+def test_mmr_select():
+    query = np.array([1.0, 0.0, 0.0])
+    candidates = np.array([
+        [1.0, 0.10, 0.0],
+        [1.0, 0.11, 0.0],   # quasi-doublon du premier
+        [0.8, 0.0, 0.6],
+    ])
+    assert list(mmr_select(query, candidates, 2, lambda_=1.0)) == [0, 1]
+    assert list(mmr_select(query, candidates, 2, lambda_=0.5)) == [0, 2]
+    assert len(mmr_select(query, candidates, 10)) == 3
+
+def test_merge_adjacent():
+    def chunk(doc_id, chunk_id, text, score):
+        return {"text": text, "score": score, "metadata": {"doc_id": doc_id, "filename": f"{doc_id}.txt", "chunk_id": chunk_id}}
+    chunks = [
+        chunk("a", 2, "p3\np4\np5", 0.9),
+        chunk("b", 0, "q1", 0.8),
+        chunk("a", 1, "p1\np2\np3", 0.7),
+        chunk("a", 4, "p8", 0.6),
+    ]
+    merged = merge_adjacent(chunks)
+    assert [block["chunk_ids"] for block in merged] == [[1, 2], [0], [4]]
+    assert merged[0]["text"] == "p1\np2\np3\np4\np5" and merged[0]["score"] == 0.9
+    assert merged[0]["metadata"]["chunk_id"] == 1 and chunks[2]["metadata"]["chunk_id"] == 1
+
+if __name__ == "__main__":
+    test_mmr_select()
+    test_merge_adjacent()
@@ -1,31 +1,67 @@
 import os
+import tempfile
 from app.document_processor.manager import DocumentManager
 
 def test_document_processing():
-    # Initialiser le gestionnaire de documents
-    doc_manager = DocumentManager()
+    with tempfile.TemporaryDirectory() as storage_dir:
+        # Initialiser le gestionnaire de documents
+        doc_manager = DocumentManager(storage_dir)
     
-    # Créer un fichier texte de test
-    test_content = "Ceci est un document de test pour notre système RAG.\n" * 100
-    test_filename = "test_document.txt"
+        # Créer un fichier texte de test
+        test_content = "Ceci est un document de test pour notre système RAG.\n" * 100
+        test_filename = "test_document.txt"
     
-    # Convertir le contenu en bytes comme s'il était téléchargé
-    file_content = test_content.encode('utf-8')
+        # Convertir le contenu en bytes comme s'il était téléchargé
+        file_content = test_content.encode('utf-8')
     
-    # Traiter le document
-    doc_id = doc_manager.process_document(file_content, test_filename)
-    print(f"Document traité avec l'ID: {doc_id}")
+        # Traiter le document
+        doc_id = doc_manager.process_document(file_content, test_filename)
+        print(f"Document traité avec l'ID: {doc_id}")
     
-    # Récupérer les chunks
-    chunks = doc_manager.get_chunks(doc_id)
-    print(f"Nombre de chunks créés: {len(chunks)}")
+        # Récupérer les chunks
+        chunks = doc_manager.get_chunks(doc_id)
+        print(f"Nombre de chunks créés: {len(chunks)}")
     
-    # Afficher le premier chunk
-    if chunks:
-        print("\nPremier chunk:")
-        print(chunks[0]["text"][:200] + "...")
-        print("\nMétadonnées du premier chunk:")
-        print(chunks[0]["metadata"])
+        # Afficher le premier chunk
+        if chunks:
+            print("\nPremier chunk:")
+            print(chunks[0]["text"][:200] + "...")
+            print("\nMétadonnées du premier chunk:")
+            print(chunks[0]["metadata"])
+
+def test_failed_processing_leaves_nothing():
+    with tempfile.TemporaryDirectory() as storage_dir:
+        doc_manager = DocumentManager(storage_dir, chunk_size=100, chunk_overlap=0)
+        doc_manager.ingest_batch_size = 2
+        
+        # Échec au deuxième lot, après l'enregistrement des premiers chunks et de leurs signatures
+        add_chunks = doc_manager.chunk_store.add_chunks
+        calls = []
+        def failing_add_chunks(chunks):
+            calls.append(len(chunks))
+            if len(calls) == 2:
+                raise IOError("disque plein")
+            add_chunks(chunks)
+        doc_manager.chunk_store.add_chunks = failing_add_chunks
+        
+        content = "".join(f"Paragraphe {i} sur un sujet distinct numéro {i * 7}.\n\n" for i in range(40))
+        try:
+            doc_manager.process_document(content.encode("utf-8"), "partiel.txt")
+            assert False, "l'échec aurait dû être propagé"
+        except IOError:
+            pass
+        assert len(calls) == 2
+        assert doc_manager.count_chunks() == 0 and doc_manager.count_documents() == 0
+        assert os.listdir(doc_manager.docs_dir) == []
+        
+        # Format non supporté: aucun fichier n'est écrit
+        try:
+            doc_manager.process_document(b"data", "tableau.xlsx")
+            assert False, "le format aurait dû être refusé"
+        except ValueError:
+            pass
+        assert os.listdir(doc_manager.docs_dir) == []
 
 if __name__ == "__main__":
-    test_document_processing()
\ No newline at end of file
+    test_document_processing()
+    test_failed_processing_leaves_nothing()
\ No newline at end of file
@@ -0,0 +1,44 @@
+import tempfile
+import numpy as np
+from app.vector_store.embeddings import SentenceTransformerEmbeddings
+
+class HashEncoder:
+    """Encodeur déterministe remplaçant le modèle SentenceTransformer pour le test"""
+    def encode(self, texts, **kwargs):
+        return np.stack([np.random.default_rng(sum(map(ord, t))).normal(size=16) for t in texts]).astype(np.float32)
+
+WORDS = ["population", "croissance", "inflation", "commerce", "énergie", "dette", "emploi"]
+
+def make_chunks(start, count):
+    return [{"text": f"chunk {WORDS[i % 7]} {WORDS[(3 * i + 1) % 7]} numéro {i}", "metadata": {"doc_id": f"doc{i}", "chunk_id": 0}}
+            for i in range(start, start + count)]
+
+def add(embeddings, chunks, fit=False):
+    texts = [chunk["text"] for chunk in chunks]
+    ids = [f"{chunk['metadata']['doc_id']}_0" for chunk in chunks]
+    (embeddings.fit if fit else embeddings.add_chunks)(texts, ids, chunks)
+
+def test_embedding_cache():
+    class CountingEncoder(HashEncoder):
+        encoded = 0
+        def encode(self, texts, **kwargs):
+            CountingEncoder.encoded += len(texts)
+            return super().encode(texts)
+
+    with tempfile.TemporaryDirectory() as indices_dir:
+        embeddings = SentenceTransformerEmbeddings(indices_dir=indices_dir)
+        embeddings.model = CountingEncoder()
+        add(embeddings, make_chunks(0, 50), fit=True)
+        first = np.array(embeddings.doc_vectors)
+        assert CountingEncoder.encoded == 50
+
+        # Reconstruction complète: aucun texte inchangé n'est réencodé, même par un autre processus
+        rebuilt = SentenceTransformerEmbeddings(indices_dir=indices_dir)
+        rebuilt.model = embeddings.model
+        add(rebuilt, make_chunks(0, 50) + make_chunks(50, 5), fit=True)
+        assert CountingEncoder.encoded == 55
+        assert np.array_equal(np.asarray(rebuilt.doc_vectors[:50]), first)
+        assert rebuilt.embedding_cache.stats()["hits"] == 50
+
+if __name__ == "__main__":
+    test_embedding_cache()
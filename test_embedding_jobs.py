@@ -0,0 +1,62 @@
+import os
+import tempfile
+import numpy as np
+from app.vector_store.embedding_jobs import EmbeddingJobRunner
+
+class LengthEncoder:
+    """Encodeur déterministe: longueur et somme des caractères du texte"""
+    calls = []
+    def encode(self, texts, batch_size=32, **kwargs):
+        LengthEncoder.calls.append([len(text) for text in texts])
+        return np.array([[len(text), sum(map(ord, text)) % 97] for text in texts], dtype=np.float32)
+
+class FailingEncoder(LengthEncoder):
+    """Encodeur interrompu au troisième lot"""
+    def encode(self, texts, batch_size=32, **kwargs):
+        if len(LengthEncoder.calls) == 2:
+            raise RuntimeError("interruption")
+        return super().encode(texts)
+
+TEXTS = [("mot " * ((i * 7) % 23)) + str(i) for i in range(50)]
+
+def test_length_sorted_batches():
+    with tempfile.TemporaryDirectory() as jobs_dir:
+        LengthEncoder.calls = []
+        output = os.path.join(jobs_dir, "job.npy")
+        vectors = EmbeddingJobRunner(encoder=LengthEncoder(), batch_size=8).run(TEXTS, output)
+        assert np.array_equal(vectors, LengthEncoder().encode(TEXTS))
+        # Lots de longueurs croissantes
+        lengths = [length for batch in LengthEncoder.calls[:-1] for length in batch]
+        assert lengths == sorted(lengths) and len(LengthEncoder.calls) == 8
+        assert not os.path.exists(output + ".progress.json")
+
+def test_process_pool():
+    with tempfile.TemporaryDirectory() as jobs_dir:
+        progress = []
+        runner = EmbeddingJobRunner(encoder_factory=LengthEncoder, batch_size=8, workers=2,
+                                    progress_callback=lambda done, total: progress.append((done, total)))
+        vectors = runner.run(TEXTS, os.path.join(jobs_dir, "job.npy"))
+        assert np.array_equal(vectors, LengthEncoder().encode(TEXTS))
+        assert progress[-1] == (50, 50) and len(progress) == 7
+
+def test_resume_after_crash():
+    with tempfile.TemporaryDirectory() as jobs_dir:
+        output = os.path.join(jobs_dir, "job.npy")
+        LengthEncoder.calls = []
+        try:
+            EmbeddingJobRunner(encoder=FailingEncoder(), batch_size=8, checkpoint_interval=0).run(TEXTS, output)
+            assert False, "l'encodage aurait dû être interrompu"
+        except RuntimeError:
+            pass
+        assert os.path.exists(output + ".progress.json")
+
+        # Reprise: seuls les lots non écrits sont encodés
+        LengthEncoder.calls = []
+        vectors = EmbeddingJobRunner(encoder=LengthEncoder(), batch_size=8).run(TEXTS, output)
+        assert sum(len(batch) for batch in LengthEncoder.calls) == 50 - 16
+        assert np.array_equal(vectors, LengthEncoder().encode(TEXTS))
+
+if __name__ == "__main__":
+    test_length_sorted_batches()
+    test_process_pool()
+    test_resume_after_crash()
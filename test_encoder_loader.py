@@ -0,0 +1,112 @@
+import tempfile
+import threading
+import numpy as np
+from app.vector_store.encoder_loader import EncoderLoader, EncoderNotReadyError
+from app.vector_store.embeddings import SentenceTransformerEmbeddings
+from app.vector_store.retriever import Retriever
+from app.vector_store import embeddings as embeddings_module
+
+class HashEncoder:
+    """Encodeur déterministe remplaçant le modèle SentenceTransformer pour le test"""
+    def encode(self, texts, **kwargs):
+        return np.stack([np.random.default_rng(sum(map(ord, t))).normal(size=16) for t in texts]).astype(np.float32)
+
+WORDS = ["population", "croissance", "inflation", "commerce", "énergie", "dette", "emploi"]
+
+def make_chunks(start, count):
+    return [{"text": f"chunk {WORDS[i % 7]} {WORDS[(3 * i + 1) % 7]} numéro {i}", "metadata": {"doc_id": f"doc{i}", "chunk_id": 0}}
+            for i in range(start, start + count)]
+
+def add(embeddings, chunks, fit=False):
+    texts = [chunk["text"] for chunk in chunks]
+    ids = [f"{chunk['metadata']['doc_id']}_0" for chunk in chunks]
+    (embeddings.fit if fit else embeddings.add_chunks)(texts, ids, chunks)
+
+def test_background_encoder_loading():
+    with tempfile.TemporaryDirectory() as indices_dir:
+        writer = SentenceTransformerEmbeddings(indices_dir=indices_dir)
+        writer.model = HashEncoder()
+        add(writer, make_chunks(0, 20), fit=True)
+
+        # Redémarrage sur un index sauvegardé: le modèle se charge en arrière-plan
+        release = threading.Event()
+        warmed = []
+
+        class SlowEncoder(HashEncoder):
+            def encode(self, texts, **kwargs):
+                warmed.append(list(texts))
+                return super().encode(texts)
+
+        def factory():
+            release.wait(5)
+            return SlowEncoder()
+
+        reader = SentenceTransformerEmbeddings(indices_dir=indices_dir, preload=False)
+        reader.model_loader = EncoderLoader(factory)
+        reader.model_loader.start()
+        assert not reader.ready and reader.encoder_status()["state"] == "loading"
+        assert len(reader.chunk_ids) == 20
+
+        # Une requête arrivant pendant le chargement l'attend au lieu d'échouer
+        release.set()
+        vector = reader.transform("croissance de la population")
+        assert np.allclose(vector, writer.transform("croissance de la population"))
+        status = reader.encoder_status()
+        assert reader.ready and status["state"] == "ready" and warmed[0] == ["warm-up"]
+
+def test_startup_does_not_wait_for_encoder():
+    release = threading.Event()
+    def slow_factory(model_name):
+        release.wait(5)
+        return HashEncoder()
+    def failing_factory(model_name):
+        raise OSError("modèle introuvable")
+    
+    load = embeddings_module.load_sentence_transformer
+    try:
+        with tempfile.TemporaryDirectory() as indices_dir:
+            # Sans index: le constructeur rend la main pendant le chargement, l'entraînement l'attend
+            embeddings_module.load_sentence_transformer = slow_factory
+            writer = SentenceTransformerEmbeddings(indices_dir=indices_dir)
+            assert writer.encoder_status()["state"] == "loading" and not writer.ready
+            release.set()
+            add(writer, make_chunks(0, 20), fit=True)
+            assert writer.ready and not writer._uses_fallback() and len(writer.chunk_ids) == 20
+            
+            # Chargement différé (preload=False): la consultation de l'état le lance
+            reader = SentenceTransformerEmbeddings(indices_dir=indices_dir, preload=False)
+            assert reader.model_loader.state == "idle"
+            assert reader.encoder_status()["state"] in ("loading", "warming", "ready")
+            assert reader.model_loader.wait(5) is not None
+            
+            # Modèle encore en chargement au-delà du délai accordé à la requête: le service chauffe
+            blocked = threading.Event()
+            def blocked_factory(model_name):
+                blocked.wait(5)
+                return HashEncoder()
+            embeddings_module.load_sentence_transformer = blocked_factory
+            waiting = SentenceTransformerEmbeddings(indices_dir=indices_dir, query_wait_timeout=0.05)
+            try:
+                Retriever(waiting).search("chunk dette inflation", top_k=3)
+                assert False, "la recherche aurait dû signaler le préchauffage"
+            except EncoderNotReadyError:
+                pass
+            blocked.set()
+            assert waiting.model_loader.wait(5) is not None
+            assert len(Retriever(waiting).search("chunk dette inflation", top_k=3)) == 3
+        
+        with tempfile.TemporaryDirectory() as indices_dir:
+            # Échec du chargement: l'index TF-IDF de secours est créé au moment où l'échec est constaté
+            embeddings_module.load_sentence_transformer = failing_factory
+            fallback = SentenceTransformerEmbeddings(indices_dir=indices_dir)
+            add(fallback, make_chunks(0, 20), fit=True)
+            assert fallback.encoder_status()["state"] == "failed" and fallback._uses_fallback()
+            assert len(fallback.chunk_ids) == 20
+            results = Retriever(fallback).search("chunk dette inflation", top_k=3)
+            assert {r["metadata"]["doc_id"] for r in results} == {"doc5", "doc12", "doc19"}
+    finally:
+        embeddings_module.load_sentence_transformer = load
+
+if __name__ == "__main__":
+    test_background_encoder_loading()
+    test_startup_does_not_wait_for_encoder()
@@ -0,0 +1,40 @@
+import tempfile
+from app.vector_store.catalog import ChunkCatalog, make_chunk_id
+from app.vector_store.embeddings import TFIDFEmbeddings
+from app.vector_store.retriever import Retriever
+
+def make_chunks():
+    themes = ["intelligence artificielle", "machine learning", "modèles de langage"]
+    chunks = []
+    for doc_idx, theme in enumerate(themes):
+        for chunk_idx in range(3):
+            chunks.append({
+                "text": f"Document sur {theme}, partie {chunk_idx}. Le sujet {theme} est important.",
+                "metadata": {"doc_id": f"doc-{doc_idx}", "filename": f"{doc_idx}.txt", "chunk_id": chunk_idx,
+                             "type": "topic" if doc_idx == 0 else "country", "id": ["MAR", "TUN", "SEN"][doc_idx]}
+            })
+    return chunks
+
+def test_filtered_search():
+    chunks = make_chunks()
+    catalog = ChunkCatalog(chunks)
+    assert list(catalog.filter_rows({"type": "country"})) == [3, 4, 5, 6, 7, 8]
+    assert list(catalog.filter_rows({"type": "country", "id": ["SEN", "MAR"]})) == [6, 7, 8]
+    assert len(catalog.filter_rows({"id": "BRA"})) == 0
+    
+    with tempfile.TemporaryDirectory() as indices_dir:
+        embeddings = TFIDFEmbeddings(indices_dir)
+        chunk_ids = [make_chunk_id(c["metadata"]["doc_id"], c["metadata"]["chunk_id"]) for c in chunks]
+        embeddings.fit([c["text"] for c in chunks], chunk_ids, chunks)
+        retriever = Retriever(embeddings)
+        
+        # Seuls les chunks correspondant au filtre sont scorés
+        results = retriever.search("machine learning", top_k=3, filters={"id": "SEN"})
+        assert results and all(r["metadata"]["id"] == "SEN" for r in results)
+        unfiltered = {r["metadata"]["chunk_id"]: r["score"] for r in retriever.search("modèles de langage", top_k=3)}
+        filtered = retriever.search("modèles de langage", top_k=3, filters={"type": "country", "id": "SEN"})
+        assert {r["metadata"]["chunk_id"]: r["score"] for r in filtered} == unfiltered
+        assert retriever.search("machine learning", filters={"id": "BRA"}) == []
+
+if __name__ == "__main__":
+    test_filtered_search()
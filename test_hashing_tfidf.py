@@ -0,0 +1,44 @@
+import os
+import tempfile
+import numpy as np
+from app.vector_store.embeddings import HashingTFIDFEmbeddings
+from app.vector_store.retriever import Retriever
+
+WORDS = ["population", "croissance", "inflation", "commerce", "énergie", "dette", "emploi"]
+
+def make_chunks(start, count):
+    return [{"text": f"chunk {WORDS[i % 7]} {WORDS[(3 * i + 1) % 7]} numéro {i}", "metadata": {"doc_id": f"doc{i}", "chunk_id": 0}}
+            for i in range(start, start + count)]
+
+def add(embeddings, chunks, fit=False):
+    texts = [chunk["text"] for chunk in chunks]
+    ids = [f"{chunk['metadata']['doc_id']}_0" for chunk in chunks]
+    (embeddings.fit if fit else embeddings.add_chunks)(texts, ids, chunks)
+
+def test_hashing_tfidf_incremental():
+    with tempfile.TemporaryDirectory() as indices_dir:
+        embeddings = HashingTFIDFEmbeddings(indices_dir, reweight_ratio=0.5)
+        add(embeddings, make_chunks(0, 20), fit=True)
+        first_rows = embeddings.doc_vectors[:20].toarray()
+
+        # Ajout sous le seuil de recalcul de l'IDF: les lignes existantes ne sont pas modifiées,
+        # le nouveau segment est écrit à côté des précédents
+        add(embeddings, make_chunks(20, 5))
+        assert np.array_equal(embeddings.doc_vectors[:20].toarray(), first_rows)
+        assert len(embeddings._segments(embeddings.snapshot.path)) == 2
+        results = Retriever(embeddings).search("chunk dette énergie numéro 22", top_k=1)
+        assert results[0]["metadata"]["doc_id"] == "doc22"
+
+        # Au-delà du seuil, l'IDF est recalculé comme si l'index avait été construit d'un coup
+        add(embeddings, make_chunks(25, 10))
+        rebuilt = HashingTFIDFEmbeddings(os.path.join(indices_dir, "rebuilt"))
+        add(rebuilt, make_chunks(0, 35), fit=True)
+        assert np.allclose(embeddings.doc_vectors.toarray(), rebuilt.doc_vectors.toarray(), atol=1e-6)
+
+        # Rechargement depuis le disque
+        reader = HashingTFIDFEmbeddings(indices_dir)
+        assert reader.snapshot.version == embeddings.snapshot.version and len(reader.catalog) == 35
+        assert np.allclose(reader.doc_vectors.toarray(), embeddings.doc_vectors.toarray())
+
+if __name__ == "__main__":
+    test_hashing_tfidf_incremental()
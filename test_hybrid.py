@@ -0,0 +1,57 @@
+import threading
+from app.vector_store.hybrid import HybridRetriever
+
+def test_hybrid_fusion():
+    def chunk(i, score):
+        return {"text": f"Chunk {i}", "metadata": {"doc_id": "doc", "chunk_id": i}, "score": score}
+    
+    dense = lambda query, top_k, threshold, filters: [chunk(0, 0.9), chunk(1, 0.8)][:top_k]
+    sparse = lambda query, top_k, filters: [chunk(3, 12.0), chunk(1, 7.0), chunk(2, 1.0)][:top_k]
+    
+    # Le chunk 1 est bien classé dans les deux branches
+    hybrid = HybridRetriever(dense, sparse)
+    results = hybrid.search("question", top_k=2)
+    assert [r["metadata"]["chunk_id"] for r in results] == [1, 0]
+    assert results[0]["text"] == "Chunk 1"
+    assert set(hybrid.last_timings) == {"dense_ms", "sparse_ms", "fusion_ms", "total_ms"}
+    
+    weighted = HybridRetriever(dense, sparse, fusion="weighted", dense_weight=0.8)
+    assert weighted.search("question", top_k=1)[0]["metadata"]["chunk_id"] == 0
+    
+    # Une branche en erreur n'empêche pas la recherche
+    def failing(query, top_k, filters):
+        raise RuntimeError("index indisponible")
+    assert len(HybridRetriever(dense, failing).search("question", top_k=3)) == 2
+    
+    # Les deux branches d'une requête se chevauchent: la branche creuse s'exécute dans le pool
+    # pendant que la branche dense occupe le thread de la requête
+    branch_threads = {"dense": [], "sparse": []}
+    def overlapping(branches):
+        barrier = threading.Barrier(2 * branches, timeout=5)
+        def blocking_dense(query, top_k, threshold, filters):
+            branch_threads["dense"].append(threading.current_thread().name)
+            barrier.wait()
+            return dense(query, top_k, threshold, filters)
+        def blocking_sparse(query, top_k, filters):
+            branch_threads["sparse"].append(threading.current_thread().name)
+            barrier.wait()
+            return sparse(query, top_k, filters)
+        return barrier, HybridRetriever(blocking_dense, blocking_sparse, sparse_workers=branches)
+    barrier, single = overlapping(1)
+    assert [r["metadata"]["chunk_id"] for r in single.search("question", top_k=2)] == [1, 0]
+    assert not barrier.broken and branch_threads["sparse"][0].startswith("hybrid-sparse")
+    
+    # Requêtes concurrentes: aucune n'attend derrière les autres tant que le pool a un thread libre
+    branch_threads = {"dense": [], "sparse": []}
+    barrier, concurrent = overlapping(4)
+    threads = [threading.Thread(target=concurrent.search, args=("question",), name=f"requete-{i}") for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not barrier.broken
+    assert sorted(branch_threads["dense"]) == [f"requete-{i}" for i in range(4)]
+    assert len(branch_threads["sparse"]) == 4
+
+if __name__ == "__main__":
+    test_hybrid_fusion()
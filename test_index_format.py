@@ -0,0 +1,91 @@
+import os
+import tempfile
+import threading
+import uuid
+import pickle
+import numpy as np
+from app.vector_store.index_format import IndexFormatError, load_chunk_ids, verify_index_file, write_index_file, read_index_file
+from app.vector_store.embeddings import TFIDFEmbeddings
+
+WORDS = ["population", "croissance", "inflation", "commerce", "énergie", "dette", "emploi"]
+
+def make_chunks(start, count):
+    return [{"text": f"chunk {WORDS[i % 7]} {WORDS[(3 * i + 1) % 7]} numéro {i}", "metadata": {"doc_id": f"doc{i}", "chunk_id": 0}}
+            for i in range(start, start + count)]
+
+def add(embeddings, chunks, fit=False):
+    texts = [chunk["text"] for chunk in chunks]
+    ids = [f"{chunk['metadata']['doc_id']}_0" for chunk in chunks]
+    (embeddings.fit if fit else embeddings.add_chunks)(texts, ids, chunks)
+
+def test_binary_index_format():
+    with tempfile.TemporaryDirectory() as indices_dir:
+        chunks = make_chunks(0, 40)
+        for chunk in chunks:
+            chunk["metadata"]["doc_id"] = str(uuid.uuid5(uuid.NAMESPACE_OID, chunk["metadata"]["doc_id"]))
+        writer = TFIDFEmbeddings(indices_dir)
+        add(writer, chunks, fit=True)
+        assert not [name for name in os.listdir(writer.snapshot.path) if name.endswith(".pkl")]
+
+        # Rechargement sans pickle: mêmes identifiants, mêmes vecteurs de requête
+        reader = TFIDFEmbeddings(indices_dir)
+        assert reader.chunk_ids == writer.chunk_ids
+        query = "croissance de la population"
+        assert np.allclose(reader.transform(query).toarray(), writer.transform(query).toarray(), atol=1e-6)
+        assert reader.document_rows([chunks[3]["metadata"]["doc_id"]]) == [3]
+        assert reader.delete_documents([chunks[5]["metadata"]["doc_id"]]) == 1
+
+        # Un fichier corrompu est refusé par la vérification explicite
+        # (le chargement courant n'ouvre les sections qu'en mmap, sans les lire)
+        path = os.path.join(writer.snapshot.path, "tfidf_chunk_ids.idx")
+        verify_index_file(path)
+        with open(path, "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_END)
+            f.write(bytes([byte[0] ^ 0xFF]))
+        assert isinstance(load_chunk_ids(path).chunk_numbers, np.memmap)
+        try:
+            verify_index_file(path)
+            assert False, "la somme de contrôle aurait dû échouer"
+        except IndexFormatError:
+            pass
+
+    # Un index antérieur (identifiants et vectoriseur picklés) reste lisible
+    with tempfile.TemporaryDirectory() as indices_dir:
+        legacy = TFIDFEmbeddings(indices_dir)
+        add(legacy, make_chunks(0, 20), fit=True)
+        directory = legacy.snapshot.path
+        os.remove(os.path.join(directory, "tfidf_chunk_ids.idx"))
+        os.remove(os.path.join(directory, "tfidf_vectorizer.idx"))
+        with open(os.path.join(directory, "tfidf_chunk_ids.pkl"), "wb") as f:
+            pickle.dump(list(legacy.chunk_ids), f)
+        with open(os.path.join(directory, "tfidf_vectorizer.pkl"), "wb") as f:
+            pickle.dump(legacy.vectorizer, f)
+        assert TFIDFEmbeddings(indices_dir).chunk_ids == legacy.chunk_ids
+
+def test_concurrent_index_file_writers():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "shared.idx")
+        errors = []
+
+        def write(value):
+            try:
+                for _ in range(20):
+                    write_index_file(path, {"values": np.full(1000, value, dtype=np.int32)})
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=write, args=(value,)) for value in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # Chaque écrivain a son propre fichier temporaire: le fichier publié est toujours complet
+        assert not errors and os.listdir(directory) == ["shared.idx"]
+        values = read_index_file(path)[0]["values"]
+        assert len(set(values.tolist())) == 1
+
+if __name__ == "__main__":
+    test_binary_index_format()
+    test_concurrent_index_file_writers()
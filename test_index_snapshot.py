@@ -0,0 +1,196 @@
+import os
+import tempfile
+import threading
+import multiprocessing
+import numpy as np
+from app.vector_store.index_format import save_chunk_ids
+from app.vector_store.embeddings import SentenceTransformerEmbeddings, TFIDFEmbeddings, HashingTFIDFEmbeddings
+from app.vector_store.retriever import Retriever
+
+class HashEncoder:
+    """Encodeur déterministe remplaçant le modèle SentenceTransformer pour le test"""
+    def encode(self, texts, **kwargs):
+        return np.stack([np.random.default_rng(sum(map(ord, t))).normal(size=16) for t in texts]).astype(np.float32)
+
+WORDS = ["population", "croissance", "inflation", "commerce", "énergie", "dette", "emploi"]
+
+def make_chunks(start, count):
+    return [{"text": f"chunk {WORDS[i % 7]} {WORDS[(3 * i + 1) % 7]} numéro {i}", "metadata": {"doc_id": f"doc{i}", "chunk_id": 0}}
+            for i in range(start, start + count)]
+
+def add(embeddings, chunks, fit=False):
+    texts = [chunk["text"] for chunk in chunks]
+    ids = [f"{chunk['metadata']['doc_id']}_0" for chunk in chunks]
+    (embeddings.fit if fit else embeddings.add_chunks)(texts, ids, chunks)
+
+def test_snapshot_versions():
+    with tempfile.TemporaryDirectory() as indices_dir:
+        writer = SentenceTransformerEmbeddings(indices_dir=indices_dir)
+        writer.model = HashEncoder()
+        add(writer, make_chunks(0, 100), fit=True)
+        assert writer.snapshot.version == 1
+
+        # Un autre processus charge la version publiée
+        reader = SentenceTransformerEmbeddings(indices_dir=indices_dir)
+        assert reader.snapshot.version == 1 and len(reader.chunk_ids) == 100
+
+        # Un snapshot lu avant une mise à jour reste cohérent et inchangé
+        held = writer.snapshot
+        add(writer, make_chunks(100, 10))
+        assert writer.snapshot.version == 2 and len(writer.chunk_ids) == 110
+        assert len(held.chunk_ids) == len(held.catalog) == held.doc_vectors.shape[0] == 100
+
+        # Le lecteur détecte la nouvelle version
+        assert reader.refresh(force=True)
+        assert reader.snapshot.version == 2 and reader.doc_vectors.shape[0] == len(reader.catalog) == 110
+        assert not reader.refresh(force=True)
+
+        # Seules les dernières versions sont conservées
+        for i in range(4):
+            add(writer, make_chunks(110 + i, 1))
+        versions = sorted(name for name in os.listdir(writer.snapshots.root) if name.startswith("v"))
+        assert versions == ["v000004", "v000005", "v000006"]
+
+def test_concurrent_search_during_updates():
+    with tempfile.TemporaryDirectory() as indices_dir:
+        embeddings = TFIDFEmbeddings(indices_dir)
+        add(embeddings, make_chunks(0, 50), fit=True)
+        retriever = Retriever(embeddings)
+        errors = []
+
+        def search():
+            for _ in range(50):
+                try:
+                    results = retriever.search("inflation et commerce", top_k=3)
+                    assert results and all(result["text"].startswith("chunk") for result in results)
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=search) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for i in range(5):
+            add(embeddings, make_chunks(50 + 10 * i, 10))
+        for thread in threads:
+            thread.join()
+        assert not errors
+        assert len(embeddings.chunk_ids) == len(embeddings.catalog) == 100
+
+def add_in_process(indices_dir, start):
+    add(HashingTFIDFEmbeddings(indices_dir), make_chunks(start, 5))
+
+def test_writers_in_several_processes():
+    with tempfile.TemporaryDirectory() as indices_dir:
+        first = HashingTFIDFEmbeddings(indices_dir)
+        add(first, make_chunks(0, 10), fit=True)
+        # Écrivain dont le snapshot en mémoire est en retard sur la version publiée
+        stale = HashingTFIDFEmbeddings(indices_dir)
+        add(first, make_chunks(10, 5))
+        add(stale, make_chunks(15, 5))
+        assert len(stale.chunk_ids) == 20
+
+        context = multiprocessing.get_context("fork")
+        processes = [context.Process(target=add_in_process, args=(indices_dir, 20 + 5 * i)) for i in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert all(process.exitcode == 0 for process in processes)
+
+        # Aucune mise à jour perdue: chaque processus a construit sur la version du précédent
+        reader = HashingTFIDFEmbeddings(indices_dir)
+        assert sorted(reader.chunk_ids) == sorted(f"doc{i}_0" for i in range(40))
+        assert reader.snapshot.version == 7
+
+def test_delete_and_compact():
+    with tempfile.TemporaryDirectory() as indices_dir:
+        embeddings = SentenceTransformerEmbeddings(indices_dir=indices_dir, vector_dtype="int8")
+        embeddings.model = HashEncoder()
+        add(embeddings, make_chunks(0, 20), fit=True)
+        target = embeddings.transform("chunk inflation emploi numéro 2")
+        retriever = Retriever(embeddings)
+        assert retriever.search("chunk inflation emploi numéro 2", top_k=1)[0]["metadata"]["doc_id"] == "doc2"
+
+        # Suppression: la ligne reste dans l'index mais n'est plus retournée, ici comme dans un autre processus
+        assert embeddings.delete_documents(["doc2"]) == 1
+        assert embeddings.snapshot.dead_count == 1 and len(embeddings.chunk_ids) == 20
+        reader = SentenceTransformerEmbeddings(indices_dir=indices_dir, vector_dtype="int8")
+        reader.model = HashEncoder()
+        for index in (embeddings, reader):
+            results = Retriever(index).search("chunk inflation emploi numéro 2", top_k=20, threshold=-2.0)
+            assert len(results) == 19 and "doc2" not in {r["metadata"]["doc_id"] for r in results}
+        assert not Retriever(embeddings).search("x", top_k=5, filters={"doc_id": "doc2"})
+
+        # Mise à jour: l'ancienne version est supprimée dans la même version que l'ajout
+        replacement = [{"text": "chunk inflation emploi numéro 2", "metadata": {"doc_id": "doc2b", "chunk_id": 0}}]
+        version = embeddings.snapshot.version
+        embeddings.add_chunks(["chunk inflation emploi numéro 2"], ["doc2b_0"], replacement, replace_documents=["doc5"])
+        assert embeddings.snapshot.version == version + 1 and embeddings.snapshot.dead_count == 2
+        assert retriever.search("chunk inflation emploi numéro 2", top_k=1)[0]["metadata"]["doc_id"] == "doc2b"
+
+        # Compaction: nouvelle version sans les lignes supprimées
+        assert embeddings.compact() and not embeddings.compact()
+        snapshot = embeddings.snapshot
+        assert snapshot.deleted is None and len(snapshot.chunk_ids) == len(snapshot.catalog) == len(snapshot.quantized) == 19
+        assert "doc2_0" not in snapshot.chunk_ids and "doc5_0" not in snapshot.chunk_ids
+        assert isinstance(snapshot.doc_vectors, np.memmap)
+        assert np.allclose(snapshot.doc_vectors[snapshot.chunk_ids.index("doc2b_0")], target[0])
+        assert reader.refresh(force=True) and reader.snapshot.deleted is None
+
+def test_append_only_files():
+    with tempfile.TemporaryDirectory() as indices_dir:
+        writer = SentenceTransformerEmbeddings(indices_dir=indices_dir, vector_dtype="int8")
+        writer.model = HashEncoder()
+        writer.max_id_segments = 3
+        add(writer, make_chunks(0, 30), fit=True)
+        held = writer.snapshot
+
+        # Un ajout prolonge les fichiers de la version précédente (liens physiques), sans les recopier
+        add(writer, make_chunks(30, 5))
+        snapshot = writer.snapshot
+        for name in ("st_vectors.f32", "st_vectors.int8", "st_catalog.jsonl", "st_chunk_ids_000000000.idx"):
+            assert os.path.samefile(os.path.join(held.path, name), os.path.join(snapshot.path, name))
+        assert os.path.exists(os.path.join(snapshot.path, "st_chunk_ids_000000030.idx"))
+        assert snapshot.catalog._rows is held.catalog._rows
+
+        # L'ancienne version ne voit que ses lignes, en mémoire comme relue depuis le disque
+        assert len(held.catalog) == len(held.chunk_ids) == 30 and held.catalog.lookup("doc31", 0) is None
+        assert held.catalog.filter_rows({"doc_id": ["doc2", "doc31"]}).tolist() == [2]
+        old = writer._read_snapshot(held.path, held.version)
+        assert len(old.chunk_ids) == len(old.catalog) == old.doc_vectors.shape[0] == len(old.quantized) == 30
+        assert snapshot.catalog.filter_rows({"doc_id": ["doc2", "doc31"]}).tolist() == [2, 31]
+
+        # Les restes d'un ajout abandonné sont ignorés puis écrasés par l'ajout suivant
+        with open(os.path.join(snapshot.path, "st_vectors.f32"), "ab") as f:
+            f.write(b"\xff" * 100)
+        for start in (35, 40, 45):
+            add(writer, make_chunks(start, 5))
+        reader = SentenceTransformerEmbeddings(indices_dir=indices_dir, vector_dtype="int8")
+        assert reader.chunk_ids == [f"doc{i}_0" for i in range(50)]
+        assert np.allclose(reader.doc_vectors, HashEncoder().encode([chunk["text"] for chunk in make_chunks(0, 50)]))
+        assert [chunk["metadata"]["doc_id"] for chunk in reader.catalog] == [f"doc{i}" for i in range(50)]
+        # Au-delà de max_id_segments, les identifiants sont réunis en un seul fichier
+        assert len(reader._id_segments(reader.snapshot.path)) <= 3
+
+def test_legacy_npy_index():
+    with tempfile.TemporaryDirectory() as indices_dir:
+        chunks = make_chunks(0, 10)
+        vectors = HashEncoder().encode([chunk["text"] for chunk in chunks])
+        np.save(os.path.join(indices_dir, "st_doc_vectors.npy"), vectors)
+        save_chunk_ids(os.path.join(indices_dir, "st_chunk_ids.idx"), [f"doc{i}_0" for i in range(10)])
+
+        # Index antérieur aux fichiers bruts: lisible, puis réécrit au nouveau format au premier ajout
+        embeddings = SentenceTransformerEmbeddings(indices_dir=indices_dir)
+        embeddings.model = HashEncoder()
+        assert len(embeddings.chunk_ids) == 10 and np.allclose(embeddings.doc_vectors, vectors)
+        add(embeddings, make_chunks(10, 2))
+        assert os.path.exists(os.path.join(embeddings.snapshot.path, "st_meta.json"))
+        assert SentenceTransformerEmbeddings(indices_dir=indices_dir).doc_vectors.shape == (12, 16)
+
+if __name__ == "__main__":
+    test_snapshot_versions()
+    test_concurrent_search_during_updates()
+    test_writers_in_several_processes()
+    test_delete_and_compact()
+    test_append_only_files()
+    test_legacy_npy_index()
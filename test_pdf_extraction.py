@@ -0,0 +1,101 @@
+import os
+import tempfile
+import PyPDF2
+from app.document_processor.pdf_extractor import PdfExtractor, content_hash
+from app.document_processor.loader import DocumentLoader
+
+def make_pdf(page_texts):
+    """Construire un PDF minimal (une ligne de texte par page)"""
+    count = len(page_texts)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>",
+               b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(count)) + b"] /Count %d >>" % count,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    for i, text in enumerate(page_texts):
+        stream = b"BT /F1 12 Tf 72 720 Td (" + text.encode("latin-1") + b") Tj ET"
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (5 + 2 * i))
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+    pdf = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return pdf
+
+def serial_text(path):
+    """Extraction de référence, page par page"""
+    with open(path, "rb") as f:
+        return "".join(page.extract_text() + "\n" for page in PyPDF2.PdfReader(f).pages)
+
+def test_parallel_extraction_and_cache():
+    with tempfile.TemporaryDirectory() as data_dir:
+        content = make_pdf([f"Rapport page {i} croissance du PIB" for i in range(40)])
+        loader = DocumentLoader(os.path.join(data_dir, "documents"),
+                                PdfExtractor(os.path.join(data_dir, "pdf_cache"), workers=2, pages_per_task=8, parallel_threshold=10))
+        document = loader.save_file(content, "rapport.pdf")
+        assert document["content"] == serial_text(document["path"])
+        assert "Rapport page 39" in document["content"]
+
+        # Le texte est mis en cache par empreinte du contenu
+        cache_path = os.path.join(data_dir, "pdf_cache", f"{content_hash(content)}.jsonl.gz")
+        assert os.path.exists(cache_path)
+        os.remove(document["path"])
+        with open(document["path"], "wb") as f:
+            f.write(b"contenu illisible")
+        assert loader.load_pdf(document["path"], content_hash(content)) == document["content"]
+
+        # Un consommateur qui s'arrête en cours de route ne publie pas de cache partiel
+        other = make_pdf([f"Annexe {i}" for i in range(30)])
+        path = os.path.join(data_dir, "annexe.pdf")
+        with open(path, "wb") as f:
+            f.write(other)
+        pages = loader.iter_pdf_pages(path)
+        assert next(pages).startswith("Annexe 0")
+        pages.close()
+        assert not os.path.exists(os.path.join(data_dir, "pdf_cache", f"{content_hash(other)}.jsonl.gz"))
+        assert not [name for name in os.listdir(os.path.join(data_dir, "pdf_cache")) if name.endswith(".tmp")]
+
+def test_pool_reuse_and_cache_eviction():
+    with tempfile.TemporaryDirectory() as data_dir:
+        cache_dir = os.path.join(data_dir, "pdf_cache")
+        extractor = PdfExtractor(cache_dir, workers=2, pages_per_task=8, parallel_threshold=10)
+        paths = []
+        for name in ("rapport", "annexe", "bilan"):
+            paths.append(os.path.join(data_dir, f"{name}.pdf"))
+            with open(paths[-1], "wb") as f:
+                f.write(make_pdf([f"{name} page {i}" for i in range(20)]))
+        try:
+            # Le pool de processus est créé au premier gros document puis réutilisé
+            assert list(extractor.iter_pages(paths[0]))[19] == "rapport page 19"
+            executor = extractor._executor
+            assert executor is not None
+            list(extractor.iter_pages(paths[1]))
+            assert extractor._executor is executor
+        finally:
+            extractor.close()
+        assert extractor._executor is None
+
+        # Cache borné en taille: l'entrée la moins récemment utilisée est supprimée d'abord
+        entries = {name: os.path.join(cache_dir, name) for name in os.listdir(cache_dir)}
+        size = max(os.path.getsize(path) for path in entries.values())
+        for age, path in enumerate(sorted(entries.values(), key=os.path.getmtime)):
+            os.utime(path, (1000 + age, 1000 + age))
+        oldest = min(entries.values(), key=os.path.getmtime)
+        extractor.cache_max_bytes = 2 * size
+        list(extractor.iter_pages(paths[2]))
+        remaining = set(os.listdir(cache_dir))
+        assert len(remaining) == 2 and os.path.basename(oldest) not in remaining
+
+        # Cache borné en âge
+        limited = PdfExtractor(cache_dir, workers=1, cache_max_bytes=None, cache_max_age=60)
+        for path in os.listdir(cache_dir):
+            os.utime(os.path.join(cache_dir, path), (1000, 1000))
+        list(limited.iter_pages(paths[0]))
+        assert len(os.listdir(cache_dir)) == 1
+
+if __name__ == "__main__":
+    test_parallel_extraction_and_cache()
+    test_pool_reuse_and_cache_eviction()
@@ -0,0 +1,77 @@
+import os
+import tempfile
+import numpy as np
+from app.vector_store.ann import normalize_rows
+from app.vector_store.quantization import QuantizedVectors
+from app.vector_store.embeddings import SentenceTransformerEmbeddings
+from app.vector_store.retriever import Retriever
+
+class HashEncoder:
+    """Encodeur déterministe remplaçant le modèle SentenceTransformer pour le test"""
+    calls = 0
+    
+    def encode(self, texts, **kwargs):
+        HashEncoder.calls += len(texts)
+        return np.stack([np.random.default_rng(abs(hash(t)) % 2**32).normal(size=32) for t in texts]).astype(np.float32)
+
+def test_quantized_scores():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(2000, 64)).astype(np.float32)
+    query = rng.normal(size=64).astype(np.float32)
+    exact = normalize_rows(vectors) @ normalize_rows(query[None])[0]
+    
+    for dtype, tolerance in (("float16", 1e-3), ("int8", 5e-2)):
+        quantized = QuantizedVectors.quantize(vectors, dtype)
+        error = np.abs(quantized.scores(query) - exact).max()
+        print(f"{dtype}: erreur max {error:.5f}, {quantized.codes.nbytes} octets")
+        assert error < tolerance
+
+def test_quantized_retriever():
+    texts = [f"chunk numéro {i}" for i in range(500)]
+    chunks = [{"text": t, "metadata": {"doc_id": f"doc{i}", "chunk_id": 0, "filename": "f.txt"}} for i, t in enumerate(texts)]
+    with tempfile.TemporaryDirectory() as indices_dir:
+        embeddings = SentenceTransformerEmbeddings(indices_dir=indices_dir, vector_dtype="int8")
+        embeddings.model = HashEncoder()
+        embeddings.fit(texts, [f"doc{i}_0" for i in range(500)], chunks)
+        embeddings.add_chunks(["chunk ajouté"], ["new_0"], [{"text": "chunk ajouté", "metadata": {"doc_id": "new", "chunk_id": 0}}])
+        
+        # Les fichiers sont rouverts en mmap après l'ajout
+        reloaded = SentenceTransformerEmbeddings(indices_dir=indices_dir, vector_dtype="int8")
+        reloaded.model = HashEncoder()
+        assert isinstance(reloaded.doc_vectors, np.memmap)
+        assert reloaded.quantized.codes.dtype == np.int8 and len(reloaded.quantized) == 501
+        
+        results = Retriever(reloaded).search("chunk ajouté", top_k=3)
+        assert results[0]["metadata"]["doc_id"] == "new"
+        assert abs(results[0]["score"] - 1.0) < 1e-5
+        
+        # Filtre de métadonnées: seules les lignes candidates sont scorées
+        filtered = Retriever(reloaded).search("chunk ajouté", top_k=3, filters={"doc_id": ["doc7", "new"]})
+        assert filtered[0]["metadata"]["doc_id"] == "new"
+        assert {r["metadata"]["doc_id"] for r in filtered} <= {"doc7", "new"}
+
+def test_quantization_at_write_only():
+    texts = [f"chunk numéro {i}" for i in range(50)]
+    chunks = [{"text": t, "metadata": {"doc_id": f"doc{i}", "chunk_id": 0}} for i, t in enumerate(texts)]
+    with tempfile.TemporaryDirectory() as indices_dir:
+        writer = SentenceTransformerEmbeddings(indices_dir=indices_dir)
+        writer.model = HashEncoder()
+        writer.fit(texts, [f"doc{i}_0" for i in range(50)], chunks)
+        published = writer.snapshot.path
+        files = sorted(os.listdir(published))
+        
+        # Index float32 rouvert en int8: la version publiée n'est pas modifiée, recherche en float32
+        reader = SentenceTransformerEmbeddings(indices_dir=indices_dir, vector_dtype="int8")
+        reader.model = HashEncoder()
+        assert reader.quantized is None and sorted(os.listdir(published)) == files
+        assert Retriever(reader).search("chunk numéro 7", top_k=1)[0]["metadata"]["doc_id"] == "doc7"
+        
+        # La version suivante est écrite avec son stockage quantifié
+        reader.add_chunks(["chunk ajouté"], ["new_0"], [{"text": "chunk ajouté", "metadata": {"doc_id": "new", "chunk_id": 0}}])
+        assert reader.quantized is not None and len(reader.quantized) == 51
+        assert sorted(os.listdir(published)) == files
+
+if __name__ == "__main__":
+    test_quantized_scores()
+    test_quantized_retriever()
+    test_quantization_at_write_only()
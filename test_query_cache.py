@@ -0,0 +1,46 @@
+import tempfile
+import numpy as np
+from app.vector_store.embeddings import SentenceTransformerEmbeddings
+from app.vector_store.query_cache import QueryEmbeddingCache
+
+class HashEncoder:
+    """Encodeur déterministe remplaçant le modèle SentenceTransformer pour le test"""
+    calls = 0
+    
+    def encode(self, texts, **kwargs):
+        HashEncoder.calls += len(texts)
+        return np.stack([np.random.default_rng(abs(hash(t)) % 2**32).normal(size=32) for t in texts]).astype(np.float32)
+
+def test_query_embedding_cache():
+    with tempfile.TemporaryDirectory() as indices_dir:
+        embeddings = SentenceTransformerEmbeddings(indices_dir=indices_dir, query_cache_size=2)
+        embeddings.model = HashEncoder()
+        calls = HashEncoder.calls
+        
+        first = embeddings.transform("PIB du Maroc")
+        assert np.array_equal(embeddings.transform("  PIB du   Maroc "), first)
+        assert HashEncoder.calls == calls + 1
+        
+        # Lot: seules les requêtes absentes du cache sont encodées
+        batch = embeddings.transform_many(["PIB du Maroc", "Population du Mali", "Inflation"])
+        assert batch.shape == (3, 32) and HashEncoder.calls == calls + 3
+        stats = embeddings.query_cache.stats()
+        assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (2, 3, 1, 2)
+        
+        # Niveau disque partagé, séparé par modèle
+        path = f"{indices_dir}/query_cache.db"
+        shared = QueryEmbeddingCache(max_size=8, disk_path=path)
+        shared.set_model("modele-a")
+        shared.put("question", first)
+        other = QueryEmbeddingCache(max_size=8, disk_path=path)
+        other.set_model("modele-a")
+        assert np.array_equal(other.get("question"), first) and other.stats()["disk_hits"] == 1
+        other.set_model("modele-b")
+        assert other.get("question") is None
+        # Un processus encore associé à l'ancien modèle garde ses entrées sur disque
+        reader = QueryEmbeddingCache(max_size=8, disk_path=path)
+        reader.set_model("modele-a")
+        assert np.array_equal(reader.get("question"), first)
+
+if __name__ == "__main__":
+    test_query_embedding_cache()
@@ -1,68 +1,265 @@
+import os
+import tempfile
+import numpy as np
 from app.rag_pipeline.processor import RAGProcessor
+from app.llm.model_manager import LLMManager
+from app.rag_pipeline.answer_cache import AnswerCache
+from app.rag_pipeline.reranker import Reranker
+from app.document_processor.manager import DocumentManager
 
 def test_rag_pipeline():
-    # Initialiser le pipeline RAG
-    rag = RAGProcessor()
-    
-    # Vérifier l'état du système
-    system_info = rag.get_system_info()
-    print("État du système:")
-    print(f"- Documents: {system_info['document_count']}")
-    print(f"- Chunks: {system_info['chunk_count']}")
-    print(f"- Modèle chargé: {system_info['model_loaded']}")
-    print(f"- Nom du modèle: {system_info['model_name']}")
-    
-    # Si le modèle n'est pas chargé, terminer le test
-    if not system_info['model_loaded']:
-        print("\nVeuillez exécuter download_model.py pour télécharger le modèle.")
-        return
-    
-    # Créer un fichier texte de test
-    test_content = """Le système RAG (Retrieval-Augmented Generation) est une technologie 
-    qui combine la recherche d'informations avec des modèles de langage. 
-    Il permet d'améliorer les réponses des LLM en leur fournissant du contexte pertinent.
-    
-    Les composants principaux d'un système RAG sont:
-    1. Un système de gestion de documents
-    2. Un système d'indexation vectorielle
-    3. Un modèle de langage (LLM)
-    4. Un pipeline d'intégration
-    
-    Les avantages du RAG incluent une meilleure précision des réponses, 
-    une réduction des hallucinations et la possibilité d'accéder à des connaissances spécifiques."""
-    
-    test_filename = "test_document_rag.txt"
-    
-    # Convertir le contenu en bytes
-    file_content = test_content.encode('utf-8')
-    
-    # Ajouter le document
-    print("\nAjout d'un document...")
-    result = rag.add_document(file_content, test_filename)
-    
-    if result["success"]:
-        print(f"Document ajouté avec succès: {result['doc_id']}")
-    else:
-        print(f"Erreur: {result['message']}")
-        return
-    
-    # Tester une requête
-    question = "Quels sont les avantages du RAG?"
-    print(f"\nRequête: '{question}'")
-    
-    result = rag.query(question)
-    
-    if result["success"]:
-        print("\nRéponse:")
-        print("-" * 50)
-        print(result["answer"])
-        print("-" * 50)
+    with tempfile.TemporaryDirectory() as storage_dir:
+        # Initialiser le pipeline RAG
+        rag = RAGProcessor(storage_dir=storage_dir)
+    
+        # Vérifier l'état du système
+        system_info = rag.get_system_info()
+        print("État du système:")
+        print(f"- Documents: {system_info['document_count']}")
+        print(f"- Chunks: {system_info['chunk_count']}")
+        print(f"- Modèle chargé: {system_info['model_loaded']}")
+        print(f"- Nom du modèle: {system_info['model_name']}")
+    
+        # Si le modèle n'est pas chargé, terminer le test
+        if not system_info['model_loaded']:
+            print("\nVeuillez exécuter download_model.py pour télécharger le modèle.")
+            return
+    
+        # Créer un fichier texte de test
+        test_content = """Le système RAG (Retrieval-Augmented Generation) est une technologie 
+        qui combine la recherche d'informations avec des modèles de langage. 
+        Il permet d'améliorer les réponses des LLM en leur fournissant du contexte pertinent.
+    
+        Les composants principaux d'un système RAG sont:
+        1. Un système de gestion de documents
+        2. Un système d'indexation vectorielle
+        3. Un modèle de langage (LLM)
+        4. Un pipeline d'intégration
+    
+        Les avantages du RAG incluent une meilleure précision des réponses, 
+        une réduction des hallucinations et la possibilité d'accéder à des connaissances spécifiques."""
+    
+        test_filename = "test_document_rag.txt"
+    
+        # Convertir le contenu en bytes
+        file_content = test_content.encode('utf-8')
+    
+        # Ajouter le document
+        print("\nAjout d'un document...")
+        result = rag.add_document(file_content, test_filename)
+    
+        if result["success"]:
+            print(f"Document ajouté avec succès: {result['doc_id']}")
+        else:
+            print(f"Erreur: {result['message']}")
+            return
+    
+        # Tester une requête
+        question = "Quels sont les avantages du RAG?"
+        print(f"\nRequête: '{question}'")
+    
+        result = rag.query(question)
+    
+        if result["success"]:
+            print("\nRéponse:")
+            print("-" * 50)
+            print(result["answer"])
+            print("-" * 50)
+        
+            print("\nSources:")
+            for i, source in enumerate(result["sources"]):
+                print(f"{i+1}. Fichier: {source['filename']}, Score: {source['score']:.4f}")
+        else:
+            print(f"Erreur: {result['message']}")
+
+def test_answer_cache():
+    cache = AnswerCache(max_size=2, semantic_threshold=0.95)
+    params = {"chunk_ids": ["doc_0", "doc_1"], "index_version": 1, "max_tokens": 256, "temperature": 0.7, "model_name": "tinyllama"}
+    question_vector = np.array([1.0, 0.0, 0.0])
+    
+    cache.put("Quel est le PIB du Maroc ?", answer="Réponse 1", query_vector=question_vector, **params)
+    assert cache.get("Quel est le PIB  du Maroc ?", **params) == "Réponse 1"
+    # Autres chunks ou autres paramètres de génération: pas de réutilisation
+    assert cache.get("Quel est le PIB du Maroc ?", **{**params, "chunk_ids": ["doc_1", "doc_0"]}) is None
+    assert cache.get("Quel est le PIB du Maroc ?", **{**params, "max_tokens": 512}) is None
+    
+    # Mode quasi-doublon: question proche avec exactement le même contexte
+    assert cache.get("PIB du Maroc ?", query_vector=np.array([0.99, 0.05, 0.0]), **params) == "Réponse 1"
+    assert cache.get("PIB du Mali ?", query_vector=np.array([0.5, 0.8, 0.0]), **params) is None
+    assert cache.stats()["semantic_hits"] == 1
+    
+    # Une mise à jour de l'index invalide le cache
+    assert cache.get("Quel est le PIB du Maroc ?", **{**params, "index_version": 2}) is None
+    assert cache.stats()["size"] == 0
+
+class StubDocManager:
+    def count_chunks(self):
+        return 1
+
+class StubVectorStore:
+    index_version = 1
+    embeddings = None
+    chunks = [{"text": "La dette publique du Maroc", "score": 0.9,
+               "metadata": {"doc_id": "doc", "filename": "maroc.txt", "chunk_id": 0}}]
+
+    def encoder_status(self):
+        return {"state": "ready", "ready": True}
+
+    def search(self, question, top_k, **kwargs):
+        return [dict(chunk) for chunk in self.chunks]
+
+def failing_processor(models_dir):
+    # Pipeline sans chargement de modèles: LLM dont chaque génération échoue
+    processor = object.__new__(RAGProcessor)
+    processor.doc_manager = StubDocManager()
+    processor.vector_store = StubVectorStore()
+    processor.llm_manager = LLMManager(models_dir=models_dir)
+    calls = []
+    def failing_model(prompt, **kwargs):
+        calls.append(prompt)
+        raise RuntimeError("délai dépassé")
+    processor.llm_manager.model = failing_model
+    processor.llm_manager.model_name = "stub"
+    processor.answer_cache = AnswerCache(max_size=8)
+    processor.reranker = None
+    processor.model_loaded = True
+    return processor, calls
+
+def test_generation_errors_not_cached():
+    with tempfile.TemporaryDirectory() as models_dir:
+        processor, calls = failing_processor(models_dir)
+        for _ in range(2):
+            result = processor.query("Quelle est la dette publique du Maroc ?")
+            assert result["answer"].startswith("Erreur lors de la génération")
+        # L'échec n'est pas servi depuis le cache: le modèle est rappelé à chaque requête
+        assert len(calls) == 2
+        assert processor.answer_cache.stats()["size"] == 0
+
+class RecordingVectorStore:
+    def __init__(self):
+        self.calls = []
+
+    def add_chunks(self, chunks, replace_documents=None):
+        self.calls.append(([(c["metadata"]["doc_id"], c["metadata"]["chunk_id"]) for c in chunks], list(replace_documents or [])))
+        return True
+
+class FailingVectorStore(RecordingVectorStore):
+    def add_chunks(self, chunks, replace_documents=None):
+        super().add_chunks(chunks, replace_documents)
+        return False
+
+def batch_processor(storage_dir):
+    # Pipeline sans modèles: vrai stockage des documents, index remplacé par un enregistreur
+    processor = object.__new__(RAGProcessor)
+    processor.doc_manager = DocumentManager(storage_dir=storage_dir)
+    processor.vector_store = RecordingVectorStore()
+    return processor
+
+def test_upsert_same_filename_twice_in_batch():
+    with tempfile.TemporaryDirectory() as storage_dir:
+        processor = batch_processor(storage_dir)
+        result = processor.upsert_documents([
+            {"file_content": "Première version du rapport sur la dette.".encode("utf-8"), "filename": "rapport.txt"},
+            {"file_content": "Rapport sur le commerce extérieur.".encode("utf-8"), "filename": "commerce.txt"},
+            {"file_content": "Seconde version du rapport sur la dette.".encode("utf-8"), "filename": "rapport.txt"},
+        ])
+        # Seule la dernière copie est enregistrée; rien n'est supprimé qui serait encore indexé
+        assert not result["results"][0]["success"] and result["document_count"] == 2
+        doc_id = result["results"][2]["doc_id"]
+        assert processor.doc_manager.find_documents("rapport.txt") == [doc_id]
+        indexed, replaced = processor.vector_store.calls[0]
+        assert len(processor.vector_store.calls) == 1 and not replaced
+        assert {row[0] for row in indexed} == {doc_id, result["results"][1]["doc_id"]}
+        assert processor.doc_manager.get_chunks(doc_id)[0]["text"].startswith("Seconde version")
+
+        # Un lot suivant remplace bien le document enregistré
+        again = processor.upsert_documents([{"file_content": "Troisième version.".encode("utf-8"), "filename": "rapport.txt"}])
+        assert again["results"][0]["replaced"] == [doc_id] and not processor.doc_manager.get_chunks(doc_id)
+
+def test_batch_with_failed_document():
+    with tempfile.TemporaryDirectory() as storage_dir:
+        processor = batch_processor(storage_dir)
+        result = processor.add_documents([
+            {"file_content": "Rapport sur la dette publique.".encode("utf-8"), "filename": "dette.txt"},
+            {"file_content": b"PK\x03\x04", "filename": "tableau.xlsx"},
+            {"file_content": "Rapport sur le commerce extérieur.".encode("utf-8"), "filename": "commerce.txt",
+             "metadata": {"country": "MAR"}},
+        ])
+        # Le document en échec est signalé sans empêcher les autres, indexés en une seule mise à jour
+        assert [r["success"] for r in result["results"]] == [True, False, True]
+        assert result["success"] and result["document_count"] == 2 and result["failed_count"] == 1
+        assert "non supporté" in result["results"][1]["message"]
+        assert len(processor.vector_store.calls) == 1
+        indexed, _ = processor.vector_store.calls[0]
+        assert {row[0] for row in indexed} == {result["results"][0]["doc_id"], result["results"][2]["doc_id"]}
+        assert processor.doc_manager.get_chunks(result["results"][2]["doc_id"])[0]["metadata"]["country"] == "MAR"
+        assert processor.doc_manager.count_documents() == 2
+        assert len(os.listdir(processor.doc_manager.docs_dir)) == 2
+
+def test_batch_rolled_back_when_indexing_fails():
+    with tempfile.TemporaryDirectory() as storage_dir:
+        processor = batch_processor(storage_dir)
+        processor.vector_store = FailingVectorStore()
+        documents = [
+            {"file_content": "Rapport sur la dette publique.".encode("utf-8"), "filename": "dette.txt"},
+            {"file_content": "Rapport sur le commerce extérieur.".encode("utf-8"), "filename": "commerce.txt"},
+        ]
+        result = processor.add_documents(documents)
+        # Aucun document du lot ne reste enregistré sans être indexé
+        assert not result["success"] and result["document_count"] == 0
+        assert processor.doc_manager.count_documents() == 0 and not os.listdir(processor.doc_manager.docs_dir)
         
-        print("\nSources:")
-        for i, source in enumerate(result["sources"]):
-            print(f"{i+1}. Fichier: {source['filename']}, Score: {source['score']:.4f}")
-    else:
-        print(f"Erreur: {result['message']}")
+        # Un nouvel envoi du lot indexe bien les documents
+        processor.vector_store = RecordingVectorStore()
+        retry = processor.add_documents(documents)
+        assert retry["success"] and retry["document_count"] == 2 and len(processor.vector_store.calls[0][0]) == 2
+
+def test_prompt_chunks_and_mmr_option():
+    # Les chunks consécutifs d'un même document forment un seul bloc du prompt
+    chunks = [
+        {"text": "B\nC", "score": 0.9, "metadata": {"doc_id": "doc", "filename": "maroc.txt", "chunk_id": 1}},
+        {"text": "Autre", "score": 0.8, "metadata": {"doc_id": "autre", "filename": "mali.txt", "chunk_id": 0}},
+        {"text": "A\nB", "score": 0.7, "metadata": {"doc_id": "doc", "filename": "maroc.txt", "chunk_id": 0}},
+    ]
+    blocks = object.__new__(RAGProcessor)._prompt_chunks(chunks)
+    assert [block["text"] for block in blocks] == ["A\nB\nC", "Autre"]
+    assert blocks[0]["chunk_ids"] == [0, 1] and blocks[0]["score"] == 0.9
+    
+    with tempfile.TemporaryDirectory() as storage_dir:
+        rag = RAGProcessor(use_sentence_transformers=False, mmr_lambda=0.5, storage_dir=storage_dir)
+        assert rag.vector_store.retriever.mmr_lambda == 0.5
+
+def test_reranker():
+    candidates = [
+        {"text": "Le commerce extérieur du Maroc", "score": 0.9},
+        {"text": "La dette publique du Maroc augmente", "score": 0.8},
+        {"text": "Croissance de la dette publique et inflation", "score": 0.7},
+    ]
+    reranker = Reranker("lexical", batch_size=2)
+    reranked = reranker.rerank("dette publique", candidates, top_k=2)
+    assert [chunk["text"] for chunk in reranked] == [candidates[1]["text"], candidates[2]["text"]]
+    assert reranked[0]["retrieval_score"] == 0.8 and reranked[0]["score"] >= reranked[1]["score"]
+    assert candidates[1]["score"] == 0.8
+    # L'IDF porte sur tous les candidats: les scores ne dépendent pas de la taille des lots
+    mixed = candidates + [{"text": "Dette des ménages", "score": 0.6}, {"text": "Dette des entreprises", "score": 0.5}]
+    whole = Reranker("lexical", batch_size=16).rerank("dette publique", mixed, top_k=5)
+    batched = Reranker("lexical", batch_size=2).rerank("dette publique", mixed, top_k=5)
+    assert [chunk["score"] for chunk in batched] == [chunk["score"] for chunk in whole]
+
+    # Budget de candidats: seuls les premiers résultats de la recherche sont reclassés
+    limited = Reranker("lexical", max_candidates=1).rerank("dette publique", candidates, top_k=2)
+    assert [chunk["text"] for chunk in limited] == [candidates[0]["text"]]
+
+    # Budget de temps épuisé après le premier lot: les suivants gardent l'ordre de la recherche
+    budgeted = Reranker("lexical", batch_size=1, time_budget=0.0).rerank("dette publique", candidates, top_k=3)
+    assert [chunk["text"] for chunk in budgeted] == [chunk["text"] for chunk in candidates]
 
 if __name__ == "__main__":
+    test_answer_cache()
+    test_generation_errors_not_cached()
+    test_upsert_same_filename_twice_in_batch()
+    test_batch_with_failed_document()
+    test_batch_rolled_back_when_indexing_fails()
+    test_prompt_chunks_and_mmr_option()
+    test_reranker()
     test_rag_pipeline()
\ No newline at end of file
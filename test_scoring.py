@@ -0,0 +1,29 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.metrics.pairwise import cosine_similarity
+from app.vector_store.scoring import ScoringEngine
+
+def test_scoring_engine_matches_cosine():
+    rng = np.random.default_rng(0)
+    dense = rng.normal(size=(500, 32)).astype(np.float32)
+    sparse = sp.random(500, 200, density=0.05, format="csr", dtype=np.float32, random_state=0)
+    
+    for doc_vectors, queries in ((dense, rng.normal(size=(3, 32))), (sparse, sparse[:3])):
+        engine = ScoringEngine(doc_vectors)
+        expected = cosine_similarity(queries, doc_vectors)
+        assert np.allclose(engine.scores(queries), expected, atol=1e-5)
+        
+        indices, scores = engine.rank(queries[:1], top_k=5, threshold=-1.0)
+        assert list(indices) == list(np.argsort(-expected[0])[:5])
+        assert all(scores[i] >= scores[i + 1] for i in range(len(scores) - 1))
+
+def test_select_top_k_threshold():
+    scores = np.array([0.9, -0.3, 0.2, -0.8, -0.6], dtype=np.float32)
+    assert list(ScoringEngine.select_top_k(scores, 3, 0.1)[0]) == [0, 2]
+    # Aucun score au-dessus du seuil: repli sur -0.5, puis sur les meilleurs
+    assert list(ScoringEngine.select_top_k(-np.abs(scores) - 0.1, 2, 0.5)[0]) == [2, 1]
+    assert list(ScoringEngine.select_top_k(np.array([-0.9, -0.7]), 2, 0.5)[0]) == [1, 0]
+
+if __name__ == "__main__":
+    test_scoring_engine_matches_cosine()
+    test_select_top_k_threshold()
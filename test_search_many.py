@@ -0,0 +1,34 @@
+import tempfile
+from app.vector_store.catalog import make_chunk_id
+from app.vector_store.embeddings import TFIDFEmbeddings
+from app.vector_store.retriever import Retriever
+
+def make_chunks():
+    themes = ["intelligence artificielle", "machine learning", "modèles de langage"]
+    chunks = []
+    for doc_idx, theme in enumerate(themes):
+        for chunk_idx in range(3):
+            chunks.append({
+                "text": f"Document sur {theme}, partie {chunk_idx}. Le sujet {theme} est important.",
+                "metadata": {"doc_id": f"doc-{doc_idx}", "filename": f"{doc_idx}.txt", "chunk_id": chunk_idx,
+                             "type": "topic" if doc_idx == 0 else "country", "id": ["MAR", "TUN", "SEN"][doc_idx]}
+            })
+    return chunks
+
+def test_search_many_matches_search():
+    chunks = make_chunks()
+    with tempfile.TemporaryDirectory() as indices_dir:
+        embeddings = TFIDFEmbeddings(indices_dir)
+        chunk_ids = [make_chunk_id(c["metadata"]["doc_id"], c["metadata"]["chunk_id"]) for c in chunks]
+        embeddings.fit([c["text"] for c in chunks], chunk_ids, chunks)
+        retriever = Retriever(embeddings)
+        
+        queries = ["machine learning", "modèles de langage", "intelligence artificielle"]
+        batched = retriever.search_many(queries, top_k=3)
+        assert len(batched) == len(queries)
+        for query, results in zip(queries, batched):
+            single = retriever.search(query, top_k=3)
+            assert [r["score"] for r in results] == [r["score"] for r in single]
+
+if __name__ == "__main__":
+    test_search_many_matches_search()